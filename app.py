@@ -2,22 +2,15 @@
 # app.py
 import streamlit as st
 from pathlib import Path
-from PIL import Image
 import uuid, re, os, json, shutil, time
-from openai import OpenAI
 from dotenv import load_dotenv
 
 load_dotenv()
 
-from runway_api import generate_video_from_image, extract_video_url
-from video_utils import download_video, concat_videos, add_subtitle_to_video, fit_video_to_duration
-# TTS 모듈 캐싱 방지 - 항상 최신 코드 로드
-import importlib
-
-import tts_core
-import tts_module
-importlib.reload(tts_core)
-importlib.reload(tts_module)
+from runway_api import generate_video_from_image, extract_video_url, run_video_task
+from video_utils import download_video, concat_videos
+# moviepy·OpenAI·Runway·Google SDK는 처음 쓸 때 불러옴 (video_utils.load_moviepy, sdk_clients)
+# → 이름 입력·책 선택 화면은 이 SDK들 없이 뜸. scripts/startup_benchmark.py로 확인.
 
 # 2. 함수 위치에 맞춰 Import 분리
 # (1) API 호출이 필요한 함수 -> tts_module에서 가져옴
@@ -27,19 +20,44 @@ from tts_module import (
 
 # (2) 영상/오디오 파일 처리 유틸리티 -> tts_core에서 가져옴
 from tts_core import (
-    add_audio_to_video,
     concat_videos_with_audio,
     get_audio_duration,
     concat_audio_files,
 )
+from duration_model import get_model, log_duration_sample, predict_segments
+from scene_pipeline import ScenePipeline, Stage
+from render_scheduler import render_slot
+from render_farm import execute as execute_scene_op
+from checkpoint import SceneCheckpoint, mode_a_checkpoint_path
+from cancellation import cancel_scope
+from artifact_store import materialize
+from outputs_gc import start_background_gc
+from job_runner import resume_queued_jobs
+from media_server import start_media_server, show_video, download_link
+from metrics import start_metrics_server
+from profiling import profile_stage
+from eta import StageETA, get_history
+from run_planner import mode_a_checkpoint_key, plan_mode_a
+from tracing import begin_rerun, trace_step
+from sdk_clients import get_openai
 
 import re
 import json
-# OpenAI 클라이언트
-client = OpenAI(api_key=os.getenv("OPENAI_API_KEY"))
 
 import b_text_based
 
+# outputs/ 쿼터 관리 스레드, 영상 스트리밍 서버, 메트릭 엔드포인트, 재시작 전 대기 잡 복구 (프로세스당 한 번만)
+start_background_gc()
+start_media_server()
+start_metrics_server()
+resume_queued_jobs()
+# ETA·길이 예측용 과거 기록을 백그라운드에서 미리 읽기 시작 (막히지 않음)
+get_history()
+get_model()
+
+# 추적(TRACE=1)이 켜져 있으면 리런마다 구간 하나
+begin_rerun("app")
+
 # --------------------------------
 # Streamlit UI 설정
 # --------------------------------
@@ -220,6 +238,7 @@ THUMBNAIL_SIZE = (200, 200)
 
 @st.cache_data(show_spinner=False)
 def load_images(folder_path: str):
+    from PIL import Image
     folder = Path(folder_path)
     results = []
     for p in sorted(folder.iterdir()):
@@ -288,6 +307,7 @@ if mode == "이미지 선택 기반 제작":
     if "modeA_wizard_step" not in st.session_state:
         st.session_state.modeA_wizard_step = 1
     modeA_step = st.session_state.modeA_wizard_step
+    trace_step(f"modeA step {modeA_step}")
 
     def _render_modeA_step_indicator(current: int):
         """상단에 단계 진행도(✅ 완료 / 🟢 진행 중 / ⚪️ 대기) 표시.
@@ -364,11 +384,12 @@ if mode == "이미지 선택 기반 제작":
     st.session_state.mode_a_tts_engine = "gemini-pro"
     MODE_A_TTS_ENGINE = "gemini-pro"
 
-    def _generate_mode_a_audio_with_characters(scripts, characters, dialogue_map, output_dir, uid):
-        """각 장면 텍스트를 따옴표 기준으로 분리, dialogue_map으로 화자/톤 식별,
-        캐릭터별 voice_label에 매핑된 보이스로 합성 후 concat.
+    def _mode_a_tts_segments(scene, characters, dialogue_map):
+        """장면 텍스트를 따옴표 기준으로 분리, dialogue_map으로 화자/톤 식별,
+        캐릭터별 voice_label에 매핑된 보이스로 실제 합성 단위 [(text, speaker, style_prompt)]를 만든다.
         매칭 안 되는 대사나 narration은 scene의 기본 speaker(narrator)로 fallback.
-        dialogue_map 각 항목의 'tone' 필드가 있으면 그 대사 합성 시 style_prompt로 전달."""
+        dialogue_map 각 항목의 'tone' 필드가 있으면 그 대사 합성 시 style_prompt로 전달.
+        합성할 것이 없으면 []. 합성(_generate_mode_a_audio_with_characters)과 길이 예측이 같이 씀."""
         char_voice = {}
         for c in characters or []:
             cid = c.get("id")
@@ -408,97 +429,108 @@ if mode == "이미지 선택 기반 제작":
                 f"Speak the following Korean text naturally with matching emotion."
             )
 
-        output_dir = Path(output_dir)
-        audio_paths = []
         quote_pattern = r'[“"]([^“”"]*?)[”"]'
-
-        for i, scene in enumerate(scripts):
-            text = (scene.get("text") or "").strip()
-            narr_spk = scene.get("speaker", "narrator")
-            if not text or narr_spk == "none":
-                audio_paths.append(None)
+        text = (scene.get("text") or "").strip()
+        narr_spk = scene.get("speaker", "narrator")
+        if not text or narr_spk == "none":
+            return []
+
+        # 세그먼트별 보이스 fallback 정책:
+        #   - 따옴표 안 대사: dialogue_map에서 캐릭터 찾음 → 못 찾으면 _safe_narr_spk
+        #   - 본문 나레이션은 항상 narrator_voice (캐릭터 프로필에서 지정한 보이스)로
+        #     읽음. scene.speaker는 "narrator" 또는 "none" 두 값만 들어옴.
+        _safe_narr_spk = narrator_voice if narr_spk != "none" else narrator_voice
+
+        # 본문에서 extra_lines 위치를 찾아 chunk 단위로 split. extra chunk는
+        # 사용자가 지정한 화자로 강제, 나머지 chunk는 기존 quote 매핑 로직 적용.
+        # 같은 텍스트가 본문에 중복 등장하면 첫 등장만 매칭, 겹치는 extra는 무시.
+        extras = scene.get("extra_lines") or []
+        extra_hits = []
+        for ex in extras:
+            ex_text = (ex.get("text") or "").strip()
+            if not ex_text:
+                continue
+            pos = text.find(ex_text)
+            if pos < 0:
+                continue
+            extra_hits.append({
+                "start": pos,
+                "end": pos + len(ex_text),
+                "text": ex_text,
+                "speaker": (ex.get("speaker") or "narrator") or "narrator",
+                "tone": (ex.get("tone") or "").strip(),
+            })
+        extra_hits.sort(key=lambda h: h["start"])
+        non_overlap_hits = []
+        for h in extra_hits:
+            if non_overlap_hits and h["start"] < non_overlap_hits[-1]["end"]:
+                continue
+            non_overlap_hits.append(h)
+
+        chunks = []
+        cursor = 0
+        for h in non_overlap_hits:
+            if h["start"] > cursor:
+                chunks.append((text[cursor:h["start"]], False, None, ""))
+            chunks.append((h["text"], True, h["speaker"], h.get("tone", "")))
+            cursor = h["end"]
+        if cursor < len(text):
+            chunks.append((text[cursor:], False, None, ""))
+        if not chunks:
+            chunks.append((text, False, None, ""))
+
+        # (text, speaker, style_prompt) 세그먼트 빌드 — chunk 단위
+        segments = []
+        for chunk_text, is_extra, forced_spk, forced_tone in chunks:
+            if is_extra:
+                spk = forced_spk if forced_spk and forced_spk != "none" else _safe_narr_spk
+                # extra에서 "narrator" 라벨 선택했으면 캐릭터 프로필의 나레이터로 통일
+                if spk == "narrator":
+                    spk = narrator_voice
+                else:
+                    # 캐릭터 id를 골랐다면 char_voice로 매핑, 아니면 라벨 그대로
+                    spk = char_voice.get(spk, spk)
+                seg_text = chunk_text.strip()
+                if seg_text:
+                    segments.append((seg_text, spk, _tone_to_prompt(forced_tone)))
                 continue
 
-            # 세그먼트별 보이스 fallback 정책:
-            #   - 따옴표 안 대사: dialogue_map에서 캐릭터 찾음 → 못 찾으면 _safe_narr_spk
-            #   - 본문 나레이션은 항상 narrator_voice (캐릭터 프로필에서 지정한 보이스)로
-            #     읽음. scene.speaker는 "narrator" 또는 "none" 두 값만 들어옴.
-            _safe_narr_spk = narrator_voice if narr_spk != "none" else narrator_voice
-
-            # 본문에서 extra_lines 위치를 찾아 chunk 단위로 split. extra chunk는
-            # 사용자가 지정한 화자로 강제, 나머지 chunk는 기존 quote 매핑 로직 적용.
-            # 같은 텍스트가 본문에 중복 등장하면 첫 등장만 매칭, 겹치는 extra는 무시.
-            extras = scene.get("extra_lines") or []
-            extra_hits = []
-            for ex in extras:
-                ex_text = (ex.get("text") or "").strip()
-                if not ex_text:
-                    continue
-                pos = text.find(ex_text)
-                if pos < 0:
-                    continue
-                extra_hits.append({
-                    "start": pos,
-                    "end": pos + len(ex_text),
-                    "text": ex_text,
-                    "speaker": (ex.get("speaker") or "narrator") or "narrator",
-                    "tone": (ex.get("tone") or "").strip(),
-                })
-            extra_hits.sort(key=lambda h: h["start"])
-            non_overlap_hits = []
-            for h in extra_hits:
-                if non_overlap_hits and h["start"] < non_overlap_hits[-1]["end"]:
-                    continue
-                non_overlap_hits.append(h)
-
-            chunks = []
-            cursor = 0
-            for h in non_overlap_hits:
-                if h["start"] > cursor:
-                    chunks.append((text[cursor:h["start"]], False, None, ""))
-                chunks.append((h["text"], True, h["speaker"], h.get("tone", "")))
-                cursor = h["end"]
-            if cursor < len(text):
-                chunks.append((text[cursor:], False, None, ""))
-            if not chunks:
-                chunks.append((text, False, None, ""))
-
-            # (text, speaker, style_prompt) 세그먼트 빌드 — chunk 단위
-            segments = []
-            for chunk_text, is_extra, forced_spk, forced_tone in chunks:
-                if is_extra:
-                    spk = forced_spk if forced_spk and forced_spk != "none" else _safe_narr_spk
-                    # extra에서 "narrator" 라벨 선택했으면 캐릭터 프로필의 나레이터로 통일
-                    if spk == "narrator":
-                        spk = narrator_voice
-                    else:
-                        # 캐릭터 id를 골랐다면 char_voice로 매핑, 아니면 라벨 그대로
-                        spk = char_voice.get(spk, spk)
-                    seg_text = chunk_text.strip()
-                    if seg_text:
-                        segments.append((seg_text, spk, _tone_to_prompt(forced_tone)))
-                    continue
+            # 일반 chunk: 따옴표 단위로 다시 split
+            last_end = 0
+            for m in re.finditer(quote_pattern, chunk_text):
+                if m.start() > last_end:
+                    narr = chunk_text[last_end:m.start()].strip()
+                    if narr:
+                        segments.append((narr, _safe_narr_spk, ""))
+                quote = m.group(1).strip()
+                if quote:
+                    spk_id, tone = _lookup_quote(quote)
+                    spk = char_voice.get(spk_id, _safe_narr_spk) if spk_id else _safe_narr_spk
+                    segments.append((quote, spk, _tone_to_prompt(tone)))
+                last_end = m.end()
+            if last_end < len(chunk_text):
+                tail = chunk_text[last_end:].strip()
+                if tail:
+                    segments.append((tail, _safe_narr_spk, ""))
+
+        if not segments:
+            segments.append((text, _safe_narr_spk, ""))
+        return segments
+
+    def _log_segment_sample(seg_text, seg_spk, path):
+        # 길이 학습 샘플은 세그먼트 단위로 — 실제 읽은 텍스트와 보이스, concat 사이 여백 제외
+        log_duration_sample(seg_text, seg_spk, MODE_A_TTS_ENGINE, 0, get_audio_duration(str(path)))
 
-                # 일반 chunk: 따옴표 단위로 다시 split
-                last_end = 0
-                for m in re.finditer(quote_pattern, chunk_text):
-                    if m.start() > last_end:
-                        narr = chunk_text[last_end:m.start()].strip()
-                        if narr:
-                            segments.append((narr, _safe_narr_spk, ""))
-                    quote = m.group(1).strip()
-                    if quote:
-                        spk_id, tone = _lookup_quote(quote)
-                        spk = char_voice.get(spk_id, _safe_narr_spk) if spk_id else _safe_narr_spk
-                        segments.append((quote, spk, _tone_to_prompt(tone)))
-                    last_end = m.end()
-                if last_end < len(chunk_text):
-                    tail = chunk_text[last_end:].strip()
-                    if tail:
-                        segments.append((tail, _safe_narr_spk, ""))
+    def _generate_mode_a_audio_with_characters(scripts, characters, dialogue_map, output_dir, uid):
+        """장면마다 _mode_a_tts_segments의 세그먼트를 합성한 뒤 concat. 실패한 장면은 None."""
+        output_dir = Path(output_dir)
+        audio_paths = []
 
+        for i, scene in enumerate(scripts):
+            segments = _mode_a_tts_segments(scene, characters, dialogue_map)
             if not segments:
-                segments.append((text, _safe_narr_spk, ""))
+                audio_paths.append(None)
+                continue
 
             out_path = output_dir / f"clip_{i:02d}_{uid}.mp3"
 
@@ -508,6 +540,8 @@ if mode == "이미지 선택 기반 제작":
                     seg_text, str(out_path), speaker=seg_spk,
                     engine=MODE_A_TTS_ENGINE, style_prompt=seg_prompt,
                 )
+                if ok and out_path.exists():
+                    _log_segment_sample(seg_text, seg_spk, out_path)
                 audio_paths.append(str(out_path) if ok and out_path.exists() else None)
                 continue
 
@@ -521,6 +555,7 @@ if mode == "이미지 선택 기반 제작":
                     seg_text, str(tmp), speaker=seg_spk,
                     engine=MODE_A_TTS_ENGINE, style_prompt=seg_prompt,
                 ) and tmp.exists():
+                    _log_segment_sample(seg_text, seg_spk, tmp)
                     temp_paths.append(str(tmp))
 
             if not temp_paths:
@@ -536,6 +571,12 @@ if mode == "이미지 선택 기반 제작":
 
         return audio_paths
 
+    def _predict_mode_a_scene(scene):
+        """합성 전 장면 길이 예측 — 합성과 같은 세그먼트(보이스별)로 나눠 예측한 합."""
+        _cd = st.session_state.get("mode_a_characters") or {}
+        segments = _mode_a_tts_segments(scene, _cd.get("characters"), _cd.get("dialogue_map"))
+        return predict_segments([(t, spk) for t, spk, _ in segments], engine=MODE_A_TTS_ENGINE)
+
     # =========================================================
     # [SHARED MODE A SETUP] 모든 단계가 공유하는 헬퍼/상태/상수
     # (Wizard 도입 후 step 2 안에 있던 것들을 step 3·4도 쓸 수 있게 위로 끌어올림)
@@ -792,7 +833,7 @@ if mode == "이미지 선택 기반 제작":
                              if c.get("id") == NARRATOR_ID),
                             None,
                         )
-                        result = b_text_based.analyze_characters_and_speakers(client, full_text)
+                        result = b_text_based.analyze_characters_and_speakers(get_openai(), full_text)
                         result = _merge_analysis_with_narrator(result, _existing_narrator)
                         st.session_state.mode_a_characters = result
                         log_event("modeA_char_analysis_done", {
@@ -1350,7 +1391,7 @@ if mode == "이미지 선택 기반 제작":
                             if not st.session_state.proc_uid:
                                 st.session_state.proc_uid = _uid
     
-                            with st.spinner(f"장면 {i+1} 음성 합성 중..."):
+                            with st.spinner(f"장면 {i+1} 음성 합성 중..."), render_slot("tts", "interactive"):
                                 _audio_paths = _generate_mode_a_audio_with_characters(
                                     [_scene_dict], _chars, _dialogues, SESSION_DIR,
                                     f"{_uid}_scene{i:02d}",
@@ -1421,7 +1462,15 @@ if mode == "이미지 선택 기반 제작":
                             else None
                         )
                         _tts_dur = _audio_info_for_dur.get("duration") if _audio_info_for_dur else None
-                        if _tts_dur is None:
+                        _scene_text = (st.session_state.get(f"script_text_{i}") or item.get("text") or "").strip()
+                        if _tts_dur is None and _scene_text:
+                            # TTS 전이라도 예측 길이(90% 상한)로 Runway 길이를 정해 먼저 돌릴 수 있음
+                            _pred = _predict_mode_a_scene({
+                                "text": _scene_text, "speaker": "narrator",
+                                "extra_lines": item.get("extra_lines") or [],
+                            })
+                            _rw_dur = 5 if _pred.high <= 5.0 else 10
+                        elif _tts_dur is None:
                             _rw_dur = DEFAULT_DURATION
                         elif _tts_dur <= 5.0:
                             _rw_dur = 5
@@ -1435,7 +1484,8 @@ if mode == "이미지 선택 기반 제작":
     
                         try:
                             with st.spinner(f"장면 {i+1} 영상 생성 중 (1~3분)..."):
-                                _result = generate_video_from_image(str(_img_path), _final_prompt, _rw_dur)
+                                with render_slot("runway", "interactive"):
+                                    _result = generate_video_from_image(str(_img_path), _final_prompt, _rw_dur)
                                 _video_url = extract_video_url(_result)
                                 SESSION_DIR.mkdir(parents=True, exist_ok=True)
                                 _raw_path = SESSION_DIR / f"clip_{i:02d}_{_uid}_raw.mp4"
@@ -1529,49 +1579,31 @@ if mode == "이미지 선택 기반 제작":
             if _missing == 0 and _total_scenes > 0:
                 st.success(f"✅ 모든 장면({_total_scenes}개) Runway 영상이 준비됨. 합성만 진행되어 크레딧 차감 없음.")
 
-            if st.button("최종 영상 합성하기"):
-                log_button_click("mode_a_step3_compose", {
-                    "scene_count": len(st.session_state.selected_pages),
-                    "cached_runway": _cached_count,
-                    "missing_runway": _missing,
-                    "use_bgm": use_bgm,
-                })
-                uid = st.session_state.proc_uid
-                OUT = SESSION_DIR
-                video_paths = []
-                log_event("modeA_step3_start", {
-                    "uid": uid,
-                    "scene_count": len(st.session_state.selected_pages),
-                    "prompt": PROMPT,
-                })
-                
-                progress_bar = st.progress(0)
-                status_text = st.empty()
-                total = len(st.session_state.selected_pages)
-                
-                # 1. 영상 생성
+            # 장면별 작업 명세 (session_state는 스크립트 스레드에서만 읽음)
+            def _build_step3_scene_specs():
+                scene_specs = []
                 for i, name in enumerate(st.session_state.selected_pages):
-                    status_text.text(f"[{i+1}/{total}] '{name}' 영상 생성 중...")
-                    
-                    img_path = folder / name
                     tts_dur = st.session_state.step2_audio[i]["duration"]
-                    
-                    # 길이 결정
-                    if tts_dur is None:
+                    _scene_text = (st.session_state.step1_scripts[i].get("text") or "").strip()
+
+                    # 길이 결정 (TTS가 아직 없으면 예측 길이의 90% 상한 기준)
+                    if tts_dur is None and _scene_text:
+                        _pred = _predict_mode_a_scene(st.session_state.step1_scripts[i])
+                        runway_dur = 5 if _pred.high <= 5.0 else 10
+                    elif tts_dur is None:
                         runway_dur = DEFAULT_DURATION
                     elif tts_dur <= 5.0:
                         runway_dur = 5
                     else:
                         runway_dur = 10
-                    
+
                     # 장면별 Runway 프롬프트 우선, 없으면 글로벌 PROMPT
                     _scene_rw_prompt = ""
                     try:
                         _scene_rw_prompt = (st.session_state.step1_scripts[i].get("runway_prompt") or "").strip()
                     except (IndexError, KeyError, AttributeError):
                         _scene_rw_prompt = ""
-                    _runway_prompt = _scene_rw_prompt or PROMPT
-    
+
                     # Step 1.5에서 장면별로 이미 Runway 돌렸으면 그 결과 재사용
                     # (사용자가 마음에 든 버전을 그대로 영상에 적용 — 크레딧 절약).
                     _cached_vid = None
@@ -1583,72 +1615,187 @@ if mode == "이미지 선택 기반 제작":
                         if _cached_vid and _cached_vid.get("raw_path")
                         else None
                     )
-                    _use_cache = bool(_cached_raw and os.path.exists(_cached_raw))
-    
-                    try:
-                        if _use_cache:
-                            raw_path = Path(_cached_raw)
-                            status_text.text(f"[{i+1}/{total}] '{name}' 캐시된 영상 재사용")
-                        else:
-                            result = generate_video_from_image(str(img_path), _runway_prompt, runway_dur)
-                            video_url = extract_video_url(result)
-                            raw_path = OUT / f"clip_{i:02d}_{uid}_raw.mp4"
-                            download_video(video_url, raw_path)
-    
-                        # 영상 길이를 TTS 길이에 정확히 맞춤. TTS가 영상보다 짧으면 trim,
-                        # 길면 마지막 프레임 freeze-frame으로 extend (그래야 음성이 안 잘림).
-                        out_path = OUT / f"clip_{i:02d}_{uid}.mp4"
-                        if tts_dur:
-                            fit_video_to_duration(str(raw_path), tts_dur, str(out_path))
-                        else:
-                            shutil.copy(str(raw_path), str(out_path))
-                        video_paths.append(out_path)
-                        
-                    except Exception as e:
-                        st.error(f"영상 생성 실패 ({name}): {e}")
-                        video_paths.append(None)
-                    
-                    progress_bar.progress((i + 1) / total)
-                    
-                # 2. 합성
-                status_text.text("자막 및 오디오 합성 중...")
-                final_clips = []
+
+                    page_bgm = get_bgm_for_page(name, BGM_DIR) if use_bgm else None
+                    scene_specs.append({
+                        "name": name,
+                        "img_path": folder / name,
+                        "tts_dur": tts_dur,
+                        "runway_dur": runway_dur,
+                        "prompt": _scene_rw_prompt or PROMPT,
+                        "cached_raw": _cached_raw if (_cached_raw and os.path.exists(_cached_raw)) else None,
+                        "subtitle": st.session_state.step1_scripts[i]["text"],
+                        "audio": st.session_state.step2_audio[i]["path"],
+                        "bgm": page_bgm if (page_bgm and page_bgm.exists()) else None,
+                        "notes": [],
+                    })
+                return scene_specs
+
+            def _step3_checkpoint_path():
+                # proc_uid는 세션마다 새로 생기므로 사용자·책·삽화 기준 — 세션이 죽은 뒤 다시 들어와도 이어서 진행
+                return mode_a_checkpoint_path(
+                    st.session_state.get("user_name"), selected_book, st.session_state.selected_pages,
+                )
+
+            # 실행 계획 미리 보기 — 호출 수·예상 시간·비용 (아무것도 실행하지 않음)
+            if _total_scenes > 0:
+                _plan = plan_mode_a(_build_step3_scene_specs(), _step3_checkpoint_path())
+                st.caption(f"🧭 {_plan.summary_text()}")
+                with st.expander("실행 계획 보기", expanded=False):
+                    st.dataframe(_plan.rows(), hide_index=True, use_container_width=True)
+                    for _note in _plan.notes:
+                        st.caption(_note)
+
+            if st.button("최종 영상 합성하기"):
+                log_button_click("mode_a_step3_compose", {
+                    "scene_count": len(st.session_state.selected_pages),
+                    "cached_runway": _cached_count,
+                    "missing_runway": _missing,
+                    "use_bgm": use_bgm,
+                })
+                uid = st.session_state.proc_uid
+                OUT = SESSION_DIR
+                log_event("modeA_step3_start", {
+                    "uid": uid,
+                    "scene_count": len(st.session_state.selected_pages),
+                    "prompt": PROMPT,
+                })
                 
-                for i, vid in enumerate(video_paths):
-                    if vid is None: continue
-    
-                    sub = st.session_state.step1_scripts[i]["text"]
-                    audio = st.session_state.step2_audio[i]["path"]
-                    img_name = st.session_state.selected_pages[i]
-    
-                    # 자막
-                    sub_out = str(vid).replace(".mp4", "_sub.mp4")
-                    add_subtitle_to_video(str(vid), sub, sub_out, scene_index=i)
-    
+                progress_bar = st.progress(0)
+                status_text = st.empty()
+                total = len(st.session_state.selected_pages)
+
+                # 1. 장면별 작업 명세 (버튼 위 실행 계획과 같은 것)
+                scene_specs = _build_step3_scene_specs()
+
+                # 2. generate → download → fit → subtitle → mux 파이프라인
+                #    장면 N을 합성하는 동안 장면 N+1의 Runway 생성이 진행됨.
+                #    장면별 진행은 체크포인트에 남겨서, 중간에 실패/중단 후 다시 누르면
+                #    제출된 Runway 작업은 다시 조회하고 끝난 다운로드/길이 맞춤은 건너뜀.
+                checkpoint = SceneCheckpoint(_step3_checkpoint_path())
+
+                def _stage_generate(i, spec):
+                    spec["resumed"] = checkpoint.resume(i, mode_a_checkpoint_key(spec))
+                    if spec["cached_raw"]:
+                        spec["raw_path"] = Path(spec["cached_raw"])
+                        spec["notes"].append(("caption", f"♻️ Scene {i+1} ({spec['name']}): 캐시된 영상 재사용"))
+                    elif spec["resumed"].get("raw_path"):
+                        spec["raw_path"] = Path(spec["resumed"]["raw_path"])
+                        spec["notes"].append(("caption", f"♻️ Scene {i+1} ({spec['name']}): 이전 실행의 영상 재사용"))
+                    else:
+                        result = run_video_task(
+                            str(spec["img_path"]), spec["prompt"], spec["runway_dur"],
+                            task_id=spec["resumed"].get("task_id"),
+                            on_submitted=lambda tid: checkpoint.record(i, task_id=tid),
+                        )
+                        spec["video_url"] = extract_video_url(result)
+                    return spec
+
+                def _stage_download(i, spec):
+                    if not spec.get("raw_path"):
+                        raw_path = OUT / f"clip_{i:02d}_{uid}_raw.mp4"
+                        try:
+                            download_video(spec["video_url"], raw_path)
+                        except Exception:
+                            # 결과 URL이 만료된 작업은 다음 실행에서 새로 제출
+                            checkpoint.forget(i, "task_id")
+                            raise
+                        checkpoint.record(i, raw_path=raw_path)
+                        spec["raw_path"] = raw_path
+                    return spec
+
+                def _stage_fit(i, spec):
+                    # 영상 길이를 TTS 길이에 정확히 맞춤. TTS가 영상보다 짧으면 trim,
+                    # 길면 마지막 프레임 freeze-frame으로 extend (그래야 음성이 안 잘림).
+                    resumed = spec["resumed"]
+                    if resumed.get("clip_path") and resumed.get("fit_target") == spec["tts_dur"]:
+                        spec["clip_path"] = Path(resumed["clip_path"])
+                        return spec
+                    out_path = OUT / f"clip_{i:02d}_{uid}.mp4"
+                    if spec["tts_dur"]:
+                        result = execute_scene_op(
+                            "fit", {"video": spec["raw_path"]},
+                            {"method": "loop", "target_duration": spec["tts_dur"]}, out_path,
+                        )
+                        if result is not True:
+                            raise RuntimeError(result)
+                    else:
+                        materialize(spec["raw_path"], out_path)
+                    checkpoint.record(i, clip_path=out_path, fit_target=spec["tts_dur"])
+                    spec["clip_path"] = out_path
+                    return spec
+
+                def _stage_subtitle(i, spec):
+                    sub_out = str(spec["clip_path"]).replace(".mp4", "_sub.mp4")
+                    result = execute_scene_op(
+                        "subtitle", {"video": spec["clip_path"]}, {"text": spec["subtitle"], "scene_index": i}, sub_out,
+                    )
+                    if result is not True:
+                        raise RuntimeError(result)
+                    spec["sub_path"] = sub_out
+                    return spec
+
+                def _stage_mux(i, spec):
                     # 오디오 (BGM 포함 - 페이지별 자동 매칭)
+                    sub_out = spec["sub_path"]
                     final_out = sub_out.replace("_sub.mp4", "_audio.mp4")
+                    audio = spec["audio"]
                     if audio and os.path.exists(audio):
-                        # 해당 페이지의 BGM 찾기
-                        page_bgm = None
-                        if use_bgm:
-                            page_bgm = get_bgm_for_page(img_name, BGM_DIR)
-    
-                        if page_bgm and page_bgm.exists():
-                            add_audio_to_video(sub_out, audio, final_out, bgm_path=str(page_bgm), bgm_volume=bgm_volume)
-                            st.caption(f"🎵 Scene {i+1} ({img_name}): BGM '{page_bgm.name}' 적용")
+                        if spec["bgm"]:
+                            execute_scene_op("mux", {"video": sub_out, "audio": audio, "bgm": spec["bgm"]},
+                                             {"bgm_volume": bgm_volume}, final_out)
+                            spec["notes"].append(("caption", f"🎵 Scene {i+1} ({spec['name']}): BGM '{spec['bgm'].name}' 적용"))
                         else:
-                            add_audio_to_video(sub_out, audio, final_out)
+                            execute_scene_op("mux", {"video": sub_out, "audio": audio}, {}, final_out)
                             if use_bgm:
-                                st.caption(f"⚠️ Scene {i+1} ({img_name}): 매칭되는 BGM 없음")
+                                spec["notes"].append(("caption", f"⚠️ Scene {i+1} ({spec['name']}): 매칭되는 BGM 없음"))
                     else:
-                        shutil.copy(sub_out, final_out)
-    
-                    final_clips.append(final_out)
+                        materialize(sub_out, final_out)
+                    spec["final_path"] = final_out
+                    return spec
+
+                _done_count = [0]
+                scene_eta = StageETA("modeA", [1] * len(scene_specs))
+
+                def _on_scene_done(res):
+                    _done_count[0] += 1
+                    # 실패한 장면은 처리 속도 기록에서 뺌
+                    scene_eta.unit_done(res.index, cached=not res.ok)
+                    spec = res.value
+                    for level, msg in spec.get("notes", []):
+                        getattr(st, level)(msg)
+                    if not res.ok:
+                        st.error(f"영상 생성 실패 ({spec['name']}, {res.failed_stage}): {res.error}")
+                    status_text.text(f"[{_done_count[0]}/{total}] '{spec['name']}' 완료")
+                    progress_bar.progress(_done_count[0] / total, text=scene_eta.text())
+
+                status_text.text(f"{total}개 장면 영상 생성·합성 중...")
+                # 취소 버튼(또는 다른 위젯 조작)으로 리런되면 cancel_scope가 토큰을 취소 →
+                # 도는 ffmpeg 종료, 대기 중인 Runway 작업 취소, 남은 장면 건너뜀.
+                # 리런 요청은 st.* 호출 때 반영되므로 기다리는 동안 경과 시간을 계속 갱신.
+                st.button("⏹ 취소", key="modeA_step3_cancel")
+                _elapsed_text = st.empty()
+                _t0 = time.time()
+
+                def _on_idle():
+                    _elapsed_text.caption(f"⏱ {int(time.time() - _t0)}초 경과 · {scene_eta.text()}")
+
+                with cancel_scope():
+                    scene_results = ScenePipeline([
+                        Stage("generate", _stage_generate),
+                        Stage("download", _stage_download),
+                        Stage("fit", _stage_fit),
+                        Stage("subtitle", _stage_subtitle),
+                        Stage("mux", _stage_mux),
+                    ]).run(scene_specs, on_result=_on_scene_done, on_idle=_on_idle)
+
+                final_clips = [r.value["final_path"] for r in scene_results if r.ok]
                     
                 # 3. 최종 병합
                 status_text.text("최종 파일 저장 중...")
                 final_video = OUT / f"short_final_{uid}.mp4"
-                concat_videos_with_audio(final_clips, str(final_video))
+                with render_slot("cpu"), profile_stage("modeA concat"):
+                    concat_videos_with_audio(final_clips, str(final_video))
     
                 progress_bar.progress(100)
                 status_text.text("완료!")
@@ -1670,14 +1817,14 @@ if mode == "이미지 선택 기반 제작":
             # 전체화면 버튼으로 크게 볼 수 있음.
             _vid_left, _vid_mid, _vid_right = st.columns([1, 2, 1])
             with _vid_mid:
-                st.video(st.session_state.step3_final_video)
+                show_video(st.session_state.step3_final_video)
 
-            with open(st.session_state.step3_final_video, "rb") as f:
-                st.download_button(
-                    " 최종 영상 다운로드",
-                    f,
-                    file_name=Path(st.session_state.step3_final_video).name
-                )
+            download_link(
+                " 최종 영상 다운로드",
+                st.session_state.step3_final_video,
+                file_name=Path(st.session_state.step3_final_video).name,
+                mime="video/mp4",
+            )
 
         # Step 4 navigation — 마지막 단계라 next 없음
         _render_modeA_nav(prev_ok=True, next_ok=False)
@@ -1687,6 +1834,6 @@ if mode == "이미지 선택 기반 제작":
 # B. 텍스트 분석 기반 제작
 #-----------------------------
 elif mode == "텍스트 분석 기반 예고편 제작":
-    b_text_based.run_text_analysis_mode(client, folder, txt_file)
+    b_text_based.run_text_analysis_mode(get_openai(), folder, txt_file)
 
     
\ No newline at end of file
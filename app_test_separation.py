@@ -2,7 +2,7 @@
 import streamlit as st
 from pathlib import Path
 from PIL import Image
-import uuid, re, os, json, shutil
+import uuid, re, os, json
 from openai import OpenAI
 from dotenv import load_dotenv
 
@@ -10,6 +10,7 @@ load_dotenv()
 
 from runway_api import generate_video_from_image, extract_video_url
 from video_utils import download_video, concat_videos, add_subtitle_to_video, trim_video_to_duration
+from artifact_store import materialize
 # TTS 모듈 캐싱 방지 - 항상 최신 코드 로드
 import importlib
 import tts_module
@@ -655,7 +656,7 @@ if mode == "(기존) 이미지 선택 기반 제작":
                     if tts_dur and tts_dur < runway_dur:
                         trim_video_to_duration(str(raw_path), tts_dur, str(out_path))
                     else:
-                        shutil.copy(str(raw_path), str(out_path))
+                        materialize(raw_path, out_path)
                     video_paths.append(out_path)
                     
                 except Exception as e:
@@ -695,7 +696,7 @@ if mode == "(기존) 이미지 선택 기반 제작":
                         if use_bgm:
                             print(f"   Scene {i+1} ({img_name}): 매칭되는 BGM 없음")
                 else:
-                    shutil.copy(sub_out, final_out) 
+                    materialize(sub_out, final_out)
 
                 final_clips.append(final_out)
                 
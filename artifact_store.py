@@ -0,0 +1,149 @@
+# -*- coding: utf-8 -*-
+"""
+내용 주소 기반 산출물 저장소 (CAS).
+같은 Runway 원본 클립, TTS 세그먼트, BGM 합성 오디오가 버전 폴더·세션마다 복사되던 것을
+outputs/.cas/objects/<sha256[:2]>/<sha256> 에 한 번만 저장하고, 각 위치에는 하드링크로 둔다.
+
+- put(path): 파일 내용을 저장소에 복사해 등록 (path 자체는 링크하지 않음 — 원본은 그대로 제 inode)
+- materialize(src, dst): src 내용을 dst에 둠 (복사 대신 저장소 객체 하드링크)
+- 다른 파일시스템이라 하드링크가 안 되면 복사로 폴백 (결과는 같고 절약만 못 함)
+
+하드링크된 파일을 제자리에서 덮어쓰면 같은 내용을 가진 모든 위치와 객체가 바뀐다.
+- 객체는 읽기 전용(0444)으로 둠 → 일반 사용자 권한이면 제자리 덮어쓰기가 조용히 넘어가지 않고 실패함
+- 쓰기 직전에 detach(path)로 공유 inode를 끊음: ffmpeg 출력은 proc_accounting.AccountedPopen이,
+  파이썬에서 직접 쓰는 곳(다운로드, TTS 저장 등)은 각자 부름
+"""
+import os
+import shutil
+import threading
+import uuid
+from pathlib import Path
+from typing import Optional
+
+from render_cache import file_digest
+
+STORE_DIR = os.getenv("ARTIFACT_STORE_DIR", "outputs/.cas")
+OBJECT_MODE = 0o444
+
+
+class ArtifactStore:
+    def __init__(self, root):
+        self.root = Path(root)
+        self._lock = threading.Lock()
+
+    def object_path(self, digest: str) -> Path:
+        return self.root / "objects" / digest[:2] / digest
+
+    def put(self, path) -> Optional[str]:
+        """
+        파일 내용을 저장소에 등록하고 sha256을 반환 (파일이 없으면 None).
+        새 내용이면 객체로 복사. path는 건드리지 않음 — path를 나중에 제자리에서 다시 써도
+        객체와 이 내용을 받은 다른 위치는 그대로.
+        """
+        path = Path(path)
+        digest = file_digest(path)
+        if not digest:
+            return None
+        obj = self.object_path(digest)
+        try:
+            obj.parent.mkdir(parents=True, exist_ok=True)
+            with self._lock:
+                if not obj.exists():
+                    _copy_new_object(path, obj, digest)
+        except OSError as e:
+            print(f"[artifact_store] 등록 실패 {path}: {e}")
+            return None
+        return digest
+
+    def materialize(self, src, dst) -> Path:
+        """src 내용을 dst에 둔다. 저장소 객체의 하드링크로 만들고, 불가능하면 복사."""
+        src, dst = Path(src), Path(dst)
+        digest = self.put(src)
+        obj = self.object_path(digest) if digest else None
+        dst.parent.mkdir(parents=True, exist_ok=True)
+        if obj is not None and obj.exists():
+            _replace_with_link(obj, dst)
+        else:
+            detach(dst)
+            shutil.copyfile(src, dst)
+        return dst
+
+    def link_count(self, digest: str) -> int:
+        """객체를 가리키는 링크 수 (저장소 자신 포함). 1이면 더 이상 쓰는 곳이 없음."""
+        try:
+            return self.object_path(digest).stat().st_nlink
+        except OSError:
+            return 0
+
+    def prune(self, dry_run: bool = False) -> int:
+        """아무 위치에서도 링크하지 않는 객체 삭제. Returns: 확보한 바이트 수."""
+        freed = 0
+        objects = self.root / "objects"
+        if not objects.exists():
+            return 0
+        for obj in objects.glob("*/*"):
+            try:
+                st = obj.stat()
+            except OSError:
+                continue
+            if st.st_nlink <= 1:
+                freed += st.st_size
+                if not dry_run:
+                    obj.unlink(missing_ok=True)
+        return freed
+
+
+def _copy_new_object(src: Path, obj: Path, digest: str) -> None:
+    """src를 복사해 객체로 (tmp → replace). 복사 도중 src가 바뀌었으면 등록하지 않음."""
+    tmp = obj.with_name(f"{obj.name}.{uuid.uuid4().hex[:8]}.tmp")
+    try:
+        shutil.copyfile(src, tmp)
+        if file_digest(tmp) != digest:
+            raise OSError(f"복사 중 내용이 바뀜: {src}")
+        os.chmod(tmp, OBJECT_MODE)
+        os.replace(tmp, obj)
+    finally:
+        if tmp.exists():
+            tmp.unlink()
+
+
+def _replace_with_link(obj: Path, dst: Path) -> None:
+    """
+    dst를 obj의 하드링크로 원자적으로 교체 (읽는 쪽이 빈 파일을 보지 않게 tmp → replace).
+    하드링크가 안 되면 복사 (사본은 쓰기 가능한 독립 파일).
+    """
+    tmp = dst.with_name(f".{dst.name}.{uuid.uuid4().hex[:8]}.tmp")
+    try:
+        os.link(obj, tmp)
+    except OSError:
+        shutil.copyfile(obj, tmp)
+    os.replace(tmp, dst)
+
+
+def detach(path) -> None:
+    """
+    path에 제자리로 쓰기 직전에 부름. 다른 위치(저장소 객체, 렌더 캐시, 다른 버전 폴더)와 inode를
+    공유하는 파일이면 지워서, 이어지는 쓰기가 새 inode를 만들게 함. 공유하지 않으면 그대로 둠.
+    """
+    if not path:
+        return
+    try:
+        if os.stat(path).st_nlink > 1:
+            os.unlink(path)
+    except OSError:
+        pass
+
+
+_STORE: Optional[ArtifactStore] = None
+
+
+def get_store() -> ArtifactStore:
+    global _STORE
+    if _STORE is None:
+        _STORE = ArtifactStore(STORE_DIR)
+    return _STORE
+
+
+def materialize(src, dst) -> Path:
+    """shutil.copy(src, dst) 대신 쓰는 함수. 전역 저장소 사용."""
+    return get_store().materialize(src, dst)
@@ -2,24 +2,20 @@
 # b_test_based.py
 import streamlit as st
 from pathlib import Path
-from PIL import Image
 import uuid, re, os, json, copy, shutil, time, traceback, hashlib
 import base64
-from moviepy.editor import AudioFileClip, concatenate_audioclips, VideoFileClip, concatenate_videoclips, vfx, ImageClip
-from moviepy.video.fx.all import crop
-from openai import OpenAI
 from datetime import datetime
 from session_logger import log_api_call, summarize_text
+from sdk_clients import get_openai
 
-
-client = OpenAI(api_key=os.getenv("OPENAI_API_KEY"))
 from difflib import SequenceMatcher
 
 # 외부 모듈 임포트 (app.py와 동일한 위치에 있다고 가정)
-from runway_api import generate_video_from_image, extract_video_url
+from runway_api import generate_video_from_image, extract_video_url, run_video_task
 from video_utils import (
     download_video, 
     add_subtitle_to_video, 
+    load_moviepy,
     trim_video_to_duration  
 )
 
@@ -32,6 +28,23 @@ from tts_core import (
     concat_videos_with_audio, 
     get_audio_duration
 )
+from duration_model import log_duration_sample
+from scene_pipeline import ScenePipeline, Stage, run_with_idle
+from render_cache import RenderCache, link_or_copy, scene_key
+from render_scheduler import render_priority, render_slot
+from render_farm import execute as execute_scene_op
+from checkpoint import CHECKPOINT_FILE, SceneCheckpoint
+from version_catalog import get_catalog
+from cancellation import Cancelled, cancel_scope, check_cancelled, partial_output
+from media_server import download_link, show_video
+from profiling import profile_stage
+from eta import StageETA, format_eta
+from run_planner import plan_final_step, plan_video_step
+from tracing import trace_step, traced
+from job_runner import (
+    TERMINAL_STATES as JOB_TERMINAL_STATES, cancel_job, cancel_requested, queue_position,
+    read_status as read_job_status, submit_job, tail_log as tail_job_log,
+)
 
 
 # --------------------------------
@@ -174,7 +187,7 @@ def analyze_story_structure(full_text: str, known_title: str = ""):
         "function": "analyze_story_structure",
         "user_text": summarize_text(full_text),
     }) as _ctx:
-        response = client.chat.completions.create(
+        response = get_openai().chat.completions.create(
             model="gpt-5.2",  # 상세 분석을 위해 고성능 모델 권장
             messages=[
                 {"role": "system", "content": system_prompt},
@@ -357,7 +370,7 @@ def analyze_characters_and_speakers(client, full_text: str):
         "function": "analyze_characters_and_speakers",
         "user_text": summarize_text(full_text),
     }) as _ctx:
-        response = client.chat.completions.create(
+        response = get_openai().chat.completions.create(
             model="gpt-5.2",
             messages=[
                 {"role": "system", "content": system_prompt},
@@ -529,7 +542,7 @@ def recommend_trailer_segments(full_text: str, analysis_data: dict):
         "function": "recommend_trailer_segments",
         "user_text": summarize_text(user_content),
     }) as _ctx:
-        response = client.chat.completions.create(
+        response = get_openai().chat.completions.create(
             model="gpt-5.2",
             messages=[
                 {"role": "system", "content": system_prompt},
@@ -786,7 +799,7 @@ def generate_script_with_specs(target_text: str, duration_opt: str, age_info: di
         "function": "generate_script_with_specs",
         "user_text": summarize_text(user_content),
     }) as _ctx:
-        response = client.chat.completions.create(
+        response = get_openai().chat.completions.create(
             model="gpt-5.2", # 긴 텍스트 처리를 위해 gpt-5.2 권장
             messages=[
                 {"role": "system", "content": system_prompt},
@@ -947,7 +960,7 @@ def generate_conversation_oriented_script(target_text: str, duration_opt: str, a
             "function": "generate_conversation_oriented_script",
             "user_text": summarize_text(user_content),
         }) as _ctx:
-            response = client.chat.completions.create(
+            response = get_openai().chat.completions.create(
                 model="gpt-5.2",
                 messages=[
                     {"role": "system", "content": system_prompt},
@@ -1097,7 +1110,7 @@ def generate_comprehensive_script(target_text: str, duration_opt: str, age_info:
         "function": "generate_comprehensive_script",
         "user_text": summarize_text(user_content),
     }) as _ctx:
-        response = client.chat.completions.create(
+        response = get_openai().chat.completions.create(
             model="gpt-5.2", # 긴 텍스트 처리를 위해 gpt-5.2 권장
             messages=[
                 {"role": "system", "content": system_prompt},
@@ -1228,7 +1241,7 @@ def generate_standalone_hooks(target_text: str, full_text: str, char_info: dict)
         "function": "generate_standalone_hooks",
         "user_text": summarize_text(user_content),
     }) as _ctx:
-        response = client.chat.completions.create(
+        response = get_openai().chat.completions.create(
             model="gpt-5.2",
             messages=[
                 {"role": "system", "content": system_prompt},
@@ -1362,24 +1375,13 @@ def compress_consecutive_scenes(subtitles):
 # [step 3 Helper] 버전 파일 목록 가져오기 (내림차순 정렬)
 def get_sorted_versions(base_dir, safe_name, mode):
     """
-    내림차순 정렬된 버전 숫자 리스트와 파일 경로 맵을 반환
+    내림차순 정렬된 버전 숫자 리스트와 파일 경로 맵을 반환 (버전 카탈로그 조회)
     Returns: 
         sorted_versions: [3, 2, 1] 
         version_map: {3: Path(..v3..), 2: Path(..v2..)}
     """
-    pattern = re.compile(rf"script_{re.escape(safe_name)}_{re.escape(mode)}_v(\d+)\.json")
-    version_map = {}
-    
-    if base_dir.exists():
-        for f in base_dir.iterdir():
-            match = pattern.match(f.name)
-            if match:
-                ver = int(match.group(1))
-                version_map[ver] = f
-                
-    # 내림차순 정렬 (최신이 0번 인덱스에 오도록)
-    sorted_versions = sorted(version_map.keys(), reverse=True)
-    return sorted_versions, version_map
+    keys, path_map = get_catalog().versions("script", base_dir, book=safe_name)
+    return [k[0] for k in keys], {k[0]: p for k, p in path_map.items()}
 
 # =========================================================
 # [step 4 Helper] (Page + Speaker) 기반 정밀 매칭 함수(화자 별 프롬프트 제작 용)
@@ -1456,6 +1458,9 @@ def merge_audio_files(audio_paths: list, output_path: str):
     """
     여러 개의 오디오 파일 경로를 받아 하나로 합쳐서 저장합니다.
     """
+    load_moviepy()
+    from moviepy.editor import AudioFileClip, concatenate_audioclips
+
     clips = []
     try:
         for p in audio_paths:
@@ -1480,38 +1485,13 @@ def get_tts_versions_v2(base_dir):
     """
     폴더명이 'v{script_ver}_{audio_ver}' 형식을 기본으로 하되,
     뒤에 모델명(_clova 등)이 붙어도 앞의 숫자 2개를 기준으로 파싱합니다.
+    폴더 스캔은 카탈로그가 처음 보는 폴더일 때 한 번만 (version_catalog).
     
     Returns:
         sorted_list: [(s_ver, a_ver), ...] (내림차순 정렬)
         path_map: {(s_ver, a_ver): Path객체}
     """
-    version_map = {}
-    
-    if base_dir.exists():
-        for item in base_dir.iterdir():
-            if item.is_dir() and item.name.startswith("v"):
-                # 정규식 대신 split 사용
-                # v1_1_clova -> ['v1', '1', 'clova']
-                parts = item.name.split("_")
-                
-                # 최소 2덩어리(v대본, 음성) 이상이면 유효한 폴더로 간주
-                if len(parts) >= 2:
-                    try:
-                        s_ver = int(parts[0].replace("v", "")) # v1 -> 1
-                        a_ver = int(parts[1])                  # 1
-                        
-                        # manifest.json이 있어야 유효 데이터로 인정
-                        if (item / "manifest.json").exists():
-                            # 맵에 저장 (동일 버전이 여러 개면 나중 것이 덮어써지지만,
-                            # 보통 버전 번호를 증가시키므로 큰 문제 없습니다)
-                            version_map[(s_ver, a_ver)] = item
-                            
-                    except ValueError:
-                        continue # 숫자가 아니면 패스 (예: v_temp 등)
-    
-    # 정렬 기준: 대본 버전(내림차순) -> 음성 버전(내림차순)
-    sorted_versions = sorted(version_map.keys(), key=lambda x: (x[0], x[1]), reverse=True)
-    return sorted_versions, version_map
+    return get_catalog().versions("tts", base_dir)
 # --------------------------------
 # [Step 5 Helper] 이미지 필터링 및 텍스트 파싱
 # --------------------------------
@@ -1677,20 +1657,8 @@ def find_cover_page_num(text_map: dict, candidates: list) -> int:
 
 # [step 6.5 Helper] 프리뷰 버전 파싱 (v{script}_{audio}_{preview})
 def get_preview_versions(base_dir):
-    version_map = {}
-    if base_dir.exists():
-        for item in base_dir.iterdir():
-            if item.is_dir():
-                # 정규식: v(S)_(A)_(P)
-                match = re.match(r"^v(\d+)_(\d+)_(\d+)$", item.name)
-                if match:
-                    s, a, p = map(int, match.groups())
-                    if (item / "manifest.json").exists():
-                        version_map[(s, a, p)] = item
-    # 정렬: S->A->P 내림차순
-    sorted_keys = sorted(version_map.keys(), key=lambda x: x, reverse=True)
-    return sorted_keys, version_map
-
+    # 정렬: S->A->P 내림차순 (버전 카탈로그 조회)
+    return get_catalog().versions("preview", base_dir)
 
 # [step 6.5, 8 Helper] 자막 색상 변경
 
@@ -1750,54 +1718,747 @@ def generate_dynamic_color_map(scripts):
 # [step 7 Helper] 3단 버전 폴더 파싱 (v{script}_{audio}_{video})
 def get_video_versions_v3(base_dir):
     """
-    폴더명이 'v{s}_{a}_{v}' 형식인 것을 찾아 파싱합니다.
+    폴더명이 'v{s}_{a}_{v}' 형식인 버전 목록 (버전 카탈로그 조회).
     Returns:
         sorted_keys: [(s, a, v), ...] (내림차순)
         path_map: {(s, a, v): Path객체}
     """
-    version_map = {}
-    
-    if base_dir.exists():
-        for item in base_dir.iterdir():
-            if item.is_dir():
-                # 정규식: v(숫자)_(숫자)_(숫자)
-                match = re.match(r"^v(\d+)_(\d+)_(\d+)$", item.name)
-                if match:
-                    s = int(match.group(1)) # 대본
-                    a = int(match.group(2)) # 음성
-                    v = int(match.group(3)) # 영상
-                    
-                    if (item / "manifest.json").exists():
-                        version_map[(s, a, v)] = item
-    
-    # 정렬: S -> A -> V 순서로 내림차순
-    sorted_keys = sorted(version_map.keys(), key=lambda x: (x[0], x[1], x[2]), reverse=True)
-    return sorted_keys, version_map
+    return get_catalog().versions("video", base_dir)
 
 # [step 8 Helper] 4단 버전 파싱 (v{S}_{A}_{V}_{F})
 def get_final_versions(base_dir):
     """
-    폴더명이 'v{s}_{a}_{v}_{f}' 형식인 것을 찾아 파싱
+    폴더명이 'v{s}_{a}_{v}_{f}' 형식인 버전 목록 (버전 카탈로그 조회)
     """
-    version_map = {}
-    if base_dir.exists():
-        for item in base_dir.iterdir():
-            if item.is_dir():
-                # 정규식: v(S)_(A)_(V)_(F)
-                match = re.match(r"^v(\d+)_(\d+)_(\d+)_(\d+)$", item.name)
-                if match:
-                    s, a, v, f = map(int, match.groups())
-                    if (item / "manifest.json").exists():
-                        version_map[(s, a, v, f)] = item
-    
-    # 정렬: S->A->V->F 내림차순
-    sorted_keys = sorted(version_map.keys(), key=lambda x: x, reverse=True)
-    return sorted_keys, version_map
+    return get_catalog().versions("final", base_dir)
+
+# --------------------------------
+# [Step 3 Helper] 모드별 대본 생성 + 공통 후처리 (UI/배치 공용)
+# --------------------------------
+def generate_script_for_mode(script_style_mode: str, target_text: str, duration_key: str, rec_info: dict,
+                             full_text: str, char_info: dict, analysis_data: dict = None, page_map: dict = None):
+    """
+    스포일러 구간을 잘라낸 뒤 모드별 대본 함수를 호출하고,
+    화자 ID 풀네임 변환 → 괄호 지문 제거 → 씬 압축 → 장면 번호 할당까지 수행합니다.
+    """
+    # 스포일러 방지 및 데이터 준비 (공통)
+    spoiler_limit_page = find_spoiler_limit_page(target_text, page_map or {})
+    safe_full_text = trim_full_text_by_page(full_text, spoiler_limit_page)
+    safe_char_info = dict(char_info) if char_info else {}
+    if safe_char_info and "dialogue_map" in safe_char_info:
+        safe_char_info["dialogue_map"] = trim_dialogue_map_by_page(safe_char_info["dialogue_map"], spoiler_limit_page)
+
+    # 모드별 함수 호출
+    if script_style_mode == "Conversation":
+        result = generate_conversation_oriented_script(
+            target_text, duration_key, rec_info, safe_full_text, safe_char_info
+        )
+    elif script_style_mode == "Comprehensive":
+        result = generate_comprehensive_script(
+            target_text, duration_key, rec_info, safe_full_text, safe_char_info, analysis_data or {}
+        )
+    else: # Standard
+        result = generate_script_with_specs(
+            target_text, duration_key, rec_info, safe_full_text, safe_char_info
+        )
+
+    # ID -> 풀네임 변환 (공통 후처리)
+    if char_info and "characters" in char_info:
+        id_to_full = {c['id']: f"{c['id']} ({c['name']}) {c['voice_type']}" for c in char_info["characters"]}
+        for item in result.get("subtitles", []):
+            spk_id = item.get("speaker", "narrator")
+            if spk_id in id_to_full:
+                item["speaker"] = id_to_full[spk_id]
+
+    # 대사 내 괄호 및 지문 제거: (1단계), (지문) 등
+    for item in result.get("subtitles", []):
+        original_text = item.get("text", "")
+        if "(" in original_text and ")" in original_text:
+            clean_text = re.sub(r'\([^)]*\)', '', original_text)
+            # 괄호 삭제로 생긴 다중 공백을 하나로 축소
+            item["text"] = re.sub(r'\s+', ' ', clean_text).strip()
+
+    # 씬 압축(같은 Page 3개 이상 -> 2개)은 Scene No 할당 전에 수행해야 함
+    result["subtitles"] = compress_consecutive_scenes(result["subtitles"])
+    result["subtitles"] = assign_scene_numbers(result["subtitles"])
+    return result
+
+
+# --------------------------------
+# [Step 4 Helper] 장면별 TTS 스타일 프롬프트 / 음성 버전 생성 (UI/배치 공용)
+# --------------------------------
+def build_tts_style_prompts(final_scripts: list, char_info: dict, speaker_mode: str, user_prompts: list = None):
+    """
+    Step 1.5 캐릭터 톤 + dialogue_map 상황 설명으로 장면별 GPT/Gemini 지시문을 만듭니다.
+    user_prompts[i]가 있으면(Step 1.5에서 사용자가 편집) 그것을 우선 사용합니다.
+    """
+    char_info = char_info or {}
+    characters_data = char_info.get("characters", [])
+    dialogue_map_data = char_info.get("dialogue_map", [])
+    # 캐릭터 ID -> Tone 매핑 (예: {'char_01': '소심하고 겁이 많은 말투', ...})
+    char_tone_map = {c['id']: c.get('tone', '') for c in characters_data}
+    user_prompts = user_prompts or []
+
+    style_prompts_list = []
+    for idx, script in enumerate(final_scripts):
+        text = script["text"]
+        # speaker 필드에 이름이 섞여있을 수 있으므로 ID만 추출 (예: "char_01 (흥부)..." -> "char_01")
+        raw_speaker = script["speaker"]
+        speaker_id = raw_speaker.split(" ")[0] if raw_speaker else "narrator"
+
+        user_edited_prompt = user_prompts[idx] if idx < len(user_prompts) else None
+        if user_edited_prompt and user_edited_prompt.strip():
+            style_prompts_list.append(user_edited_prompt.strip())
+            continue
+
+        # (A) 나레이터 처리
+        if "narrator" in speaker_id.lower():
+            if speaker_mode == "단일 화자 (Narrator Only)":
+                current_prompt = "차분하고 몰입감 있는 동화 구연조로 읽어주세요."
+            else:
+                current_prompt = "차분하고 명확한 발음의 나레이션 톤."
+        # (B) 캐릭터 처리: [Role/Tone] + [Context/Situation]
+        else:
+            char_tone = char_tone_map.get(speaker_id, "일반적인 목소리")
+            try:
+                page_num = int(script.get("source_page", 0))
+            except (TypeError, ValueError):
+                page_num = 0
+            script_context = find_context_by_structure(text, raw_speaker, page_num, dialogue_map_data)
+            if script_context:
+                current_prompt = (
+                    f"Roleplay with a '{char_tone}' tone. "
+                    f"The situation is '{script_context}'. "
+                    f"Speak the following Korean text with the appropriate emotion."
+                )
+            else:
+                current_prompt = (
+                    f"Roleplay with a '{char_tone}' tone. "
+                    f"Speak the following Korean text naturally."
+                )
+        style_prompts_list.append(current_prompt)
+    return style_prompts_list
+
+
+def voice_speed_to_clova(voice_speed: float) -> int:
+    """배수(Float)를 Clova 기준 정수로 변환. 1.2배 -> -2 (빠름), 0.8배 -> 2 (느림), -5~5 제한."""
+    clova_speed_int = int((1.0 - voice_speed) * 10)
+    return max(-5, min(5, clova_speed_int))
+
+
+def synthesize_tts_version(final_scripts: list, new_ver_dir: Path, folder_name: str, engine: str,
+                           speakers: list, speed_int: int, style_prompts: list, uid: str,
+                           tts_eta=None):
+    """
+    대본 전체 TTS를 new_ver_dir/segments에 생성하고 전체 병합 mp3를 만듭니다.
+    tts_eta: 문장별 글자 수를 크기로 한 StageETA (진행 표시용). 없으면 여기서 만듦.
+    Returns:
+        (audio_data_list, full_audio_path 문자열 — 실패 시 "")
+    """
+    segments_dir = new_ver_dir / "segments"
+    segments_dir.mkdir(parents=True, exist_ok=True)
+    # 문장 하나가 끝날 때마다 단위 완료 — 다 끝나면 글자당 처리 시간이 stage_timing으로 남아 다음 예상에 쓰임
+    if tts_eta is None:
+        tts_eta = StageETA("tts", [len(s["text"]) for s in final_scripts])
+
+    try:
+        with render_slot("tts"):
+            audio_paths = generate_audio_for_subtitles(
+                subtitles=[s["text"] for s in final_scripts],
+                output_dir=segments_dir,
+                uid=uid,
+                speakers=speakers,
+                engine=engine,
+                parallel=True,
+                global_speed=speed_int,
+                style_prompts=style_prompts,
+                # 실패한 문장은 처리 속도 기록에서 뺌
+                on_progress=lambda i, path: tts_eta.unit_done(i, cached=path is None),
+            )
+    except Cancelled:
+        # manifest 없는 반쪽 버전 폴더가 목록에 남지 않게 정리
+        shutil.rmtree(new_ver_dir, ignore_errors=True)
+        raise
+
+    audio_data_list = []
+    valid_paths = []
+    for idx, path in enumerate(audio_paths):
+        script_item = final_scripts[idx]
+        if path and Path(path).exists():
+            dur = get_audio_duration(str(path))
+            log_duration_sample(script_item["text"], speakers[idx], engine, speed_int, dur)
+            audio_data_list.append({
+                "text": script_item["text"],
+                "speaker": script_item["speaker"],
+                "path": str(path),
+                "duration": dur,
+                "scene_no": script_item.get("scene_no")
+            })
+            valid_paths.append(path)
+        else:
+            audio_data_list.append({
+                "text": script_item["text"],
+                "speaker": script_item["speaker"],
+                "path": None,  # 경로는 없음
+                "duration": 0,
+                "scene_no": script_item.get("scene_no"),
+                "status": "failed" # 실패했음을 표시
+            })
+            print(f"⚠️ 오디오 생성 실패: {script_item['text'][:10]}...")
+
+    # Full Audio 병합
+    full_audio_str = ""
+    if valid_paths:
+        full_path = new_ver_dir / f"full_{folder_name}.mp3"
+        if merge_audio_files(valid_paths, str(full_path)):
+            full_audio_str = str(full_path)
+    return audio_data_list, full_audio_str
+
+
+# --------------------------------
+# [Step 6 Helper] 이미지 후보 생성 + 장면별 이미지 배정 (UI/배치 공용)
+# --------------------------------
+def build_image_candidates(folder: Path, txt_file: Path):
+    """이미지 폴더 + TXT로 Step 6 후보 리스트 [{page_num, img_path, img_name, text}] 생성."""
+    valid_imgs = load_filtered_images(folder)
+    text_map = parse_book_text_by_page(txt_file)
+    candidates = []
+    for img_path in valid_imgs:
+        pg_num = extract_page_num_from_filename(img_path.name)
+        candidates.append({
+            "page_num": pg_num,
+            "img_path": str(img_path),
+            "img_name": img_path.name,
+            "text": text_map.get(pg_num, "(텍스트 없음)")
+        })
+    return candidates
+
+
+def assign_images_to_scenes(scripts: list, candidates: list, target_text: str):
+    """
+    대본의 source_page를 바탕으로 펼침면/중복 방지/스포일러 상한 규칙을 적용해 장면별 이미지를 배정합니다.
+    Returns:
+        (final_selection, cover_page_num, spoiler_limit_pg)
+    """
+    text_map = {item['page_num']: item['text'] for item in candidates}
+    spread_map = analyze_spread_structure(candidates)
+
+    # [스포일러 상한선 계산]
+    spoiler_limit_pg = find_spoiler_limit_page(target_text, text_map)
+    max_book_pg = max(text_map.keys()) if text_map else 0
+    if spoiler_limit_pg > max_book_pg: spoiler_limit_pg = max_book_pg
+    if spoiler_limit_pg % 2 == 0: spoiler_limit_pg += 1
+
+    cover_page_num = find_cover_page_num(text_map, candidates)
+
+    total_scenes = len(scripts)
+    final_selection = []
+
+    def get_spread_id(pg):
+        info = spread_map.get(pg)
+        if info and info['pair_page']:
+            return min(pg, info['pair_page'])
+        return pg
+
+    # 헬퍼: 안전하게 페이지 번호 가져오기
+    def get_safe_page(idx):
+        if 0 <= idx < total_scenes:
+            val = scripts[idx].get("source_page", 0)
+            try: return int(val)
+            except: return 0
+        return -1
+
+    for i in range(total_scenes):
+        # 1. Step 3의 값 그대로 가져오기
+        source_pg = get_safe_page(i)
+        scene_idx = i
+        note = "대본 출처"
+
+        # 유효성 검사 (0이거나 이미지 맵에 없으면 최소 페이지로 보정)
+        if source_pg != 0 and source_pg not in text_map:
+            if candidates:
+                source_pg = min(text_map.keys())
+                note = "유효하지 않은 페이지 보정"
+            else:
+                source_pg=cover_page_num
+
+        # Rule 0. 마지막 장면(Outro)은 source_page==0일 때만 표지
+        if i == total_scenes - 1 and source_pg == 0:
+            final_selection.append({
+                "scene_index": scene_idx,
+                "page": cover_page_num,
+                "original_pick": source_pg,
+                "note": "Rule: 마지막 장면(표지, source_page=0)"
+            })
+            continue
+
+        # Logic: 연속 씬 vs 단독 씬 분기 (앞뒤 씬의 Source Page 비교)
+        prev_pg_raw = get_safe_page(i-1)
+        next_pg_raw = get_safe_page(i+1)
+
+        curr_spread_id = get_spread_id(source_pg)
+        prev_spread_id = get_spread_id(prev_pg_raw) if i > 0 else -1
+        next_spread_id = get_spread_id(next_pg_raw) if i < total_scenes - 1 else -1
+
+        # 후보군 (Left, Right)
+        curr_info = spread_map.get(source_pg)
+        pair_pg = curr_info['pair_page'] if curr_info else None
+
+        if pair_pg:
+            available_pages = sorted([source_pg, pair_pg])
+        else:
+            available_pages = [source_pg]
+
+        final_pg = source_pg # 초기값
+
+        # Case 1: 연속 장면 시작 (Start) -> 왼쪽
+        if curr_spread_id == next_spread_id and curr_spread_id != prev_spread_id:
+            final_pg = available_pages[0]
+            note += " + 연속 시작(좌)"
+
+        # Case 2: 연속 장면 이어짐 (Continue) -> 오른쪽
+        elif curr_spread_id == prev_spread_id:
+            if len(available_pages) > 1:
+                final_pg = available_pages[1]
+                note += " + 연속 이어짐(우)"
+            else:
+                final_pg = available_pages[0]
+                note += " (단일 페이지 유지)"
+
+        # Case 3: 단독 장면 -> 텍스트 없는 쪽 우선
+        else:
+            pair_info = spread_map.get(pair_pg) if pair_pg else None
+            if curr_info and curr_info['has_text'] and pair_info and not pair_info['has_text']:
+                final_pg = pair_pg
+                note += " (텍스트 없는 쪽 우선)"
+
+        # Rule: 스포일러 상한선
+        if final_pg > spoiler_limit_pg:
+            final_pg = spoiler_limit_pg
+            note = f"스포일러 제한(Limit P.{spoiler_limit_pg})"
+
+        # Rule: 중복 방지
+        if i > 0:
+            last_final_pg = final_selection[i-1]['page']
+            if final_pg == last_final_pg:
+                if pair_pg and pair_pg != final_pg:
+                    if pair_pg <= spoiler_limit_pg:
+                        final_pg = pair_pg
+                        note += " + 중복 회피"
+
+        final_selection.append({
+            "scene_index": scene_idx,
+            "page": final_pg,
+            "original_pick": source_pg,
+            "note": note
+        })
+
+    return final_selection, cover_page_num, spoiler_limit_pg
+
+
+# --------------------------------
+# [Step 6.5, 8 Helper] BGM 폴더/파일 찾기
+# --------------------------------
+def resolve_bgm_dir(story_dir_name: str) -> Path:
+    """BGM/<동화이름> → BGM/<get_bgm_folder_name> 순으로 존재하는 폴더. 없으면 첫 후보."""
+    path_candidate_1 = Path("BGM") / story_dir_name
+    path_candidate_2 = Path("BGM") / get_bgm_folder_name(story_dir_name)
+    if path_candidate_1.exists() and path_candidate_1.is_dir():
+        return path_candidate_1
+    if path_candidate_2.exists() and path_candidate_2.is_dir():
+        return path_candidate_2
+    return path_candidate_1
+
+
+def bgm_dir_has_audio(bgm_dir: Path) -> bool:
+    return bgm_dir.exists() and any(
+        f.suffix.lower() in ['.wav', '.mp3', '.m4a'] for f in bgm_dir.iterdir()
+    )
+
+
+def find_bgm_file(keywords, bgm_dir_path):
+    if not bgm_dir_path.exists(): return None
+    # 폴더 내 모든 오디오 파일 검색
+    for f in bgm_dir_path.iterdir():
+        if f.is_file() and f.suffix.lower() in ['.mp3', '.wav', '.m4a']:
+            # 전달받은 키워드(예: '2P', '2p') 중 하나라도 파일명에 있으면 성공
+            for kw in keywords:
+                if kw in f.name:
+                    return f
+    return None
+
+
+def find_page_bgm(source_page: int, cover_page_num: int, bgm_dir: Path):
+    """
+    표지(또는 source_page 0)는 "title", 본문은 표지 기준 상대 번호 "nP" 파일을 찾습니다.
+    Returns:
+        (BGM Path 또는 None, 로그용 라벨)
+    """
+    search_keywords = []
+    log_msg = ""
+    # Case 1: 표지 (Title)
+    if source_page == 0 or source_page == cover_page_num:
+        search_keywords = ["title", "Title", "TITLE"]
+        log_msg = "Title"
+    # Case 2: 본문 (nP) 예: source_page(6) - cover(5) + 1 = 2 --> "2p"
+    elif source_page > cover_page_num:
+        story_seq = source_page - cover_page_num + 1
+        search_keywords = [f"{story_seq}p", f"{story_seq}P", f"Page {story_seq}", f"Page{story_seq}"]
+        log_msg = f"{story_seq}p"
+    if not search_keywords:
+        return None, log_msg
+    return find_bgm_file(search_keywords, bgm_dir), log_msg
+
+
+# --------------------------------
+# [Step 7 Helper] Runway 장면 생성 파이프라인 (generate → download → fit)
+# --------------------------------
+def build_runway_scene_specs(matches: list, audios: list, candidates_map: dict, default_dur: int = 5):
+    """장면별 Runway 생성 길이(5/10초)와 맞출 길이(TTS 길이) 결정. 이미지 없는 장면은 제외."""
+    scene_specs = []
+    for i, match in enumerate(matches):
+        img_info = candidates_map.get(match['page'])
+        if not img_info: continue
+
+        audio_dur = audios[i]['duration'] if i < len(audios) and audios[i] else None
+        if not audio_dur:
+            runway_dur = default_dur; target_trim_dur = default_dur
+        else:
+            runway_dur = 5 if audio_dur <= 6.0 else 10
+            target_trim_dur = audio_dur
+
+        scene_specs.append({
+            "scene": i,
+            "img_path": str(img_info['img_path']),
+            "runway_dur": runway_dur,
+            "target_trim_dur": target_trim_dur,
+            "notes": [],
+        })
+    return scene_specs
+
+
+def runway_checkpoint_key(spec: dict, global_prompt: str) -> dict:
+    """Step 7 장면 체크포인트 키 (입력이 같을 때만 이전 기록 재사용)."""
+    return {"img": spec["img_path"], "prompt": global_prompt, "runway_dur": spec["runway_dur"]}
+
+
+def run_runway_scenes(scene_specs: list, global_prompt: str, raw_dir: Path, trimmed_dir: Path, uid: str,
+                      on_result=None, workers: dict = None, checkpoint: SceneCheckpoint = None):
+    """
+    장면별 Runway 생성 → 다운로드 → 길이 맞춤(자르기/슬로우)을 파이프라인으로 실행.
+    notes에는 UI 표시용 메시지가 쌓이고, 결과는 입력 순서대로 SceneResult 리스트로 반환됩니다.
+    checkpoint가 있으면 단계마다 결과를 기록하고, 이전 실행에서 끝난 단계는 건너뜁니다.
+    """
+    workers = workers or {}
+
+    def _stage_generate(_, spec):
+        i = spec["scene"]
+        resumed = checkpoint.resume(i, runway_checkpoint_key(spec, global_prompt)) if checkpoint else {}
+        spec["resumed"] = resumed
+        if resumed.get("raw_path"):
+            spec["notes"].append(f"♻️ Scene {i+1}: 이전 실행의 Runway 영상 재사용 (체크포인트)")
+            return spec
+
+        result_json = run_video_task(
+            spec["img_path"], global_prompt, spec["runway_dur"],
+            task_id=resumed.get("task_id"),
+            on_submitted=(lambda tid: checkpoint.record(i, task_id=tid)) if checkpoint else None,
+        )
+        spec["video_url"] = extract_video_url(result_json)
+        if not spec["video_url"]:
+            raise RuntimeError(f"Scene {i+1} 생성 실패")
+        return spec
+
+    def _stage_download(_, spec):
+        i = spec["scene"]
+        if spec["resumed"].get("raw_path"):
+            spec["raw_path"] = Path(spec["resumed"]["raw_path"])
+            return spec
+        raw_path = raw_dir / f"scene_{i+1:02d}_{uid}_raw.mp4"
+        try:
+            download_video(spec["video_url"], raw_path)
+        except Exception:
+            # 결과 URL이 만료된 작업이면 다음 실행에서 다시 폴링해 봐야 소용없으므로 새로 제출하게 함
+            if checkpoint:
+                checkpoint.forget(i, "task_id")
+            raise
+        if checkpoint:
+            checkpoint.record(i, raw_path=raw_path)
+        spec["raw_path"] = raw_path
+        return spec
+
+    def _stage_fit(_, spec):
+        i, runway_dur, target_trim_dur = spec["scene"], spec["runway_dur"], spec["target_trim_dur"]
+        resumed = spec["resumed"]
+        if resumed.get("trimmed_path") and resumed.get("fit_target") == round(target_trim_dur, 3):
+            spec["trimmed_path"] = Path(resumed["trimmed_path"])
+            spec["cached"] = True
+            return spec
+        final_path = trimmed_dir / f"scene_{i+1:02d}_{uid}_trimmed.mp4"
+
+        # 영상이 오디오보다 길면 뒤를 잘라내고(Trim), 짧으면 오디오 길이만큼 느리게 늘림(Slow)
+        result = execute_scene_op(
+            "fit", {"video": spec["raw_path"]},
+            {"method": "speed", "source_duration": runway_dur, "target_duration": target_trim_dur},
+            final_path,
+        )
+        if result is not True:
+            raise RuntimeError(result)
+        if target_trim_dur <= runway_dur:
+            spec["notes"].append(f"✂️ Scene {i+1}: 자르기 (Trim) ({runway_dur}s → {target_trim_dur:.1f}s)")
+        else:
+            spec["notes"].append(f"🐢 Scene {i+1}: 늘리기 (Slow) ({runway_dur}s → {target_trim_dur:.1f}s)")
+        if checkpoint:
+            checkpoint.record(i, trimmed_path=final_path, fit_target=round(target_trim_dur, 3))
+        spec["trimmed_path"] = final_path
+        return spec
+
+    return ScenePipeline([
+        Stage("generate", _stage_generate, workers.get("generate", 0)),
+        Stage("download", _stage_download, workers.get("download", 0)),
+        Stage("fit", _stage_fit, workers.get("fit", 0)),
+    ]).run(scene_specs, on_result=on_result)
+
+
+def write_full_visual(generated_data_list: list, out_path: Path) -> str:
+    """트리밍된 장면들을 무음으로 이어붙인 전체 영상 저장. 경로 문자열 반환."""
+    load_moviepy()
+    from moviepy.editor import VideoFileClip, concatenate_videoclips
+
+    with render_slot("cpu"), partial_output(out_path):
+        clips_vis = [VideoFileClip(d['trimmed']) for d in generated_data_list]
+        try:
+            final_clip_vis = concatenate_videoclips(clips_vis, method="compose")
+            final_clip_vis.write_videofile(
+                str(out_path), fps=24, codec="libx264", audio=False, logger=None
+            )
+        finally:
+            for c in clips_vis: c.close()
+    return str(out_path)
+
+
+# --------------------------------
+# [Step 8 Helper] 최종 장면 합성 파이프라인 (subtitle → mux)
+# --------------------------------
+def build_final_scene_specs(video_results: list, audios: list, scripts: list, sub_dir: Path, uid: str,
+                            subtitle_mode: str, use_bgm: bool, bgm_dir: Path, cover_page_num: int):
+    """
+    장면별 자막 텍스트/색상/BGM을 결정합니다.
+    Returns:
+        (scene_specs, missing — 트림 영상이 없는 장면 인덱스 리스트)
+    """
+    speaker_color_map = {}
+    if "컬러링" in subtitle_mode:
+        speaker_color_map = generate_dynamic_color_map(scripts)
+
+    scene_specs, missing = [], []
+    for i, vid_data in enumerate(video_results):
+        video_path = vid_data.get("trimmed")
+        if not video_path or not os.path.exists(video_path):
+            missing.append(i)
+            continue
+
+        audio_path = audios[i].get("path") if i < len(audios) else None
+
+        # 기본 대사 (Step 3 결과)
+        script_item = scripts[i] if i < len(scripts) else {}
+        original_text = script_item.get("text", "")      # 대사(Quote)
+        source_page = script_item.get("source_page", 0)  # 페이지 번호
+        current_speaker = str(script_item.get("speaker", "narrator")).strip()
+
+        # ★ 색상 결정 로직
+        if "컬러링" in subtitle_mode:
+            text_color = speaker_color_map.get(current_speaker, "white")
+        else:
+            text_color = "white"
+
+        page_bgm, log_msg = (None, "")
+        if use_bgm:
+            page_bgm, log_msg = find_page_bgm(source_page, cover_page_num, bgm_dir)
+
+        output_clip_path = sub_dir / f"scene_{i+1:02d}_{uid}_complete.mp4"
+        scene_specs.append({
+            "scene": i,
+            "video_path": video_path,
+            "audio_path": audio_path,
+            "subtitle": original_text,
+            "text_color": text_color,
+            "source_page": source_page,
+            "page_bgm": page_bgm,
+            "bgm_log": log_msg,
+            "output": str(output_clip_path),
+            "temp_sub": str(output_clip_path).replace(".mp4", "_temp_sub.mp4"),
+            "notes": [],
+        })
+    return scene_specs, missing
+
+
+def final_scene_keys(spec: dict, use_bgm: bool, bgm_volume: float) -> tuple:
+    """최종 장면의 render_cache 키 (자막 영상, 음성/BGM 합성 영상). 입력 파일 내용 해시 포함."""
+    page_bgm, audio_path = spec["page_bgm"], spec["audio_path"]
+    has_bgm = bool(use_bgm and page_bgm and page_bgm.exists())
+    sub_key = scene_key(
+        "final_sub", video=Path(spec["video_path"]), text=spec["subtitle"],
+        color=spec["text_color"], scene_index=spec["scene"],
+    )
+    final_key = scene_key(
+        "final_scene", sub=sub_key,
+        audio=Path(audio_path) if audio_path else "",
+        bgm=Path(page_bgm) if has_bgm else "",
+        bgm_volume=bgm_volume if has_bgm else 0.0,
+    )
+    return sub_key, final_key
+
+
+def run_final_scenes(scene_specs: list, render_cache: RenderCache, use_bgm: bool, bgm_volume: float,
+                     on_result=None, workers: dict = None):
+    """
+    장면별 자막 입히기 → TTS(+BGM) 합성을 파이프라인으로 실행.
+    입력 해시가 같은 장면은 render_cache에서 하드링크로 재사용합니다.
+    notes에는 (레벨, 메시지)가 쌓입니다. 레벨은 st.caption/st.warning 이름과 같음.
+    """
+    workers = workers or {}
+
+    def _stage_subtitle(_, spec):
+        # 증분 리빌드: 입력(트림 영상·자막·색상·TTS·BGM) 해시가 같으면 이전 결과 재사용
+        spec["sub_key"], spec["final_key"] = final_scene_keys(spec, use_bgm, bgm_volume)
+        cached = render_cache.lookup("final_scene", spec["final_key"])
+        if cached:
+            link_or_copy(cached, spec["output"])
+            spec["cached"] = True
+            return spec
+
+        # 1. 자막 입히기
+        render_cache.materialize(
+            "final_sub", spec["sub_key"], spec["temp_sub"],
+            lambda out: execute_scene_op(
+                "subtitle", {"video": spec["video_path"]},
+                {"text": spec["subtitle"], "scene_index": spec["scene"], "font_color": spec["text_color"]},
+                out,
+            ),
+        )
+        return spec
+
+    def _stage_mux(_, spec):
+        # 2. 오디오 입히기 (BGM 포함) - [Step 6.5 로직 적용]
+        if spec.get("cached"):
+            return spec
+        i, temp_sub_path, output_path = spec["scene"], spec["temp_sub"], spec["output"]
+        audio_path, page_bgm, notes = spec["audio_path"], spec["page_bgm"], spec["notes"]
+        audio_ok = False
+        bgm_applied = False
+
+        # 자막 영상 생성 확인
+        if not os.path.exists(temp_sub_path):
+            notes.append(("warning", f"⚠️ Scene {i+1}: 자막 영상 생성 실패 (temp_sub 없음)"))
+        elif audio_path and os.path.exists(audio_path):
+            # BGM이 있으면 TTS+BGM 시도
+            if page_bgm and page_bgm.exists():
+                audio_ok = execute_scene_op(
+                    "mux", {"video": temp_sub_path, "audio": audio_path, "bgm": page_bgm},
+                    {"bgm_volume": bgm_volume}, output_path,
+                )
+                if audio_ok is True:
+                    bgm_applied = True
+                    notes.append(("caption", f"🎵 Scene {i+1}: BGM '{page_bgm.name}' ({spec['bgm_log']}) 적용"))
+
+            # BGM이 없거나 BGM+TTS 실패 → TTS만 적용
+            if audio_ok is not True:
+                audio_ok = execute_scene_op(
+                    "mux", {"video": temp_sub_path, "audio": audio_path}, {}, output_path,
+                )
+                if audio_ok is True:
+                    if use_bgm:
+                        notes.append(("caption", f"Scene {i+1}: BGM 없음, TTS만 적용 (Source: {spec['source_page']}p)"))
+                else:
+                    notes.append(("warning", f"⚠️ Scene {i+1}: TTS 합성 실패 - {audio_ok}"))
+        else:
+            notes.append(("caption", f"Scene {i+1}: TTS 파일 없음 (audio_path={audio_path})"))
+
+        # 오디오 합성 실패 시 → 자막만 입힌 영상 사용 (임시 결과라 캐시하지 않음)
+        if audio_ok is True:
+            # BGM 합성이 실패해 TTS만 넣었으면 BGM 없는 변형의 키로 저장 (BGM 포함 키에 넣으면 다음 실행이 재사용)
+            _, stored_key = final_scene_keys(spec, bgm_applied, bgm_volume)
+            render_cache.store("final_scene", stored_key, output_path)
+        elif os.path.exists(temp_sub_path):
+            if os.path.exists(output_path):
+                os.remove(output_path)
+            shutil.copy2(temp_sub_path, output_path)
+
+        # 임시 파일 정리
+        if os.path.exists(temp_sub_path) and temp_sub_path != output_path:
+            os.remove(temp_sub_path)
+        return spec
+
+    return ScenePipeline([
+        Stage("subtitle", _stage_subtitle, workers.get("subtitle", 0)),
+        Stage("mux", _stage_mux, workers.get("mux", 0)),
+    ]).run(scene_specs, on_result=on_result)
+
+
+# --------------------------------
+# [Step 7, 8 Helper] 백그라운드 렌더 잡 상태 표시
+# --------------------------------
+JOB_POLL_SEC = 2
+_SCENE_STATE_ICON = {"pending": "⏳", "running": "🔄", "done": "✅", "cached": "♻️", "failed": "❌", "cancelled": "⏹"}
+
+
+@st.fragment(run_every=JOB_POLL_SEC)
+def render_job_panel(job_dir: str):
+    """잡 진행 상황만 주기적으로 다시 그림. 잡이 끝나면 전체 리런으로 결과를 반영."""
+    status = read_job_status(job_dir)
+    state = status.get("state", "queued")
+    if state in JOB_TERMINAL_STATES:
+        st.rerun()
+
+    if cancel_requested(job_dir):
+        st.warning("⏹ 취소 중... 진행 중인 인코딩과 Runway 작업을 정리하고 있습니다.")
+    elif state == "queued":
+        pos = queue_position(job_dir)
+        st.info("⏳ 렌더 대기 중..." + (f" (대기열 {pos}번째)" if pos else ""))
+    else:
+        text = f"🔄 {status.get('label', '')} 렌더 중..."
+        if status.get("eta_sec") is not None and status.get("eta_at"):
+            # 마지막 장면 갱신 이후 흐른 시간만큼 빼서 폴링마다 줄어들게
+            since = (datetime.now() - datetime.fromisoformat(status["eta_at"])).total_seconds()
+            text += f" 남은 시간 {format_eta(max(status['eta_sec'] - since, 0))}"
+        st.progress(float(status.get("progress", 0.0)), text=text)
+    if not cancel_requested(job_dir):
+        if st.button("⏹ 취소", key=f"cancel_{Path(job_dir).name}"):
+            cancel_job(job_dir)
+
+    scenes = status.get("scenes", {})
+    if scenes:
+        st.caption("  ".join(
+            f"{_SCENE_STATE_ICON.get(v.get('state'), '')} {int(k)+1}"
+            for k, v in sorted(scenes.items(), key=lambda kv: int(kv[0]))
+        ))
+    log_lines = tail_job_log(job_dir, 8)
+    if log_lines:
+        st.code("\n".join(log_lines), language=None)
+
+
+def poll_render_job(state_key: str):
+    """
+    st.session_state[state_key]에 걸린 잡 확인.
+    진행 중이면 상태 패널을 그리고 None, 끝났으면 키를 비우고 최종 status dict를 반환.
+    """
+    job_dir = st.session_state.get(state_key)
+    if not job_dir:
+        return None
+    status = read_job_status(job_dir)
+    if status.get("state") in JOB_TERMINAL_STATES:
+        del st.session_state[state_key]
+        return status
+    render_job_panel(job_dir)
+    return None
+
 
 # --------------------------------
 # 2. 메인 실행 함수 (Render Function)
 # --------------------------------
 
+@traced("modeB", cat="rerun")
 def run_text_analysis_mode(client, folder, txt_file):
     """
     app.py에서 호출되는 메인 함수입니다.
@@ -1839,6 +2500,7 @@ def run_text_analysis_mode(client, folder, txt_file):
     # -----------------------------------------
     # [Step 1] 동화 내용 분석
     # -----------------------------------------
+    trace_step("Step 1")
     st.subheader("📚 동화 내용 분석")
 
     # 1. 초기 세션 상태 및 파일 경로 설정
@@ -1929,6 +2591,7 @@ def run_text_analysis_mode(client, folder, txt_file):
     # =========================================================
     # [Step 1.5] 등장인물 및 화자 분석 (Character & Speaker Analysis)
     # =========================================================
+    trace_step("Step 1.5")
     # Step 1 분석이 완료되었거나, 사용자가 수동으로 1.5단계를 열었을 때
     if st.session_state.get("track_b_analysis") and st.session_state.get("track_b_step", 0) >= 1:
         st.divider()
@@ -2328,6 +2991,7 @@ def run_text_analysis_mode(client, folder, txt_file):
     # =========================================================
     # [Step 2] 예고편 구간 선택 (Step 1이 완료되어야 표시)
     # =========================================================
+    trace_step("Step 2")
     if st.session_state.get("track_b_step", 0) >= 2:
         st.divider()
         st.subheader("✂️ 예고편 구간 선택")
@@ -2420,6 +3084,7 @@ def run_text_analysis_mode(client, folder, txt_file):
     # =========================================================
     # [Step 3] 예고편 대본 작성 (모드별 개별 저장/관리 적용)
     # =========================================================
+    trace_step("Step 3")
     if st.session_state.get("track_b_step", 0) >= 3:
         st.divider()
         st.subheader("📝 예고편 대본 작성")
@@ -2531,10 +3196,9 @@ def run_text_analysis_mode(client, folder, txt_file):
             # 세션 로드 체크
             if st.session_state.get(f"loaded_path_{script_style_mode}") != current_file_path:
                 try:
-                    with open(current_file_path, "r", encoding="utf-8") as f:
-                        data = json.load(f)
-                        st.session_state.script_results[script_style_mode] = data
-                        st.session_state[f"loaded_path_{script_style_mode}"] = current_file_path
+                    data = get_catalog().read_manifest("script", current_file_path)
+                    st.session_state.script_results[script_style_mode] = data
+                    st.session_state[f"loaded_path_{script_style_mode}"] = current_file_path
                 except Exception as e:
                     st.error(f"파일 로드 실패: {e}")
         
@@ -2569,76 +3233,24 @@ def run_text_analysis_mode(client, folder, txt_file):
             if not target_text:
                 st.error("예고편 구간을 먼저 선택해주세요.")
             else:
-                # 스포일러 방지 및 데이터 준비 (공통)
-                page_map = st.session_state.get("page_map", {})
-                spoiler_limit_page = find_spoiler_limit_page(target_text, page_map)
-                safe_full_text = trim_full_text_by_page(full_text_content, spoiler_limit_page)
-                safe_char_info = dict(char_info) if char_info else {}
-                if safe_char_info and "dialogue_map" in safe_char_info:
-                    safe_char_info["dialogue_map"] = trim_dialogue_map_by_page(safe_char_info["dialogue_map"], spoiler_limit_page)
-
-                # AI 생성 시작
+                # AI 생성 시작 (스포일러 제거 → 모드별 대본 → 공통 후처리)
                 with st.spinner(f"AI가 '{script_style_mode}' 스타일로 대본을 쓰고 있습니다..."):
                     try:
-                        # 모드별 함수 호출
-                        if script_style_mode == "Conversation":
-                            result = generate_conversation_oriented_script(
-                                target_text, duration_key, rec_info, safe_full_text, safe_char_info
-                            )
-                        elif script_style_mode == "Comprehensive":
-                            analysis_data = st.session_state.get("track_b_analysis", {})
-                            result = generate_comprehensive_script(
-                                target_text, duration_key, rec_info, safe_full_text, safe_char_info, analysis_data
-                            )
-                        else: # Standard
-                            result = generate_script_with_specs(
-                                target_text, duration_key, rec_info, safe_full_text, safe_char_info
-                            )
-
-                        # ID -> 풀네임 변환 (공통 후처리)
-                        if char_info and "characters" in char_info:
-                            id_to_full = {c['id']: f"{c['id']} ({c['name']}) {c['voice_type']}" for c in char_info["characters"]}
-                            for item in result.get("subtitles", []):
-                                spk_id = item.get("speaker", "narrator")
-                                if spk_id in id_to_full:
-                                    item["speaker"] = id_to_full[spk_id]
-
-                        # =========================================================
-                        # [Step B] 대사 내 괄호 및 지문 제거 (독립 실행)
-                        # =========================================================
-                        # 자막 리스트를 별도로 순회하며 텍스트만 정제
-                        for item in result.get("subtitles", []):
-                            original_text = item.get("text", "")
-                            
-                            # 괄호가 포함된 경우에만 로직 수행
-                            if "(" in original_text and ")" in original_text:
-                                # 1. 괄호와 그 안의 내용 제거: (1단계), (지문) 등
-                                clean_text = re.sub(r'\([^)]*\)', '', original_text)
-                                
-                                # 2. 공백 정리: 괄호 삭제로 생긴 다중 공백을 하나로 축소
-                                clean_text = re.sub(r'\s+', ' ', clean_text).strip()
-                                
-                                # 3. 적용
-                                item["text"] = clean_text
-                        # =========================================================
-                        # ★  씬 압축 로직 (같은 Page 3개 이상 -> 2개 압축) ★
-                        # =========================================================
-                        # Scene No 할당 전에 압축을 먼저 수행해야 합니다.
-                        result["subtitles"] = compress_consecutive_scenes(result["subtitles"])
-
-                        # ---------------------------------------------------------
-                        # ★  장면 번호(Scene No) 자동 그룹핑 적용 ★
-                        # ---------------------------------------------------------
-                        result["subtitles"] = assign_scene_numbers(result["subtitles"])
-                        # ---------------------------------------------------------
+                        result = generate_script_for_mode(
+                            script_style_mode, target_text, duration_key, rec_info,
+                            full_text_content, char_info,
+                            analysis_data=st.session_state.get("track_b_analysis", {}),
+                            page_map=st.session_state.get("page_map", {}),
+                        )
 
                         # [저장 로직] 새 버전 파일 생성 mode_dir 아래 저장
                         new_filename = f"script_{safe_name}_{script_style_mode}_v{next_ver}.json"
                         new_file_path = mode_dir / new_filename
                         
                         try:
-                            with open(new_file_path, "w", encoding="utf-8") as f:
-                                json.dump(result, f, ensure_ascii=False, indent=4)
+                            get_catalog().write_manifest(
+                                "script", mode_dir, (next_ver,), new_file_path, result, book=safe_name,
+                            )
                             
                             # 세션 갱신
                             st.session_state.script_results[script_style_mode] = result
@@ -2719,8 +3331,9 @@ def run_text_analysis_mode(client, folder, txt_file):
 
                     # 2. 현재 파일에 덮어쓰기 (새 버전 생성 X)
                     if current_file_path:
-                        with open(current_file_path, "w", encoding="utf-8") as f:
-                            json.dump(current_data, f, ensure_ascii=False, indent=4)
+                        get_catalog().write_manifest(
+                            "script", mode_dir, (selected_version,), current_file_path, current_data, book=safe_name,
+                        )
 
                     log_event("modeB_step3_script_finalized", {
                         "subtitles": edited_subtitles,
@@ -2734,6 +3347,7 @@ def run_text_analysis_mode(client, folder, txt_file):
     # =========================================================
     # [Step 4] TTS 생성 및 전체 미리듣기
     # =========================================================
+    trace_step("Step 4")
     if st.session_state.get("track_b_step", 0) >= 4:
         # 1. 내부 상태 (UI 비노출)
         current_script_ver = st.session_state.get("current_script_ver", 1)
@@ -2746,35 +3360,14 @@ def run_text_analysis_mode(client, folder, txt_file):
         TTS_MODE_BASE_DIR.mkdir(parents=True, exist_ok=True)
 
         # ------------------------------------------------------------------
-        # [Logic] 기존 버전 스캔 (v{s}_{a}_{model} 대응)
+        # [Logic] 기존 버전 조회 (v{s}_{a}_{model} 대응)
         # ------------------------------------------------------------------
-        # 폴더명을 분석하여 (script_ver, audio_ver) -> path 매핑
-        # 뒤에 모델명이 붙어도 앞의 숫자만 파싱하여 버전을 관리함
-        sorted_keys, path_map = get_tts_versions_v2(TTS_MODE_BASE_DIR)
-        dir_list = [d for d in TTS_MODE_BASE_DIR.iterdir() if d.is_dir() and d.name.startswith("v")]
-        
-        version_map = {}  # key: (s_ver, a_ver), value: {path, model_name}
-        
-        for d in dir_list:
-            try:
-                # 예: v1_1_clova -> parts=["v1", "1", "clova"]
-                # 예: v1_2       -> parts=["v1", "2"]
-                parts = d.name.split("_")
-                if len(parts) >= 2:
-                    s_ver = int(parts[0].replace("v", "")) # v1 -> 1
-                    a_ver = int(parts[1])                  # 1
-                    
-                    # 모델명 추출 (3번째 요소부터 끝까지, 혹은 없으면 "Unknown")
-                    model_suffix = "_".join(parts[2:]) if len(parts) > 2 else ""
-                    
-                    # (s, a) 키가 중복될 일은 시스템상 없다고 가정 (있으면 덮어씀)
-                    version_map[(s_ver, a_ver)] = {
-                        "path": d,
-                        "model": model_suffix,
-                        "full_name": d.name
-                    }
-            except Exception:
-                continue # 파싱 실패한 폴더는 무시
+        # 버전 카탈로그에서 (script_ver, audio_ver) -> 폴더/모델명 조회 (폴더 스캔 없음)
+        # 뒤에 모델명이 붙어도 앞의 숫자만 보고 버전을 관리함
+        version_map = {  # key: (s_ver, a_ver), value: {path, model_name}
+            e["key"]: {"path": e["path"], "model": e["label"], "full_name": e["path"].name}
+            for e in get_catalog().entries("tts", TTS_MODE_BASE_DIR)
+        }
 
         # 키 정렬 (최신 버전이 위로 오도록 내림차순 정렬)
         sorted_keys = sorted(version_map.keys(), reverse=True)
@@ -2820,7 +3413,18 @@ def run_text_analysis_mode(client, folder, txt_file):
             if not final_scripts:
                 st.error("생성할 대본이 없습니다.")
             else:
-                with st.spinner(f"음성 생성 중... (Model: {selected_engine})"):
+                # 문장 단위 ETA — 합성 워커가 문장을 끝낼 때마다 갱신되고, 기다리는 동안 _on_idle이 표시
+                tts_eta = StageETA("tts", [len(s.get("text", "")) for s in final_scripts])
+                with st.spinner(f"음성 생성 중... (Model: {selected_engine}, 예상 {format_eta(tts_eta.initial_estimate)})"):
+                    # 취소 버튼(또는 다른 위젯 조작)으로 리런되면 cancel_scope가 토큰을 취소 →
+                    # 남은 문장 합성을 건너뛰고 만들던 버전 폴더를 지움 (synthesize_tts_version).
+                    st.button("⏹ 취소", key="step4_tts_cancel")
+                    _elapsed_text = st.empty()
+                    _t0 = time.time()
+
+                    def _on_idle():
+                        _elapsed_text.caption(f"⏱ {int(time.time() - _t0)}초 경과 · {tts_eta.text('🎙️ 문장')}")
+
                     try:
                         # 폴더명: v{대본}_{음성}_{모델명} 형태로 후처리 저장 (식별 용이)
                         # 모델명 파일시스템 안전하게 변환
@@ -2828,163 +3432,45 @@ def run_text_analysis_mode(client, folder, txt_file):
                         folder_name = f"v{current_script_ver}_{next_audio_ver}_{safe_model_name}"
                         
                         new_ver_dir = TTS_MODE_BASE_DIR / folder_name
-                        segments_dir = new_ver_dir / "segments"
-                        
                         new_ver_dir.mkdir(parents=True, exist_ok=True)
-                        segments_dir.mkdir(parents=True, exist_ok=True)
-                        
+
                         uid = uuid.uuid4().hex[:6]
 
-                        # =============================================================
-                        # 스타일 프롬프트(Style Prompt) 동적 생성 로직
-                        # =============================================================
-                        
-                        # 1. 데이터 로드 (Step 1.5 결과물)
-                        char_info = st.session_state.get("track_b_characters", {})
-                        characters_data = char_info.get("characters", [])
-                        dialogue_map_data = char_info.get("dialogue_map", [])
-
-                        # 2. 검색용 매핑(Lookup) 테이블 생성
-                        # (1) 캐릭터 ID -> Tone 매핑
-                        # 예: {'char_01': '소심하고 겁이 많은 말투', ...}
-                        char_tone_map = {c['id']: c.get('tone', '') for c in characters_data}
-                        
-                        # (2) 대사 내용 -> Context 매핑
-                        # 대본 수정 과정에서 텍스트가 약간 바뀔 수 있으므로, 
-                        # 완벽한 매칭이 안 될 수 있음을 감안해야 합니다. (여기서는 정확한 텍스트 매칭 시도)
-                        dialogue_context_map = {d['quote'].strip(): d.get('context', '') for d in dialogue_map_data}
-
-                        # 3. 스크립트 순회하며 프롬프트 리스트 생성
-                        style_prompts_list = []
-
-                        # 화자 정보 보정을 위한 임시 리스트
-                        processed_speakers = []
-
-                        for _idx_p, script in enumerate(final_scripts):
-                            text = script["text"]
-                            # speaker 필드에 이름이 섞여있을 수 있으므로 ID만 추출 (예: "char_01 (흥부)..." -> "char_01")
-                            raw_speaker = script["speaker"]
-                            speaker_id = raw_speaker.split(" ")[0] if raw_speaker else "narrator"
-
-                            # 사용자가 Step 1.5에서 편집한 AI 지시문이 있으면 그것 우선 사용
-                            user_edited_prompt = st.session_state.get(f"user_prompt_{_idx_p}")
-                            if user_edited_prompt and user_edited_prompt.strip():
-                                style_prompts_list.append(user_edited_prompt.strip())
-                                processed_speakers.append(speaker_id)
-                                continue
-
-                            # (A) 나레이터 처리
-                            if "narrator" in speaker_id.lower() or speaker_id == "narrator":
-                                if speaker_mode == "단일 화자 (Narrator Only)":
-                                    # 단일 화자 모드면 나레이션도 상황에 따라 톤이 바뀌면 좋겠지만, 기본은 차분하게
-                                    current_prompt = "차분하고 몰입감 있는 동화 구연조로 읽어주세요."
-                                else:
-                                    current_prompt = "차분하고 명확한 발음의 나레이션 톤."
-                                processed_speakers.append("narrator") # 단일화자 모드 처리는 아래에서 덮어씌워짐
-
-                            # (B) 캐릭터 처리
-                            else:
-                                # 1. 성격/말투(Tone) 가져오기
-                                char_tone = char_tone_map.get(speaker_id, "일반적인 목소리")
-                                
-                                # 2. 상황(Context) 가져오기
-                                # 텍스트 앞뒤 공백 제거 후 매칭 시도
-                                script_context = find_context_by_structure(text, raw_speaker, page_num, dialogue_map_data)
-                                
-                                # 3. 프롬프트 조합 (Gemini/GPT용)
-                                # 영어로 변환해서 넘기면 더 좋지만, 한글로도 최신 모델은 잘 이해합니다.
-                                # 포맷: [Role/Tone] + [Context/Situation]
-                                if script_context:
-                                    # 예: "Roleplay with a '소심한 목소리' tone. The situation is '호랑이를 피해 도망침'. Speak..."
-                                    current_prompt = (
-                                        f"Roleplay with a '{char_tone}' tone. "
-                                        f"The situation is '{script_context}'. "
-                                        f"Speak the following Korean text with the appropriate emotion."
-                                    )
-                                else:
-                                    current_prompt = (
-                                        f"Roleplay with a '{char_tone}' tone. "
-                                        f"Speak the following Korean text naturally."
-                                    )
-                                
-                                processed_speakers.append(speaker_id)
+                        # 스타일 프롬프트: Step 1.5 캐릭터 톤/상황 + 사용자가 편집한 AI 지시문 우선
+                        style_prompts_list = build_tts_style_prompts(
+                            final_scripts,
+                            st.session_state.get("track_b_characters", {}),
+                            speaker_mode,
+                            user_prompts=[st.session_state.get(f"user_prompt_{i}") for i in range(len(final_scripts))],
+                        )
 
-                            style_prompts_list.append(current_prompt)
-                        
-                        # 1. 텍스트와 화자 리스트 추출 (기본값)
-                        texts = [s["text"] for s in final_scripts]
-                        original_speakers = [s["speaker"] for s in final_scripts] # 원본 보존
-                        
                         #  단일 화자 모드일 경우, 모든 화자를 'narrator'로 강제 변경
                         if speaker_mode == "단일 화자 (Narrator Only)":
-                            # 리스트 전체를 'narrator'로 채움
-                            speakers = ["narrator"] * len(texts)
+                            speakers = ["narrator"] * len(final_scripts)
                             print(f"ℹ️ [Info] 단일 화자 모드 적용: 모든 화자를 narrator로 설정함.")
                         else:
-                            # 다수 화자 모드라면 원본 그대로 사용
-                            speakers = original_speakers
+                            speakers = [s["speaker"] for s in final_scripts]
+
+                        # 배수(Float)를 Clova 기준 정수(Int)로 변환 (-5 ~ 5)
+                        clova_speed_int = voice_speed_to_clova(voice_speed)
+
+                        # 사용자가 기다리는 작업이라 다른 세션의 최종 렌더보다 먼저 TTS 슬롯을 받음
+                        # 합성은 워커 스레드에서 돌리고, 기다리는 동안 경과 시간을 갱신해 리런 요청을 받음
+                        with cancel_scope(), render_priority("interactive"):
+                            audio_data_list, full_audio_str = run_with_idle(
+                                synthesize_tts_version,
+                                final_scripts, new_ver_dir, folder_name, selected_engine,
+                                speakers, clova_speed_int, style_prompts_list, uid, tts_eta,
+                                on_idle=_on_idle,
+                            )
 
-                        #  1. 배수(Float)를 Clova 기준 정수(Int)로 변환
-                        # 공식: (1.0 - 배수) * 10 
-                        # 예: 1.2배 -> -2 (빠름), 0.8배 -> 2 (느림)
-                        clova_speed_int = int((1.0 - voice_speed) * 10)
-                        
-                        # 범위를 -5 ~ 5 로 안전하게 제한 (Clova API 허용범위 준수)
-                        clova_speed_int = max(-5, min(5, clova_speed_int))
-                        
-                        # 여기서 engine 인자 전달
-                        audio_paths = generate_audio_for_subtitles(
-                            subtitles=texts,
-                            output_dir=segments_dir,
-                            uid=uid,
-                            speakers=speakers,
-                            engine=selected_engine,  # <--- 선택한 엔진 전달
-                            parallel=True ,
-                            global_speed=clova_speed_int,
-                            style_prompts=style_prompts_list
-                        )
-                        
-                        # 2. 데이터 구성
-                        audio_data_list = []
-                        valid_paths = []
-                        for idx, path in enumerate(audio_paths):
-                            script_item = final_scripts[idx]
-                            if path and Path(path).exists():
-                                dur = get_audio_duration(str(path))
-                                audio_data_list.append({
-                                    "text": script_item["text"],
-                                    "speaker": script_item["speaker"],
-                                    "path": str(path),
-                                    "duration": dur,
-                                    "scene_no": script_item.get("scene_no")
-                                })
-                                valid_paths.append(path)
-                            else:
-                                audio_data_list.append({
-                                    "text": script_item["text"],
-                                    "speaker": script_item["speaker"],
-                                    "path": None,  # 경로는 없음
-                                    "duration": 0,
-                                    "scene_no": script_item.get("scene_no"),
-                                    "status": "failed" # 실패했음을 표시
-                                })
-                                
-                                # (선택) 디버깅을 위해 실패 로그 출력
-                                print(f"⚠️ 오디오 생성 실패: {script_item['text'][:10]}...")
-
-                        # 3. Full Audio 병합
-                        full_audio_str = ""
-                        if valid_paths:
-                            full_path = new_ver_dir / f"full_{folder_name}.mp3"
-                            if merge_audio_files(valid_paths, str(full_path)):
-                                full_audio_str = str(full_path)
-                        
                         # 4. Manifest 저장
                         manifest = {
                             "script_ver": current_script_ver,
                             "audio_ver": next_audio_ver,
                             "mode": current_mode,
                             "engine": selected_engine,
+                            "speed": clova_speed_int,
                             "created_at": str(datetime.now()),
                             "scripts": final_scripts,
                             "audio_data": audio_data_list,
@@ -3002,8 +3488,10 @@ def run_text_analysis_mode(client, folder, txt_file):
                                     find_set_in_dict(v, f"{path}[{i}]")
                         
                         find_set_in_dict(manifest)
-                        with open(new_ver_dir / "manifest.json", "w", encoding="utf-8") as f:
-                            json.dump(manifest, f, ensure_ascii=False, indent=4)
+                        get_catalog().write_manifest(
+                            "tts", TTS_MODE_BASE_DIR, (current_script_ver, next_audio_ver), new_ver_dir, manifest,
+                            label=safe_model_name,
+                        )
                             
                         # 5. 세션 갱신 및 리런
                         st.session_state.track_b_audio = audio_data_list
@@ -3014,6 +3502,8 @@ def run_text_analysis_mode(client, folder, txt_file):
                         st.success(f"✅ 생성 완료! (폴더: {folder_name})")
                         st.rerun()
                         
+                    except Cancelled:
+                        st.warning("음성 생성을 취소했습니다.")
                     except Exception as e:
                         st.error(f"에러: {e}")
 
@@ -3040,9 +3530,8 @@ def run_text_analysis_mode(client, folder, txt_file):
             try:
                 cur_dir = st.session_state.get(f"loaded_tts_dir_{current_mode}")
                 if cur_dir:
-                    with open(Path(cur_dir) / "manifest.json", 'r', encoding='utf-8') as f:
-                        m = json.load(f)
-                        current_engine_display = m.get('engine', 'clova')
+                    m = get_catalog().read_manifest("tts", cur_dir)
+                    current_engine_display = m.get('engine', 'clova')
             except:
                 pass
 
@@ -3093,22 +3582,8 @@ def run_text_analysis_mode(client, folder, txt_file):
                         st.error("TXT 파일이 없습니다.")
                     else:
                         with st.spinner("이미지 데이터 로드 중..."):
-                            # A. 이미지 필터링
-                            valid_imgs = load_filtered_images(folder)
-                            # B. 텍스트 파싱
-                            text_map = parse_book_text_by_page(txt_file)
-                            
-                            # C. Candidates 생성 (Step 6용 데이터)
-                            candidates = []
-                            for img_path in valid_imgs:
-                                pg_num = extract_page_num_from_filename(img_path.name)
-                                page_text = text_map.get(pg_num, "(텍스트 없음)")
-                                candidates.append({
-                                    "page_num": pg_num,
-                                    "img_path": str(img_path),
-                                    "img_name": img_path.name,
-                                    "text": page_text
-                                })
+                            # 이미지 필터링 + 텍스트 파싱 → Candidates 생성 (Step 6용 데이터)
+                            candidates = build_image_candidates(folder, txt_file)
                             
                             # 세션에 중요 데이터 저장 (다음 단계를 위해)
                             st.session_state.track_b_candidates = candidates
@@ -3121,6 +3596,7 @@ def run_text_analysis_mode(client, folder, txt_file):
     # =========================================================
     # [Step 6] 이미지 자동 매칭 (대본 출처 기반 + 스마트 분배)
     # =========================================================
+    trace_step("Step 6")
     if st.session_state.get("track_b_step", 0) >= 6:        
         # [DEBUG] Source Page 값 확인 (필요시 주석 처리)
         if "step1_scripts" in st.session_state:
@@ -3145,148 +3621,15 @@ def run_text_analysis_mode(client, folder, txt_file):
             else:
                 with st.spinner("이미지 배정 규칙 적용 중..."):
                     
-                    # -------------------------------------------------
-                    # 0. 데이터 준비
-                    # -------------------------------------------------
-                    candidates = st.session_state.track_b_candidates
-                    text_map = {item['page_num']: item['text'] for item in candidates}
-                    spread_map = analyze_spread_structure(candidates)
-                    
-                    # [스포일러 상한선 계산]
-                    target_text = st.session_state.get("target_trailer_text", "")
-                    spoiler_limit_pg = find_spoiler_limit_page(target_text, text_map)
-                    
-                    # 안전장치
-                    max_book_pg = max(text_map.keys()) if text_map else 0
-                    if spoiler_limit_pg > max_book_pg: spoiler_limit_pg = max_book_pg
-                    if spoiler_limit_pg % 2 == 0: spoiler_limit_pg += 1
-
-                    # 표지 페이지 번호
-                    #cover_page_num = candidates[0]['page_num'] if candidates else 5
-                    cover_page_num = find_cover_page_num(text_map, candidates)
+                    # 대본 출처 페이지 → 펼침면/중복 방지/스포일러 상한 규칙 적용
+                    final_selection, cover_page_num, spoiler_limit_pg = assign_images_to_scenes(
+                        st.session_state.step1_scripts,
+                        st.session_state.track_b_candidates,
+                        st.session_state.get("target_trailer_text", ""),
+                    )
 
                     #  Step 6.5에서 쓰기 위해 세션에 저장
                     st.session_state['cover_page_num'] = cover_page_num
-
-                    # -------------------------------------------------
-                    # A. 대본에서 페이지 정보 가져오기 (Direct Access)
-                    # -------------------------------------------------
-                    scripts = st.session_state.step1_scripts
-                    total_scenes = len(scripts)
-                    
-                    # -------------------------------------------------
-                    # B. 스마트 배치 로직
-                    # -------------------------------------------------
-                    final_selection = []
-                    
-                    def get_spread_id(pg):
-                        info = spread_map.get(pg)
-                        if info and info['pair_page']:
-                            return min(pg, info['pair_page'])
-                        return pg
-
-                    # 헬퍼: 안전하게 페이지 번호 가져오기
-                    def get_safe_page(idx):
-                        if 0 <= idx < total_scenes:
-                            val = scripts[idx].get("source_page", 0)
-                            try: return int(val)
-                            except: return 0
-                        return -1
-
-                    for i in range(total_scenes):
-                        # 1. Step 3의 값 그대로 가져오기
-                        source_pg = get_safe_page(i)
-                        scene_idx = i
-                        note = "대본 출처"
-
-                        # 유효성 검사 (0이거나 이미지 맵에 없으면 최소 페이지로 보정)
-                        if source_pg != 0 and source_pg not in text_map:
-                            if candidates:
-                                source_pg = min(text_map.keys())
-                                note = "유효하지 않은 페이지 보정"
-                            else:
-                                source_pg=cover_page_num
-
-                        # -----------------------------------------------
-                        # Rule 0. 마지막 장면(Outro)은 source_page==0일 때만 표지
-                        # -----------------------------------------------
-                        if i == total_scenes - 1 and source_pg == 0:
-                            final_selection.append({
-                                "scene_index": scene_idx,
-                                "page": cover_page_num,
-                                "original_pick": source_pg,
-                                "note": "Rule: 마지막 장면(표지, source_page=0)"
-                            })
-                            continue
-
-                        # -----------------------------------------------
-                        # Logic: 연속 씬 vs 단독 씬 분기
-                        # -----------------------------------------------
-                        # 앞뒤 씬의 Source Page 가져오기
-                        prev_pg_raw = get_safe_page(i-1)
-                        next_pg_raw = get_safe_page(i+1)
-
-                        curr_spread_id = get_spread_id(source_pg)
-                        prev_spread_id = get_spread_id(prev_pg_raw) if i > 0 else -1
-                        next_spread_id = get_spread_id(next_pg_raw) if i < total_scenes - 1 else -1
-
-                        # 후보군 (Left, Right)
-                        curr_info = spread_map.get(source_pg)
-                        pair_pg = curr_info['pair_page'] if curr_info else None
-                        
-                        if pair_pg:
-                            available_pages = sorted([source_pg, pair_pg])
-                        else:
-                            available_pages = [source_pg]
-                        
-                        final_pg = source_pg # 초기값
-
-                        # Case 1: 연속 장면 시작 (Start) -> 왼쪽
-                        if curr_spread_id == next_spread_id and curr_spread_id != prev_spread_id:
-                            final_pg = available_pages[0] 
-                            note += " + 연속 시작(좌)"
-
-                        # Case 2: 연속 장면 이어짐 (Continue) -> 오른쪽
-                        elif curr_spread_id == prev_spread_id:
-                            if len(available_pages) > 1:
-                                final_pg = available_pages[1]
-                                note += " + 연속 이어짐(우)"
-                            else:
-                                final_pg = available_pages[0]
-                                note += " (단일 페이지 유지)"
-
-                        # Case 3: 단독 장면 -> 텍스트 없는 쪽 우선
-                        else:
-                            pair_info = spread_map.get(pair_pg) if pair_pg else None
-                            if curr_info and curr_info['has_text'] and pair_info and not pair_info['has_text']:
-                                final_pg = pair_pg
-                                note += " (텍스트 없는 쪽 우선)"
-
-                        # -----------------------------------------------
-                        # Rule: 스포일러 상한선
-                        # -----------------------------------------------
-                        if final_pg > spoiler_limit_pg:
-                            final_pg = spoiler_limit_pg
-                            note = f"스포일러 제한(Limit P.{spoiler_limit_pg})"
-
-                        # -----------------------------------------------
-                        # Rule: 중복 방지
-                        # -----------------------------------------------
-                        if i > 0:
-                            last_final_pg = final_selection[i-1]['page']
-                            if final_pg == last_final_pg:
-                                if pair_pg and pair_pg != final_pg:
-                                    if pair_pg <= spoiler_limit_pg:
-                                        final_pg = pair_pg
-                                        note += " + 중복 회피"
-                        
-                        # 결과 저장
-                        final_selection.append({
-                            "scene_index": scene_idx,
-                            "page": final_pg,
-                            "original_pick": source_pg,
-                            "note": note
-                        })
                     
                     st.session_state.track_b_matches = final_selection
                     st.success(f"배정 완료! (스포일러 상한선: P.{spoiler_limit_pg})")
@@ -3362,10 +3705,12 @@ def run_text_analysis_mode(client, folder, txt_file):
     # =========================================================
     # [Step 7] Runway 영상 생성 및 병합 (Visual & TTS)
     # =========================================================
+    trace_step("Step 7")
     if st.session_state.get("track_b_step", 0) >= 7:
         # =========================================================
         # [Step 6.5] 정지 화상 프리뷰 (BGM: Title/nP 로직 적용)
         # =========================================================
+        trace_step("Step 6.5")
         if st.session_state.get("track_b_step", 0) >= 7:
             st.divider()
             st.subheader("🎬 (선택) 정지 화상 프리뷰")
@@ -3384,15 +3729,7 @@ def run_text_analysis_mode(client, folder, txt_file):
             PREVIEW_BASE_DIR.mkdir(parents=True, exist_ok=True)
 
             # BGM 경로 설정 (기존 로직 유지)
-            path_candidate_1 = Path("BGM") / story_dir_name
-            path_candidate_2 = Path("BGM") / get_bgm_folder_name(story_dir_name)
-
-            if path_candidate_1.exists() and path_candidate_1.is_dir():
-                BGM_DIR = path_candidate_1
-            elif path_candidate_2.exists() and path_candidate_2.is_dir():
-                BGM_DIR = path_candidate_2
-            else:
-                BGM_DIR = path_candidate_1
+            BGM_DIR = resolve_bgm_dir(story_dir_name)
             
 
             # ---------------------------------------------------------
@@ -3404,22 +3741,15 @@ def run_text_analysis_mode(client, folder, txt_file):
             
             # [UI] 불러오기 Selectbox
             if sorted_keys:
+                # 프리뷰가 쓴 음성 버전의 모델명 (TTS 버전 폴더 라벨, 카탈로그 한 번 조회)
+                tts_labels = {e["key"]: e["label"] for e in get_catalog().entries("tts", TTS_MODE_BASE_DIR)}
                 col_sel, col_sp = st.columns([1, 2])
                 with col_sel:
                     def format_func(key):
                         s, a, p = key 
     
-                        # 해당 버전의 모델 정보를 가져오기 위해 path_map(또는 version_map) 활용
-                        model_hint = ""
-                        try:
-                            p_path = version_map[key] # 혹은 path_map[key] (변수명 확인 필요)
-                            if (p_path / "manifest.json").exists():
-                                with open(p_path / "manifest.json", "r", encoding="utf-8") as f:
-                                    m_data = json.load(f)
-                                    eng = m_data.get("engine", "clova")
-                                    model_hint = f" [{eng}]"
-                        except:
-                            pass
+                        label = tts_labels.get((s, a))
+                        model_hint = f" [{label}]" if label else ""
                         
                         is_latest = (key == sorted_keys[0])
                         # 화면에 표시될 텍스트 형식 (P 버전도 포함)
@@ -3437,8 +3767,7 @@ def run_text_analysis_mode(client, folder, txt_file):
                 # 세션 갱신 (경로가 바뀌었을 때만)
                 if st.session_state.get(f"loaded_prev_dir_{cur_mode}") != str(target_dir):
                     try:
-                        with open(target_dir / "manifest.json", "r", encoding="utf-8") as f:
-                            data = json.load(f)
+                        data = get_catalog().read_manifest("preview", target_dir)
                         st.session_state.track_b_preview_video = data.get("final_path", "")
                         st.session_state[f"loaded_prev_dir_{cur_mode}"] = str(target_dir)
                     except Exception as e:
@@ -3451,17 +3780,6 @@ def run_text_analysis_mode(client, folder, txt_file):
             # ---------------------------------------------------------
             # 2. BGM 및 옵션 설정 UI 
             # ---------------------------------------------------------
-            def find_bgm_file(keywords, bgm_dir_path):
-                if not bgm_dir_path.exists(): return None
-                # 폴더 내 모든 오디오 파일 검색
-                for f in bgm_dir_path.iterdir():
-                    if f.is_file() and f.suffix.lower() in ['.mp3', '.wav', '.m4a']:
-                        # 전달받은 키워드(예: '2P', '2p') 중 하나라도 파일명에 있으면 성공
-                        for kw in keywords:
-                            if kw in f.name: 
-                                return f
-                return None
-            
             # 세션 키 초기화
             if "track_b_preview_video" not in st.session_state:
                 st.session_state.track_b_preview_video = None
@@ -3547,125 +3865,175 @@ def run_text_analysis_mode(client, folder, txt_file):
                     progress_bar = st.progress(0)
                     status_text = st.empty()
                     temp_clips = []
+                    # 버전이 달라도 입력이 같은 장면은 캐시에서 하드링크로 재사용
+                    render_cache = RenderCache(_session_root / story_dir_name / "render_cache")
+                    cache_hits = 0
+
+                    # 다른 세션 렌더에 밀려 슬롯을 기다리는 동안 대기 순번 표시 (프리뷰는 interactive 우선순위)
+                    def _on_render_wait(pos):
+                        status_text.write(f"⏳ 렌더 대기열 {pos}번째... (다른 참가자 작업 처리 중)")
+
+                    # 남은 시간 추정 — 장면 크기는 오디오 길이 (이미지가 없어 건너뛸 장면은 제외)
+                    preview_eta = StageETA("preview", {
+                        i: (audios[i] or {}).get("duration") or 5.0 if i < len(audios) else 5.0
+                        for i, m in enumerate(matches) if candidates_map.get(m['page'])
+                    })
 
+                    st.button("⏹ 취소", key="step65_preview_cancel")
                     try:
                         status_text.write(f"🔄 프리뷰 생성 중... (표지: {cover_page_num}p 기준)")
-                        
-                        for i, match in enumerate(matches):
-                            # A. 기본 데이터
-                            pg = match['page']
-                            img_info = candidates_map.get(pg)
-                            if not img_info: continue
+
+                        # 취소 버튼(또는 다른 위젯 조작) 리런은 장면마다의 progress 갱신 때 반영됨 →
+                        # cancel_scope가 토큰을 취소해 도는 ffmpeg를 끝내고, 매니페스트 없는 버전 폴더는 지움
+                        with cancel_scope():
+                            try:
+                                for i, match in enumerate(matches):
+                                    check_cancelled()
+                                    # A. 기본 데이터
+                                    pg = match['page']
+                                    img_info = candidates_map.get(pg)
+                                    if not img_info: continue
                             
-                            img_path = str(img_info['img_path'])
-                            audio_data = audios[i] if i < len(audios) else None
-                            audio_path = audio_data['path'] if audio_data else None
-                            audio_dur = audio_data['duration'] if (audio_data and audio_data['duration']) else 5.0
-
-                            # B. 자막 및 색상 결정
-                            script_item = scripts[i] if i < len(scripts) else {}
-                            original_text = script_item.get("text", "")
-                            current_speaker = str(script_item.get("speaker", "narrator")).strip()
+                                    img_path = str(img_info['img_path'])
+                                    audio_data = audios[i] if i < len(audios) else None
+                                    audio_path = audio_data['path'] if audio_data else None
+                                    audio_dur = audio_data['duration'] if (audio_data and audio_data['duration']) else 5.0
+
+                                    # B. 자막 및 색상 결정
+                                    script_item = scripts[i] if i < len(scripts) else {}
+                                    original_text = script_item.get("text", "")
+                                    current_speaker = str(script_item.get("speaker", "narrator")).strip()
                             
-                            # ★ 색상 결정 로직
-                            if "컬러링" in subtitle_mode:
-                                # 맵에서 찾거나 없으면 흰색
-                                text_color = speaker_color_map.get(current_speaker, "white")
-                            else:
-                                # 기본 모드
-                                text_color = "white"
+                                    # ★ 색상 결정 로직
+                                    if "컬러링" in subtitle_mode:
+                                        # 맵에서 찾거나 없으면 흰색
+                                        text_color = speaker_color_map.get(current_speaker, "white")
+                                    else:
+                                        # 기본 모드
+                                        text_color = "white"
                             
-                            # ★ 대본상의 실제 PDF 페이지 번호 (예: 5, 6, 7...)
-                            source_page = script_item.get("source_page", 0) 
+                                    # ★ 대본상의 실제 PDF 페이지 번호 (예: 5, 6, 7...)
+                                    source_page = script_item.get("source_page", 0) 
                             
-                            subtitle_text = original_text 
-                            if current_mode == "Conversation" and dialogue_map:
-                                for d_item in dialogue_map:
-                                    if (d_item.get("quote", "").strip() == original_text.strip()) and \
-                                       (d_item.get("page_num") == source_page):
-                                        subtitle_text = d_item.get("context")
-                                        break
+                                    subtitle_text = original_text 
+                                    if current_mode == "Conversation" and dialogue_map:
+                                        for d_item in dialogue_map:
+                                            if (d_item.get("quote", "").strip() == original_text.strip()) and \
+                                               (d_item.get("page_num") == source_page):
+                                                subtitle_text = d_item.get("context")
+                                                break
                             
-                            # C. 경로 설정
-                            base_clip_path = NEW_VER_DIR / f"preview_base_{i}.mp4"
-                            sub_clip_path = NEW_VER_DIR / f"preview_sub_{i}.mp4"
-                            final_clip_path = NEW_VER_DIR / f"preview_final_{i}.mp4"
-
-                            # D. 영상 생성 (무음) - PIL로 이미지 전처리 후 클립 생성
-                            from PIL import Image as PILImage
-                            pil_img = PILImage.open(img_path).convert("RGB")
-                            # 높이 1280 기준 리사이즈
-                            ratio = 1280 / pil_img.height
-                            pil_img = pil_img.resize((int(pil_img.width * ratio), 1280), PILImage.LANCZOS)
-                            # 가운데 720px 크롭
-                            left = (pil_img.width - 720) // 2
-                            pil_img = pil_img.crop((left, 0, left + 720, 1280))
-                            # numpy 배열로 변환하여 ImageClip 생성
-                            import numpy as np
-                            clip = ImageClip(np.array(pil_img), duration=audio_dur)
-                            clip.fps = 24
-
-                            clip.write_videofile(str(base_clip_path), codec="libx264", audio=False, preset="ultrafast", logger=None)
-                            clip.close()
-
-                            # E. 자막 입히기
-                            # E. 자막 입히기 (font_color 인자 사용)
-                            add_subtitle_to_video(
-                                str(base_clip_path), 
-                                subtitle_text, 
-                                str(sub_clip_path), 
-                                scene_index=i, 
-                                font_color=text_color 
-                            )
+                                    # C. 경로 설정
+                                    base_clip_path = NEW_VER_DIR / f"preview_base_{i}.mp4"
+                                    sub_clip_path = NEW_VER_DIR / f"preview_sub_{i}.mp4"
+                                    final_clip_path = NEW_VER_DIR / f"preview_final_{i}.mp4"
+
+                                    # D. 영상 생성 (무음) - PIL로 이미지 전처리 후 클립 생성
+                                    def _build_base(out_path):
+                                        with render_slot("cpu", "interactive", on_wait=_on_render_wait):
+                                            from PIL import Image as PILImage
+                                            pil_img = PILImage.open(img_path).convert("RGB")
+                                            # 높이 1280 기준 리사이즈
+                                            ratio = 1280 / pil_img.height
+                                            pil_img = pil_img.resize((int(pil_img.width * ratio), 1280), PILImage.LANCZOS)
+                                            # 가운데 720px 크롭
+                                            left = (pil_img.width - 720) // 2
+                                            pil_img = pil_img.crop((left, 0, left + 720, 1280))
+                                            # numpy 배열로 변환하여 ImageClip 생성
+                                            import numpy as np
+                                            load_moviepy()
+                                            from moviepy.editor import ImageClip
+                                            clip = ImageClip(np.array(pil_img), duration=audio_dur)
+                                            clip.fps = 24
+
+                                            clip.write_videofile(out_path, codec="libx264", audio=False, preset="ultrafast", logger=None)
+                                            clip.close()
+
+                                    # E. 자막 입히기 (font_color 인자 사용)
+                                    # 슬롯은 자기 인코딩 동안만 — 앞 단계 결과는 슬롯 밖에서 먼저 준비 (각 빌더가 자기 슬롯을 잡음)
+                                    def _build_sub(out_path):
+                                        render_cache.materialize("preview_base", base_key, base_clip_path, _build_base)
+                                        with render_slot("cpu", "interactive", on_wait=_on_render_wait):
+                                            add_subtitle_to_video(
+                                                str(base_clip_path),
+                                                subtitle_text,
+                                                out_path,
+                                                scene_index=i,
+                                                font_color=text_color
+                                            )
+
+                                    # 증분 리빌드: 입력 내용 해시 키 (이미지 → 자막 → 오디오 순으로 연쇄)
+                                    base_key = scene_key("preview_base", image=Path(img_path), duration=audio_dur)
+                                    sub_key = scene_key("preview_sub", base=base_key, text=subtitle_text,
+                                                        color=text_color, scene_index=i)
 
-                            # F. 오디오 및 BGM 합성 (★ 사용자 요청 로직 적용)
-                            if audio_path and os.path.exists(audio_path):
-                                page_bgm = None
+                                    # F. 오디오 및 BGM 합성 (★ 사용자 요청 로직 적용)
+                                    if audio_path and os.path.exists(audio_path):
+                                        page_bgm = None
                                 
-                                if use_bgm and source_page >= 0:
-                                    search_keywords = []
+                                        if use_bgm and source_page >= 0:
+                                            search_keywords = []
                                     
-                                    # [Logic] 표지(Cover) 페이지인 경우 -> "title" 검색
-                                    if source_page == cover_page_num:
-                                        search_keywords = ["title", "Title", "TITLE"]
-                                        log_msg = "Title(표지)"
+                                            # [Logic] 표지(Cover) 페이지인 경우 -> "title" 검색
+                                            if source_page == cover_page_num:
+                                                search_keywords = ["title", "Title", "TITLE"]
+                                                log_msg = "Title(표지)"
                                         
-                                    elif source_page == 0:
-                                        search_keywords = ["title", "Title", "TITLE"]
-                                        log_msg = "Title(표지)"
-
-                                    # [Logic] 표지보다 뒤쪽 페이지인 경우 -> 상대 번호 + "P" 검색
-                                    elif source_page > cover_page_num:
-                                        # 예: source_page(6) - cover(5) + 1 = 2 --> "2p"
-                                        story_seq = source_page - cover_page_num + 1
-                                        search_keywords = [f"{story_seq}p", f"{story_seq}P", f"Page {story_seq}", f"Page{story_seq}"]
-                                        log_msg = f"{story_seq}p"
-
-                                    # BGM 파일 찾기
-                                    if search_keywords:
-                                        page_bgm = find_bgm_file(search_keywords, BGM_DIR)
-
-                                if page_bgm and page_bgm.exists():
-                                    add_audio_to_video(
-                                        str(sub_clip_path), str(audio_path), str(final_clip_path),
-                                        bgm_path=str(page_bgm), bgm_volume=bgm_volume
-                                    )
-                                    st.caption(f"🎵 Scene {i+1} (PDF {source_page}p): [{log_msg}] → '{page_bgm.name}' 적용")
-                                else:
-                                    add_audio_to_video(
-                                        str(sub_clip_path), str(audio_path), str(final_clip_path)
-                                    )
+                                            elif source_page == 0:
+                                                search_keywords = ["title", "Title", "TITLE"]
+                                                log_msg = "Title(표지)"
+
+                                            # [Logic] 표지보다 뒤쪽 페이지인 경우 -> 상대 번호 + "P" 검색
+                                            elif source_page > cover_page_num:
+                                                # 예: source_page(6) - cover(5) + 1 = 2 --> "2p"
+                                                story_seq = source_page - cover_page_num + 1
+                                                search_keywords = [f"{story_seq}p", f"{story_seq}P", f"Page {story_seq}", f"Page{story_seq}"]
+                                                log_msg = f"{story_seq}p"
+
+                                            # BGM 파일 찾기
+                                            if search_keywords:
+                                                page_bgm = find_bgm_file(search_keywords, BGM_DIR)
+
+                                        has_bgm = bool(page_bgm and page_bgm.exists())
+                                        final_key = scene_key(
+                                            "preview_final", sub=sub_key, audio=Path(audio_path),
+                                            bgm=Path(page_bgm) if has_bgm else "",
+                                            bgm_volume=bgm_volume if has_bgm else 0.0,
+                                        )
+
+                                        def _build_final(out_path):
+                                            render_cache.materialize("preview_sub", sub_key, sub_clip_path, _build_sub)
+                                            with render_slot("cpu", "interactive", on_wait=_on_render_wait):
+                                                if has_bgm:
+                                                    return add_audio_to_video(
+                                                        str(sub_clip_path), str(audio_path), out_path,
+                                                        bgm_path=str(page_bgm), bgm_volume=bgm_volume
+                                                    )
+                                                return add_audio_to_video(str(sub_clip_path), str(audio_path), out_path)
+
+                                        _, hit = render_cache.materialize("preview_final", final_key, final_clip_path, _build_final)
+                                        cache_hits += hit
+                                        if has_bgm:
+                                            st.caption(f"🎵 Scene {i+1} (PDF {source_page}p): [{log_msg}] → '{page_bgm.name}' 적용")
                                 
-                                temp_clips.append(str(final_clip_path))
-                            else:
-                                temp_clips.append(str(sub_clip_path))
+                                        temp_clips.append(str(final_clip_path))
+                                    else:
+                                        _, hit = render_cache.materialize("preview_sub", sub_key, sub_clip_path, _build_sub)
+                                        cache_hits += hit
+                                        temp_clips.append(str(sub_clip_path))
 
-                            progress_bar.progress((i + 1) / len(matches))
+                                    preview_eta.unit_done(i, cached=bool(hit))
+                                    progress_bar.progress((i + 1) / len(matches), text=preview_eta.text("🎬 장면 렌더"))
                         
-                        # 병합
-                        status_text.write(" 전체 영상 병합 중...")
-                        final_preview_path = NEW_VER_DIR / "final_preview.mp4"
-                        concat_videos_with_audio(temp_clips, str(final_preview_path))
+                                # 병합
+                                status_text.write(" 전체 영상 병합 중...")
+                                final_preview_path = NEW_VER_DIR / "final_preview.mp4"
+                                with render_slot("cpu", "interactive", on_wait=_on_render_wait), profile_stage("Step 6.5 concat"):
+                                    concat_videos_with_audio(temp_clips, str(final_preview_path))
+                            except BaseException as e:
+                                if isinstance(e, Cancelled) or not isinstance(e, Exception):
+                                    shutil.rmtree(NEW_VER_DIR, ignore_errors=True)
+                                raise
 
                         # Manifest 저장
                         manifest = {
@@ -3676,16 +4044,23 @@ def run_text_analysis_mode(client, folder, txt_file):
                             "bgm_used": use_bgm,
                             "final_path": str(final_preview_path)
                         }
-                        with open(NEW_VER_DIR / "manifest.json", "w", encoding="utf-8") as f:
-                            json.dump(manifest, f, ensure_ascii=False, indent=4)
+                        get_catalog().write_manifest(
+                            "preview", PREVIEW_BASE_DIR, (cur_script_ver, cur_audio_ver, next_prev_ver),
+                            NEW_VER_DIR, manifest,
+                        )
                         
                         st.session_state.track_b_preview_video = str(final_preview_path)
                         st.session_state[f"loaded_prev_dir_{cur_mode}"] = str(NEW_VER_DIR)
 
                         status_text.empty()
                         st.success(" 프리뷰 생성 완료!")
+                        if cache_hits:
+                            st.caption(f"♻️ 변경 없는 {cache_hits}개 장면은 이전 렌더를 재사용했습니다.")
                       #  st.video(str(final_preview_path))
 
+                    except Cancelled:
+                        status_text.empty()
+                        st.warning("프리뷰 생성을 취소했습니다.")
                     except Exception as e:
                         st.error(f"오류 발생: {e}")
                         st.text(traceback.format_exc())
@@ -3702,7 +4077,7 @@ def run_text_analysis_mode(client, folder, txt_file):
                 ver_label = f"S{cur_script_ver}/A{cur_audio_ver}/P{next_prev_ver-1}"
             
             st.markdown(f"#### 📺 프리뷰 확인 ({ver_label})")
-            st.video(st.session_state.track_b_preview_video)
+            show_video(st.session_state.track_b_preview_video)
             st.info("👆 위 영상은 '이미지+TTS+자막' 확인용입니다. 실제 영상 생성은 아래 '영상 생성' 단계에서 진행하세요.")
 
         # =========================================================
@@ -3769,8 +4144,7 @@ def run_text_analysis_mode(client, folder, txt_file):
                 # 세션 로드 (경로가 바뀌었을 때만)
                 if st.session_state.get(f"loaded_vid_dir_{cur_mode}") != str(current_ver_dir):
                     try:
-                        with open(current_ver_dir / "manifest.json", "r", encoding="utf-8") as f:
-                            data = json.load(f)
+                        data = get_catalog().read_manifest("video", current_ver_dir)
                         
                         st.session_state.track_b_video_results = data.get("clips", [])
                         st.session_state.track_b_full_visual = data.get("full_visual_path", "")
@@ -3794,7 +4168,13 @@ def run_text_analysis_mode(client, folder, txt_file):
                 with col_d:
                     default_dur_input = st.number_input("기본 길이(초):", min_value=5, max_value=5, value=5)
 
-            # 2. 미리보기
+            # 2. 미리보기 — 실행 계획 (이어서 하기면 체크포인트의 완료 장면은 재사용으로 표시)
+            video_plan = plan_video_step(
+                st.session_state.track_b_matches, st.session_state.track_b_audio,
+                st.session_state.track_b_candidates, global_prompt, int(default_dur_input),
+                VIDEO_BASE_DIR / f"v{cur_script_ver}_{cur_audio_ver}_{next_video_ver}",
+            )
+            st.caption(f"🧭 {video_plan.summary_text()}")
             with st.expander(" 생성 대기열 확인", expanded=False):
                 matches = st.session_state.track_b_matches
                 audios = st.session_state.track_b_audio
@@ -3811,151 +4191,52 @@ def run_text_analysis_mode(client, folder, txt_file):
                         "Gen Len": f"{gen_seconds}s"
                     })
                 st.dataframe(preview_data)
+                st.dataframe(video_plan.rows(), hide_index=True, use_container_width=True)
+                for note in video_plan.notes:
+                    st.caption(note)
+
+            # 3. 실행 버튼 (렌더는 백그라운드 잡으로 실행, 진행 상황은 아래 패널이 폴링)
+            job_key = f"vid_job_{cur_mode}"
+            finished = poll_render_job(job_key)
+            if finished:
+                if finished["state"] == "done":
+                    data = get_catalog().read_manifest("video", finished["result"]["dir"])
+                    # 세션 갱신 (새 버전이 목록 맨 위에 오도록 선택 상태 초기화)
+                    st.session_state.track_b_video_results = data.get("clips", [])
+                    st.session_state.track_b_full_visual = data.get("full_visual_path", "")
+                    st.session_state[f"loaded_vid_dir_{cur_mode}"] = finished["result"]["dir"]
+                    st.session_state.pop(f"vid_sel_{cur_mode}", None)
+                    st.toast(f" 영상 생성 완료! ({finished.get('label', '')})")
+                    st.rerun()
+                elif finished["state"] == "cancelled":
+                    st.warning("⏹ 영상 생성을 취소했습니다. 완료된 장면은 다음 실행에서 이어서 사용합니다.")
+                else:
+                    st.error(f"작업 중 오류 발생: {finished.get('error')}")
 
-            # 3. 실행 버튼
-            has_results = len(st.session_state.track_b_video_results) > 0
             # 버튼 라벨에 버전 정보 표시
             btn_label = f" 영상 생성 (S{cur_script_ver}/A{cur_audio_ver} ➔ Video v{next_video_ver})"
-            
-            if st.button(btn_label, type="primary"):
-                # UID 생성
-                uid = uuid.uuid4().hex[:6]
-                
-                # [버전 관리] 폴더 구조 생성: v{S}_{A}_{V}
-                folder_name = f"v{cur_script_ver}_{cur_audio_ver}_{next_video_ver}"
-                
-                # BASE_OUT을 버전별 폴더로 설정
-                BASE_OUT = VIDEO_BASE_DIR / folder_name
-                
-                RAW_DIR = BASE_OUT / "raw"
-                TRIMMED_DIR = BASE_OUT / "trimmed"
-                # FULL_DIR, FULL_TTS_DIR 등은 이 폴더 구조에 맞게 통합
-                
-                BASE_OUT.mkdir(parents=True, exist_ok=True)
-                RAW_DIR.mkdir(parents=True, exist_ok=True)
-                TRIMMED_DIR.mkdir(parents=True, exist_ok=True)
-                
-                generated_data_list = []
-                progress_bar = st.progress(0)
-                status_text = st.empty()
-                total_scenes = len(matches)
+            # 이전 시도가 중간에 실패한 버전 폴더(manifest 없음)가 있으면 같은 폴더로 이어서 진행됨
+            if (VIDEO_BASE_DIR / f"v{cur_script_ver}_{cur_audio_ver}_{next_video_ver}" / CHECKPOINT_FILE).exists():
+                btn_label = f" 영상 생성 이어서 하기 (S{cur_script_ver}/A{cur_audio_ver} ➔ Video v{next_video_ver})"
+                st.caption("♻️ 이전 실행 기록이 있습니다. 완료된 장면과 이미 제출된 Runway 작업은 다시 만들지 않습니다.")
 
+            if st.button(btn_label, type="primary", disabled=bool(st.session_state.get(job_key))):
+                # [버전 관리] 폴더 구조: v{S}_{A}_{V} (raw/, trimmed/ 는 잡에서 생성)
+                folder_name = f"v{cur_script_ver}_{cur_audio_ver}_{next_video_ver}"
                 try:
-                    # =================================================
-                    # [Part A] 개별 영상 생성 및 트리밍
-                    # =================================================
-                    for i, match in enumerate(matches):
-                        pg = match['page']
-                        img_info = candidates_map.get(pg)
-                        if not img_info: continue
-                        img_path = str(img_info['img_path'])
-                        
-                        audio_dur = audios[i]['duration'] if i < len(audios) and audios[i] else None
-                        
-                        if audio_dur is None:
-                            runway_dur = default_dur_input; target_trim_dur = default_dur_input
-                        else:
-                            runway_dur = 5 if audio_dur <= 6.0 else 10
-                            target_trim_dur = audio_dur
-
-                        status_text.write(f" Scene {i+1}/{total_scenes}: Runway 생성({runway_dur}s) 및 자르기({target_trim_dur:.1f}s)...")
-
-                        # Runway 호출
-                        result_json = generate_video_from_image(img_path, global_prompt, runway_dur)
-                        video_url = extract_video_url(result_json)
-
-                        if not video_url:
-                            st.error(f"Scene {i+1} 생성 실패")
-                            continue
-
-                        # 저장 (RAW_DIR는 버전별 폴더)
-                        raw_filename = f"scene_{i+1:02d}_{uid}_raw.mp4"
-                        raw_path = RAW_DIR / raw_filename
-                        download_video(video_url, raw_path)
-
-                        # 트리밍 (TRIMMED_DIR는 버전별 폴더)
-                        final_filename = f"scene_{i+1:02d}_{uid}_trimmed.mp4"
-                        final_path = TRIMMED_DIR / final_filename
-
-                        # 3. 길이 조절
-                        final_filename = f"scene_{i+1:02d}_{uid}_trimmed.mp4"
-                        final_path = TRIMMED_DIR / final_filename
-
-                        # MoviePy로 로드
-                        clip = VideoFileClip(str(raw_path))
-                        
-                        if target_trim_dur <= runway_dur:
-                            # Case A: 영상이 오디오보다 김 (예: 영상 5초 > 오디오 1.6초)
-                            # -> 그냥 오디오 길이에 맞춰서 뒤를 잘라버림 (Trim)
-                            final_clip = clip.subclip(0, target_trim_dur)
-                            st.caption(f"✂️ Scene {i+1}: 자르기 (Trim) ({runway_dur}s → {target_trim_dur:.1f}s)")
-                        
-                        else:
-                            # Case B: 영상이 오디오보다 짧음 (예: 영상 5초 < 오디오 6.0초)
-                            # -> 영상을 오디오 길이만큼 느리게 늘림 (Stretch / Slow Motion)
-                            # vfx.speedx를 쓰면 final_duration에 맞춰 속도를 자동 조절해줍니다.
-                            final_clip = clip.fx(vfx.speedx, final_duration=target_trim_dur)
-                            st.caption(f"🐢 Scene {i+1}: 늘리기 (Slow) ({runway_dur}s → {target_trim_dur:.1f}s)")
-                        
-                        # 처리된 영상 저장
-                        final_clip.write_videofile(
-                            str(final_path), 
-                            fps=24, 
-                            codec="libx264", 
-                            audio=False, # 오디오 없는 상태로 저장
-                            logger=None  # 로그 숨김
-                        )
-                        clip.close()
-                        final_clip.close()
-                        
-                        generated_data_list.append({"raw": str(raw_path), "trimmed": str(final_path)})
-                        progress_bar.progress((i + 1) / total_scenes)
-
-                    st.session_state.track_b_video_results = generated_data_list
-
-
-                    # =================================================
-                    # [Part B] 전체 영상 병합 (Visual Only)
-                    # =================================================
-                    if generated_data_list:
-                        status_text.write("🔗 전체 영상(무음) 병합 중...")
-                        
-                        # Visual Only (무음 병합)
-                        clips_vis = [VideoFileClip(d['trimmed']) for d in generated_data_list]
-                        final_clip_vis = concatenate_videoclips(clips_vis, method="compose")
-                        
-                        # Full 파일도 버전 폴더 안에 저장
-                        full_vis_path = BASE_OUT / f"full_visual_{uid}.mp4"
-                        final_clip_vis.write_videofile(
-                            str(full_vis_path), fps=24, codec="libx264", audio=False, logger=None
-                        )
-                        full_str = str(full_vis_path)
-                        
-                        for c in clips_vis: c.close()
-
-                    # [저장] Manifest 파일 생성 (버전 관리 핵심)
-                    manifest = {
-                        "script_ver": cur_script_ver,
-                        "audio_ver": cur_audio_ver,
-                        "video_ver": next_video_ver,
-                        "created_at": str(datetime.now()),
+                    job_dir = submit_job("modeb_video", {
+                        "video_dir": str(VIDEO_BASE_DIR / folder_name),
+                        "versions": [cur_script_ver, cur_audio_ver, next_video_ver],
+                        "matches": matches,
+                        "audio_data": audios,
+                        "candidates": st.session_state.track_b_candidates,
                         "prompt": global_prompt,
-                        "full_visual_path": full_str,
-                        "clips": generated_data_list
-                    }
-                    with open(BASE_OUT / "manifest.json", "w", encoding="utf-8") as f:
-                        json.dump(manifest, f, ensure_ascii=False, indent=4)
-
-                    # 세션 갱신
-                    st.session_state.track_b_video_results = generated_data_list
-                    st.session_state.track_b_full_visual = full_str
-                    st.session_state[f"loaded_vid_dir_{cur_mode}"] = str(BASE_OUT)
-
-                    st.success(f" 영상 생성 완료! (버전: S{cur_script_ver}/A{cur_audio_ver}/V{next_video_ver})")
+                        "default_duration": int(default_dur_input),
+                    }, label=f"S{cur_script_ver}/A{cur_audio_ver}/V{next_video_ver}")
+                    st.session_state[job_key] = str(job_dir)
                     st.rerun()
-                    
                 except Exception as e:
-                    st.error(f"작업 중 오류 발생: {e}")
+                    st.error(f"작업 등록 실패: {e}")
 
             # 4. 결과 확인 및 개별 재생성
             if st.session_state.track_b_video_results:
@@ -3968,9 +4249,9 @@ def run_text_analysis_mode(client, folder, txt_file):
                     ver_info = selected_key if selected_key else (cur_script_ver, cur_audio_ver, next_video_ver - 1)
                     st.markdown(f"#### 전체 병합 영상 (S{ver_info[0]}/A{ver_info[1]}/V{ver_info[2]})")
                     
-                    st.video(st.session_state.track_b_full_visual)
-                    with open(st.session_state.track_b_full_visual, "rb") as f:
-                        st.download_button(" 무음 영상 다운로드", f, file_name="full_visual.mp4", mime="video/mp4")
+                    show_video(st.session_state.track_b_full_visual)
+                    download_link(" 무음 영상 다운로드", st.session_state.track_b_full_visual,
+                                  file_name="full_visual.mp4", mime="video/mp4")
 
                 # [하단] 개별 씬 확인 및 수정 (In-Place Regeneration)
                 with st.expander(" 개별 씬(Scene) 상세 확인 및 수정", expanded=True):
@@ -4029,6 +4310,8 @@ def run_text_analysis_mode(client, folder, txt_file):
                                             download_video(video_url, raw_p)
                                             
                                             # 4. 다시 트리밍
+                                            load_moviepy()
+                                            from moviepy.editor import VideoFileClip, concatenate_videoclips, vfx
                                             clip = VideoFileClip(str(raw_p))
                                             if target_trim_dur <= runway_dur:
                                                 final_clip = clip.subclip(0, target_trim_dur)
@@ -4057,14 +4340,13 @@ def run_text_analysis_mode(client, folder, txt_file):
                                             # 세션 및 Manifest 업데이트
                                             st.session_state.track_b_full_visual = str(full_vis_path)
                                             
-                                            # Manifest 파일 갱신 (Full Path가 바뀌었으므로)
-                                            manifest_path = current_loaded_dir / "manifest.json"
-                                            if manifest_path.exists():
-                                                with open(manifest_path, "r", encoding="utf-8") as f:
-                                                    m_data = json.load(f)
-                                                m_data['full_visual_path'] = str(full_vis_path)
-                                                with open(manifest_path, "w", encoding="utf-8") as f:
-                                                    json.dump(m_data, f, ensure_ascii=False, indent=4)
+                                            # Manifest 갱신 (Full Path가 바뀌었으므로)
+                                            try:
+                                                get_catalog().update_manifest(
+                                                    "video", current_loaded_dir, full_visual_path=str(full_vis_path),
+                                                )
+                                            except KeyError:
+                                                pass  # 카탈로그에 없는 폴더 (manifest 없이 만든 버전)
                                             
                                             st.success("재생성 및 병합 완료!")
                                             st.rerun()
@@ -4099,6 +4381,7 @@ def run_text_analysis_mode(client, folder, txt_file):
     # =========================================================
     # [Step 8] 최종 완성: 오디오 합성 및 자막 생성
     # =========================================================
+    trace_step("Step 8")
     if st.session_state.get("track_b_step", 0) >= 8:
         st.divider()
         st.subheader("✨ 최종 영상 완성")
@@ -4177,8 +4460,7 @@ def run_text_analysis_mode(client, folder, txt_file):
                 target_dir = path_map[selected_key]
                 if st.session_state.get(f"loaded_final_dir_{current_mode}") != str(target_dir):
                     try:
-                        with open(target_dir / "manifest.json", "r", encoding="utf-8") as f:
-                            data = json.load(f)
+                        data = get_catalog().read_manifest("final", target_dir)
                         st.session_state.track_b_final_movie = data.get("final_movie_path", "")
                         st.session_state[f"loaded_final_dir_{current_mode}"] = str(target_dir)
                     except Exception as e:
@@ -4194,15 +4476,7 @@ def run_text_analysis_mode(client, folder, txt_file):
             # BGM 경로 설정 (UI 없이 내부 계산만 - 옵션은 Step 6.5에서 설정)
             # =======================================
             story_dir_name = txt_file.stem
-            path_candidate_1 = Path("BGM") / story_dir_name
-            path_candidate_2 = Path("BGM") / get_bgm_folder_name(story_dir_name)
-
-            if path_candidate_1.exists() and path_candidate_1.is_dir():
-                BGM_DIR = path_candidate_1
-            elif path_candidate_2.exists() and path_candidate_2.is_dir():
-                BGM_DIR = path_candidate_2
-            else:
-                BGM_DIR = path_candidate_1
+            BGM_DIR = resolve_bgm_dir(story_dir_name)
 
             # Step 6.5에서 설정한 값 사용
             use_bgm = st.session_state.get("bgm_use_shared", False)
@@ -4210,9 +4484,7 @@ def run_text_analysis_mode(client, folder, txt_file):
             subtitle_mode_final = st.session_state.get("subtitle_mode_shared", "🏳️ 기본 (흰색 통일)")
 
             # 폴더가 실제로 없으면 BGM 강제 비활성화
-            if use_bgm and not (BGM_DIR.exists() and any(
-                f.suffix.lower() in ['.wav', '.mp3', '.m4a'] for f in BGM_DIR.iterdir()
-            )):
+            if use_bgm and not bgm_dir_has_audio(BGM_DIR):
                 use_bgm = False
 
             st.caption(
@@ -4223,230 +4495,65 @@ def run_text_analysis_mode(client, folder, txt_file):
 
             st.markdown("---")
 
-            # 2. 실행 버튼 (버전 정보 포함)
-            btn_label = f" 최종 영상 생성 (S{cur_s}/A{cur_a}/V{cur_v} ➔ Final v{next_final_ver})"
-            
-            if st.button(btn_label, type="primary"):
-                if "proc_uid" not in st.session_state:
-                    st.session_state.proc_uid = uuid.uuid4().hex[:8]
-                uid = st.session_state.proc_uid
-                
-                # ---------------------------------------------------------
-                # [핵심] 버전별 폴더 생성 및 경로 지정
-                # ---------------------------------------------------------
-                folder_name = f"v{cur_s}_{cur_a}_{cur_v}_{next_final_ver}"
-                NEW_VER_DIR = FINAL_BASE_DIR / folder_name
-                
-                # 내부 구조: clips(자막합성본), final(최종본)
-                SUB_DIR = NEW_VER_DIR / "clips"
-                
-                NEW_VER_DIR.mkdir(parents=True, exist_ok=True)
-                SUB_DIR.mkdir(parents=True, exist_ok=True)
-                
-                progress_bar = st.progress(0)
-                status_text = st.empty()
-                
-                final_clips_paths = []
-                total_cnt = len(video_results)
-
-                # [중요] 표지 페이지 번호 가져오기 (Step 6 저장값)
-                if 'cover_page_num' in st.session_state:
-                    cover_page_num = st.session_state['cover_page_num']
-                elif candidates:
-                    cover_page_num = candidates[0]['page_num']
+            # 2. 실행 버튼 (버전 정보 포함) — 합성은 백그라운드 잡으로 실행
+            job_key = f"final_job_{current_mode}"
+            finished = poll_render_job(job_key)
+            if finished:
+                if finished["state"] == "done":
+                    st.session_state.track_b_final_movie = finished["result"]["final_movie_path"]
+                    st.session_state[f"loaded_final_dir_{current_mode}"] = finished["result"]["dir"]
+                    st.session_state.pop(f"final_sel_{current_mode}", None)
+                    st.toast(f" 최종 영상 완성! ({finished.get('label', '')})")
+                    st.rerun()
+                elif finished["state"] == "cancelled":
+                    st.warning("⏹ 최종 영상 합성을 취소했습니다.")
                 else:
-                    cover_page_num = 1
-
-                speaker_color_map = {}
-                if "컬러링" in subtitle_mode_final:
-                    speaker_color_map = generate_dynamic_color_map(scripts)
-                try:
-                    for i, vid_data in enumerate(video_results):
-                        # A. 데이터 준비
-                        video_path = vid_data.get("trimmed")
-                        if not video_path or not os.path.exists(video_path):
-                            st.error(f"Scene {i+1} 영상 파일이 없습니다.")
-                            continue
-
-                        # 오디오 경로
-                        audio_path = audios[i].get("path") if i < len(audios) else None
-                        
-                        
-                        # 기본 대사 (Step 3 결과)
-                        script_item = scripts[i] if i < len(scripts) else {}
-                        original_text = script_item.get("text", "")      # 대사(Quote)
-                        source_page = script_item.get("source_page", 0)  # 페이지 번호
-                        current_speaker = str(script_item.get("speaker", "narrator")).strip()
-                        
-                        # ★ 색상 결정 로직
-                        if "컬러링" in subtitle_mode_final:
-                            text_color = speaker_color_map.get(current_speaker, "white")
-                        else:
-                            text_color = "white"
-                        
-                        subtitle_text_to_burn = original_text
-                        
-                        # -----------------------------------------------------------
-                        # [핵심 로직 변경] 자막 텍스트 결정 (Context 매칭)
-                        # -----------------------------------------------------------
-                        subtitle_text_to_burn = original_text # 기본값: 원래 대사 그대로 사용
-                        
-                        """ # 모드가 'Conversation'이고, 매칭할 1.5 데이터가 있다면 실행
-                        if current_mode == "Conversation" and dialogue_map:
-                            found_context = None
-                            
-                            # dialogue_map에서 Quote와 Page가 일치하는 Context 찾기
-                            for d_item in dialogue_map:
-                                # 대사가 정확히 일치하거나 포함되어 있고, 페이지도 같다면 매칭
-                                # (strip()으로 공백 제거 후 비교)
-                                if (d_item.get("quote", "").strip() == original_text.strip()) and \
-                                   (d_item.get("page_num") == source_page):
-                                    found_context = d_item.get("context")
-                                    break
-                            
-                            if found_context:
-                                # 매칭 성공 시: 자막을 Context(상황 설명)로 교체
-                                # 예: 대사는 "안돼!"지만 자막은 "(놀부가 밥주걱을 휘두르며)" 로 나옴
-                                subtitle_text_to_burn = f"{found_context}" 
-                                # 원한다면 화자 이름도 같이 넣을 수 있음: f"{script_item.get('speaker')}: {found_context}"
-                            else:
-                                # 매칭 실패 시: 그냥 대사 출력 (혹은 "상황 설명 없음" 등)
-                                pass  """
-                                
-                        # -----------------------------------------------------------
+                    st.error(f"작업 중 오류 발생: {finished.get('error')}")
 
-                        # 출력 파일명 정의
-                        output_clip_path = SUB_DIR / f"scene_{i+1:02d}_{uid}_complete.mp4"
-                        
-                        # 1. 자막 입히기                        
-                        temp_sub_path = str(output_clip_path).replace(".mp4", "_temp_sub.mp4")
-
-                        status_text.write(f" Scene {i+1}/{total_cnt}: 자막 & 오디오 합성 중...")
-
-                        add_subtitle_to_video(
-                            video_path,           # 1. 입력 영상
-                            subtitle_text_to_burn,# 2. 결정된 자막 텍스트 (Context 혹은 대사)
-                            temp_sub_path,        # 3. 출력 경로
-                            scene_index=i,
-                            font_color=text_color 
-                        )
-
-                        # 2. 오디오 입히기 (BGM 포함) - [Step 6.5 로직 적용]
-                        audio_ok = False
-
-                        # 자막 영상 생성 확인
-                        if not os.path.exists(temp_sub_path):
-                            st.warning(f"⚠️ Scene {i+1}: 자막 영상 생성 실패 (temp_sub 없음)")
-                        elif audio_path and os.path.exists(audio_path):
-                            page_bgm = None
-
-                            # BGM 검색 로직
-                            if use_bgm:
-                                search_keywords = []
-                                log_msg = ""
-
-                                # Case 1: 표지 (Title)
-                                if source_page == 0 or source_page == cover_page_num:
-                                    search_keywords = ["title", "Title", "TITLE"]
-                                    log_msg = "Title"
-
-                                # Case 2: 본문 (nP)
-                                elif source_page > cover_page_num:
-                                    story_seq = source_page - cover_page_num + 1
-                                    search_keywords = [f"{story_seq}p", f"{story_seq}P", f"Page {story_seq}", f"Page{story_seq}"]
-                                    log_msg = f"{story_seq}p"
-
-                                if search_keywords:
-                                    page_bgm = find_bgm_file(search_keywords, BGM_DIR)
-
-                            # BGM이 있으면 TTS+BGM 시도
-                            if page_bgm and page_bgm.exists():
-                                audio_ok = add_audio_to_video(
-                                    temp_sub_path,
-                                    str(audio_path),
-                                    str(output_clip_path),
-                                    bgm_path=str(page_bgm),
-                                    bgm_volume=bgm_volume
-                                )
-                                if audio_ok is True:
-                                    st.caption(f"🎵 Scene {i+1}: BGM '{page_bgm.name}' ({log_msg}) 적용")
-
-                            # BGM이 없거나 BGM+TTS 실패 → TTS만 적용
-                            if audio_ok is not True:
-                                audio_ok = add_audio_to_video(
-                                    temp_sub_path,
-                                    str(audio_path),
-                                    str(output_clip_path)
-                                )
-                                if audio_ok is True:
-                                    if use_bgm:
-                                        st.caption(f"Scene {i+1}: BGM 없음, TTS만 적용 (Source: {source_page}p)")
-                                else:
-                                    st.warning(f"⚠️ Scene {i+1}: TTS 합성 실패 - {audio_ok}")
-                        else:
-                            st.caption(f"Scene {i+1}: TTS 파일 없음 (audio_path={audio_path})")
-
-                        # 오디오 합성 실패 시 → 자막만 입힌 영상 사용
-                        if not audio_ok:
-                            if os.path.exists(temp_sub_path):
-                                shutil.copy2(temp_sub_path, str(output_clip_path))
-
-                        # 임시 파일 정리
-                        if os.path.exists(temp_sub_path) and temp_sub_path != str(output_clip_path):
-                            os.remove(temp_sub_path)
+            btn_label = f" 최종 영상 생성 (S{cur_s}/A{cur_a}/V{cur_v} ➔ Final v{next_final_ver})"
 
-                        # 클립 파일 추가
-                        if os.path.exists(str(output_clip_path)) and os.path.getsize(str(output_clip_path)) > 0:
-                            final_clips_paths.append(str(output_clip_path))
-                        else:
-                            st.warning(f"⚠️ Scene {i+1} 클립 생성 실패 - 건너뜁니다.")
-                        progress_bar.progress((i + 1) / total_cnt)
-
-                    # 3. 전체 이어붙이기
-                    if final_clips_paths:
-                        status_text.write(" 최종 합체 중...")
-                        # 최종 파일도 NEW_VER_DIR 안에 저장
-                        final_movie_path = NEW_VER_DIR / f"final_movie_{uid}.mp4"
-
-                        concat_result = concat_videos_with_audio(final_clips_paths, str(final_movie_path))
-
-                        if concat_result is True and os.path.exists(str(final_movie_path)):
-                            # [Manifest] 저장
-                            manifest = {
-                                "version_info": {"s": cur_s, "a": cur_a, "v": cur_v, "f": next_final_ver},
-                                "created_at": str(datetime.now()),
-                                "bgm_used": use_bgm,
-                                "bgm_volume": bgm_volume,
-                                "final_movie_path": str(final_movie_path),
-                                "clips": final_clips_paths
-                            }
-                            with open(NEW_VER_DIR / "manifest.json", "w", encoding="utf-8") as f:
-                                json.dump(manifest, f, ensure_ascii=False, indent=4)
+            # [중요] 표지 페이지 번호 가져오기 (Step 6 저장값)
+            if 'cover_page_num' in st.session_state:
+                cover_page_num = st.session_state['cover_page_num']
+            elif candidates:
+                cover_page_num = candidates[0]['page_num']
+            else:
+                cover_page_num = 1
 
-                            # 세션 갱신
-                            st.session_state.track_b_final_movie = str(final_movie_path)
-                            st.session_state[f"loaded_final_dir_{current_mode}"] = str(NEW_VER_DIR)
-
-                            st.success(f" 최종 영상 완성! (Ver. {next_final_ver})")
-                            status_text.empty()
-
-                            # 즉시 영상 표시 (버튼 블록 내에서)
-                            st.video(str(final_movie_path))
-                            with open(str(final_movie_path), "rb") as dl_f:
-                                st.download_button(
-                                    label="💾 최종 영상 다운로드 (.mp4)",
-                                    data=dl_f,
-                                    file_name=f"{txt_file.stem}_final_v{next_final_ver}.mp4",
-                                    mime="video/mp4",
-                                    key="step8_immediate_download"
-                                )
-                        else:
-                            error_detail = concat_result if isinstance(concat_result, str) else "알 수 없는 오류"
-                            st.error(f"최종 영상 합치기에 실패했습니다: {error_detail}")
-                            status_text.empty()
+            # 실행 계획 미리 보기 — render_cache에 있는 장면은 재사용으로 표시
+            final_plan = plan_final_step(
+                video_results, audios, scripts, subtitle_mode_final, use_bgm, bgm_volume, BGM_DIR,
+                cover_page_num, _session_root / story_dir_name / "render_cache",
+            )
+            st.caption(f"🧭 {final_plan.summary_text()}")
+            with st.expander("실행 계획 보기", expanded=False):
+                st.dataframe(final_plan.rows(), hide_index=True, use_container_width=True)
+                for note in final_plan.notes:
+                    st.caption(note)
+
+            if st.button(btn_label, type="primary", disabled=bool(st.session_state.get(job_key))):
+                # [핵심] 버전별 폴더: v{S}_{A}_{V}_{F} (clips/ 는 잡에서 생성)
+                folder_name = f"v{cur_s}_{cur_a}_{cur_v}_{next_final_ver}"
 
+                try:
+                    job_dir = submit_job("modeb_final", {
+                        "final_dir": str(FINAL_BASE_DIR / folder_name),
+                        "versions": [cur_s, cur_a, cur_v, next_final_ver],
+                        "video_results": video_results,
+                        "audio_data": audios,
+                        "scripts": scripts,
+                        "subtitle_mode": subtitle_mode_final,
+                        "use_bgm": use_bgm,
+                        "bgm_volume": bgm_volume,
+                        "bgm_dir": str(BGM_DIR),
+                        "cover_page_num": cover_page_num,
+                        # 버전이 달라도 입력이 같은 장면은 캐시에서 하드링크로 재사용
+                        "cache_root": str(_session_root / story_dir_name / "render_cache"),
+                    }, label=f"S{cur_s}/A{cur_a}/V{cur_v}/F{next_final_ver}")
+                    st.session_state[job_key] = str(job_dir)
+                    st.rerun()
                 except Exception as e:
-                    st.error(f"작업 중 오류 발생: {e}")
+                    st.error(f"작업 등록 실패: {e}")
 
             # 3. 결과 확인 및 다운로드
             if st.session_state.get("track_b_final_movie") and os.path.exists(st.session_state.track_b_final_movie):
@@ -4463,18 +4570,17 @@ def run_text_analysis_mode(client, folder, txt_file):
                 st.session_state.current_final_ver = next_final_ver
 
                 final_path = st.session_state.track_b_final_movie
-                st.video(final_path)
+                show_video(final_path)
                 
                 col_d1, col_d2 = st.columns(2)
                 with col_d1:
-                    with open(final_path, "rb") as f:
-                        st.download_button(
-                            label="💾 최종 영상 다운로드 (.mp4)",
-                            data=f,
-                            file_name=f"{txt_file.stem}_final_v{ver_display}.mp4",
-                            mime="video/mp4",
-                            type="primary"
-                        )
+                    download_link(
+                        "💾 최종 영상 다운로드 (.mp4)",
+                        final_path,
+                        file_name=f"{txt_file.stem}_final_v{ver_display}.mp4",
+                        mime="video/mp4",
+                        type="primary",
+                    )
                 with col_d2:
                     if st.button("🔄 처음부터 다시 만들기 (새로고침)"):
                         st.session_state.clear()
@@ -0,0 +1,206 @@
+# -*- coding: utf-8 -*-
+"""
+협조적 작업 취소 (TTS 일괄 생성 · Runway 생성 · 장면 렌더 공통).
+
+- CancelToken 하나를 use_token()/cancel_scope()로 걸어 두면 그 블록과, 거기서 띄운 파이프라인 워커
+  스레드(contextvars 복사)가 같은 토큰을 본다
+- 작업 코드는 check_cancelled()/sleep()으로 단계 사이에서 멈추고, 기다리는 쪽(Runway 폴링,
+  렌더 슬롯 대기)은 토큰 이벤트로 바로 깨어난다
+- 토큰에 등록된 ffmpeg 프로세스는 취소 즉시 terminate → kill, on_cancel 콜백(예: Runway 작업 삭제)도 즉시 실행
+  → 버튼을 누르고 1초 안에 CPU 슬롯과 API 동시 실행 몫이 풀림
+- 백그라운드 잡은 잡 폴더의 cancel 파일로 다른 프로세스에서 취소 요청 (watch_cancel_file)
+
+사용:
+    with cancel_scope() as token:     # 블록이 예외/리런으로 빠져나가면 자동 취소
+        ScenePipeline([...]).run(scenes)
+"""
+import contextvars
+import subprocess
+import threading
+import time
+import weakref
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Callable, Optional
+
+KILL_GRACE_SEC = 0.5  # terminate 후 kill까지 기다리는 시간
+
+
+class Cancelled(Exception):
+    """취소된 토큰 아래에서 작업을 계속하려 할 때."""
+
+
+def _terminate(proc) -> None:
+    if proc.poll() is not None:
+        return
+    try:
+        proc.terminate()
+    except OSError:
+        pass
+
+
+def _kill_if_alive(proc) -> None:
+    try:
+        proc.wait(timeout=KILL_GRACE_SEC)
+    except subprocess.TimeoutExpired:
+        try:
+            proc.kill()
+        except OSError:
+            pass
+
+
+class CancelToken:
+    """한 작업 단위의 취소 상태. cancel()은 어느 스레드에서 불러도 되고 여러 번 불러도 한 번만 동작."""
+
+    def __init__(self):
+        self._event = threading.Event()
+        self._lock = threading.Lock()
+        self._callbacks = {}
+        self._next_id = 0
+        self._procs = weakref.WeakSet()
+        self.reason = ""
+
+    @property
+    def cancelled(self) -> bool:
+        return self._event.is_set()
+
+    def cancel(self, reason: str = "사용자 취소") -> None:
+        with self._lock:
+            if self._event.is_set():
+                return
+            self.reason = reason
+            self._event.set()
+            callbacks = list(self._callbacks.values())
+            self._callbacks.clear()
+            procs = [p for p in self._procs if p.poll() is None]
+        for p in procs:
+            _terminate(p)
+        for fn in callbacks:
+            try:
+                fn()
+            except Exception as e:
+                print(f"[cancel] 정리 콜백 실패: {e}")
+        for p in procs:
+            _kill_if_alive(p)
+
+    def raise_if_cancelled(self) -> None:
+        if self._event.is_set():
+            raise Cancelled(self.reason or "취소됨")
+
+    def wait(self, timeout: Optional[float] = None) -> bool:
+        """최대 timeout초 대기. 그 사이 취소되면 True."""
+        return self._event.wait(timeout)
+
+    def on_cancel(self, fn: Callable[[], None]) -> Callable[[], None]:
+        """취소 시 한 번 실행할 정리 함수 등록 (이미 취소됐으면 바로 실행). 등록 해제 함수를 반환."""
+        with self._lock:
+            if not self._event.is_set():
+                cb_id = self._next_id
+                self._next_id += 1
+                self._callbacks[cb_id] = fn
+                return lambda: self._callbacks.pop(cb_id, None)
+        fn()
+        return lambda: None
+
+    def track_process(self, proc) -> None:
+        """취소 시 같이 종료할 자식 프로세스 (ffmpeg 등)."""
+        with self._lock:
+            if not self._event.is_set():
+                self._procs.add(proc)
+                return
+        _terminate(proc)
+
+
+_CURRENT: contextvars.ContextVar = contextvars.ContextVar("cancel_token", default=None)
+
+
+def current_token() -> Optional[CancelToken]:
+    return _CURRENT.get()
+
+
+@contextmanager
+def use_token(token: CancelToken):
+    """블록 안(및 여기서 띄운 파이프라인 스레드)의 현재 토큰 지정."""
+    reset = _CURRENT.set(token)
+    try:
+        yield token
+    finally:
+        _CURRENT.reset(reset)
+
+
+@contextmanager
+def cancel_scope(token: Optional[CancelToken] = None):
+    """
+    토큰을 걸고 블록 실행. 블록이 예외로 끝나면 (Streamlit 리런/중지, Ctrl+C 포함) 토큰을 취소해서
+    아직 도는 워커 스레드·ffmpeg·Runway 작업을 정리한다.
+    """
+    token = token or CancelToken()
+    with use_token(token):
+        try:
+            yield token
+        except BaseException:
+            token.cancel("작업 중단")
+            raise
+
+
+def check_cancelled() -> None:
+    """현재 토큰이 취소됐으면 Cancelled. 토큰이 없으면 아무것도 안 함."""
+    token = _CURRENT.get()
+    if token is not None:
+        token.raise_if_cancelled()
+
+
+def is_cancelled() -> bool:
+    token = _CURRENT.get()
+    return token is not None and token.cancelled
+
+
+def sleep(seconds: float) -> None:
+    """취소되면 바로 깨어나는 time.sleep (깨어난 뒤 Cancelled)."""
+    token = _CURRENT.get()
+    if token is None:
+        time.sleep(seconds)
+        return
+    token.wait(seconds)
+    token.raise_if_cancelled()
+
+
+def discard_partial(*paths) -> None:
+    """취소로 중간에 끊긴 출력 파일 삭제."""
+    for p in paths:
+        if not p:
+            continue
+        try:
+            Path(p).unlink(missing_ok=True)
+        except OSError:
+            pass
+
+
+@contextmanager
+def partial_output(*paths):
+    """블록이 취소로 끝나면 (Cancelled 또는 토큰 취소 후의 예외) 쓰다 만 출력 파일을 지움."""
+    try:
+        yield
+    except BaseException:
+        if is_cancelled():
+            discard_partial(*paths)
+        raise
+
+
+def watch_cancel_file(path, token: CancelToken, interval: float = 0.2) -> threading.Event:
+    """
+    path 파일이 생기면 token 취소 (다른 프로세스 → 잡 프로세스 취소 요청용).
+    반환된 Event를 set하면 감시 종료.
+    """
+    path = Path(path)
+    stop = threading.Event()
+
+    def _watch():
+        while not stop.wait(interval):
+            if path.exists():
+                token.cancel("사용자 취소")
+                return
+
+    threading.Thread(target=_watch, name="cancel-watch", daemon=True).start()
+    return stop
+
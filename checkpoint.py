@@ -0,0 +1,106 @@
+# -*- coding: utf-8 -*-
+"""
+장면 단위 체크포인트 (Step 7 / Mode A step 3 재개용).
+장면마다 단계가 끝날 때 결과(Runway task id, raw 경로, 트림 경로 등)를 JSON에 바로 기록해 두고,
+재시도나 세션이 죽은 뒤 다시 실행하면 각 장면의 마지막 완료 단계부터 이어서 진행한다.
+이미 제출된 Runway 작업은 다시 제출하지 않고 task id로 결과를 다시 조회 → 크레딧 중복 차감 방지.
+
+레코드는 입력(key: 이미지·프롬프트·길이 등)이 같을 때만 재사용된다. 입력이 바뀐 장면은 처음부터.
+Step 7은 버전 폴더의 checkpoint.json, Mode A step 3는 mode_a_checkpoint_path() (사용자·책·삽화 기준,
+세션 밖 MODE_A_CHECKPOINT_DIR — 기본 outputs/checkpoints/modeA).
+"""
+import hashlib
+import json
+import os
+import threading
+from pathlib import Path
+from typing import Iterable, Optional
+
+CHECKPOINT_FILE = "checkpoint.json"
+# Mode A step 3 체크포인트는 버전 폴더 없이 MODE_A_CHECKPOINT_DIR에 바로 놓임
+MODE_A_CHECKPOINT_GLOB = "step3_checkpoint_*.json"
+CHECKPOINT_GLOBS = (CHECKPOINT_FILE, MODE_A_CHECKPOINT_GLOB)
+# 세션 폴더는 새로고침/재시작마다 새로 생기므로 Mode A 체크포인트는 세션 밖 공용 폴더에 둠
+MODE_A_CHECKPOINT_DIR = Path(os.getenv("MODE_A_CHECKPOINT_DIR", "outputs/checkpoints/modeA"))
+
+
+def mode_a_checkpoint_path(user_name: str, book: str, pages: Iterable[str]) -> Path:
+    """사용자·책·선택한 삽화(순서 포함)가 같으면 세션이 바뀌어도 같은 체크포인트 파일."""
+    ident = json.dumps([user_name or "", book or "", list(pages)], ensure_ascii=False)
+    digest = hashlib.sha256(ident.encode("utf-8")).hexdigest()[:16]
+    return MODE_A_CHECKPOINT_DIR / f"step3_checkpoint_{digest}.json"
+
+
+class SceneCheckpoint:
+    """{"scenes": {"<index>": {"key": {...}, <필드>: <값>, ...}}} 형태로 저장."""
+
+    def __init__(self, path):
+        self.path = Path(path)
+        self._lock = threading.Lock()
+        self._data = {"scenes": {}}
+        if self.path.exists():
+            try:
+                with open(self.path, "r", encoding="utf-8") as f:
+                    self._data = json.load(f)
+            except (OSError, json.JSONDecodeError) as e:
+                print(f"[checkpoint] 읽기 실패, 새로 시작: {e}")
+
+    def _flush(self) -> None:
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = self.path.with_suffix(".tmp")
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(self._data, f, ensure_ascii=False, indent=2, default=str)
+        os.replace(tmp, self.path)
+
+    def resume(self, index: int, key: dict) -> dict:
+        """
+        장면 index의 기록 중 재사용 가능한 것만 반환.
+        key가 저장된 것과 다르면 기록을 비우고 빈 dict. 경로 필드는 파일이 실제로 있을 때만 포함.
+        """
+        key = json.loads(json.dumps(key, default=str))
+        with self._lock:
+            rec = self._data["scenes"].get(str(index))
+            if not rec or rec.get("key") != key:
+                self._data["scenes"][str(index)] = {"key": key}
+                self._flush()
+                return {}
+            return self._usable(rec)
+
+    def peek(self, index: int, key: dict) -> dict:
+        """resume과 같지만 기록을 바꾸지 않음 (실행 계획 미리 보기용)."""
+        key = json.loads(json.dumps(key, default=str))
+        with self._lock:
+            rec = self._data["scenes"].get(str(index))
+            if not rec or rec.get("key") != key:
+                return {}
+            return self._usable(rec)
+
+    @staticmethod
+    def _usable(rec: dict) -> dict:
+        out = {}
+        for field, value in rec.items():
+            if field == "key":
+                continue
+            if field.endswith("_path") and not (value and os.path.exists(value)):
+                continue
+            out[field] = value
+        return out
+
+    def record(self, index: int, **fields) -> None:
+        """단계 완료 즉시 호출. 다른 스테이지 스레드와 동시에 불려도 안전."""
+        with self._lock:
+            rec = self._data["scenes"].setdefault(str(index), {})
+            rec.update({k: (str(v) if isinstance(v, Path) else v) for k, v in fields.items()})
+            self._flush()
+
+    def forget(self, index: int, *fields) -> None:
+        """재사용하면 안 되는 기록 삭제 (예: 만료된 Runway 결과 URL)."""
+        with self._lock:
+            rec = self._data["scenes"].get(str(index), {})
+            for field in fields:
+                rec.pop(field, None)
+            self._flush()
+
+    def get(self, index: int, field: str) -> Optional[object]:
+        with self._lock:
+            return self._data["scenes"].get(str(index), {}).get(field)
@@ -0,0 +1,274 @@
+# -*- coding: utf-8 -*-
+"""
+TTS 음성 길이 예측기.
+세션 로그(tts_duration_sample 이벤트)와 Mode B TTS manifest에 남은
+(텍스트 길이, 문장부호, 보이스, 엔진, 속도) → 실제 길이 기록을 모아
+보이스·엔진별 읽기 속도를 보정한다. 합성 전에 길이를 예측할 수 있으므로
+Runway 길이(5초/10초)를 TTS 완료 전에 정할 수 있고,
+tts_core.calculate_speed_for_duration도 이 예측으로 보이스별 speed를 고른다.
+"""
+import json
+import math
+import re
+from collections import defaultdict
+from pathlib import Path
+from typing import Dict, List, NamedTuple, Optional, Tuple
+
+from event_history import DerivedCache, EventHistory
+from session_logger import SESSIONS_ROOT, log_event
+
+# 한국어 TTS 읽기 속도 사전값 (글자/초, speed=0 기준)
+PRIOR_CHARS_PER_SEC = 4.5
+# 문장부호 1개당 쉬는 시간 사전값 (초)
+PRIOR_PAUSE_PER_PUNCT = 0.25
+# 샘플이 부족할 때 사용할 상대 오차 (±25%)
+PRIOR_REL_SIGMA = 0.25
+# 그룹별 회귀를 믿기 위한 최소 샘플 수
+MIN_SAMPLES = 8
+# 예측 구간 z값 (양측 90%)
+Z_90 = 1.645
+# 실측 길이 이벤트 (event_history가 백그라운드에서 모아 옴)
+SAMPLE_EVENT = "tts_duration_sample"
+
+_PUNCT_RE = re.compile(r"[.,!?…~·;:。、！？]")
+
+
+class DurationEstimate(NamedTuple):
+    """예측 길이(초)와 90% 구간. source는 어떤 그룹 모델을 썼는지 표시."""
+    seconds: float
+    low: float
+    high: float
+    samples: int
+    source: str
+
+
+def text_features(text: str) -> Tuple[int, int]:
+    """(공백 제외 글자 수, 문장부호 수)."""
+    if not text:
+        return 0, 0
+    chars = len(re.sub(r"\s+", "", text))
+    punct = len(_PUNCT_RE.findall(text))
+    return chars, punct
+
+
+def speed_factor(engine: str, speed: float) -> float:
+    """speed 값(-5~5)이 길이에 주는 배율. 엔진별 실제 변환식을 따른다.
+
+    - gpt: tts_module._generate_with_gpt와 동일하게 1.0 - speed*0.1 배속 (0.5~2.0)
+    - gemini: speed를 API에 넘기지 않으므로 영향 없음
+    - clova/edge: 양수=느리게, 음수=빠르게 (한 단계 약 10%)
+    """
+    engine = (engine or "clova").lower()
+    speed = float(speed or 0)
+    if "gemini" in engine:
+        return 1.0
+    rate = max(0.5, min(2.0, 1.0 - speed * 0.1))
+    return 1.0 / rate
+
+
+def normalize_voice(voice: Optional[str]) -> str:
+    """'char_01 (흥부) young_male' 같은 Mode B 화자 문자열에서 보이스 타입만 추출."""
+    if not voice:
+        return "narrator"
+    parts = str(voice).split()
+    return parts[-1].strip("(),") if parts else "narrator"
+
+
+# =========================================================
+# 샘플 수집
+# =========================================================
+def log_duration_sample(text: str, voice: str, engine: str, speed: float, duration: float) -> None:
+    """실측 길이를 세션 이벤트로 남긴다. 다음 학습 때 harvest_samples가 읽어감."""
+    if not text or not duration or duration <= 0:
+        return
+    chars, punct = text_features(text)
+    log_event(SAMPLE_EVENT, {
+        "chars": chars,
+        "punct": punct,
+        "voice": normalize_voice(voice),
+        "engine": engine or "clova",
+        "speed": speed or 0,
+        "duration": round(float(duration), 3),
+    })
+
+
+def _samples_from_manifest(path: Path) -> List[dict]:
+    """Mode B Step 4의 tts/<mode>/v*/manifest.json에서 샘플 추출."""
+    try:
+        with open(path, encoding="utf-8") as f:
+            m = json.load(f)
+    except (OSError, json.JSONDecodeError):
+        return []
+    engine = m.get("engine", "clova")
+    speed = m.get("speed", 0)
+    out = []
+    for item in m.get("audio_data") or []:
+        dur = item.get("duration")
+        text = item.get("text") or ""
+        if not dur or not text:
+            continue
+        chars, punct = text_features(text)
+        out.append({
+            "chars": chars, "punct": punct,
+            "voice": normalize_voice(item.get("speaker")),
+            "engine": engine, "speed": speed, "duration": dur,
+        })
+    return out
+
+
+def _collect_samples(hist: EventHistory) -> List[dict]:
+    """공용 수집기(event_history)의 tts_duration_sample + 이벤트 샘플이 없는 세션의 manifest."""
+    by_session: Dict[str, List[dict]] = defaultdict(list)
+    for sid, e in hist.events(SAMPLE_EVENT):
+        d = e.get("data") or {}
+        if d.get("duration"):
+            by_session[sid].append(d)
+    samples = [d for rows in by_session.values() for d in rows]
+    if hist.root.exists():
+        for sdir in hist.root.iterdir():
+            # Step 4가 이미 이벤트로 기록했으면 manifest와 중복됨
+            if not sdir.is_dir() or sdir.name in by_session:
+                continue
+            for manifest in sdir.glob("*/tts/*/v*/manifest.json"):
+                samples.extend(_samples_from_manifest(manifest))
+    return samples
+
+
+def harvest_samples(root: Path = SESSIONS_ROOT) -> List[dict]:
+    """세션 폴더 전체에서 길이 샘플 수집 (CLI·테스트용 — 앱은 get_model)."""
+    hist = EventHistory(root)
+    hist.refresh()
+    return _collect_samples(hist)
+
+
+# =========================================================
+# 모델
+# =========================================================
+class _GroupFit(NamedTuple):
+    coef: Tuple[float, float, float]   # (초/글자, 초/문장부호, 절편)
+    sigma: float                      # 잔차 표준편차 (speed=0 기준 초)
+    n: int
+
+
+def _fit(rows: List[dict]) -> Optional[_GroupFit]:
+    if len(rows) < MIN_SAMPLES:
+        return None
+    import numpy as np  # 처음 적합할 때만 (앱 시작 시간)
+    x = np.array([[r["chars"], r["punct"], 1.0] for r in rows], dtype=float)
+    # speed 영향을 걷어낸 기준 길이로 학습
+    y = np.array([
+        float(r["duration"]) / speed_factor(r.get("engine"), r.get("speed", 0))
+        for r in rows
+    ], dtype=float)
+    coef, *_ = np.linalg.lstsq(x, y, rcond=None)
+    if coef[0] <= 0:
+        # 글자당 시간이 음수면 데이터가 이상한 것 — 사전값으로 폴백
+        return None
+    resid = y - x @ coef
+    dof = max(len(rows) - 3, 1)
+    sigma = float(math.sqrt(float(resid @ resid) / dof))
+    return _GroupFit((float(coef[0]), float(coef[1]), float(coef[2])), sigma, len(rows))
+
+
+class DurationModel:
+    """(engine, voice) → engine → 전체 → 사전값 순으로 폴백하는 선형 길이 모델."""
+
+    def __init__(self, samples: Optional[List[dict]] = None):
+        self._fits: Dict[Tuple[str, str], _GroupFit] = {}
+        if samples:
+            self.fit(samples)
+
+    def fit(self, samples: List[dict]) -> "DurationModel":
+        groups: Dict[Tuple[str, str], List[dict]] = defaultdict(list)
+        for s in samples:
+            try:
+                row = {
+                    "chars": int(s["chars"]), "punct": int(s.get("punct", 0)),
+                    "engine": str(s.get("engine") or "clova").lower(),
+                    "voice": normalize_voice(s.get("voice")),
+                    "speed": float(s.get("speed") or 0),
+                    "duration": float(s["duration"]),
+                }
+            except (KeyError, TypeError, ValueError):
+                continue
+            if row["chars"] <= 0 or row["duration"] <= 0:
+                continue
+            groups[(row["engine"], row["voice"])].append(row)
+            groups[(row["engine"], "*")].append(row)
+            groups[("*", "*")].append(row)
+
+        self._fits = {}
+        for key, rows in groups.items():
+            fit = _fit(rows)
+            if fit:
+                self._fits[key] = fit
+        return self
+
+    def _lookup(self, engine: str, voice: str) -> Tuple[Optional[_GroupFit], str]:
+        for key in ((engine, voice), (engine, "*"), ("*", "*")):
+            if key in self._fits:
+                return self._fits[key], "/".join(key)
+        return None, "prior"
+
+    def predict(self, text: str, voice: str = "narrator", engine: str = "clova",
+                speed: float = 0) -> DurationEstimate:
+        chars, punct = text_features(text)
+        engine = (engine or "clova").lower()
+        factor = speed_factor(engine, speed)
+        fit, source = self._lookup(engine, normalize_voice(voice))
+
+        if fit is None:
+            base = chars / PRIOR_CHARS_PER_SEC + punct * PRIOR_PAUSE_PER_PUNCT
+            sigma = max(base * PRIOR_REL_SIGMA, 0.3)
+            n = 0
+        else:
+            a, b, c = fit.coef
+            base = max(a * chars + b * punct + c, 0.0)
+            sigma = max(fit.sigma, 0.15)
+            n = fit.n
+
+        seconds = base * factor
+        half = Z_90 * sigma * factor
+        return DurationEstimate(
+            seconds=round(seconds, 2),
+            low=round(max(seconds - half, 0.0), 2),
+            high=round(seconds + half, 2),
+            samples=n,
+            source=source,
+        )
+
+
+_MODEL: DerivedCache = DerivedCache(lambda hist: DurationModel(_collect_samples(hist)), DurationModel(),
+                                    name="duration_model")
+
+
+def get_model(refresh: bool = False) -> DurationModel:
+    """프로세스 공용 모델. 세션 로그 읽기·재학습은 백그라운드에서 (첫 반영 전에는 사전값)."""
+    return _MODEL.get(refresh)
+
+
+def predict_duration(text: str, voice: str = "narrator", engine: str = "clova",
+                     speed: float = 0) -> DurationEstimate:
+    """합성 전에 TTS 길이(초)를 예측. 반환값의 low/high는 90% 예측 구간."""
+    return get_model().predict(text, voice=voice, engine=engine, speed=speed)
+
+
+def predict_segments(segments, engine: str = "clova", speed: float = 0) -> DurationEstimate:
+    """
+    보이스가 섞인 장면(나레이션 + 캐릭터 대사)의 길이 예측. segments: [(텍스트, 보이스), ...].
+    세그먼트별 예측의 합, 구간은 세그먼트 오차가 독립이라고 보고 제곱합으로 합친다.
+    """
+    model = get_model()
+    parts = [model.predict(text, voice=voice, engine=engine, speed=speed) for text, voice in segments if text]
+    if not parts:
+        return DurationEstimate(0.0, 0.0, 0.0, 0, "empty")
+    seconds = sum(p.seconds for p in parts)
+    below = math.sqrt(sum((p.seconds - p.low) ** 2 for p in parts))
+    above = math.sqrt(sum((p.high - p.seconds) ** 2 for p in parts))
+    return DurationEstimate(
+        seconds=round(seconds, 2),
+        low=round(max(seconds - below, 0.0), 2),
+        high=round(seconds + above, 2),
+        samples=min(p.samples for p in parts),
+        source="+".join(sorted({p.source for p in parts})),
+    )
@@ -0,0 +1,257 @@
+# -*- coding: utf-8 -*-
+"""
+진행률 바용 남은 시간(ETA) 추정기.
+Step 4/6.5/7/8, Mode A Step 3 진행 바가 장면 단위로만 올라가서 사용자가 새로고침하거나 렌더를 죽이는 일이 많았다.
+
+- 단계(stage)마다 작업 단위의 크기를 정함: tts=글자 수, preview/final=장면 영상 길이(초), runway/modeA=장면 수
+- 과거 기록: 세션 로그의 stage_timing 이벤트(이 모듈이 단계가 끝날 때 남김)에서 크기당 초를 구하고,
+  없으면 API 응답 시간(*_tts 글자당 지연, Runway 제출+대기)으로, 그것도 없으면 사전값으로
+  (세션 로그는 event_history가 백그라운드에서 증분으로 읽음 — duration_model과 같은 읽기 결과를 씀)
+- 진행 중: 끝난 단위의 실측 처리 속도(병렬 포함)와 과거 값을 끝난 단위 수에 비례해 섞음
+- 호출 하나의 지연(병렬 미포함): 장면 파이프라인 스테이지는 scene_done, TTS·Runway는 API 응답 시간
+  (run_planner가 동시성 상한과 합쳐 실행 전 소요 시간을 예측할 때 씀)
+
+사용:
+    eta = StageETA("preview", [장면별 길이...])
+    ...
+    eta.unit_done(i)                        # 캐시 재사용이면 unit_done(i, cached=True)
+    progress_bar.progress(eta.fraction(), text=eta.text("프리뷰 생성 중"))
+
+    estimate_total("tts", [글자 수...])      # 시작 전 예상 소요 시간 (초)
+"""
+import statistics
+import threading
+import time
+from collections import defaultdict
+from pathlib import Path
+from typing import Dict, Optional, Sequence
+
+from event_history import DerivedCache, EventHistory
+from render_scheduler import POOL_CAPACITY
+from scene_pipeline import stage_workers
+from session_logger import SESSIONS_ROOT, log_event
+
+STAGE_TIMING_EVENT = "stage_timing"
+
+# 크기 1당 초 사전값 (기록이 전혀 없을 때)
+PRIOR_SEC_PER_UNIT = {
+    "tts": 0.08,        # 글자당 (병렬 생성 포함)
+    "preview": 0.8,     # 장면 영상 1초당
+    "runway": 60.0,     # 장면당 (제출 + 생성 대기 + 다운로드/트림)
+    "final": 1.2,       # 장면 영상 1초당 (자막 + 음성/BGM 합성)
+    "modeA": 75.0,      # 장면당 (Runway + 자막 + 합성)
+}
+# 장면 파이프라인 스테이지 한 번의 사전값 (초, 장면 하나)
+PRIOR_STAGE_SEC = {
+    "generate": 45.0,   # Runway 제출 + 생성 대기
+    "download": 3.0,
+    "fit": 6.0,
+    "subtitle": 8.0,
+    "mux": 6.0,
+}
+# TTS 글자당 지연 사전값 (초, 호출 하나 — 병렬 미포함)
+PRIOR_TTS_SEC_PER_CHAR = 0.16
+# 이보다 짧은 스테이지 기록은 캐시/체크포인트 재사용으로 보고 지연 통계에서 뺌
+CACHED_STAGE_SEC = 0.2
+# tts_module.generate_audio_for_subtitles의 병렬 작업 수 상한 (429 방지 cap)
+TTS_PARALLEL = 2
+# 실측 속도를 과거 값보다 믿기 시작하는 끝난 단위 수 (이만큼 끝나면 반반)
+LIVE_WEIGHT_UNITS = 2
+# 단계별로 최근 몇 개 기록의 중앙값을 쓸지
+HISTORY_SAMPLES = 30
+
+
+# =========================================================
+# 과거 기록
+# =========================================================
+def _collect(hist: EventHistory) -> dict:
+    """공용 수집기(event_history)의 이벤트 → History 입력."""
+    acc = {"stage": defaultdict(list), "scene_stage": defaultdict(list), "tts_per_char": [],
+           "runway": []}
+    for _, e in hist.events(STAGE_TIMING_EVENT):
+        d = e.get("data") or {}
+        if d.get("size") and d.get("wall_sec"):
+            acc["stage"][d.get("stage")].append((e.get("ts", ""), d["wall_sec"] / d["size"]))
+    tts_chars: Dict[tuple, int] = {}
+    for sid, e in hist.events(suffix="_tts_request"):
+        d = e.get("data") or {}
+        chars = ((d.get("request") or {}).get("text") or {}).get("length")
+        if d.get("call_id") and chars:
+            tts_chars[(sid, d["call_id"])] = chars
+    for sid, e in hist.events(suffix="_tts_response"):
+        d = e.get("data") or {}
+        chars = tts_chars.get((sid, d.get("call_id")))
+        if chars and d.get("success") and d.get("duration_ms"):
+            acc["tts_per_char"].append(d["duration_ms"] / 1000 / chars)
+    # runway_gen4 = 제출부터 결과까지 (구간별 runway_gen4_submit/_wait는 안 씀)
+    for _, e in hist.events("runway_gen4_response"):
+        d = e.get("data") or {}
+        if d.get("success") and d.get("duration_ms"):
+            acc["runway"].append(d["duration_ms"] / 1000)
+    for _, e in hist.events("scene_done"):
+        d = e.get("data") or {}
+        if d.get("failed_stage"):
+            continue
+        for name, sec in (d.get("stages") or {}).items():
+            if sec >= CACHED_STAGE_SEC:
+                acc["scene_stage"][name].append(sec)
+    return acc
+
+
+class History:
+    """단계별 크기당 초. stage_timing 기록 → API 지연 기반 → 사전값 순으로 폴백."""
+
+    def __init__(self, acc: Optional[dict] = None):
+        acc = acc or {}
+        self._stage = {
+            stage: statistics.median(r for _, r in sorted(rows)[-HISTORY_SAMPLES:])
+            for stage, rows in (acc.get("stage") or {}).items() if rows
+        }
+        self._scene_stage = {
+            name: statistics.median(secs[-HISTORY_SAMPLES * 10:])
+            for name, secs in (acc.get("scene_stage") or {}).items() if secs
+        }
+        self._tts_per_char = statistics.median(acc["tts_per_char"]) if acc.get("tts_per_char") else None
+        self._api: Dict[str, float] = {}
+        if self._tts_per_char:
+            self._api["tts"] = self._tts_per_char / TTS_PARALLEL
+        self._runway_call = None
+        if acc.get("runway"):
+            self._runway_call = statistics.median(acc["runway"])
+            self._api["runway"] = self._runway_call / max(1, min(stage_workers("generate"), POOL_CAPACITY["runway"]))
+
+    def rate(self, stage: str) -> float:
+        if stage in self._stage:
+            return self._stage[stage]
+        if stage in self._api:
+            return self._api[stage]
+        return PRIOR_SEC_PER_UNIT.get(stage, 1.0)
+
+    def stage_latency(self, name: str) -> float:
+        """장면 파이프라인 스테이지 한 번의 소요 (초, 병렬 미포함)."""
+        if name in self._scene_stage:
+            return self._scene_stage[name]
+        if name == "generate" and self._runway_call:
+            return self._runway_call
+        return PRIOR_STAGE_SEC.get(name, 5.0)
+
+    def tts_latency(self, chars: int) -> float:
+        """TTS 호출 하나의 소요 (초, 병렬 미포함)."""
+        return chars * (self._tts_per_char or PRIOR_TTS_SEC_PER_CHAR)
+
+    def source(self, stage: str) -> str:
+        if stage in self._stage:
+            return "history"
+        return "api" if stage in self._api else "prior"
+
+
+def harvest(root: Path = SESSIONS_ROOT) -> History:
+    """root 아래 세션 로그를 지금 다 읽어서 History (CLI·테스트용 — 앱은 get_history)."""
+    hist = EventHistory(root)
+    hist.refresh()
+    return History(_collect(hist))
+
+
+_HISTORY: DerivedCache = DerivedCache(lambda hist: History(_collect(hist)), History(), name="eta")
+
+
+def get_history(refresh: bool = False) -> History:
+    """프로세스 공용. 세션 로그는 백그라운드에서 읽으므로 막히지 않음 (첫 반영 전에는 사전값)."""
+    return _HISTORY.get(refresh)
+
+
+def estimate_total(stage: str, sizes: Sequence[float]) -> float:
+    """시작 전 예상 소요 시간 (초)."""
+    return get_history().rate(stage) * sum(sizes)
+
+
+def format_eta(seconds: Optional[float]) -> str:
+    if seconds is None:
+        return ""
+    if seconds < 5:
+        return "곧 완료"
+    m, s = divmod(int(round(seconds / 5) * 5), 60)
+    if m >= 60:
+        return f"약 {m // 60}시간 {m % 60}분"
+    if m:
+        return f"약 {m}분 {s}초" if s and m < 5 else f"약 {m}분"
+    return f"약 {s}초"
+
+
+# =========================================================
+# 진행 중 추정
+# =========================================================
+class StageETA:
+    """
+    한 단계의 남은 시간. 단위가 병렬로, 순서 없이 끝나도 됨 (장면 파이프라인).
+    스레드에서 unit_done을 불러도 안전. 모든 단위가 끝나면 stage_timing 기록을 남김.
+    """
+
+    def __init__(self, stage: str, sizes, history: Optional[History] = None):
+        self.stage = stage
+        # sizes: 리스트(0..n-1) 또는 {단위 키: 크기}
+        items = sizes.items() if isinstance(sizes, dict) else enumerate(sizes)
+        self.sizes = {str(k): max(float(v or 0), 0.01) for k, v in items}
+        self.prior = (history or get_history()).rate(stage)
+        self.started = time.monotonic()
+        self._done: Dict[str, bool] = {}  # 키 → 캐시 재사용 여부
+        self._lock = threading.Lock()
+        self.initial_estimate = self.prior * sum(self.sizes.values())
+        self._logged = False
+
+    def unit_done(self, key, cached: bool = False) -> None:
+        key = str(key)
+        with self._lock:
+            if key not in self.sizes or key in self._done:
+                return
+            self._done[key] = cached
+            finished = len(self._done) == len(self.sizes)
+        if finished:
+            self._log_timing()
+
+    def fraction(self) -> float:
+        with self._lock:
+            return len(self._done) / max(len(self.sizes), 1)
+
+    def remaining(self) -> float:
+        """남은 초 (추정)."""
+        with self._lock:
+            left = sum(v for k, v in self.sizes.items() if k not in self._done)
+            measured = [self.sizes[k] for k, cached in self._done.items() if not cached]
+        if not left:
+            return 0.0
+        elapsed = time.monotonic() - self.started
+        measured_size = sum(measured)
+        rate = self.prior
+        if measured_size > 0:
+            w = len(measured) / (len(measured) + LIVE_WEIGHT_UNITS)
+            rate = w * (elapsed / measured_size) + (1 - w) * self.prior
+        # 끝난 단위 몫을 넘는 경과 시간은 지금 진행 중인 단위에 이미 들인 시간
+        in_progress = max(0.0, elapsed - measured_size * rate)
+        return max(left * rate - in_progress, 0.0)
+
+    def text(self, prefix: str = "") -> str:
+        with self._lock:
+            done, total = len(self._done), len(self.sizes)
+        parts = [p for p in (prefix, f"{done}/{total}") if p]
+        if done < total:
+            parts.append(f"남은 시간 {format_eta(self.remaining())}")
+        return " · ".join(parts)
+
+    def _log_timing(self) -> None:
+        with self._lock:
+            if self._logged:
+                return
+            self._logged = True
+            measured = [self.sizes[k] for k, cached in self._done.items() if not cached]
+        if not measured:
+            # 전부 캐시 재사용 — 처리 속도 기록으로 쓸 수 없음
+            return
+        log_event(STAGE_TIMING_EVENT, {
+            "stage": self.stage,
+            "units": len(measured),
+            "cached_units": len(self._done) - len(measured),
+            "size": round(sum(measured), 2),
+            "wall_sec": round(time.monotonic() - self.started, 2),
+            "initial_estimate_sec": round(self.initial_estimate, 1),
+        })
@@ -0,0 +1,169 @@
+# -*- coding: utf-8 -*-
+"""
+과거 기록 공용 수집기.
+eta(단계별 처리 속도)와 duration_model(TTS 길이 샘플)이 각자 리런마다 모든 세션의 events.jsonl을
+처음부터 다시 읽던 것을 하나로 합쳤다.
+
+- 파일마다 (inode, 읽은 위치)를 기억해 두고 새로 붙은 완결된 줄만 읽음 (perf_monitor와 같은 꼬리 읽기)
+- 과거 기록에 쓰는 이벤트(HISTORY_ACTIONS, *_tts_request/_tts_response)만 메모리에 유지
+- 읽기와 모델 계산은 백그라운드 스레드에서 (DerivedCache) — Streamlit 스크립트 스레드는 직전 값을 바로 받음
+
+    model = DerivedCache(build_fn, default)   # build_fn(EventHistory) → 값
+    model.get()                               # 막히지 않음. 처음엔 default, 새 이벤트가 반영되면 새 값
+"""
+import json
+import threading
+import time
+from collections import defaultdict
+from pathlib import Path
+from typing import Callable, Dict, Generic, List, Optional, Tuple, TypeVar
+
+from session_logger import SESSIONS_ROOT, flush_events
+
+HISTORY_ACTIONS = (
+    "stage_timing", "scene_done", "tts_duration_sample", "runway_gen4_response",
+)
+HISTORY_SUFFIXES = ("_tts_request", "_tts_response")
+# json 파싱 전에 줄을 거르는 부분 문자열 (위 이벤트 이름을 모두 덮음)
+_LINE_TOKENS = ("stage_timing", "scene_done", "tts_duration_sample", "_tts_re", "runway_gen4")
+# 새 줄을 다시 읽는 주기 (초). 읽기는 증분이라 짧아도 부담이 적음
+REFRESH_INTERVAL_SEC = 60
+
+T = TypeVar("T")
+
+
+def _wanted(action: str) -> bool:
+    return action in HISTORY_ACTIONS or action.endswith(HISTORY_SUFFIXES)
+
+
+class EventHistory:
+    def __init__(self, root: Path = SESSIONS_ROOT):
+        self.root = Path(root)
+        self._offsets: Dict[Path, tuple] = {}   # 파일 → (inode, 읽은 바이트 수)
+        self._events: Dict[str, List[Tuple[str, dict]]] = defaultdict(list)  # action → [(세션, 이벤트)]
+        self._lock = threading.Lock()        # _events
+        self._scan_lock = threading.Lock()   # 파일 읽기는 한 번에 하나
+        self._refreshed_at: Optional[float] = None
+        self.generation = 0  # 새 이벤트가 들어올 때마다 증가
+
+    def refresh(self, max_age: float = 0.0) -> int:
+        """새 줄 반영. max_age초 안에 읽었으면 건너뜀. Returns: 새로 넣은 이벤트 수."""
+        with self._scan_lock:
+            if self._refreshed_at is not None and time.monotonic() - self._refreshed_at < max_age:
+                return 0
+            added = 0
+            if self.root.exists():
+                flush_events()
+                for sdir in self.root.iterdir():
+                    added += self._read_file(sdir.name, sdir / "events.jsonl")
+            self._refreshed_at = time.monotonic()
+            if added:
+                with self._lock:
+                    self.generation += 1
+            return added
+
+    def _read_file(self, session_id: str, path: Path) -> int:
+        try:
+            st = path.stat()
+        except OSError:
+            return 0
+        ino, offset = self._offsets.get(path, (None, 0))
+        if ino != st.st_ino or offset > st.st_size:
+            offset = 0  # 처음 보거나 파일이 바뀜
+        added = 0
+        if offset < st.st_size:
+            try:
+                with open(path, "rb") as f:
+                    f.seek(offset)
+                    raw = f.read()
+            except OSError as e:
+                print(f"[event_history] 읽기 실패 {path}: {e}")
+                return 0
+            # 쓰는 중인 마지막 줄(개행 없음)은 다음 번에
+            end = raw.rfind(b"\n") + 1
+            rows = []
+            for line in raw[:end].decode("utf-8", errors="replace").splitlines():
+                if not any(tok in line for tok in _LINE_TOKENS):
+                    continue
+                try:
+                    e = json.loads(line)
+                except json.JSONDecodeError:
+                    continue
+                if _wanted(e.get("action", "")):
+                    rows.append(e)
+            with self._lock:
+                for e in rows:
+                    self._events[e["action"]].append((session_id, e))
+            added = len(rows)
+            offset += end
+        self._offsets[path] = (st.st_ino, offset)
+        return added
+
+    def events(self, *actions: str, suffix: Optional[str] = None) -> List[Tuple[str, dict]]:
+        """[(세션, 이벤트)] — actions 이름이거나 suffix로 끝나는 이벤트. 세션 안에서는 기록 순서."""
+        with self._lock:
+            out = []
+            for action, rows in self._events.items():
+                if action in actions or (suffix and action.endswith(suffix)):
+                    out.extend(rows)
+            return out
+
+
+class DerivedCache(Generic[T]):
+    """
+    EventHistory에서 계산한 값(모델, 통계) 캐시.
+    get()은 호출한 스레드를 막지 않는다: 오래됐으면 백그라운드에서 새 줄을 읽고, 새 이벤트가 있을 때만 다시 계산.
+    """
+
+    def __init__(self, build: Callable[[EventHistory], T], default: T, name: str = "history"):
+        self._build = build
+        self._value = default
+        self._name = name
+        self._generation = -1
+        self._checked_at: Optional[float] = None
+        self._thread: Optional[threading.Thread] = None
+        self._lock = threading.Lock()
+
+    def get(self, refresh: bool = False) -> T:
+        """refresh=True면 지금 스레드에서 다시 읽고 계산 (CLI·테스트용)."""
+        if refresh:
+            self._rebuild(max_age=0.0)
+            with self._lock:
+                self._checked_at = time.monotonic()
+                return self._value
+        with self._lock:
+            due = self._checked_at is None or time.monotonic() - self._checked_at >= REFRESH_INTERVAL_SEC
+            if due and (self._thread is None or not self._thread.is_alive()):
+                self._checked_at = time.monotonic()
+                self._thread = threading.Thread(target=self._rebuild_safe, name=f"{self._name}-refit", daemon=True)
+                self._thread.start()
+            return self._value
+
+    def _rebuild(self, max_age: float) -> None:
+        hist = get_event_history()
+        hist.refresh(max_age=max_age)
+        if hist.generation == self._generation:
+            return
+        generation = hist.generation
+        value = self._build(hist)
+        with self._lock:
+            self._value, self._generation = value, generation
+
+    def _rebuild_safe(self) -> None:
+        try:
+            self._rebuild(max_age=REFRESH_INTERVAL_SEC)
+        except Exception as e:
+            print(f"[event_history] {self._name} 갱신 실패: {e}")
+
+
+_HISTORY: Optional[EventHistory] = None
+_HISTORY_LOCK = threading.Lock()
+
+
+def get_event_history() -> EventHistory:
+    """프로세스 공용 (eta·duration_model이 같은 읽기 결과를 씀)."""
+    global _HISTORY
+    with _HISTORY_LOCK:
+        if _HISTORY is None:
+            _HISTORY = EventHistory()
+        return _HISTORY
@@ -0,0 +1,493 @@
+# -*- coding: utf-8 -*-
+"""
+백그라운드 렌더 잡 실행기.
+Step 7/8처럼 몇 분씩 걸리는 렌더를 버튼 핸들러(Streamlit 스크립트 스레드) 밖에서 돌린다.
+
+- submit_job()이 잡 ID를 돌려주고, 실제 작업은 별도 프로세스(python job_runner.py run <job_dir>)에서 실행
+- 진행률·장면별 상태·로그는 <세션>/jobs/<job_id>/ 아래 status.json, log.txt로 남음
+  → 새로고침/웹소켓 끊김/리런이 있어도 작업은 계속되고, UI는 파일을 폴링해서 다시 붙음
+- 서버 프로세스 전체(모든 세션)에서 동시에 도는 잡 수를 JOB_MAX_CONCURRENCY로 제한
+  → 워크숍 30명이 동시에 눌러도 libx264 인코딩이 CPU를 과점하지 않고 대기열에서 순서를 기다림
+- 대기열은 서버 메모리에 있고, 서버가 재시작되면 resume_queued_jobs()가 status.json이 queued인 잡을 다시 넣음
+  running이던 잡은 기록된 자식 pid를 확인해 살아 있으면 다시 추적(동시 실행 수에 포함), 죽었으면 failed 처리
+- cancel_job()은 잡 폴더에 cancel 파일을 만들고, 자식 프로세스가 이를 보고 취소 토큰을 취소
+  (ffmpeg 종료 · Runway 작업 취소 · 쓰다 만 파일 삭제). 유예 시간 뒤에도 살아 있으면 프로세스 그룹째 종료
+
+잡 종류는 JOB_KINDS에 "모듈:함수"로 등록하며, 함수는 fn(params: dict, job: JobContext) -> dict 형태.
+"""
+import importlib
+import json
+import os
+import signal
+import subprocess
+import sys
+import threading
+import time
+import traceback
+import uuid
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, List, Optional
+
+import metrics
+from cancellation import CancelToken, use_token, watch_cancel_file
+from eta import StageETA
+from session_logger import SESSIONS_ROOT, bind_session, current_session_id, get_session_dir, log_event
+
+# 잡 종류 → 실행 함수 (자식 프로세스에서 import)
+JOB_KINDS = {
+    "modeb_video": "mode_b_pipeline:video_job",
+    "modeb_final": "mode_b_pipeline:final_job",
+}
+
+# 서버 전체 동시 실행 잡 수 (기본: CPU 코어의 절반)
+MAX_CONCURRENT_JOBS = int(os.getenv("JOB_MAX_CONCURRENCY", "0")) or max(1, (os.cpu_count() or 2) // 2)
+
+# 취소 요청 후 자식이 스스로 정리하고 끝나길 기다리는 시간 — 넘기면 프로세스 그룹 강제 종료
+CANCEL_GRACE_SEC = float(os.getenv("JOB_CANCEL_GRACE_SEC", "10"))
+
+# 서버 재시작 후 다시 붙은(자식이 아닌) 잡 프로세스의 종료 확인 주기
+ADOPT_POLL_SEC = float(os.getenv("JOB_ADOPT_POLL_SEC", "2"))
+
+TERMINAL_STATES = ("done", "failed", "cancelled")
+LOG_FILE = "log.txt"
+STATUS_FILE = "status.json"
+PARAMS_FILE = "params.json"
+CANCEL_FILE = "cancel"
+
+
+def _now() -> str:
+    return datetime.now().isoformat(timespec="seconds")
+
+
+def _write_json_atomic(path: Path, data: dict) -> None:
+    """다른 프로세스가 읽는 도중 반쯤 쓰인 파일을 보지 않도록 tmp → replace."""
+    tmp = path.with_suffix(path.suffix + f".{os.getpid()}.tmp")
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(data, f, ensure_ascii=False, indent=2, default=str)
+    os.replace(tmp, path)
+
+
+def read_status(job_dir) -> dict:
+    """status.json 읽기. 아직 없거나 깨져 있으면 빈 dict."""
+    try:
+        with open(Path(job_dir) / STATUS_FILE, "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, json.JSONDecodeError):
+        return {}
+
+
+def tail_log(job_dir, lines: int = 20) -> List[str]:
+    try:
+        with open(Path(job_dir) / LOG_FILE, "r", encoding="utf-8") as f:
+            return f.read().splitlines()[-lines:]
+    except OSError:
+        return []
+
+
+def cancel_requested(job_dir) -> bool:
+    return (Path(job_dir) / CANCEL_FILE).exists()
+
+
+def list_jobs(session_dir: Optional[Path] = None) -> List[dict]:
+    """세션의 잡 상태 목록 (최신순)."""
+    session_dir = session_dir or get_session_dir()
+    if not session_dir or not (session_dir / "jobs").exists():
+        return []
+    out = []
+    for d in (session_dir / "jobs").iterdir():
+        if d.is_dir():
+            st = read_status(d)
+            if st:
+                out.append(st)
+    return sorted(out, key=lambda s: s.get("submitted_at", ""), reverse=True)
+
+
+# =========================================================
+# 자식 프로세스 쪽: 진행 상황 기록
+# =========================================================
+class JobContext:
+    """잡 함수에 넘겨지는 진행 보고 객체. 모든 변경은 즉시 status.json에 반영된다."""
+
+    def __init__(self, job_dir: Path):
+        self.job_dir = Path(job_dir)
+        self._lock = threading.Lock()
+        self.status = read_status(self.job_dir)
+        self._eta: Optional[StageETA] = None
+
+    def _flush(self) -> None:
+        self.status["updated_at"] = _now()
+        _write_json_atomic(self.job_dir / STATUS_FILE, self.status)
+
+    def update(self, **fields) -> None:
+        with self._lock:
+            self.status.update(fields)
+            self._flush()
+
+    def log(self, msg: str) -> None:
+        line = f"{datetime.now():%H:%M:%S} {msg}"
+        with self._lock:
+            with open(self.job_dir / LOG_FILE, "a", encoding="utf-8") as f:
+                f.write(line + "\n")
+
+    def set_scenes(self, indices, stage: Optional[str] = None, sizes: Optional[List[float]] = None) -> None:
+        """
+        진행률 계산용 장면 목록 등록 (모두 대기 상태).
+        stage를 주면 남은 시간(eta_sec, eta_at 시점 기준)도 기록 — sizes는 장면별 크기 (eta.py 참고, 없으면 장면당 1).
+        """
+        indices = list(indices)
+        if stage:
+            self._eta = StageETA(stage, {i: (sizes[n] if sizes else 1) for n, i in enumerate(indices)})
+        with self._lock:
+            self.status["scenes"] = {str(i): {"state": "pending"} for i in indices}
+            self.status["progress"] = 0.0
+            self._update_eta()
+            self._flush()
+
+    def _update_eta(self) -> None:
+        if self._eta is None:
+            return
+        self.status["eta_sec"] = round(self._eta.remaining(), 1)
+        self.status["eta_at"] = _now()
+
+    def scene(self, index: int, state: str, message: str = "") -> None:
+        """장면 하나의 상태 갱신 (pending/running/done/failed/cached/cancelled). progress는 끝난 장면 비율."""
+        with self._lock:
+            scenes = self.status.setdefault("scenes", {})
+            scenes[str(index)] = {"state": state, "message": message}
+            finished = sum(1 for s in scenes.values() if s["state"] in ("done", "failed", "cached", "cancelled"))
+            self.status["progress"] = round(finished / max(len(scenes), 1), 3)
+            if self._eta is not None and state in ("done", "failed", "cached", "cancelled"):
+                self._eta.unit_done(index, cached=state != "done")
+            self._update_eta()
+            self._flush()
+
+
+def _run_child(job_dir: Path) -> int:
+    """python job_runner.py run <job_dir> 진입점."""
+    with open(job_dir / PARAMS_FILE, "r", encoding="utf-8") as f:
+        spec = json.load(f)
+    job = JobContext(job_dir)
+    job.update(state="running", started_at=_now(), pid=os.getpid())
+    # API·렌더 메트릭을 Streamlit 프로세스의 엔드포인트로 넘김
+    metrics.start_metrics_export()
+    token = CancelToken()
+    stop_watch = watch_cancel_file(job_dir / CANCEL_FILE, token)
+    with bind_session(spec["session_id"]), use_token(token):
+        try:
+            module_name, fn_name = JOB_KINDS[spec["kind"]].split(":")
+            fn = getattr(importlib.import_module(module_name), fn_name)
+            result = fn(spec["params"], job)
+            job.update(state="done", finished_at=_now(), progress=1.0, result=result or {})
+            job.log("✅ 완료")
+            log_event("job_done", {"job_id": spec["job_id"], "kind": spec["kind"]})
+            return 0
+        except Exception as e:
+            if token.cancelled:
+                job.log("⏹ 취소됨")
+                job.update(state="cancelled", finished_at=_now())
+                log_event("job_cancelled", {"job_id": spec["job_id"], "kind": spec["kind"]})
+                return 0
+            job.log(f"❌ 실패: {e}")
+            job.log(traceback.format_exc())
+            job.update(state="failed", finished_at=_now(), error=f"{type(e).__name__}: {e}")
+            log_event("job_failed", {"job_id": spec["job_id"], "kind": spec["kind"], "error": str(e)[:500]})
+            return 1
+        finally:
+            stop_watch.set()
+
+
+# =========================================================
+# 서버 쪽: 제출 · 대기열 · 동시 실행 제한
+# =========================================================
+_PENDING: List[tuple] = []          # 시작 대기 중인 (잡 폴더, 세션 ID), 제출 순
+_RUNNING: Dict[str, tuple] = {}     # 잡 ID → (프로세스, 세션 ID)
+_COND = threading.Condition()
+_DISPATCHER: Optional[threading.Thread] = None
+_STOP = False                       # stop_dispatcher()가 디스패처를 멈추는 중인지
+_RESUMED = False                    # 서버 시작 후 대기열 복구를 했는지
+
+
+class _AdoptedProcess:
+    """
+    서버 재시작 전에 띄운 잡 프로세스. 이제 자식이 아니라 wait()로 거둘 수 없으므로 pid를 폴링한다.
+    _RUNNING · _watch · _kill_after_grace가 쓰는 만큼만 Popen과 같은 모양.
+    """
+
+    returncode = None  # 남의 자식이었으므로 종료 코드는 알 수 없음
+
+    def __init__(self, pid: int):
+        self.pid = pid
+
+    def wait(self, timeout: Optional[float] = None):
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while _pid_alive(self.pid):
+            if deadline is not None and time.monotonic() >= deadline:
+                raise subprocess.TimeoutExpired(f"pid {self.pid}", timeout)
+            time.sleep(ADOPT_POLL_SEC)
+        return None
+
+    def kill(self) -> None:
+        os.kill(self.pid, signal.SIGKILL)
+
+
+def _pid_alive(pid: int) -> bool:
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass  # 다른 사용자 프로세스 — 살아는 있음
+    except OSError:
+        return False
+    return True
+
+
+def _is_job_process(pid, job_dir: Path) -> bool:
+    """status.json의 pid가 아직 이 잡을 돌리는 프로세스인지 (재부팅 뒤 pid 재사용 구분)."""
+    if not isinstance(pid, int) or pid <= 0 or not _pid_alive(pid):
+        return False
+    try:
+        with open(f"/proc/{pid}/cmdline", "rb") as f:
+            return job_dir.name.encode() in f.read()
+    except OSError:
+        return True  # /proc이 없는 OS — pid만으로 판단
+
+
+def submit_job(kind: str, params: dict, label: str = "", session_id: Optional[str] = None) -> Path:
+    """잡을 대기열에 넣고 잡 폴더 경로를 반환. 잡 ID는 폴더 이름."""
+    if kind not in JOB_KINDS:
+        raise ValueError(f"알 수 없는 잡 종류: {kind}")
+    session_id = session_id or current_session_id()
+    if not session_id:
+        raise RuntimeError("세션이 없습니다. 이름 입력 후 다시 시도하세요.")
+
+    job_id = f"{datetime.now():%Y%m%d_%H%M%S}_{kind}_{uuid.uuid4().hex[:6]}"
+    with bind_session(session_id) as sdir:
+        job_dir = sdir / "jobs" / job_id
+    job_dir.mkdir(parents=True, exist_ok=True)
+    _write_json_atomic(job_dir / PARAMS_FILE, {
+        "job_id": job_id, "kind": kind, "session_id": session_id, "params": params,
+    })
+    _write_json_atomic(job_dir / STATUS_FILE, {
+        "job_id": job_id, "kind": kind, "label": label, "state": "queued",
+        "submitted_at": _now(), "progress": 0.0, "scenes": {},
+    })
+    log_event("job_submitted", {"job_id": job_id, "kind": kind, "label": label})
+
+    with _COND:
+        _PENDING.append((job_dir, session_id))
+        _ensure_dispatcher()
+        _COND.notify_all()
+    return job_dir
+
+
+def resume_queued_jobs(root: Path = SESSIONS_ROOT) -> int:
+    """
+    서버 재시작 전에 대기열에 있던 잡을 status.json에서 다시 불러옴 (대기열은 메모리에만 있으므로).
+    Streamlit 리런마다 불려도 프로세스당 한 번만 스캔한다. cancel 파일이 있는 잡은 취소 처리.
+    running이던 잡은 자식 프로세스가 살아 있으면 _RUNNING에 다시 올려 동시 실행 한도에 세고 종료를 지켜보며,
+    이미 죽었으면 상태를 남기지 못한 것이므로 failed(취소 요청이 있었으면 cancelled)로 마감한다.
+    Returns: 다시 대기열에 넣은 잡 수
+    """
+    global _RESUMED
+    with _COND:
+        if _RESUMED:
+            return 0
+        _RESUMED = True
+    found = []
+    adopted = []
+    for status_path in Path(root).glob(f"*/jobs/*/{STATUS_FILE}"):
+        job_dir = status_path.parent
+        status = read_status(job_dir)
+        if status.get("state") == "running":
+            if _is_job_process(status.get("pid"), job_dir):
+                adopted.append(job_dir)
+            elif cancel_requested(job_dir):
+                status.update(state="cancelled", finished_at=_now())
+                _write_json_atomic(job_dir / STATUS_FILE, status)
+            else:
+                status.update(state="failed", error="서버 재시작 중 작업 프로세스가 종료됨", finished_at=_now())
+                _write_json_atomic(job_dir / STATUS_FILE, status)
+            continue
+        if status.get("state") != "queued":
+            continue
+        if cancel_requested(job_dir):
+            status.update(state="cancelled", finished_at=_now())
+            _write_json_atomic(job_dir / STATUS_FILE, status)
+            continue
+        try:
+            with open(job_dir / PARAMS_FILE, "r", encoding="utf-8") as f:
+                session_id = json.load(f)["session_id"]
+        except (OSError, json.JSONDecodeError, KeyError) as e:
+            print(f"[job_runner] 대기 잡 복구 실패 ({job_dir.name}): {e}")
+            continue
+        found.append((status.get("submitted_at", ""), job_dir, session_id))
+    for job_dir in adopted:
+        _adopt(job_dir)
+    if adopted:
+        print(f"[job_runner] 실행 중이던 잡 {len(adopted)}개 다시 추적")
+    if not found:
+        return 0
+    found.sort(key=lambda item: item[0])
+    with _COND:
+        known = {d for d, _ in _PENDING}
+        for _, job_dir, session_id in found:
+            if job_dir not in known:
+                _PENDING.append((job_dir, session_id))
+        _ensure_dispatcher()
+        _COND.notify_all()
+    print(f"[job_runner] 대기 중이던 잡 {len(found)}개 복구")
+    return len(found)
+
+
+def _adopt(job_dir: Path) -> None:
+    """살아 있는 이전 잡 프로세스를 실행 중 목록에 올리고 종료를 지켜봄."""
+    try:
+        with open(job_dir / PARAMS_FILE, "r", encoding="utf-8") as f:
+            session_id = json.load(f)["session_id"]
+    except (OSError, json.JSONDecodeError, KeyError):
+        session_id = job_dir.parent.parent.name
+    proc = _AdoptedProcess(read_status(job_dir)["pid"])
+    with _COND:
+        _RUNNING[job_dir.name] = (proc, session_id)
+    threading.Thread(target=_watch, args=(job_dir, proc), name=f"job-watch-{job_dir.name}",
+                     daemon=True).start()
+
+
+def queue_position(job_dir) -> Optional[int]:
+    """대기열에서 몇 번째인지 (1부터). 이미 시작했거나 없으면 None."""
+    job_dir = Path(job_dir)
+    with _COND:
+        for i, (d, _) in enumerate(_fair_order(), 1):
+            if d == job_dir:
+                return i
+    return None
+
+
+def cancel_job(job_dir) -> None:
+    """
+    잡 취소 요청. 대기 중이면 바로 취소 처리하고, 실행 중이면 cancel 파일로 자식에게 알린다
+    (보통 1초 안에 ffmpeg·Runway 작업이 정리됨). CANCEL_GRACE_SEC 안에 안 끝나면 프로세스 그룹 종료.
+    """
+    job_dir = Path(job_dir)
+    with open(job_dir / CANCEL_FILE, "w", encoding="utf-8") as f:
+        f.write(_now())
+    with _COND:
+        pending = [item for item in _PENDING if item[0] == job_dir]
+        for item in pending:
+            _PENDING.remove(item)
+        running = _RUNNING.get(job_dir.name)
+    log_event("job_cancel_requested", {"job_id": job_dir.name})
+    if pending:
+        status = read_status(job_dir)
+        status.update(state="cancelled", finished_at=_now())
+        _write_json_atomic(job_dir / STATUS_FILE, status)
+    elif running:
+        threading.Thread(target=_kill_after_grace, args=(running[0],),
+                         name=f"job-cancel-{job_dir.name}", daemon=True).start()
+
+
+def _kill_after_grace(proc: subprocess.Popen) -> None:
+    try:
+        proc.wait(timeout=CANCEL_GRACE_SEC)
+        return
+    except subprocess.TimeoutExpired:
+        pass
+    try:
+        # start_new_session으로 띄웠으므로 pgid == pid → moviepy가 띄운 ffmpeg까지 같이 종료
+        if hasattr(os, "killpg"):
+            os.killpg(proc.pid, signal.SIGKILL)
+        else:
+            proc.kill()
+    except OSError:
+        pass
+
+
+def _fair_order() -> List[tuple]:
+    """대기 잡 시작 순서: 지금 돌고 있는 잡이 적은 세션 먼저, 같으면 제출 순 (락 안에서 호출)."""
+    running_by_session: Dict[str, int] = {}
+    for _, sid in _RUNNING.values():
+        running_by_session[sid] = running_by_session.get(sid, 0) + 1
+    return sorted(_PENDING, key=lambda item: running_by_session.get(item[1], 0))
+
+
+def running_count() -> int:
+    with _COND:
+        return len(_RUNNING)
+
+
+def _ensure_dispatcher() -> None:
+    global _DISPATCHER
+    if _DISPATCHER is None or not _DISPATCHER.is_alive():
+        _DISPATCHER = threading.Thread(target=_dispatch_loop, name="job-dispatcher", daemon=True)
+        _DISPATCHER.start()
+
+
+def stop_dispatcher(timeout: float = 5.0) -> None:
+    """디스패처 스레드를 멈춤 (대기열·실행 중 잡은 그대로). 다음 제출 때 다시 뜬다."""
+    global _DISPATCHER, _STOP
+    with _COND:
+        thread = _DISPATCHER
+        _STOP = True
+        _COND.notify_all()
+    if thread is not None:
+        thread.join(timeout)
+    with _COND:
+        _STOP = False
+        _DISPATCHER = None
+
+
+def _dispatch_loop() -> None:
+    while True:
+        with _COND:
+            while not _STOP and (not _PENDING or len(_RUNNING) >= MAX_CONCURRENT_JOBS):
+                _COND.wait()
+            if _STOP:
+                return
+            job_dir, session_id = _fair_order()[0]
+            _PENDING.remove((job_dir, session_id))
+            proc = _spawn(job_dir)
+            if proc is None:
+                continue
+            _RUNNING[job_dir.name] = (proc, session_id)
+        threading.Thread(target=_watch, args=(job_dir, proc), name=f"job-watch-{job_dir.name}",
+                         daemon=True).start()
+
+
+def _spawn(job_dir: Path) -> Optional[subprocess.Popen]:
+    try:
+        out = open(job_dir / "worker.log", "ab")
+        return subprocess.Popen(
+            [sys.executable, str(Path(__file__).resolve()), "run", str(job_dir)],
+            cwd=os.getcwd(), stdout=out, stderr=subprocess.STDOUT,
+            start_new_session=True,  # 서버 재시작/Ctrl+C가 진행 중 렌더를 같이 죽이지 않도록
+        )
+    except OSError as e:
+        status = read_status(job_dir)
+        status.update(state="failed", error=f"프로세스 시작 실패: {e}", finished_at=_now())
+        _write_json_atomic(job_dir / STATUS_FILE, status)
+        return None
+
+
+def _watch(job_dir: Path, proc: subprocess.Popen) -> None:
+    code = proc.wait()
+    status = read_status(job_dir)
+    if status.get("state") not in TERMINAL_STATES:
+        # 자식이 상태를 남기지 못하고 죽은 경우 (OOM, kill, 취소 유예 시간 초과 등)
+        if cancel_requested(job_dir):
+            status.update(state="cancelled", finished_at=_now())
+        else:
+            reason = "작업 프로세스 비정상 종료" + (f" (exit {code})" if code is not None else "")
+            status.update(state="failed", error=reason, finished_at=_now())
+        _write_json_atomic(job_dir / STATUS_FILE, status)
+    with _COND:
+        _RUNNING.pop(job_dir.name, None)
+        _COND.notify_all()
+
+
+if __name__ == "__main__":
+    if len(sys.argv) == 3 and sys.argv[1] == "run":
+        sys.exit(_run_child(Path(sys.argv[2])))
+    print("사용: python job_runner.py run <job_dir>")
+    sys.exit(2)
@@ -0,0 +1,258 @@
+# -*- coding: utf-8 -*-
+"""
+대용량 영상·세션 ZIP 스트리밍 서버 (HTTP Range 지원).
+st.video(경로) / st.download_button(open(...))은 파일 전체를 서버 메모리에 올리고 시청자마다 복제하므로,
+최종본·프리뷰·세션 ZIP은 Streamlit 프로세스 안에 띄운 작은 정적 서버가 디스크에서 조금씩 읽어 보낸다.
+
+- GET/HEAD /media/<outputs 기준 상대경로>  : Range 요청 → 206 부분 응답 (브라우저 탐색/이어받기)
+- GET      /session-zip/<세션 ID>          : 요청 시점에 세션 ZIP을 증분 갱신한 뒤 스트리밍
+- URL은 만료 시각과 HMAC 서명을 붙여 발급 (다른 사람 세션 경로를 추측해도 못 받음). outputs/ 밖은 거부
+  다운로드 파일 이름(dl)도 서명에 들어감 → 링크를 고쳐 다른 이름·확장자로 받게 만들 수 없음
+- 시청자당 메모리는 전송 버퍼(CHUNK_SIZE) 하나로 일정
+
+환경변수:
+    MEDIA_SERVER_PORT  (기본 8502)      MEDIA_SERVER_BIND (기본 127.0.0.1 — 리버스 프록시만 접근)
+    MEDIA_SERVER_URL   브라우저가 접근할 주소 (예: https://example.com/media-server — 프록시가 이 서버로 전달).
+                       없으면 서버를 띄우지 않고 예전 방식으로 동작 (http://호스트:8502 링크는 HTTPS 페이지에서
+                       mixed content로 막히고, 포트를 밖에 열어야 하므로 추측해서 만들지 않음)
+    MEDIA_SERVER=0     서버를 끄고 예전 방식(Streamlit으로 바이트 전달)으로 동작
+
+스트리밍은 MEDIA_SERVER_URL을 설정해야 켜지는 선택 기능. 설정하지 않으면 show_video/download_link는
+예전처럼 파일 전체를 Streamlit 프로세스 메모리에 올려 보낸다 (Streamlit에는 나눠 보내는 경로가 없음).
+
+페이지에서는 show_video(path) / download_link(label, path, file_name)을 쓴다.
+"""
+import hashlib
+import hmac
+import mimetypes
+import os
+import threading
+import time
+from http import HTTPStatus
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from typing import Optional, Tuple
+from urllib.parse import parse_qs, quote, unquote, urlsplit
+
+import streamlit as st
+
+from session_logger import SESSIONS_ROOT, update_session_zip
+
+ENABLED = os.getenv("MEDIA_SERVER", "1") != "0"
+PORT = int(os.getenv("MEDIA_SERVER_PORT", "8502"))
+BIND = os.getenv("MEDIA_SERVER_BIND", "127.0.0.1")
+PUBLIC_URL = os.getenv("MEDIA_SERVER_URL", "")
+URL_TTL_SEC = 6 * 3600
+CHUNK_SIZE = 256 * 1024
+
+OUTPUTS_ROOT = SESSIONS_ROOT.parent.resolve()
+# 서버가 같은 프로세스에 있으므로 서명 키는 프로세스마다 새로 만들어도 됨 (재시작하면 링크만 새로 발급)
+_SECRET = os.getenv("MEDIA_SERVER_SECRET", "").encode() or os.urandom(32)
+
+
+def _sign(path: str, exp: int, download_name: Optional[str] = None) -> str:
+    msg = f"{path}:{exp}:{download_name or ''}"
+    return hmac.new(_SECRET, msg.encode("utf-8"), hashlib.sha256).hexdigest()[:32]
+
+
+def parse_range(header: Optional[str], size: int) -> Optional[Tuple[int, int]]:
+    """
+    Range 헤더 → (시작, 끝) 포함 구간. 헤더가 없거나 여러 구간이면 None (전체 전송).
+    만족할 수 없는 구간이면 ValueError (416).
+    """
+    if not header or not header.startswith("bytes=") or "," in header:
+        return None
+    start_s, _, end_s = header[len("bytes="):].strip().partition("-")
+    try:
+        if not start_s:
+            # bytes=-500 → 마지막 500바이트
+            length = int(end_s)
+            start, end = size - length, size - 1
+        else:
+            length = None
+            start = int(start_s)
+            end = int(end_s) if end_s else size - 1
+    except ValueError:
+        return None
+    if length is not None:
+        if length <= 0 or size == 0:
+            raise ValueError(header)
+        return max(0, start), end
+    if start >= size or end < start:
+        raise ValueError(header)
+    return start, min(end, size - 1)
+
+
+class _MediaHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, format, *args):
+        # 영상 탐색마다 요청이 수십 개 → 콘솔에 남기지 않음
+        pass
+
+    def do_HEAD(self):
+        self._handle(head=True)
+
+    def do_GET(self):
+        self._handle(head=False)
+
+    def _handle(self, head: bool) -> None:
+        url = urlsplit(self.path)
+        query = parse_qs(url.query)
+        path = unquote(url.path)
+        try:
+            exp = int(query.get("exp", ["0"])[0])
+        except ValueError:
+            exp = 0
+        sig = query.get("sig", [""])[0]
+        download_name = query.get("dl", [None])[0]
+        if exp < time.time() or not hmac.compare_digest(sig, _sign(path, exp, download_name)):
+            self.send_error(HTTPStatus.FORBIDDEN)
+            return
+
+        if path.startswith("/session-zip/"):
+            session_id = path[len("/session-zip/"):]
+            try:
+                file_path = update_session_zip(session_id)
+            except Exception as e:
+                print(f"[media_server] 세션 ZIP 생성 실패 {session_id}: {e}")
+                file_path = None
+            download_name = download_name or f"{session_id}.zip"
+        elif path.startswith("/media/"):
+            file_path = (OUTPUTS_ROOT / path[len("/media/"):]).resolve()
+            if OUTPUTS_ROOT not in file_path.parents:
+                self.send_error(HTTPStatus.FORBIDDEN)
+                return
+        else:
+            file_path = None
+        if file_path is None or not file_path.is_file():
+            self.send_error(HTTPStatus.NOT_FOUND)
+            return
+        self._send_file(file_path, download_name, head)
+
+    def _send_file(self, file_path: Path, download_name: Optional[str], head: bool) -> None:
+        try:
+            f = open(file_path, "rb")
+        except OSError:
+            self.send_error(HTTPStatus.NOT_FOUND)
+            return
+        with f:
+            st_ = os.fstat(f.fileno())
+            size = st_.st_size
+            etag = f'"{size:x}-{st_.st_mtime_ns:x}"'
+            range_header = self.headers.get("Range")
+            if_range = self.headers.get("If-Range")
+            if if_range and if_range != etag:
+                # 그 사이 파일이 바뀜 → 이어받기 말고 전체를 새로
+                range_header = None
+            try:
+                byte_range = parse_range(range_header, size)
+            except ValueError:
+                self.send_response(HTTPStatus.REQUESTED_RANGE_NOT_SATISFIABLE)
+                self.send_header("Content-Range", f"bytes */{size}")
+                self.send_header("Content-Length", "0")
+                self.end_headers()
+                return
+
+            start, end = byte_range or (0, size - 1)
+            length = max(0, end - start + 1)
+            self.send_response(HTTPStatus.PARTIAL_CONTENT if byte_range else HTTPStatus.OK)
+            self.send_header("Content-Type", mimetypes.guess_type(file_path.name)[0] or "application/octet-stream")
+            self.send_header("Content-Length", str(length))
+            self.send_header("Accept-Ranges", "bytes")
+            self.send_header("ETag", etag)
+            self.send_header("Cache-Control", "private, max-age=3600")
+            if byte_range:
+                self.send_header("Content-Range", f"bytes {start}-{end}/{size}")
+            if download_name:
+                self.send_header("Content-Disposition", f"attachment; filename*=UTF-8''{quote(download_name, safe='')}")
+            self.end_headers()
+            if head:
+                return
+
+            f.seek(start)
+            remaining = length
+            try:
+                while remaining > 0:
+                    chunk = f.read(min(CHUNK_SIZE, remaining))
+                    if not chunk:
+                        break
+                    self.wfile.write(chunk)
+                    remaining -= len(chunk)
+            except (BrokenPipeError, ConnectionResetError):
+                # 브라우저가 탐색하면서 이전 요청을 끊는 건 정상
+                pass
+
+
+# ---------------------------------------------------------
+# 서버 실행 (프로세스당 하나)
+# ---------------------------------------------------------
+_SERVER: Optional[ThreadingHTTPServer] = None
+_SERVER_LOCK = threading.Lock()
+
+
+def start_media_server() -> bool:
+    """서버 시작. Streamlit 리런마다 불려도 한 번만 뜬다. Returns: 사용 가능 여부."""
+    global _SERVER
+    if not ENABLED or not PUBLIC_URL:
+        return False
+    with _SERVER_LOCK:
+        if _SERVER is not None:
+            return True
+        try:
+            server = ThreadingHTTPServer((BIND, PORT), _MediaHandler)
+        except OSError as e:
+            print(f"[media_server] 포트 {PORT} 사용 불가, Streamlit 전송으로 대체: {e}")
+            return False
+        server.daemon_threads = True
+        threading.Thread(target=server.serve_forever, name="media-server", daemon=True).start()
+        _SERVER = server
+        return True
+
+
+def is_running() -> bool:
+    """링크를 발급할 수 있는지 (서버가 떠 있고 MEDIA_SERVER_URL이 있음)."""
+    return _SERVER is not None and bool(PUBLIC_URL)
+
+
+def _signed_url(path: str, download_name: Optional[str], ttl: int) -> str:
+    exp = int(time.time()) + ttl
+    url = f"{PUBLIC_URL.rstrip('/')}{quote(path)}?exp={exp}&sig={_sign(path, exp, download_name)}"
+    if download_name:
+        url += f"&dl={quote(download_name, safe='')}"
+    return url
+
+
+def media_url(path, download_name: Optional[str] = None, ttl: int = URL_TTL_SEC) -> Optional[str]:
+    """outputs/ 아래 파일의 스트리밍 URL. 서버가 없거나 outputs 밖이면 None."""
+    if not is_running():
+        return None
+    resolved = Path(path).resolve()
+    if OUTPUTS_ROOT not in resolved.parents:
+        return None
+    return _signed_url(f"/media/{resolved.relative_to(OUTPUTS_ROOT).as_posix()}", download_name, ttl)
+
+
+def session_zip_url(session_id: str, ttl: int = URL_TTL_SEC) -> Optional[str]:
+    """클릭하면 그때 세션 ZIP을 갱신해서 내려주는 URL."""
+    if not is_running():
+        return None
+    return _signed_url(f"/session-zip/{session_id}", None, ttl)
+
+
+# ---------------------------------------------------------
+# 페이지용 헬퍼 (서버가 없으면 예전 방식으로)
+# ---------------------------------------------------------
+def show_video(path) -> None:
+    """st.video(path) 대신. 브라우저가 서버에서 직접 Range로 받아 재생 (서버가 없으면 st.video — 파일 전체를 메모리에)."""
+    st.video(media_url(path) or str(path))
+
+
+def download_link(label: str, path, file_name: str, mime: Optional[str] = None, **kwargs) -> None:
+    """파일을 읽어 download_button에 넘기는 대신 스트리밍 다운로드 링크."""
+    url = media_url(path, download_name=file_name)
+    if url:
+        st.link_button(label, url, **kwargs)
+        return
+    # 서버가 없을 때: 클릭할 때만 파일을 읽도록 지연 (바이트로 넘김 — 파일 객체는 Streamlit이 닫지 않음)
+    st.download_button(label, data=lambda: Path(path).read_bytes(), file_name=file_name, mime=mime, **kwargs)
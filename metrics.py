@@ -0,0 +1,498 @@
+# -*- coding: utf-8 -*-
+"""
+프로세스 내 메트릭 레지스트리 + Prometheus 텍스트 엔드포인트.
+session_logger의 JSONL은 세션별이라, 전체 세션을 합친 TTS 호출률·429 비율·Runway 대기·인코딩 처리량을
+실시간으로 보려면 파일을 뒤져야 했다. 여기서는 카운터/게이지/히스토그램을 메모리에 모아 로컬 포트로 내보낸다.
+
+- Counter / Gauge / Histogram: 라벨 값 조합별로 값 보관 (스레드 안전)
+- register_collector(fn): 긁어갈 때마다 값을 계산하는 게이지 (예: 렌더 슬롯 사용량)
+- 기본 메트릭: log_api_call → api_*, 렌더 함수(@timed_render) → render_*, 렌더 스케줄러 → render_slot_*
+- 라벨: engine(API 이름), model(엔드포인트/모델), voice, step(tracing.trace_step으로 표시된 현재 단계)
+
+- 백그라운드 잡(job_runner) 프로세스는 start_metrics_export()로 자기 값을 METRICS_DIR/<pid>-<시작시각>.json에
+  주기적으로 쓰고, 엔드포인트를 띄운 프로세스가 긁어갈 때 합쳐서 내보낸다.
+  끝난 프로세스의 카운터·히스토그램은 레지스트리에 접어 넣고 파일을 지움 (게이지는 살아 있는 프로세스 것만)
+
+환경변수:
+    METRICS_PORT (기본 9108)   METRICS_BIND (기본 127.0.0.1 — 외부에 열지 않음)
+    METRICS=0  엔드포인트를 띄우지 않음 (수집은 계속)
+    METRICS_DIR (기본 outputs/.metrics)  잡 프로세스 값 교환 폴더 (같은 머신 안에서만)
+
+    curl -s localhost:9108/metrics
+"""
+import atexit
+import contextvars
+import functools
+import inspect
+import json
+import math
+import os
+import threading
+import time
+from collections import defaultdict
+from contextlib import contextmanager
+from http import HTTPStatus
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from typing import Callable, Dict, Iterable, List, Optional, Sequence, Tuple
+
+from tracing import current_step
+
+ENABLED = os.getenv("METRICS", "1") != "0"
+PORT = int(os.getenv("METRICS_PORT", "9108"))
+BIND = os.getenv("METRICS_BIND", "127.0.0.1")
+METRICS_DIR = os.getenv("METRICS_DIR", "outputs/.metrics")
+# 잡 프로세스가 값을 파일로 내보내는 주기 (초)
+EXPORT_INTERVAL_SEC = 5.0
+
+# 초 단위 — API 호출(수백 ms~Runway 수 분)과 인코딩(수 초~수 분)을 같이 담을 수 있게
+DEFAULT_BUCKETS = (0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300, 600)
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _fmt_value(v: float) -> str:
+    if v == math.inf:
+        return "+Inf"
+    if float(v).is_integer():
+        return str(int(v))
+    return repr(float(v))
+
+
+def _fmt_labels(names: Sequence[str], values: Sequence[str], extra: str = "") -> str:
+    parts = [f'{n}="{_escape(v)}"' for n, v in zip(names, values)]
+    if extra:
+        parts.append(extra)
+    return "{" + ",".join(parts) + "}" if parts else ""
+
+
+def _add_items(values: dict, items) -> None:
+    """values(라벨 값 튜플 → 값)에 items를 더함. 히스토그램 값은 리스트끼리 원소별 합."""
+    for key, value in items:
+        key = tuple(key)
+        cur = values.get(key)
+        if isinstance(value, list):
+            values[key] = list(value) if cur is None else [a + b for a, b in zip(cur, value)]
+        else:
+            values[key] = (cur or 0) + value
+
+
+def _pid_alive(pid: int) -> bool:
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    except OSError:
+        return False
+    return True
+
+
+# ---------------------------------------------------------
+# 메트릭 종류
+# ---------------------------------------------------------
+class _Metric:
+    kind = ""
+
+    def __init__(self, name: str, help_text: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.help = help_text
+        self.labelnames = tuple(labelnames)
+        self._values: Dict[Tuple[str, ...], object] = {}
+        self._lock = threading.Lock()
+
+    def _key(self, labels: dict) -> Tuple[str, ...]:
+        # 빠진 라벨은 빈 문자열 (호출부마다 모든 라벨을 알 필요 없게)
+        return tuple("" if labels.get(n) is None else str(labels[n]) for n in self.labelnames)
+
+    def _header(self) -> List[str]:
+        return [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.kind}"]
+
+    def items(self) -> List[tuple]:
+        """[(라벨 값 튜플, 값)] 복사본 (히스토그램 값은 [구간별 개수..., 합계, 개수])."""
+        with self._lock:
+            return sorted((k, list(v) if isinstance(v, list) else v) for k, v in self._values.items())
+
+    def merge(self, items) -> None:
+        """다른 프로세스의 값을 더함."""
+        with self._lock:
+            _add_items(self._values, items)
+
+    def render(self, items=None) -> List[str]:
+        raise NotImplementedError
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def inc(self, amount: float = 1, **labels) -> None:
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def render(self, items=None) -> List[str]:
+        items = self.items() if items is None else items
+        return self._header() + [f"{self.name}{_fmt_labels(self.labelnames, k)} {_fmt_value(v)}" for k, v in items]
+
+
+class Gauge(Counter):
+    kind = "gauge"
+
+    def set(self, value: float, **labels) -> None:
+        with self._lock:
+            self._values[self._key(labels)] = value
+
+    def dec(self, amount: float = 1, **labels) -> None:
+        self.inc(-amount, **labels)
+
+    @contextmanager
+    def track_inprogress(self, **labels):
+        self.inc(**labels)
+        try:
+            yield
+        finally:
+            self.dec(**labels)
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, name: str, help_text: str, labelnames: Sequence[str] = (),
+                 buckets: Sequence[float] = DEFAULT_BUCKETS):
+        super().__init__(name, help_text, labelnames)
+        self.buckets = tuple(sorted(buckets)) + (math.inf,)
+
+    def observe(self, value: float, **labels) -> None:
+        key = self._key(labels)
+        with self._lock:
+            state = self._values.get(key)
+            if state is None:
+                # [구간별 개수..., 합계, 개수]
+                state = self._values[key] = [0] * len(self.buckets) + [0.0, 0]
+            for i, upper in enumerate(self.buckets):
+                if value <= upper:
+                    state[i] += 1
+                    break
+            state[-2] += value
+            state[-1] += 1
+
+    @contextmanager
+    def time(self, **labels):
+        t0 = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - t0, **labels)
+
+    def render(self, items=None) -> List[str]:
+        items = self.items() if items is None else items
+        lines = self._header()
+        for key, state in items:
+            cumulative = 0
+            for upper, n in zip(self.buckets, state):
+                cumulative += n
+                le = f'le="{_fmt_value(upper)}"'
+                lines.append(f"{self.name}_bucket{_fmt_labels(self.labelnames, key, le)} {cumulative}")
+            lines.append(f"{self.name}_sum{_fmt_labels(self.labelnames, key)} {_fmt_value(round(state[-2], 6))}")
+            lines.append(f"{self.name}_count{_fmt_labels(self.labelnames, key)} {state[-1]}")
+        return lines
+
+
+# ---------------------------------------------------------
+# 레지스트리
+# ---------------------------------------------------------
+# collector: () -> [(이름, 종류, 설명, [(라벨 dict, 값), ...]), ...]
+Collector = Callable[[], Iterable[Tuple[str, str, str, List[Tuple[dict, float]]]]]
+
+
+class Registry:
+    def __init__(self):
+        self._metrics: Dict[str, _Metric] = {}
+        self._collectors: List[Collector] = []
+        self._lock = threading.Lock()
+        self._fold_lock = threading.Lock()  # 끝난 프로세스 파일을 두 번 접지 않도록
+
+    def _get_or_create(self, cls, name: str, help_text: str, labelnames: Sequence[str], **kwargs):
+        with self._lock:
+            metric = self._metrics.get(name)
+            if metric is None:
+                metric = self._metrics[name] = cls(name, help_text, labelnames, **kwargs)
+            elif type(metric) is not cls or metric.labelnames != tuple(labelnames):
+                raise ValueError(f"메트릭 {name}이 다른 종류/라벨로 이미 등록됨")
+            return metric
+
+    def counter(self, name: str, help_text: str, labelnames: Sequence[str] = ()) -> Counter:
+        return self._get_or_create(Counter, name, help_text, labelnames)
+
+    def gauge(self, name: str, help_text: str, labelnames: Sequence[str] = ()) -> Gauge:
+        return self._get_or_create(Gauge, name, help_text, labelnames)
+
+    def histogram(self, name: str, help_text: str, labelnames: Sequence[str] = (),
+                  buckets: Sequence[float] = DEFAULT_BUCKETS) -> Histogram:
+        return self._get_or_create(Histogram, name, help_text, labelnames, buckets=buckets)
+
+    def register_collector(self, fn: Collector) -> None:
+        with self._lock:
+            self._collectors.append(fn)
+
+    def snapshot(self) -> dict:
+        """다른 프로세스로 넘길 값 (start_metrics_export가 파일로 씀)."""
+        with self._lock:
+            metrics = list(self._metrics.values())
+        return {
+            m.name: {
+                "kind": m.kind, "help": m.help, "labelnames": list(m.labelnames),
+                "buckets": [b for b in getattr(m, "buckets", ()) if b != math.inf],
+                "items": [[list(k), v] for k, v in m.items()],
+            }
+            for m in metrics
+        }
+
+    def _family(self, name: str, fam: dict) -> _Metric:
+        if fam["kind"] == "histogram":
+            return self.histogram(name, fam["help"], fam["labelnames"], buckets=fam["buckets"] or DEFAULT_BUCKETS)
+        if fam["kind"] == "gauge":
+            return self.gauge(name, fam["help"], fam["labelnames"])
+        return self.counter(name, fam["help"], fam["labelnames"])
+
+    def collect_exports(self, export_dir=None) -> Dict[str, list]:
+        """
+        다른 프로세스(잡)가 내보낸 값 {메트릭 이름: items}. 살아 있는 프로세스 것만 돌려주고,
+        끝난 프로세스의 카운터·히스토그램은 이 레지스트리에 접어 넣은 뒤 파일을 지움.
+        """
+        extra: Dict[str, list] = defaultdict(list)
+        export_dir = Path(export_dir or METRICS_DIR)
+        if not export_dir.is_dir():
+            return extra
+        with self._fold_lock:
+            for path in sorted(export_dir.glob("*.json")):
+                try:
+                    pid = int(path.stem.split("-")[0])
+                    snap = json.loads(path.read_text(encoding="utf-8"))
+                except (ValueError, OSError):
+                    continue
+                if pid == os.getpid():
+                    continue
+                alive = _pid_alive(pid)
+                for name, fam in snap.items():
+                    try:
+                        metric = self._family(name, fam)
+                    except (KeyError, TypeError, ValueError):
+                        continue
+                    if alive:
+                        extra[name].extend(fam["items"])
+                    elif metric.kind != "gauge":
+                        metric.merge(fam["items"])
+                if not alive:
+                    path.unlink(missing_ok=True)
+        return extra
+
+    def render(self) -> str:
+        """Prometheus 텍스트 형식 (version 0.0.4). 잡 프로세스가 내보낸 값도 합침."""
+        extra = self.collect_exports()
+        with self._lock:
+            metrics = sorted(self._metrics.values(), key=lambda m: m.name)
+            collectors = list(self._collectors)
+        lines: List[str] = []
+        for metric in metrics:
+            if metric.name in extra:
+                values = dict(metric.items())
+                _add_items(values, extra[metric.name])
+                lines.extend(metric.render(sorted(values.items())))
+            else:
+                lines.extend(metric.render())
+        for fn in collectors:
+            try:
+                families = list(fn())
+            except Exception as e:
+                print(f"[metrics] collector 실패 {getattr(fn, '__name__', fn)}: {e}")
+                continue
+            for name, kind, help_text, samples in families:
+                lines += [f"# HELP {name} {help_text}", f"# TYPE {name} {kind}"]
+                for labels, value in samples:
+                    lines.append(f"{name}{_fmt_labels(list(labels), list(labels.values()))} {_fmt_value(value)}")
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = Registry()
+counter = REGISTRY.counter
+gauge = REGISTRY.gauge
+histogram = REGISTRY.histogram
+register_collector = REGISTRY.register_collector
+
+
+# ---------------------------------------------------------
+# 기본 메트릭
+# ---------------------------------------------------------
+API_CALLS = counter("api_calls_total", "외부 API 호출 수 (status: ok / error / rate_limited)",
+                    ("engine", "model", "voice", "step", "status"))
+API_SECONDS = histogram("api_call_seconds", "외부 API 호출 소요 시간 (runway_gen4 = Runway 제출부터 결과까지)",
+                        ("engine", "model", "voice"))
+API_IN_FLIGHT = gauge("api_in_flight", "진행 중인 외부 API 호출 수", ("engine",))
+
+RENDER_CALLS = counter("render_calls_total", "렌더 함수 호출 수 (status: ok / error)", ("op", "step", "status"))
+RENDER_SECONDS = histogram("render_seconds", "렌더(인코딩/합성) 소요 시간", ("op", "step"))
+RENDER_OUTPUT_BYTES = counter("render_output_bytes_total", "렌더 결과 파일 크기 합 (처리량 = rate / rate(render_seconds_sum))",
+                              ("op",))
+RENDER_IN_FLIGHT = gauge("render_in_flight", "진행 중인 렌더 함수 수", ("op",))
+
+
+def is_rate_limited(error: Optional[dict], result: Optional[dict] = None) -> bool:
+    """429(요청 한도)인지. 예외(error_info) 또는 예외 없이 상태 코드만 돌려받은 경우(result_summary, CLOVA)."""
+    if result and result.get("status_code") == 429:
+        return True
+    if not error:
+        return False
+    text = f"{error.get('type', '')} {error.get('message', '')}".lower()
+    return "ratelimit" in text or "rate limit" in text or "429" in text or "resource_exhausted" in text
+
+
+def api_status(error: Optional[dict], result: Optional[dict] = None) -> str:
+    if is_rate_limited(error, result):
+        return "rate_limited"
+    if error is not None or (result and (result.get("status_code") or 200) >= 400):
+        return "error"
+    return "ok"
+
+
+_OUTPUT_PARAMS = ("output_path", "out_path")
+# 지금 실행 중인 렌더 함수 이름 (proc_accounting이 ffmpeg 프로세스를 어느 함수가 띄웠는지 붙일 때 씀)
+_RENDER_OP: "contextvars.ContextVar[str]" = contextvars.ContextVar("render_op", default="")
+
+
+def current_render_op() -> str:
+    return _RENDER_OP.get()
+
+
+def timed_render(op: Optional[str] = None):
+    """
+    렌더 함수 데코레이터: 소요 시간·호출 수·진행 중 개수, 결과 파일(output_path/out_path 인자) 크기.
+    예외뿐 아니라 False나 에러 메시지 문자열을 돌려준 경우(실패를 반환값으로 알리는 tts_core 함수)도 error.
+    """
+    def deco(fn):
+        label = op or fn.__name__
+        params = inspect.signature(fn).parameters
+        out_param = next((p for p in _OUTPUT_PARAMS if p in params), None)
+        out_index = list(params).index(out_param) if out_param else None
+
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            step = current_step()
+            RENDER_IN_FLIGHT.inc(op=label)
+            op_token = _RENDER_OP.set(label)
+            t0 = time.perf_counter()
+            ok = False
+            try:
+                result = fn(*args, **kwargs)
+                ok = result is not False and not isinstance(result, str)
+                return result
+            finally:
+                _RENDER_OP.reset(op_token)
+                RENDER_IN_FLIGHT.dec(op=label)
+                RENDER_SECONDS.observe(time.perf_counter() - t0, op=label, step=step)
+                RENDER_CALLS.inc(op=label, step=step, status="ok" if ok else "error")
+                if ok and out_param:
+                    out = kwargs.get(out_param, args[out_index] if out_index < len(args) else None)
+                    try:
+                        RENDER_OUTPUT_BYTES.inc(os.path.getsize(out), op=label)
+                    except (OSError, TypeError):
+                        pass
+        return wrapper
+    return deco
+
+
+# ---------------------------------------------------------
+# 엔드포인트 (프로세스당 하나)
+# ---------------------------------------------------------
+class _MetricsHandler(BaseHTTPRequestHandler):
+    def log_message(self, format, *args):
+        # 15초마다 긁어감 → 콘솔에 남기지 않음
+        pass
+
+    def do_GET(self):
+        if self.path.split("?", 1)[0] not in ("/metrics", "/"):
+            self.send_error(HTTPStatus.NOT_FOUND)
+            return
+        body = REGISTRY.render().encode("utf-8")
+        self.send_response(HTTPStatus.OK)
+        self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+
+_SERVER: Optional[ThreadingHTTPServer] = None
+_SERVER_LOCK = threading.Lock()
+
+
+def start_metrics_server() -> bool:
+    """엔드포인트 시작. Streamlit 리런마다 불려도 한 번만 뜬다. Returns: 실행 중 여부."""
+    global _SERVER
+    if not ENABLED:
+        return False
+    with _SERVER_LOCK:
+        if _SERVER is not None:
+            return True
+        try:
+            server = ThreadingHTTPServer((BIND, PORT), _MetricsHandler)
+        except OSError as e:
+            print(f"[metrics] 포트 {PORT} 사용 불가, 엔드포인트 없이 동작: {e}")
+            return False
+        server.daemon_threads = True
+        threading.Thread(target=server.serve_forever, name="metrics-server", daemon=True).start()
+        _SERVER = server
+        return True
+
+
+# ---------------------------------------------------------
+# 잡 프로세스 → 엔드포인트 프로세스
+# ---------------------------------------------------------
+_EXPORT_PATH: Optional[Path] = None
+_EXPORT_LOCK = threading.Lock()
+
+
+def flush_metrics() -> None:
+    """이 프로세스의 값을 METRICS_DIR에 씀 (start_metrics_export 이후에만)."""
+    if _EXPORT_PATH is None:
+        return
+    with _EXPORT_LOCK:
+        tmp = _EXPORT_PATH.with_suffix(".tmp")
+        try:
+            tmp.write_text(json.dumps(REGISTRY.snapshot(), ensure_ascii=False), encoding="utf-8")
+            os.replace(tmp, _EXPORT_PATH)
+        except OSError as e:
+            print(f"[metrics] 내보내기 실패 {_EXPORT_PATH}: {e}")
+
+
+def start_metrics_export() -> bool:
+    """
+    잡 프로세스용: EXPORT_INTERVAL_SEC마다 값을 METRICS_DIR로 내보냄. 끝날 때 한 번 더 (atexit).
+    Returns: 내보내는 중인지.
+    """
+    global _EXPORT_PATH
+    if not ENABLED:
+        return False
+    with _EXPORT_LOCK:
+        if _EXPORT_PATH is not None:
+            return True
+        export_dir = Path(METRICS_DIR)
+        try:
+            export_dir.mkdir(parents=True, exist_ok=True)
+        except OSError as e:
+            print(f"[metrics] {export_dir} 생성 실패, 내보내지 않음: {e}")
+            return False
+        # pid 재사용으로 끝난 프로세스 파일을 덮어쓰지 않게 시작 시각을 붙임
+        _EXPORT_PATH = export_dir / f"{os.getpid()}-{int(time.time() * 1000)}.json"
+
+    def _loop():
+        while True:
+            time.sleep(EXPORT_INTERVAL_SEC)
+            flush_metrics()
+
+    threading.Thread(target=_loop, name="metrics-export", daemon=True).start()
+    atexit.register(flush_metrics)
+    flush_metrics()
+    return True
@@ -0,0 +1,487 @@
+# -*- coding: utf-8 -*-
+"""
+Mode B(텍스트 기반) 헤드리스 파이프라인.
+run_text_analysis_mode의 각 단계를 Streamlit 위젯/세션 상태 없이 실행한다.
+분석 → 캐릭터 → 구간 → 대본 → TTS → 이미지 매칭 → Runway → 최종 합성까지
+UI와 같은 헬퍼(b_text_based)를 쓰고, UI가 읽는 것과 같은 버전 폴더/manifest를 남긴다.
+
+세션 폴더는 session_logger.bind_session으로 지정한다 (scripts/batch_mode_b.py 참고).
+"""
+import json
+import re
+import shutil
+import uuid
+from datetime import datetime
+from pathlib import Path
+from typing import Callable, Dict, Optional
+
+import b_text_based as mb
+from cancellation import Cancelled, check_cancelled
+from checkpoint import CHECKPOINT_FILE, SceneCheckpoint
+from profiling import profile_stage, profiled
+from render_cache import RenderCache
+from render_scheduler import render_slot
+from sdk_clients import get_openai
+from session_logger import get_session_dir, log_event
+from version_catalog import get_catalog
+from tts_core import concat_videos_with_audio
+
+BASE_DIR = Path(__file__).resolve().parent
+CHARACTER_DIR = BASE_DIR / "character"
+TXT_ROOT = CHARACTER_DIR / "txt"  # 하위에 048/, 049/, 050/ 같은 월령 폴더가 있음
+
+# 단계 순서. until 인자로 중간에 멈출 수 있다.
+STAGES = ("analysis", "script", "tts", "match", "video", "final")
+
+# UI 기본값과 동일한 옵션 프리셋
+DEFAULT_PRESET = {
+    "script_mode": "Standard",          # Standard | Conversation | Comprehensive
+    "duration": None,                   # Short | Standard | Long (None이면 월령 추천값)
+    "segment_index": 0,                 # Step 2 추천 구간 중 선택할 번호
+    "engine": "clova",                  # clova | gpt | gemini-pro
+    "speaker_mode": "다수 화자 (자동 배정)",
+    "voice_speed": 0.8,
+    "use_bgm": False,
+    "bgm_volume": 0.15,
+    "subtitle_mode": "🏳️ 기본 (흰색 통일)",
+    "runway_prompt": (
+        "Characters and elements within a children's book illustration move, as if coming to life, "
+        "with gentle cinematic movement, without adding anything new."
+    ),
+    "default_duration": 5,
+}
+
+PRESETS: Dict[str, dict] = {
+    "default": {},
+    "conversation": {"script_mode": "Conversation", "subtitle_mode": "🌈 캐릭터별 자동 컬러링", "use_bgm": True},
+    "comprehensive": {"script_mode": "Comprehensive", "use_bgm": True},
+    "gpt_narrator": {"engine": "gpt", "speaker_mode": "단일 화자 (Narrator Only)"},
+}
+
+
+class BookFailed(Exception):
+    """책 하나의 파이프라인이 더 진행할 수 없을 때."""
+
+
+def load_preset(name_or_path: Optional[str] = None, overrides: Optional[dict] = None) -> dict:
+    """프리셋 이름 또는 JSON 파일 경로 → DEFAULT_PRESET 위에 덮어쓴 옵션 dict."""
+    preset = dict(DEFAULT_PRESET)
+    if name_or_path:
+        if name_or_path in PRESETS:
+            preset.update(PRESETS[name_or_path])
+        else:
+            with open(name_or_path, "r", encoding="utf-8") as f:
+                preset.update(json.load(f))
+    for k, v in (overrides or {}).items():
+        if v is not None:
+            preset[k] = v
+    return preset
+
+
+def resolve_txt_path(book_name: str) -> Path:
+    """책 이름에서 월령(48개월/49개월/50개월)을 추출해 해당 txt 파일 경로를 반환 (app.py와 동일 규칙)."""
+    m = re.search(r"(\d+)개월", book_name)
+    age_folder = f"{int(m.group(1)):03d}" if m else "048"
+    return TXT_ROOT / age_folder / f"{book_name}.txt"
+
+
+def list_book_folders():
+    """character 폴더의 책 목록 (txt/json 폴더 + 표지 책 제외, app.py와 동일)."""
+    return sorted(
+        f.name for f in CHARACTER_DIR.iterdir()
+        if f.is_dir() and f.name not in ["txt", "json"] and "_표지_" not in f.name
+    )
+
+
+def _save_json(path: Path, data) -> None:
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(data, f, ensure_ascii=False, indent=4)
+
+
+def _next_ver(keys, prefix: tuple) -> int:
+    """버전 키 튜플들 중 prefix가 같은 것들의 마지막 자리 최댓값 + 1."""
+    n = len(prefix)
+    existing = [k[n] for k in keys if tuple(k[:n]) == prefix]
+    return (max(existing) + 1) if existing else 1
+
+
+def run_book(folder: Path, txt_file: Path, preset: dict, until: str = "final",
+             workers: Optional[dict] = None, log: Callable[[str], None] = print) -> dict:
+    """
+    책 한 권을 until 단계까지 실행하고 단계별 산출물 경로를 담은 dict를 반환합니다.
+    현재 바인딩된 세션 폴더(<session>/<동화이름>/...)에 UI와 같은 구조로 저장됩니다.
+    """
+    if until not in STAGES:
+        raise ValueError(f"until은 {STAGES} 중 하나여야 합니다: {until}")
+    stop_after = STAGES.index(until)
+    if not txt_file.exists():
+        raise BookFailed(f"TXT 파일이 없습니다: {txt_file}")
+
+    session_root = get_session_dir() or Path("outputs")
+    story_dir_name = txt_file.stem
+    safe_name = story_dir_name
+    mode = preset["script_mode"]
+    full_text = txt_file.read_text(encoding="utf-8")
+    extracted_title = mb.extract_title_from_filename(txt_file.name)
+    summary = {"book": story_dir_name, "mode": mode}
+
+    TEXT_OUT = session_root / story_dir_name / "TEXT"
+    TEXT_OUT.mkdir(parents=True, exist_ok=True)
+
+    def say(msg):
+        log(f"[{story_dir_name}] {msg}")
+
+    log_event("modeB_batch_book_start", {"book": story_dir_name, "preset": preset, "until": until})
+
+    # -----------------------------------------
+    # [Step 1 / 1.5 / 2] 분석 · 캐릭터 · 구간
+    # -----------------------------------------
+    say("동화 분석 중...")
+    analysis = mb.analyze_story_structure(full_text, known_title=extracted_title)
+    _save_json(TEXT_OUT / f"analysis_{safe_name}.json", analysis)
+    log_event("modeB_step1_analysis_done", {"book": story_dir_name, "result": analysis})
+
+    say("등장인물 분석 중...")
+    char_info = mb.analyze_characters_and_speakers(get_openai(), full_text)
+    for char in char_info.get("characters", []):
+        char["voice_label"] = mb.GPT_VOICE_TO_UI_LABEL.get(char.get("voice_type", "narrator"), "🎙️ 나레이터")
+    _save_json(TEXT_OUT / f"characters_{safe_name}.json", char_info)
+
+    say("예고편 구간 추천 중...")
+    segments_result = mb.recommend_trailer_segments(full_text, analysis)
+    _save_json(TEXT_OUT / f"segments_{safe_name}.json", segments_result)
+    options = segments_result.get("options", [])
+    if not options:
+        raise BookFailed("예고편 구간 추천 결과가 없습니다.")
+    segment = options[min(int(preset["segment_index"]), len(options) - 1)]
+    target_text = str(segment.get("target_text") or "")
+    log_event("modeB_step2_segment_chosen", {"segment": segment})
+    summary["analysis"] = str(TEXT_OUT)
+    if stop_after == STAGES.index("analysis"):
+        return summary
+
+    # -----------------------------------------
+    # [Step 3] 대본
+    # -----------------------------------------
+    months = mb.extract_age_from_filename(txt_file.name)
+    rec_info = mb.get_recommendation_by_age(months)
+    duration_key = preset.get("duration") or rec_info["default_option"]
+
+    mode_dir = TEXT_OUT / mode
+    mode_dir.mkdir(parents=True, exist_ok=True)
+    sorted_versions, _ = mb.get_sorted_versions(mode_dir, safe_name, mode)
+    script_ver = (sorted_versions[0] + 1) if sorted_versions else 1
+
+    say(f"'{mode}' 대본 작성 중 (길이: {duration_key})...")
+    script = mb.generate_script_for_mode(
+        mode, target_text, duration_key, rec_info, full_text, char_info, analysis_data=analysis,
+    )
+    script_path = mode_dir / f"script_{safe_name}_{mode}_v{script_ver}.json"
+    get_catalog().write_manifest("script", mode_dir, (script_ver,), script_path, script, book=safe_name)
+    scripts = script.get("subtitles", [])
+    if not scripts:
+        raise BookFailed("생성된 대본이 비어 있습니다.")
+    log_event("modeB_step3_script_finalized", {"subtitles": scripts})
+    summary["script"] = str(script_path)
+    if stop_after == STAGES.index("script"):
+        return summary
+
+    # -----------------------------------------
+    # [Step 4] TTS
+    # -----------------------------------------
+    engine = preset["engine"]
+    speaker_mode = preset["speaker_mode"]
+    tts_base = session_root / story_dir_name / "tts" / mode
+    tts_base.mkdir(parents=True, exist_ok=True)
+    tts_keys, _ = mb.get_tts_versions_v2(tts_base)
+    audio_ver = _next_ver(tts_keys, (script_ver,))
+    tts_folder = f"v{script_ver}_{audio_ver}_{engine.replace(' ', '_')}"
+    tts_dir = tts_base / tts_folder
+    tts_dir.mkdir(parents=True, exist_ok=True)
+
+    if speaker_mode == "단일 화자 (Narrator Only)":
+        speakers = ["narrator"] * len(scripts)
+    else:
+        speakers = [s["speaker"] for s in scripts]
+    speed_int = mb.voice_speed_to_clova(float(preset["voice_speed"]))
+
+    say(f"TTS 생성 중 ({engine}, {len(scripts)}문장)...")
+    audio_data, full_audio = mb.synthesize_tts_version(
+        scripts, tts_dir, tts_folder, engine, speakers, speed_int,
+        mb.build_tts_style_prompts(scripts, char_info, speaker_mode),
+        uuid.uuid4().hex[:6],
+    )
+    get_catalog().write_manifest("tts", tts_base, (script_ver, audio_ver), tts_dir, {
+        "script_ver": script_ver,
+        "audio_ver": audio_ver,
+        "mode": mode,
+        "engine": engine,
+        "speed": speed_int,
+        "created_at": str(datetime.now()),
+        "scripts": scripts,
+        "audio_data": audio_data,
+        "full_audio_path": full_audio,
+    }, label=engine.replace(' ', '_'))
+    failed_tts = sum(1 for a in audio_data if not a.get("path"))
+    if failed_tts:
+        say(f"⚠️ TTS 실패 {failed_tts}건")
+    summary["tts"] = str(tts_dir)
+    if stop_after == STAGES.index("tts"):
+        return summary
+
+    # -----------------------------------------
+    # [Step 6] 이미지 매칭
+    # -----------------------------------------
+    candidates = mb.build_image_candidates(folder, txt_file)
+    if not candidates:
+        raise BookFailed(f"이미지가 없습니다: {folder}")
+    matches, cover_page_num, spoiler_limit_pg = mb.assign_images_to_scenes(scripts, candidates, target_text)
+    page_to_img = {c['page_num']: c['img_name'] for c in candidates}
+    log_event("modeB_step6_images_finalized", {
+        "selected_pages": [page_to_img[m['page']] for m in matches if m['page'] in page_to_img],
+    })
+    say(f"이미지 배정 완료 (표지 P.{cover_page_num}, 상한 P.{spoiler_limit_pg})")
+    summary["matches"] = matches
+    if stop_after == STAGES.index("match"):
+        return summary
+
+    # -----------------------------------------
+    # [Step 7] Runway 영상
+    # -----------------------------------------
+    video_base = session_root / story_dir_name / "video" / mode
+    video_base.mkdir(parents=True, exist_ok=True)
+    video_keys, _ = mb.get_video_versions_v3(video_base)
+    video_ver = _next_ver(video_keys, (script_ver, audio_ver))
+    video_dir = video_base / f"v{script_ver}_{audio_ver}_{video_ver}"
+
+    say("Runway 영상 생성 중...")
+    video_manifest = render_video_version(
+        video_dir, (script_ver, audio_ver, video_ver), matches, audio_data, candidates,
+        preset["runway_prompt"], int(preset["default_duration"]), workers=workers, log=say,
+    )
+    video_results = video_manifest["clips"]
+    summary["video"] = str(video_dir)
+    if stop_after == STAGES.index("video"):
+        return summary
+
+    # -----------------------------------------
+    # [Step 8] 최종 합성
+    # -----------------------------------------
+    use_bgm = bool(preset["use_bgm"])
+    bgm_dir = mb.resolve_bgm_dir(story_dir_name)
+    if use_bgm and not mb.bgm_dir_has_audio(bgm_dir):
+        say(f"BGM 폴더가 없어 BGM 없이 진행: {bgm_dir}")
+        use_bgm = False
+
+    final_base = session_root / story_dir_name / "final" / mode
+    final_base.mkdir(parents=True, exist_ok=True)
+    final_keys, _ = mb.get_final_versions(final_base)
+    final_ver = _next_ver(final_keys, (script_ver, audio_ver, video_ver))
+    final_dir = final_base / f"v{script_ver}_{audio_ver}_{video_ver}_{final_ver}"
+
+    say("최종 장면 합성 중...")
+    final_manifest = render_final_version(
+        final_dir, (script_ver, audio_ver, video_ver, final_ver), video_results, audio_data, scripts,
+        preset["subtitle_mode"], use_bgm, float(preset["bgm_volume"]), bgm_dir, cover_page_num,
+        session_root / story_dir_name / "render_cache", workers=workers, log=say,
+    )
+    final_movie = final_manifest["final_movie_path"]
+    log_event("modeB_batch_book_done", {"book": story_dir_name, "final_movie": final_movie})
+    say(f"✅ 최종 영상 완성: {final_movie}")
+    summary["final"] = final_movie
+    return summary
+
+
+# =========================================================
+# [Step 7 / 8] 버전 렌더 (배치 · 백그라운드 잡 공용)
+# =========================================================
+@profiled("Step 7 video")
+def render_video_version(video_dir, versions: tuple, matches: list, audio_data: list, candidates: list,
+                         prompt: str, default_duration: int = 5, workers: Optional[dict] = None,
+                         log: Callable[[str], None] = print,
+                         on_scene: Optional[Callable] = None,
+                         on_start: Optional[Callable[[list], None]] = None) -> dict:
+    """
+    Step 7: 장면별 Runway 영상 생성 → video/<mode>/v{S}_{A}_{V}/ 에 저장하고 manifest dict를 반환.
+    on_start(scene_specs)는 처리할 장면이 정해진 직후 한 번, on_scene(SceneResult)는 장면 하나가 끝날 때마다
+    (완료 순서가 아니라 장면 순서로) 호출됩니다. 장면 번호는 spec["scene"] (이미지 없는 장면은 빠짐).
+
+    장면별 진행은 video_dir/checkpoint.json에 기록됩니다. 한 장면이라도 실패하면 manifest를 쓰지 않고
+    BookFailed를 내므로 이 버전 폴더는 '미완성'으로 남고, 같은 폴더로 다시 실행하면 끝난 장면(Runway 작업
+    제출·다운로드·트림)은 건너뛰고 이어서 진행합니다.
+    """
+    video_dir = Path(video_dir)
+    script_ver, audio_ver, video_ver = versions
+    raw_dir, trimmed_dir = video_dir / "raw", video_dir / "trimmed"
+    raw_dir.mkdir(parents=True, exist_ok=True)
+    trimmed_dir.mkdir(parents=True, exist_ok=True)
+    uid = uuid.uuid4().hex[:6]
+
+    candidates_map = {c['page_num']: c for c in candidates}
+    scene_specs = mb.build_runway_scene_specs(matches, audio_data, candidates_map, default_duration)
+    if on_start:
+        on_start(scene_specs)
+
+    def _on_scene_done(res):
+        if res.ok:
+            log(f"Scene {res.value['scene']+1} 영상 완료")
+        else:
+            log(f"❌ Scene {res.value['scene']+1} 실패 ({res.failed_stage}): {res.error}")
+        if on_scene:
+            on_scene(res)
+
+    checkpoint = SceneCheckpoint(video_dir / CHECKPOINT_FILE)
+    log(f"Runway 장면 {len(scene_specs)}개 처리 시작")
+    scene_results = mb.run_runway_scenes(
+        scene_specs, prompt, raw_dir, trimmed_dir, uid, on_result=_on_scene_done, workers=workers,
+        checkpoint=checkpoint,
+    )
+    # 취소면 실패가 아니라 Cancelled로 (완료된 장면은 체크포인트에 남아 다음 실행이 이어받음)
+    check_cancelled()
+    failed = [r.value["scene"] + 1 for r in scene_results if not r.ok]
+    if failed:
+        # 일부 장면만 있는 manifest를 쓰면 Step 8에서 TTS와 장면 순서가 어긋나므로 미완성으로 남김
+        raise BookFailed(f"장면 {failed} 생성 실패 — 다시 실행하면 완료된 장면은 건너뛰고 이어서 진행합니다.")
+    video_results = [
+        {"raw": str(r.value["raw_path"]), "trimmed": str(r.value["trimmed_path"])}
+        for r in scene_results
+    ]
+    if not video_results:
+        raise BookFailed("생성된 장면 영상이 없습니다.")
+    manifest = {
+        "script_ver": script_ver,
+        "audio_ver": audio_ver,
+        "video_ver": video_ver,
+        "created_at": str(datetime.now()),
+        "prompt": prompt,
+        "full_visual_path": mb.write_full_visual(video_results, video_dir / f"full_visual_{uid}.mp4"),
+        "clips": video_results,
+    }
+    get_catalog().write_manifest("video", video_dir.parent, tuple(versions), video_dir, manifest)
+    return manifest
+
+
+@profiled("Step 8 final")
+def render_final_version(final_dir, versions: tuple, video_results: list, audio_data: list, scripts: list,
+                         subtitle_mode: str, use_bgm: bool, bgm_volume: float, bgm_dir, cover_page_num,
+                         cache_root, workers: Optional[dict] = None,
+                         log: Callable[[str], None] = print,
+                         on_scene: Optional[Callable] = None,
+                         on_start: Optional[Callable[[list], None]] = None) -> dict:
+    """
+    Step 8: 장면별 자막/TTS/BGM 합성 → 이어 붙이기 → final/<mode>/v{S}_{A}_{V}_{F}/ 에 저장하고 manifest dict를 반환.
+    on_start / on_scene은 render_video_version과 같음 (영상 파일이 없는 장면은 빠짐).
+    """
+    final_dir = Path(final_dir)
+    script_ver, audio_ver, video_ver, final_ver = versions
+    sub_dir = final_dir / "clips"
+    sub_dir.mkdir(parents=True, exist_ok=True)
+    uid = uuid.uuid4().hex[:6]
+
+    final_specs, missing = mb.build_final_scene_specs(
+        video_results, audio_data, scripts, sub_dir, uid,
+        subtitle_mode, use_bgm, Path(bgm_dir) if bgm_dir else bgm_dir, cover_page_num,
+    )
+    for i in missing:
+        log(f"⚠️ Scene {i+1} 영상 파일 없음")
+    if on_start:
+        on_start(final_specs)
+
+    def _on_clip_done(res):
+        for _, msg in res.value["notes"]:
+            log(msg)
+        if not res.ok:
+            log(f"❌ Scene {res.value['scene']+1} 합성 오류 ({res.failed_stage}): {res.error}")
+        if on_scene:
+            on_scene(res)
+
+    log(f"최종 장면 {len(final_specs)}개 합성 시작")
+    final_movie = final_dir / f"final_movie_{uid}.mp4"
+    try:
+        clip_results = mb.run_final_scenes(
+            final_specs, RenderCache(cache_root), use_bgm, bgm_volume, on_result=_on_clip_done, workers=workers,
+        )
+        check_cancelled()
+        final_clips = [
+            r.value["output"] for r in clip_results
+            if r.ok and Path(r.value["output"]).exists() and Path(r.value["output"]).stat().st_size > 0
+        ]
+        if not final_clips:
+            raise BookFailed("합성된 최종 장면이 없습니다.")
+
+        with render_slot("cpu"), profile_stage("Step 8 concat"):
+            concat_result = concat_videos_with_audio(final_clips, str(final_movie))
+        check_cancelled()
+    except Cancelled:
+        # 취소된 버전 폴더는 통째로 정리 (완료된 장면은 render_cache에 남아 다음 실행이 재사용)
+        shutil.rmtree(final_dir, ignore_errors=True)
+        raise
+    if concat_result is not True:
+        raise BookFailed(str(concat_result))
+    manifest = {
+        "version_info": {"s": script_ver, "a": audio_ver, "v": video_ver, "f": final_ver},
+        "created_at": str(datetime.now()),
+        "bgm_used": use_bgm,
+        "bgm_volume": bgm_volume,
+        "final_movie_path": str(final_movie),
+        "clips": final_clips,
+    }
+    get_catalog().write_manifest("final", final_dir.parent, tuple(versions), final_dir, manifest)
+    return manifest
+
+
+# =========================================================
+# 백그라운드 잡 진입점 (job_runner.JOB_KINDS에 등록)
+# =========================================================
+def _scene_reporter(job):
+    """SceneResult → job.scene(...) 상태 갱신 콜백.
+    res.index는 걸러진 spec 목록의 순번이므로, 잡 상태에는 spec의 원래 장면 번호로 기록."""
+    def _report(res):
+        scene = res.value["scene"]
+        if isinstance(res.error, Cancelled):
+            job.scene(scene, "cancelled")
+        elif not res.ok:
+            job.scene(scene, "failed", f"{res.failed_stage}: {res.error}")
+        elif res.value.get("cached"):
+            job.scene(scene, "cached", "♻️ 이전 렌더 재사용")
+        else:
+            job.scene(scene, "done")
+    return _report
+
+
+def _scene_seconds(audio_data: list, n: int, default: float) -> list:
+    """ETA용 장면별 길이 (TTS 길이, 없으면 기본 길이)."""
+    return [
+        (audio_data[i] or {}).get("duration") or default if i < len(audio_data) else default
+        for i in range(n)
+    ]
+
+
+def video_job(params: dict, job) -> dict:
+    """Step 7 잡. params는 UI가 넘긴 JSON (경로는 문자열)."""
+    manifest = render_video_version(
+        params["video_dir"], tuple(params["versions"]), params["matches"], params["audio_data"],
+        params["candidates"], params["prompt"], int(params.get("default_duration", 5)),
+        log=job.log, on_scene=_scene_reporter(job),
+        on_start=lambda specs: job.set_scenes([s["scene"] for s in specs], stage="runway"),
+    )
+    return {"dir": params["video_dir"], "manifest": str(Path(params["video_dir"]) / "manifest.json"),
+            "clips": len(manifest["clips"])}
+
+
+def final_job(params: dict, job) -> dict:
+    """Step 8 잡."""
+    seconds = _scene_seconds(params["audio_data"], len(params["video_results"]), 5.0)
+
+    def _on_start(specs):
+        scenes = [s["scene"] for s in specs]
+        job.set_scenes(scenes, stage="final", sizes=[seconds[i] for i in scenes])
+
+    manifest = render_final_version(
+        params["final_dir"], tuple(params["versions"]), params["video_results"], params["audio_data"],
+        params["scripts"], params["subtitle_mode"], params["use_bgm"], float(params["bgm_volume"]),
+        params.get("bgm_dir"), params.get("cover_page_num"), params["cache_root"],
+        log=job.log, on_scene=_scene_reporter(job), on_start=_on_start,
+    )
+    return {"dir": params["final_dir"], "manifest": str(Path(params["final_dir"]) / "manifest.json"),
+            "final_movie_path": manifest["final_movie_path"]}
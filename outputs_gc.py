@@ -0,0 +1,296 @@
+# -*- coding: utf-8 -*-
+"""
+outputs/ 디스크 용량 관리 (쿼터 기반 GC).
+여러 날 이어지는 워크숍에서 preview_base_*.mp4, *_sub.mp4, *_audio.mp4, *_raw.mp4, TTS 세그먼트 같은
+중간 산출물이 계속 쌓여 디스크가 차면 인코딩이 실패하므로, 쿼터를 넘으면 오래 안 쓴 것부터 지운다.
+
+- 쿼터: 환경변수 OUTPUTS_QUOTA_GB (기본 50). 넘으면 쿼터의 GC_TARGET_RATIO(기본 0.9)까지 내려가도록 삭제
+- 순서: 저장소 고아 객체 → 중간 산출물 → 최종본, 같은 등급 안에서는 마지막 접근(atime/mtime) 오래된 순 (LRU)
+- 절대 안 지우는 것:
+  · 버전 카탈로그에서 단계(tts/preview/video/final)별 최신 버전 폴더와 그 manifest가 가리키는 파일
+  · 장면 체크포인트(Step 7 checkpoint.json, Mode A step3_checkpoint_*.json)가 가리키는 파일 (재개용)
+  · 캐시된 세션 ZIP이 담고 있는 파일 (다음 ZIP 갱신 때 다시 담아야 함) 과 ZIP을 만드는 중인 세션
+    (session_logger.ZIP_PIN_FILE)
+  · 미디어가 아닌 파일 (manifest, 로그, 대본, 이미지) 과 최근 GC_MIN_AGE_SEC 안에 수정된 파일
+  (캐시된 세션 ZIP은 다시 만들 수 있으므로 중간 산출물로 취급)
+- 하드링크(artifact_store)는 inode 단위로 묶어서, 모든 위치를 지울 수 있을 때만 지우고 실제로 풀리는 바이트만 센다
+- 백그라운드 스레드가 GC_INTERVAL_SEC마다 한 번, 한 번에 최대 GC_MAX_DELETE개씩 조금씩 지운다
+
+사용:
+    python outputs_gc.py --dry-run       # 지울 후보 보고서만
+    python outputs_gc.py [--quota-gb 30] # 실제 삭제
+"""
+import json
+import os
+import threading
+import time
+from pathlib import Path
+from typing import Dict, Optional, Set
+
+from checkpoint import CHECKPOINT_GLOBS, MODE_A_CHECKPOINT_DIR, MODE_A_CHECKPOINT_GLOB
+from session_logger import SESSIONS_ROOT, ZIP_CACHE_DIR, ZIP_PIN_FILE, zipped_session_files
+from version_catalog import STAGE_KINDS, get_catalog
+
+OUTPUTS_ROOT = SESSIONS_ROOT.parent
+QUOTA_GB = float(os.getenv("OUTPUTS_QUOTA_GB", "50"))
+TARGET_RATIO = float(os.getenv("GC_TARGET_RATIO", "0.9"))
+INTERVAL_SEC = float(os.getenv("GC_INTERVAL_SEC", "600"))
+MAX_DELETE = int(os.getenv("GC_MAX_DELETE", "200"))
+MIN_AGE_SEC = float(os.getenv("GC_MIN_AGE_SEC", "3600"))
+ZIP_PIN_TTL_SEC = 3600  # 비정상 종료로 남은 ZIP 표시는 이 시간 뒤 무시
+
+MEDIA_SUFFIXES = {".mp4", ".mp3", ".wav", ".m4a"}
+STORE_DIR_NAME = ".cas"
+
+# 등급: 낮을수록 먼저 지움
+TIER_ORPHAN = 0        # 아무 데서도 링크하지 않는 저장소 객체
+TIER_INTERMEDIATE = 1  # 장면 원본/트림/자막/오디오 합성, 프리뷰 조각, TTS 세그먼트, 렌더 캐시
+TIER_FINAL = 2         # 최종 영상, 전체 프리뷰, 무음 전체 영상, 전체 TTS
+TIER_NAMES = {TIER_ORPHAN: "orphan", TIER_INTERMEDIATE: "intermediate", TIER_FINAL: "final"}
+
+_FINAL_PREFIXES = ("final_movie_", "short_final_", "final_preview", "full_visual", "full_")
+
+
+def _tier(path: Path) -> int:
+    return TIER_FINAL if path.name.startswith(_FINAL_PREFIXES) else TIER_INTERMEDIATE
+
+
+# =========================================================
+# 고정(pin) 목록
+# =========================================================
+def _collect_paths(value, out: Set[Path]) -> None:
+    """manifest/체크포인트 JSON 안의 문자열 중 파일 경로처럼 보이는 것을 모은다."""
+    if isinstance(value, dict):
+        for v in value.values():
+            _collect_paths(v, out)
+    elif isinstance(value, (list, tuple)):
+        for v in value:
+            _collect_paths(v, out)
+    elif isinstance(value, str) and Path(value).suffix.lower() in MEDIA_SUFFIXES:
+        out.add(Path(value).resolve())
+
+
+def pinned_paths(root: Path = OUTPUTS_ROOT) -> tuple:
+    """
+    Returns: (고정 폴더 집합, 고정 파일 집합).
+    폴더 안의 파일은 전부 고정. 카탈로그를 못 읽으면 예외 — 고정 목록 없이 지우는 일은 없게.
+    카탈로그에 아직 없는 세션(이 카탈로그가 생긴 뒤 한 번도 안 연 세션)의 단계 폴더는 먼저 가져온다.
+    """
+    dirs: Set[Path] = set()
+    files: Set[Path] = set()
+    catalog = get_catalog()
+    catalog.migrate_tree(root)
+    for kind in STAGE_KINDS:
+        for entry in catalog.latest_all(kind):
+            dirs.add(entry["path"].resolve())
+            _collect_paths(entry["manifest"], files)
+    checkpoints = {cp for pattern in CHECKPOINT_GLOBS for cp in root.rglob(pattern)}
+    checkpoints.update(MODE_A_CHECKPOINT_DIR.glob(MODE_A_CHECKPOINT_GLOB))  # outputs 밖으로 옮겨 둔 경우
+    for cp in checkpoints:
+        try:
+            with open(cp, "r", encoding="utf-8") as f:
+                _collect_paths(json.load(f), files)
+        except (OSError, json.JSONDecodeError):
+            # 체크포인트를 못 읽으면 그 폴더 전체를 보존
+            dirs.add(cp.parent.resolve())
+    files.update(p.resolve() for p in zipped_session_files(root / SESSIONS_ROOT.name))
+    now = time.time()
+    for pin in root.rglob(ZIP_PIN_FILE):
+        try:
+            if now - pin.stat().st_mtime < ZIP_PIN_TTL_SEC:
+                dirs.add(pin.parent.resolve())
+        except OSError:
+            continue
+    return dirs, files
+
+
+def _under(path: Path, dirs: Set[Path]) -> bool:
+    return any(p in dirs for p in path.parents)
+
+
+# =========================================================
+# 스캔 / 계획
+# =========================================================
+def scan(root: Path = OUTPUTS_ROOT) -> Dict[tuple, dict]:
+    """root 아래 미디어 파일을 inode별로 묶는다. {(dev, ino): {paths, size, nlink, last_access, store}}."""
+    groups: Dict[tuple, dict] = {}
+    for dirpath, _, filenames in os.walk(root):
+        parts = Path(dirpath).relative_to(root).parts
+        in_store = STORE_DIR_NAME in parts
+        in_zip_cache = ZIP_CACHE_DIR.name in parts
+        for name in filenames:
+            path = Path(dirpath) / name
+            if not in_store and path.suffix.lower() not in MEDIA_SUFFIXES \
+                    and not (in_zip_cache and path.suffix == ".zip"):
+                continue
+            try:
+                st = path.stat()
+            except OSError:
+                continue
+            g = groups.setdefault((st.st_dev, st.st_ino), {
+                "paths": [], "store": [], "size": st.st_size, "nlink": st.st_nlink,
+                "last_access": 0.0, "mtime": 0.0,
+            })
+            (g["store"] if in_store else g["paths"]).append(path)
+            g["last_access"] = max(g["last_access"], st.st_atime, st.st_mtime)
+            g["mtime"] = max(g["mtime"], st.st_mtime)
+    return groups
+
+
+def disk_usage(root: Path = OUTPUTS_ROOT) -> int:
+    """root 아래 실제 사용량 (하드링크는 한 번만)."""
+    seen, total = set(), 0
+    for dirpath, _, filenames in os.walk(root):
+        for name in filenames:
+            try:
+                st = os.stat(os.path.join(dirpath, name))
+            except OSError:
+                continue
+            if (st.st_dev, st.st_ino) not in seen:
+                seen.add((st.st_dev, st.st_ino))
+                total += st.st_size
+    return total
+
+
+def plan(root: Path = OUTPUTS_ROOT, quota_bytes: Optional[int] = None,
+         max_delete: Optional[int] = None) -> dict:
+    """
+    지울 후보 계산 (아무것도 지우지 않음).
+    Returns: {"usage", "quota", "target", "to_free", "pinned_bytes", "candidates": [...], "evict": [...]}
+             evict는 candidates 앞에서부터 target까지 내려가는 데 필요한 만큼.
+    """
+    root = Path(root)
+    quota = int(QUOTA_GB * 1024 ** 3) if quota_bytes is None else quota_bytes
+    target = int(quota * TARGET_RATIO)
+    usage = disk_usage(root)
+    pin_dirs, pin_files = pinned_paths(root)
+    now = time.time()
+
+    candidates, pinned_bytes = [], 0
+    for g in scan(root).values():
+        resolved = [p.resolve() for p in g["paths"]]
+        if any(p in pin_files or _under(p, pin_dirs) for p in resolved):
+            pinned_bytes += g["size"]
+            continue
+        if now - g["mtime"] < MIN_AGE_SEC:
+            continue
+        if g["nlink"] > len(g["paths"]) + len(g["store"]):
+            # outputs 밖에도 링크가 있음 → 지워도 공간이 안 풀림
+            continue
+        tier = max((_tier(p) for p in g["paths"]), default=TIER_ORPHAN)
+        candidates.append({
+            "paths": [str(p) for p in g["paths"] + g["store"]],
+            "size": g["size"],
+            "tier": TIER_NAMES[tier],
+            "last_access": g["last_access"],
+            "_order": (tier, g["last_access"]),
+        })
+    candidates.sort(key=lambda c: c["_order"])
+    for c in candidates:
+        del c["_order"]
+
+    evict, freed = [], 0
+    to_free = max(0, usage - target) if usage > quota else 0
+    for c in candidates:
+        if freed >= to_free or (max_delete is not None and len(evict) >= max_delete):
+            break
+        evict.append(c)
+        freed += c["size"]
+    return {
+        "usage": usage, "quota": quota, "target": target, "to_free": to_free,
+        "pinned_bytes": pinned_bytes, "candidates": candidates, "evict": evict,
+        "evict_bytes": freed,
+    }
+
+
+# =========================================================
+# 실행
+# =========================================================
+def collect(root: Path = OUTPUTS_ROOT, quota_bytes: Optional[int] = None,
+            max_delete: Optional[int] = MAX_DELETE, dry_run: bool = False) -> dict:
+    """plan 후 evict 목록 삭제. dry_run이면 보고서만. Returns: plan 결과 + {"freed", "deleted", "errors"}."""
+    report = plan(root, quota_bytes, max_delete)
+    report.update({"freed": 0, "deleted": 0, "errors": [], "dry_run": dry_run})
+    if dry_run:
+        return report
+    for c in report["evict"]:
+        try:
+            for p in c["paths"]:
+                Path(p).unlink(missing_ok=True)
+        except OSError as e:
+            report["errors"].append(f"{c['paths'][0]}: {e}")
+            continue
+        report["freed"] += c["size"]
+        report["deleted"] += 1
+    if report["deleted"]:
+        print(f"[outputs_gc] {report['deleted']}개 삭제, {_fmt_bytes(report['freed'])} 확보 "
+              f"(사용량 {_fmt_bytes(report['usage'])} / 쿼터 {_fmt_bytes(report['quota'])})")
+    return report
+
+
+def format_report(report: dict, limit: int = 30) -> str:
+    lines = [
+        f"사용량 {_fmt_bytes(report['usage'])} / 쿼터 {_fmt_bytes(report['quota'])} "
+        f"(목표 {_fmt_bytes(report['target'])}), 보존(pin) {_fmt_bytes(report['pinned_bytes'])}",
+        f"후보 {len(report['candidates'])}개, 이번에 {'지울' if report.get('dry_run', True) else '지운'} "
+        f"대상 {len(report['evict'])}개 {_fmt_bytes(report['evict_bytes'])}",
+    ]
+    for c in report["evict"][:limit]:
+        age_h = (time.time() - c["last_access"]) / 3600
+        lines.append(f"  [{c['tier']:<12}] {_fmt_bytes(c['size']):>9}  {age_h:6.1f}h  {c['paths'][0]}")
+    if len(report["evict"]) > limit:
+        lines.append(f"  ... 외 {len(report['evict']) - limit}개")
+    for err in report.get("errors", []):
+        lines.append(f"  실패: {err}")
+    return "\n".join(lines)
+
+
+def _fmt_bytes(n: int) -> str:
+    for unit in ("B", "KB", "MB", "GB"):
+        if n < 1024 or unit == "GB":
+            return f"{n:.0f}{unit}" if unit == "B" else f"{n:.1f}{unit}"
+        n /= 1024
+    return f"{n}B"
+
+
+# ---------------------------------------------------------
+# 백그라운드 실행 (서버 프로세스당 하나)
+# ---------------------------------------------------------
+_GC_THREAD: Optional[threading.Thread] = None
+_GC_LOCK = threading.Lock()
+
+
+def start_background_gc(interval: float = INTERVAL_SEC) -> None:
+    """GC 스레드 시작. Streamlit 리런마다 불려도 한 번만 뜬다. OUTPUTS_QUOTA_GB=0이면 끔."""
+    global _GC_THREAD
+    if QUOTA_GB <= 0:
+        return
+    with _GC_LOCK:
+        if _GC_THREAD is not None and _GC_THREAD.is_alive():
+            return
+
+        def _loop():
+            while True:
+                try:
+                    if OUTPUTS_ROOT.exists():
+                        collect()
+                except Exception as e:
+                    print(f"[outputs_gc] 정리 실패: {e}")
+                time.sleep(interval)
+
+        _GC_THREAD = threading.Thread(target=_loop, name="outputs-gc", daemon=True)
+        _GC_THREAD.start()
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="outputs/ 쿼터 기반 정리")
+    parser.add_argument("--root", default=str(OUTPUTS_ROOT))
+    parser.add_argument("--quota-gb", type=float, default=QUOTA_GB)
+    parser.add_argument("--max-delete", type=int, default=None, help="한 번에 지울 최대 개수 (기본 제한 없음)")
+    parser.add_argument("--dry-run", action="store_true", help="지우지 않고 보고서만 출력")
+    args = parser.parse_args()
+
+    result = collect(Path(args.root), int(args.quota_gb * 1024 ** 3), args.max_delete, args.dry_run)
+    print(format_report(result))
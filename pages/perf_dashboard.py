@@ -0,0 +1,129 @@
+# -*- coding: utf-8 -*-
+"""
+관리자용 실시간 성능 대시보드.
+모든 세션의 events.jsonl을 꼬리 읽기(perf_monitor)로 모아 워크숍 도중에 보여 준다:
+진행 중인 잡, API별 처리량·오류율(429), 대기열, 느린 장면, 인코딩 CPU 비중, 시간당 비용 추정.
+
+ADMIN_TOKEN 환경변수가 있어야 열리고, 토큰을 입력하거나 ?token=... 으로 들어와야 보인다.
+"""
+import hmac
+import time
+from datetime import datetime
+
+import streamlit as st
+from dotenv import load_dotenv
+
+# 이 페이지로 바로 들어오면 app.py가 실행되지 않음 — ADMIN_TOKEN을 읽기 전에 .env 반영
+load_dotenv()
+
+from perf_monitor import ADMIN_TOKEN, get_monitor  # noqa: E402
+
+REFRESH_SEC = 5
+
+st.set_page_config(page_title="성능 대시보드", layout="wide")
+st.title("📈 성능 대시보드")
+
+
+def _authorized() -> bool:
+    if not ADMIN_TOKEN:
+        st.info("관리자 대시보드가 꺼져 있습니다. 서버에 ADMIN_TOKEN 환경변수를 설정하세요.")
+        return False
+    token = st.session_state.get("admin_token") or st.query_params.get("token", "")
+    if token and hmac.compare_digest(token, ADMIN_TOKEN):
+        return True
+    entered = st.text_input("관리자 토큰", type="password")
+    if entered:
+        if hmac.compare_digest(entered, ADMIN_TOKEN):
+            st.session_state.admin_token = entered
+            st.rerun()
+        st.error("토큰이 맞지 않습니다.")
+    return False
+
+
+def _fmt_sec(sec) -> str:
+    if sec is None:
+        return ""
+    m, s = divmod(int(sec), 60)
+    return f"{m}분 {s}초" if m else f"{s}초"
+
+
+@st.fragment(run_every=REFRESH_SEC)
+def render_dashboard():
+    t0 = time.perf_counter()
+    snap = get_monitor().snapshot()
+    window_min = snap["window_sec"] // 60
+
+    apis = snap["apis"]
+    calls = sum(a["calls"] for a in apis)
+    limited = sum(a["rate_limited"] for a in apis)
+    c1, c2, c3, c4, c5 = st.columns(5)
+    c1.metric("활동 중인 세션", snap["active_sessions"])
+    c2.metric("진행 중인 잡", len(snap["jobs"]))
+    c3.metric(f"API 호출 (최근 {window_min}분)", calls)
+    c4.metric("429 (요청 한도)", limited)
+    c5.metric("비용 추정 ($/시간)", f"{snap['cost_per_hour_usd']:.2f}",
+              help=f"최근 {window_min}분 비용 ${snap['cost_usd']:.2f} 기준 (scripts/analyze_session.py PRICING)")
+
+    st.subheader("API")
+    if apis:
+        st.dataframe([{
+            "API": a["api"],
+            "호출": a["calls"],
+            "분당": a["per_min"],
+            "오류율": f"{a['error_rate']:.0%}",
+            "429": a["rate_limited"],
+            "p50 (초)": round(a["p50_ms"] / 1000, 2),
+            "p95 (초)": round(a["p95_ms"] / 1000, 2),
+            "진행 중": a["in_flight"],
+            "가장 오래된 진행 중": _fmt_sec(a["oldest_in_flight_sec"]) if a["in_flight"] else "",
+            "비용 ($)": a["cost_usd"],
+        } for a in apis], hide_index=True, use_container_width=True)
+    else:
+        st.caption("최근 API 호출 없음")
+
+    left, right = st.columns(2)
+    with left:
+        st.subheader("대기열")
+        st.dataframe([{
+            "대기열": q["queue"], "상한": q["capacity"], "사용 중": q["in_use"], "대기": q["waiting"],
+        } for q in snap["queues"]], hide_index=True, use_container_width=True)
+        st.caption("slot:* 는 이 서버 프로세스의 렌더 슬롯 (cpu 사용량은 잡 프로세스와 공유)")
+    with right:
+        st.subheader("진행 중인 잡")
+        if snap["jobs"]:
+            st.dataframe([{
+                "세션": j["session"], "잡": j["label"] or j["kind"], "상태": j["state"],
+                "진행률": f"{j['progress']:.0%}", "남은 시간": _fmt_sec(j["eta_sec"]),
+                "제출": j["submitted_at"],
+            } for j in snap["jobs"]], hide_index=True, use_container_width=True)
+        else:
+            st.caption("없음")
+
+    left, right = st.columns(2)
+    with left:
+        st.subheader("느린 장면")
+        if snap["slowest_scenes"]:
+            st.dataframe([{
+                "세션": s["session"], "단계": s.get("step", ""), "장면": (s.get("index") or 0) + 1,
+                "소요 (초)": s.get("wall_sec"),
+                "스테이지": ", ".join(f"{k} {v:.0f}s" for k, v in (s.get("stages") or {}).items()),
+                "실패": s.get("failed_stage") or "",
+            } for s in snap["slowest_scenes"]], hide_index=True, use_container_width=True)
+        else:
+            st.caption(f"최근 {window_min}분 동안 끝난 장면 없음")
+    with right:
+        st.subheader("인코딩 CPU 비중")
+        if snap["encodes"]:
+            st.dataframe([{
+                "op": r["op"], "코덱": r["codec"], "횟수": r["runs"], "CPU (초)": r["cpu_sec"],
+                "벽시계 (초)": r["wall_sec"], "비중": f"{r['cpu_share']:.0%}",
+            } for r in snap["encodes"]], hide_index=True, use_container_width=True)
+        else:
+            st.caption(f"최근 {window_min}분 동안 끝난 ffmpeg 없음")
+
+    st.caption(f"{datetime.fromtimestamp(snap['at']):%H:%M:%S} 갱신 · {REFRESH_SEC}초마다 · "
+               f"집계 {(time.perf_counter() - t0) * 1000:.0f}ms")
+
+
+if _authorized():
+    render_dashboard()
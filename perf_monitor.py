@@ -0,0 +1,282 @@
+# -*- coding: utf-8 -*-
+"""
+실시간 성능 모니터 (관리자 대시보드 pages/perf_dashboard.py의 데이터 쪽).
+scripts/analyze_session.py는 워크숍이 끝난 뒤에야 돌려 볼 수 있어서, Gemini 429 폭주나
+Runway 대기열 정체를 진행 중에 보려고 모든 세션의 events.jsonl을 꼬리 읽기로 모은다.
+
+- 파일마다 (inode, 읽은 위치)를 기억해 두고 새로 붙은 완결된 줄만 읽음 (events.jsonl은 append-only)
+- 최근 WINDOW_SEC 동안의 API 호출·장면(scene_done)·인코딩(subprocess_done)만 메모리에 유지
+- 비용·백분위수는 analyze_session의 estimate_cost/percentile을 그대로 씀 (scripts/는 패키지가 아니라 파일 경로로 로드)
+
+    mon = get_monitor()
+    snap = mon.snapshot()   # 새 줄 반영 후 집계
+"""
+import importlib.util
+import json
+import os
+import threading
+import time
+from collections import defaultdict, deque
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, Optional
+
+import metrics
+from job_runner import TERMINAL_STATES, read_status
+from render_scheduler import get_scheduler
+from session_logger import SESSIONS_ROOT, flush_events
+
+ADMIN_TOKEN = os.getenv("ADMIN_TOKEN", "")
+WINDOW_SEC = int(os.getenv("PERF_WINDOW_SEC", "900"))
+# 마지막 이벤트 후 이 시간 안이면 활동 중인 세션으로 셈
+ACTIVE_SESSION_SEC = 300
+SLOWEST_SCENES = 10
+
+_ANALYZE_PATH = Path(__file__).resolve().parent / "scripts" / "analyze_session.py"
+_analyze = None
+
+
+def analyze_session_module():
+    """scripts/analyze_session.py (estimate_cost, percentile). 없으면 None → 비용·지연 0."""
+    global _analyze
+    if _analyze is None:
+        try:
+            spec = importlib.util.spec_from_file_location("analyze_session", _ANALYZE_PATH)
+            mod = importlib.util.module_from_spec(spec)
+            spec.loader.exec_module(mod)
+            _analyze = mod
+        except (OSError, ImportError) as e:
+            print(f"[perf_monitor] analyze_session 로드 실패: {e}")
+            _analyze = False
+    return _analyze or None
+
+
+def _event_time(e: dict) -> float:
+    try:
+        return datetime.fromisoformat(e.get("ts", "")).timestamp()
+    except (TypeError, ValueError):
+        return time.time()
+
+
+def _percentile(vals: list, pct: float) -> float:
+    """analyze_session.percentile과 같은 정의 (사후 보고서와 대시보드 수치가 맞게)."""
+    mod = analyze_session_module()
+    return mod.percentile(sorted(vals), pct) if mod else 0.0
+
+
+class PerfMonitor:
+    def __init__(self, root: Path = SESSIONS_ROOT, window_sec: int = WINDOW_SEC):
+        self.root = Path(root)
+        self.window_sec = window_sec
+        self._lock = threading.Lock()
+        self._offsets: Dict[Path, tuple] = {}   # 파일 → (inode, 읽은 바이트 수)
+        self._pending: Dict[tuple, dict] = {}   # (세션, call_id) → 응답을 기다리는 request
+        self._calls: deque = deque()            # 끝난 API 호출
+        self._scenes: deque = deque()           # scene_done
+        self._encodes: deque = deque()          # subprocess_done
+        self._jobs: Dict[str, dict] = {}        # 끝나지 않은 잡
+        self._last_seen: Dict[str, float] = {}  # 세션 → 마지막 이벤트 시각
+        self.lines_read = 0
+
+    # ---------------------------------------------------------
+    # 꼬리 읽기
+    # ---------------------------------------------------------
+    def poll(self) -> int:
+        """모든 세션 파일에서 새 줄을 읽어 반영. Returns: 새 줄이 있던 파일 수."""
+        if not self.root.exists():
+            return 0
+        flush_events()
+        cutoff = time.time() - self.window_sec
+        read = 0
+        with self._lock:
+            for sdir in self.root.iterdir():
+                path = sdir / "events.jsonl"
+                try:
+                    st = path.stat()
+                except OSError:
+                    continue
+                ino, offset = self._offsets.get(path, (None, None))
+                if ino != st.st_ino or offset > st.st_size:
+                    # 처음 보거나 파일이 바뀜 — 창 밖에서 멈춘 세션은 처음부터 읽을 필요 없음
+                    offset = st.st_size if st.st_mtime < cutoff else 0
+                if offset < st.st_size:
+                    try:
+                        offset += self._read_from(sdir.name, path, offset)
+                    except OSError as e:
+                        print(f"[perf_monitor] 읽기 실패 {path}: {e}")
+                    read += 1
+                self._offsets[path] = (st.st_ino, offset)
+            self._prune(time.time())
+        return read
+
+    def _read_from(self, session_id: str, path: Path, offset: int) -> int:
+        with open(path, "rb") as f:
+            f.seek(offset)
+            raw = f.read()
+        # 쓰는 중인 마지막 줄(개행 없음)은 다음 번에
+        end = raw.rfind(b"\n") + 1
+        for line in raw[:end].decode("utf-8", errors="replace").splitlines():
+            try:
+                e = json.loads(line)
+            except json.JSONDecodeError:
+                continue
+            self.lines_read += 1
+            self._ingest(session_id, e)
+        return end
+
+    def _ingest(self, sid: str, e: dict) -> None:
+        action = e.get("action", "")
+        d = e.get("data") or {}
+        t = _event_time(e)
+        self._last_seen[sid] = max(self._last_seen.get(sid, 0.0), t)
+
+        if action.endswith("_request"):
+            req = d.get("request") or {}
+            chars = next((req[k].get("length", 0) for k in ("text", "user_text", "prompt")
+                          if isinstance(req.get(k), dict)), 0)
+            self._pending[(sid, d.get("call_id") or action[:-len("_request")])] = {
+                "api": action[:-len("_request")], "start_t": d.get("start_ts") or t, "chars": chars,
+            }
+        elif action.endswith("_response"):
+            api = action[:-len("_response")]
+            req = self._pending.pop((sid, d.get("call_id") or api), {})
+            result = d.get("result") or {}
+            stats = {**(d.get("usage") or {}), "char_count": req.get("chars", 0),
+                     "billed_seconds": result.get("billed_duration_sec", 0) or 0}
+            self._calls.append({
+                "t": t, "session": sid, "api": api,
+                "ms": d.get("duration_ms") or 0,
+                "status": metrics.api_status(d.get("error"), result),
+                "cost": self._cost(api, stats),
+            })
+        elif action == "scene_done":
+            self._scenes.append({"t": t, "session": sid, **d})
+        elif action == "subprocess_done":
+            self._encodes.append({
+                "t": t, "op": d.get("op") or "?", "kind": d.get("kind"), "codec": d.get("codec") or "",
+                "cpu_sec": (d.get("user_sec") or 0) + (d.get("system_sec") or 0), "wall_sec": d.get("wall_sec") or 0,
+            })
+        elif action == "job_submitted":
+            self._jobs[d.get("job_id")] = {"session": sid, "kind": d.get("kind"), "label": d.get("label"), "t": t}
+        elif action in ("job_done", "job_failed", "job_cancelled"):
+            self._jobs.pop(d.get("job_id"), None)
+
+    def _cost(self, api: str, stats: dict) -> float:
+        mod = analyze_session_module()
+        if mod is None:
+            return 0.0
+        full = {k: stats.get(k) or 0 for k in ("prompt_tokens", "completion_tokens", "prompt_token_count",
+                                               "char_count", "billed_seconds")}
+        return mod.estimate_cost(api, full)
+
+    def _prune(self, now: float) -> None:
+        cutoff = now - self.window_sec
+        for q in (self._calls, self._scenes, self._encodes):
+            while q and q[0]["t"] < cutoff:
+                q.popleft()
+        # 응답이 끝내 안 온 request (프로세스가 죽음 등) — 오래 걸리는 Runway 대기는 보이도록 넉넉히 둠
+        stale = now - 4 * self.window_sec
+        for key in [k for k, p in self._pending.items() if p["start_t"] < stale]:
+            del self._pending[key]
+
+    # ---------------------------------------------------------
+    # 집계
+    # ---------------------------------------------------------
+    def snapshot(self) -> dict:
+        self.poll()
+        now = time.time()
+        with self._lock:
+            calls, scenes, encodes = list(self._calls), list(self._scenes), list(self._encodes)
+            pending = list(self._pending.values())
+            jobs = dict(self._jobs)
+            active_sessions = sum(1 for t in self._last_seen.values() if now - t < ACTIVE_SESSION_SEC)
+        # 창을 다 못 채웠으면(막 시작) 실제 관측 구간으로 나눔
+        span = min(self.window_sec, max(60.0, now - min((c["t"] for c in calls), default=now)))
+
+        by_api = defaultdict(list)
+        for c in calls:
+            by_api[c["api"]].append(c)
+        in_flight = defaultdict(list)
+        for p in pending:
+            in_flight[p["api"]].append(now - p["start_t"])
+        apis = []
+        for api in sorted(set(by_api) | set(in_flight)):
+            rows = by_api.get(api, [])
+            n = len(rows)
+            errors = sum(1 for r in rows if r["status"] != "ok")
+            ms = [r["ms"] for r in rows]
+            apis.append({
+                "api": api,
+                "calls": n,
+                "per_min": round(n * 60 / span, 2),
+                "error_rate": round(errors / n, 3) if n else 0.0,
+                "rate_limited": sum(1 for r in rows if r["status"] == "rate_limited"),
+                "p50_ms": _percentile(ms, 50),
+                "p95_ms": _percentile(ms, 95),
+                "in_flight": len(in_flight.get(api, [])),
+                "oldest_in_flight_sec": round(max(in_flight.get(api, [0])), 1),
+                "cost_usd": round(sum(r["cost"] for r in rows), 4),
+            })
+        cost = sum(c["cost"] for c in calls)
+        job_rows = self._job_rows(jobs)
+
+        cpu_by = defaultdict(lambda: [0, 0.0, 0.0])
+        for r in encodes:
+            agg = cpu_by[(r["op"], r["codec"])]
+            agg[0] += 1
+            agg[1] += r["cpu_sec"]
+            agg[2] += r["wall_sec"]
+        total_cpu = sum(v[1] for v in cpu_by.values()) or 1.0
+        encode_rows = sorted((
+            {"op": op, "codec": codec, "runs": n, "cpu_sec": round(cpu, 1), "wall_sec": round(wall, 1),
+             "cpu_share": round(cpu / total_cpu, 3)}
+            for (op, codec), (n, cpu, wall) in cpu_by.items()
+        ), key=lambda r: r["cpu_sec"], reverse=True)
+
+        return {
+            "at": now,
+            "window_sec": self.window_sec,
+            "active_sessions": active_sessions,
+            "apis": apis,
+            "cost_usd": round(cost, 4),
+            "cost_per_hour_usd": round(cost * 3600 / span, 2),
+            "jobs": job_rows,
+            "queues": self._queue_rows(job_rows),
+            "slowest_scenes": sorted(scenes, key=lambda s: s.get("wall_sec") or 0, reverse=True)[:SLOWEST_SCENES],
+            "encodes": encode_rows,
+        }
+
+    def _job_rows(self, jobs: dict) -> list:
+        rows = []
+        for job_id, j in jobs.items():
+            status = read_status(self.root / j["session"] / "jobs" / job_id)
+            if status.get("state") in TERMINAL_STATES:
+                continue
+            rows.append({
+                "job_id": job_id, "session": j["session"], "kind": j["kind"], "label": j["label"],
+                "state": status.get("state", "queued"), "progress": status.get("progress", 0.0),
+                "eta_sec": status.get("eta_sec"), "submitted_at": status.get("submitted_at"),
+            })
+        return sorted(rows, key=lambda r: r.get("submitted_at") or "")
+
+    def _queue_rows(self, job_rows: list) -> list:
+        # 렌더 슬롯 대기열은 이 프로세스(Streamlit 서버) 것 — cpu 사용량은 잡 프로세스와 잠금 파일로 공유됨
+        rows = [{"queue": f"slot:{pool}", "capacity": s["capacity"], "in_use": s["in_use"], "waiting": s["waiting"]}
+                for pool, s in get_scheduler().snapshot().items()]
+        states = [r["state"] for r in job_rows]
+        rows.append({"queue": "jobs", "capacity": None, "in_use": states.count("running"),
+                     "waiting": states.count("queued")})
+        return rows
+
+
+_MONITOR: Optional[PerfMonitor] = None
+_MONITOR_LOCK = threading.Lock()
+
+
+def get_monitor() -> PerfMonitor:
+    """프로세스 공용 (대시보드를 여러 명이 열어도 파일은 한 번씩만 읽음)."""
+    global _MONITOR
+    with _MONITOR_LOCK:
+        if _MONITOR is None:
+            _MONITOR = PerfMonitor()
+        return _MONITOR
@@ -0,0 +1,209 @@
+# -*- coding: utf-8 -*-
+"""
+ffmpeg 등 자식 프로세스 자원 계측.
+인코딩이 CPU 대부분을 쓰는데 어떤 인코딩인지 안 보였다 — write_videofile(moviepy)과 _pcm_to_mp3가
+ffmpeg를 띄우고 아무것도 남기지 않았기 때문. 여기서는 프로세스를 거둘 때 wait4()로 받은 rusage를 기록한다.
+
+- AccountedPopen: subprocess.Popen 대체. 종료 시 벽시계·user/sys CPU·최대 RSS·입출력 바이트·코덱·프리셋 기록
+- run(): subprocess.run 대체 (같은 인자)
+- 기록 → 세션 events.jsonl의 subprocess_done 이벤트 + metrics의 subprocess_* 메트릭
+  (어느 렌더 함수가 띄웠는지 op 라벨, 현재 단계 step 라벨)
+
+moviepy가 띄우는 ffmpeg는 video_utils의 Popen 대리 객체가 이 클래스로 띄운다.
+wait4가 없는 환경(Windows)에서는 rusage 없이 벽시계·바이트만 남는다.
+"""
+import os
+import subprocess
+import sys
+import time
+from pathlib import Path
+from typing import List, Optional
+
+try:
+    # os.wait4가 결과(struct_rusage)를 만들 때 resource를 import함 — 종료 중(__del__)에는 import가 안 되므로 미리
+    import resource  # noqa: F401
+except ImportError:  # Windows 로컬 개발 환경
+    resource = None
+
+import metrics
+from artifact_store import detach
+from session_logger import current_session_id, log_event
+from tracing import current_step
+
+# 코덱/프리셋을 읽을 ffmpeg 옵션
+_CODEC_FLAGS = ("-vcodec", "-c:v", "-codec:v", "-acodec", "-c:a", "-codec:a", "-codec", "-c")
+
+SUBPROC_CALLS = metrics.counter("subprocess_calls_total", "자식 프로세스 수 (kind: encode / decode / probe)",
+                                ("tool", "kind", "op", "status"))
+SUBPROC_CPU = metrics.counter("subprocess_cpu_seconds_total", "자식 프로세스 CPU 시간 (mode: user / system)",
+                              ("tool", "kind", "op", "codec", "preset", "step", "mode"))
+SUBPROC_WALL = metrics.histogram("subprocess_wall_seconds", "자식 프로세스 실행 시간", ("tool", "kind", "op"))
+SUBPROC_RSS = metrics.histogram("subprocess_max_rss_megabytes", "자식 프로세스 최대 RSS", ("tool", "kind"),
+                                buckets=(25, 50, 100, 200, 400, 800, 1600, 3200))
+SUBPROC_OUTPUT_BYTES = metrics.counter("subprocess_output_bytes_total", "자식 프로세스가 쓴 출력 파일 크기 합",
+                                       ("tool", "op", "codec"))
+
+
+def _flag_value(args: List[str], flags) -> Optional[str]:
+    for i, a in enumerate(args[:-1]):
+        if a in flags:
+            return args[i + 1]
+    return None
+
+
+def _file_size(path: Optional[str]) -> Optional[int]:
+    if not path or path == "-" or path.startswith("pipe:"):
+        return None
+    try:
+        return os.path.getsize(path)
+    except OSError:
+        return None
+
+
+def describe_command(args) -> dict:
+    """ffmpeg 명령줄 → {tool, kind, inputs, output, codec, preset}. ffmpeg가 아니면 tool만."""
+    args = [str(a) for a in ([args] if isinstance(args, (str, bytes, os.PathLike)) else args)]
+    tool = Path(args[0]).stem if args else "?"
+    # imageio-ffmpeg 바이너리 이름(ffmpeg-linux-x86_64-v7.0 등)도 ffmpeg로
+    tool = next((t for t in ("ffprobe", "ffmpeg") if tool.startswith(t)), tool)
+    info = {"tool": tool, "kind": "other", "inputs": [], "output": None, "codec": "", "preset": ""}
+    if tool not in ("ffmpeg", "ffprobe"):
+        return info
+    info["inputs"] = [args[i + 1] for i, a in enumerate(args[:-1]) if a == "-i"]
+    last = args[-1] if len(args) > 1 else None
+    # moviepy: 쓰기는 '... 출력파일', 읽기는 '... -' (stdout 파이프), 정보 조회는 'ffmpeg -i 파일'
+    # ffprobe는 입력을 -i 없이 마지막 인자로 받으므로 항상 probe
+    if tool == "ffprobe" or last is None or last in info["inputs"]:
+        info["kind"] = "probe"
+    elif last == "-" or last.startswith("pipe:"):
+        info["kind"] = "decode"
+    else:
+        info["kind"] = "encode"
+        info["output"] = last
+    # 마지막 -i 뒤의 옵션이 출력 쪽 (moviepy는 입력 파이프 형식에도 -vcodec rawvideo를 붙임)
+    last_input = max((i for i, a in enumerate(args) if a == "-i"), default=0)
+    out_args = args[last_input:]
+    info["codec"] = ",".join(
+        out_args[i + 1] for i, a in enumerate(out_args[:-1]) if a in _CODEC_FLAGS
+    )
+    info["preset"] = _flag_value(out_args, ("-preset",)) or ""
+    return info
+
+
+class AccountedPopen(subprocess.Popen):
+    """
+    종료를 거둘 때 os.wait4로 rusage를 받는 Popen.
+    Popen이 자식을 거두는 두 경로(wait → _try_wait, poll → _internal_poll)를 모두 wait4로 바꾼다.
+    """
+
+    def __init__(self, args, *posargs, **kwargs):
+        self._acct = describe_command(args)
+        self._acct.update(
+            session_id=current_session_id(), op=metrics.current_render_op(), step=current_step(),
+            started=time.perf_counter(),
+            input_bytes=sum(s for s in map(_file_size, self._acct["inputs"]) if s) or None,
+        )
+        self._acct_done = False
+        self.rusage = None
+        if self._acct["kind"] == "encode":
+            # ffmpeg는 출력 파일을 제자리에서 덮어씀 — 저장소/캐시와 하드링크된 파일이면 먼저 끊음
+            detach(self._acct["output"])
+        super().__init__(args, *posargs, **kwargs)
+
+    if resource is not None and hasattr(os, "wait4"):
+        def _wait4(self, pid, flags):
+            got_pid, sts, ru = os.wait4(pid, flags)
+            if got_pid == pid:
+                self.rusage = ru
+            return got_pid, sts
+
+        def _try_wait(self, wait_flags):
+            try:
+                return self._wait4(self.pid, wait_flags)
+            except ChildProcessError:
+                # 다른 곳에서 이미 거둠 (SIGCHLD 무시 등) — 원래 구현과 같은 처리
+                return self.pid, 0
+
+        def _internal_poll(self, _deadstate=None, **kwargs):
+            if _deadstate is not None:
+                # __del__에서 불림 (종료 중일 수 있음) — 원래 구현 그대로
+                return super()._internal_poll(_deadstate=_deadstate)
+            return super()._internal_poll(_deadstate=_deadstate, _waitpid=self._wait4)
+
+    def _handle_exitstatus(self, *args, **kwargs):
+        super()._handle_exitstatus(*args, **kwargs)
+        # 거둔 직후 한 번 (wait/poll 어느 쪽이든)
+        if not self._acct_done:
+            self._acct_done = True
+            try:
+                _record(self._acct, self.returncode, self.rusage)
+            except Exception as e:
+                print(f"[proc_accounting] 기록 실패: {e}")
+
+
+def _record(acct: dict, returncode: Optional[int], ru) -> None:
+    wall = time.perf_counter() - acct["started"]
+    output_bytes = _file_size(acct["output"]) if returncode == 0 else None
+    user = ru.ru_utime if ru else None
+    system = ru.ru_stime if ru else None
+    max_rss_mb = None
+    if ru:
+        # macOS는 바이트, Linux는 KB
+        max_rss_mb = round(ru.ru_maxrss / 1e6 if sys.platform == "darwin" else ru.ru_maxrss / 1024, 1)
+
+    tool, kind, op = acct["tool"], acct["kind"], acct["op"]
+    if returncode == 0 or (kind == "probe" and returncode == 1):
+        # 'ffmpeg -i 파일'은 출력이 없어서 항상 1로 끝남
+        status = "ok"
+    else:
+        # moviepy는 다 읽은 디코더를 terminate → 시그널로 죽거나 ffmpeg가 255로 끝냄
+        status = "killed" if returncode is not None and (returncode < 0 or returncode == 255) else "error"
+    SUBPROC_CALLS.inc(tool=tool, kind=kind, op=op, status=status)
+    SUBPROC_WALL.observe(wall, tool=tool, kind=kind, op=op)
+    if ru:
+        labels = dict(tool=tool, kind=kind, op=op, codec=acct["codec"], preset=acct["preset"], step=acct["step"])
+        SUBPROC_CPU.inc(user, mode="user", **labels)
+        SUBPROC_CPU.inc(system, mode="system", **labels)
+        SUBPROC_RSS.observe(max_rss_mb, tool=tool, kind=kind)
+    if output_bytes:
+        SUBPROC_OUTPUT_BYTES.inc(output_bytes, tool=tool, op=op, codec=acct["codec"])
+
+    # 정보 조회(ffmpeg -i)는 클립마다 불려서 이벤트로는 남기지 않음 (메트릭만)
+    if kind == "probe":
+        return
+    log_event("subprocess_done", {
+        "tool": tool,
+        "kind": kind,
+        "op": op,
+        "step": acct["step"],
+        "codec": acct["codec"],
+        "preset": acct["preset"],
+        "returncode": returncode,
+        "wall_sec": round(wall, 3),
+        "user_sec": round(user, 3) if user is not None else None,
+        "system_sec": round(system, 3) if system is not None else None,
+        "max_rss_mb": max_rss_mb,
+        "input_bytes": acct["input_bytes"],
+        "output_bytes": output_bytes,
+        "output": Path(acct["output"]).name if acct["output"] else None,
+    }, session_id=acct["session_id"])
+
+
+def run(args, *, check: bool = False, capture_output: bool = False, timeout: Optional[float] = None,
+        **kwargs) -> subprocess.CompletedProcess:
+    """subprocess.run과 같지만 AccountedPopen으로 실행."""
+    if capture_output:
+        kwargs["stdout"] = kwargs["stderr"] = subprocess.PIPE
+    with AccountedPopen(args, **kwargs) as proc:
+        try:
+            stdout, stderr = proc.communicate(timeout=timeout)
+        except subprocess.TimeoutExpired:
+            proc.kill()
+            proc.wait()
+            raise
+        except BaseException:
+            proc.kill()
+            raise
+    if check and proc.returncode:
+        raise subprocess.CalledProcessError(proc.returncode, proc.args, stdout, stderr)
+    return subprocess.CompletedProcess(proc.args, proc.returncode, stdout, stderr)
@@ -0,0 +1,284 @@
+# -*- coding: utf-8 -*-
+"""
+단계별 프로파일링 (opt-in): cProfile + tracemalloc + RSS.
+어떤 책의 Step 8만 느린 이유, concatenate_videoclips 중 메모리가 튀는 이유를 워크숍 도중에 재배포 없이 보기 위함.
+
+- profile_stage(stage, scene=None): with 블록 하나를 프로파일 → <세션>/profiles/<stage>[_sceneNN]_<시각>_<pid>_<n>.prof/.json
+- profiled(stage): 함수 전체를 감싸는 데코레이터
+- .prof는 pstats/snakeviz로 열고, .json은 상위 함수·메모리 요약 (scripts/analyze_session.py가 모아서 보여 줌)
+
+켜기:
+    환경변수 PROFILE=1          → 모든 세션
+    사이드바 "성능 프로파일링"   → 그 세션만 (<세션>/profiles/.enabled 표시 파일 — 백그라운드 잡 프로세스도 따라감)
+
+주의:
+- cProfile은 스레드별이라 블록을 실행한 스레드만 잡힌다 (장면 파이프라인은 스테이지 워커마다 따로 기록됨).
+  같은 스레드에서 중첩되면 안쪽 구간 동안 바깥 구간은 잠시 멈춘다.
+- Python 3.12+에서는 cProfile을 프로세스에서 한 번에 하나만 켤 수 있어, 다른 스레드 구간과 겹친 구간은
+  벽시계·CPU 시간·메모리만 남는다 (.json의 cpu_profile=false, .prof 없음).
+- tracemalloc은 프로세스 전체라 동시에 도는 구간의 할당이 섞이고, 켜져 있는 동안 할당이 눈에 띄게 느려진다.
+- ffmpeg 인코딩은 자식 프로세스라 cProfile에는 대기 시간으로만 보인다 (children_max_rss_mb 참고).
+"""
+import cProfile
+import functools
+import itertools
+import json
+import os
+import pstats
+import re
+import sys
+import threading
+import time
+import tracemalloc
+from contextlib import contextmanager
+from datetime import datetime
+from pathlib import Path
+from typing import Optional
+
+try:
+    import resource
+except ImportError:  # Windows 로컬 개발 환경
+    resource = None
+
+from session_logger import SESSIONS_ROOT, current_session_id, log_event
+
+PROFILE_DIR_NAME = "profiles"
+ENABLED_MARKER = ".enabled"
+TOP_FUNCTIONS = 30
+TOP_ALLOCATIONS = 15
+
+_env_enabled = os.getenv("PROFILE", "0") == "1"
+_tls = threading.local()
+_seq = itertools.count(1)
+_tm_lock = threading.Lock()
+_tm_users = 0
+_tm_owned = False  # 이 모듈이 tracemalloc을 켰는지 (밖에서 켠 건 끄지 않음)
+
+
+def profile_dir(session_id: Optional[str] = None) -> Optional[Path]:
+    sid = session_id or current_session_id()
+    return SESSIONS_ROOT / sid / PROFILE_DIR_NAME if sid else None
+
+
+def is_enabled(session_id: Optional[str] = None) -> bool:
+    d = profile_dir(session_id)
+    if d is None:
+        return False
+    return _env_enabled or (d / ENABLED_MARKER).exists()
+
+
+def set_session_enabled(on: bool, session_id: Optional[str] = None) -> None:
+    """세션 단위 on/off (표시 파일). 다음 단계부터 적용."""
+    d = profile_dir(session_id)
+    if d is None:
+        return
+    marker = d / ENABLED_MARKER
+    if on:
+        d.mkdir(parents=True, exist_ok=True)
+        marker.touch()
+    else:
+        marker.unlink(missing_ok=True)
+
+
+# ---------------------------------------------------------
+# 메모리 측정
+# ---------------------------------------------------------
+def _tracemalloc_acquire() -> None:
+    global _tm_users, _tm_owned
+    with _tm_lock:
+        if _tm_users == 0 and not tracemalloc.is_tracing():
+            tracemalloc.start()
+            _tm_owned = True
+        _tm_users += 1
+
+
+def _tracemalloc_release() -> None:
+    global _tm_users, _tm_owned
+    with _tm_lock:
+        _tm_users -= 1
+        if _tm_users == 0 and _tm_owned:
+            tracemalloc.stop()
+            _tm_owned = False
+
+
+def _rss_mb() -> Optional[float]:
+    try:
+        with open("/proc/self/statm") as f:
+            pages = int(f.read().split()[1])
+        return round(pages * os.sysconf("SC_PAGE_SIZE") / 1e6, 1)
+    except (OSError, ValueError, AttributeError):
+        return None
+
+
+def _max_rss_mb(who) -> Optional[float]:
+    if resource is None:
+        return None
+    kb = resource.getrusage(who).ru_maxrss
+    # macOS는 바이트 단위
+    return round(kb / 1e6 if sys.platform == "darwin" else kb / 1024, 1)
+
+
+# ---------------------------------------------------------
+# 요약
+# ---------------------------------------------------------
+# 측정 자체(스냅샷·중첩 구간 전환)가 상위에 뜨지 않게 뺄 것들
+_SELF_FILES = (Path(__file__).name, Path(tracemalloc.__file__).name)
+
+
+def _is_self(file: str, name: str) -> bool:
+    return Path(file).name in _SELF_FILES or "_lsprof.Profiler" in name
+
+
+def _top_functions(prof: cProfile.Profile) -> list:
+    stats = pstats.Stats(prof).stats
+    rows = sorted(
+        ((k, v) for k, v in stats.items() if not _is_self(k[0], k[2])),
+        key=lambda kv: kv[1][3], reverse=True,
+    )[:TOP_FUNCTIONS]
+    return [
+        {
+            "func": f"{Path(file).name}:{line}({name})",
+            "ncalls": nc,
+            "tottime": round(tt, 4),
+            "cumtime": round(ct, 4),
+        }
+        for (file, line, name), (cc, nc, tt, ct, callers) in rows
+    ]
+
+
+def _top_allocations(before, after) -> list:
+    if before is None or after is None:
+        return []
+    diff = after.compare_to(before, "lineno")
+    return [
+        {
+            "where": f"{Path(s.traceback[0].filename).name}:{s.traceback[0].lineno}",
+            "size_diff_kb": round(s.size_diff / 1024, 1),
+            "count_diff": s.count_diff,
+        }
+        for s in diff[:TOP_ALLOCATIONS]
+        if s.size_diff
+    ]
+
+
+def _snapshot():
+    try:
+        return tracemalloc.take_snapshot().filter_traces(
+            [tracemalloc.Filter(False, f"*{name}") for name in _SELF_FILES])
+    except RuntimeError:
+        # 다른 스레드가 그 사이 tracemalloc을 껐음
+        return None
+
+
+def _enable(prof: Optional[cProfile.Profile]) -> bool:
+    """cProfile 켜기. 3.12+는 sys.monitoring 기반이라 프로세스에서 동시에 하나만 켤 수 있음
+    (다른 스레드의 구간이 이미 켜 뒀으면 ValueError) → 이 구간은 CPU 프로파일 없이 진행."""
+    if prof is None:
+        return False
+    try:
+        prof.enable()
+        return True
+    except ValueError:
+        return False
+
+
+@contextmanager
+def profile_stage(stage: str, scene: Optional[int] = None):
+    """with 블록을 프로파일해서 세션 profiles/에 저장. 꺼져 있으면 아무것도 안 함.
+    측정이 실패해도(프로파일러 사용 중, 저장 실패 등) 블록 자체는 그대로 실행된다."""
+    if not is_enabled():
+        yield
+        return
+    out_dir = profile_dir()
+    stack = getattr(_tls, "stack", None)
+    if stack is None:
+        stack = _tls.stack = []
+    if stack and stack[-1] is not None:
+        stack[-1].disable()
+
+    _tracemalloc_acquire()
+    tracemalloc.reset_peak()
+    mem_before = _snapshot()
+    rss_before = _rss_mb()
+    started_at = datetime.now().isoformat(timespec="seconds")
+    t0, cpu0 = time.perf_counter(), time.thread_time()
+    prof = cProfile.Profile()
+    profiling = False
+    error = None
+    # 스택에는 실제로 켠 프로파일만 (못 켰으면 None — 바깥 구간 재개 때 건너뜀)
+    stack.append(None)
+    try:
+        profiling = _enable(prof)
+        stack[-1] = prof if profiling else None
+        yield
+    except BaseException as e:
+        error = type(e).__name__
+        raise
+    finally:
+        if profiling:
+            prof.disable()
+        stack.pop()
+        wall, cpu = time.perf_counter() - t0, time.thread_time() - cpu0
+        peak = tracemalloc.get_traced_memory()[1] if tracemalloc.is_tracing() else 0
+        mem_after = _snapshot()
+        _tracemalloc_release()
+        if stack and stack[-1] is not None and not _enable(stack[-1]):
+            stack[-1] = None  # 그 사이 다른 스레드가 프로파일러를 잡음 → 바깥 구간은 벽시계·메모리만
+        try:
+            _save(out_dir, stage, scene, prof if profiling else None, {
+                "stage": stage,
+                "scene": scene,
+                "started_at": started_at,
+                "pid": os.getpid(),
+                "thread": threading.current_thread().name,
+                "wall_sec": round(wall, 3),
+                "thread_cpu_sec": round(cpu, 3),
+                "error": error,
+                "cpu_profile": profiling,
+                "memory": {
+                    "traced_peak_mb": round(peak / 1e6, 1),
+                    "rss_before_mb": rss_before,
+                    "rss_after_mb": _rss_mb(),
+                    "max_rss_mb": _max_rss_mb(resource.RUSAGE_SELF) if resource else None,
+                    "children_max_rss_mb": _max_rss_mb(resource.RUSAGE_CHILDREN) if resource else None,
+                    "top_allocations": _top_allocations(mem_before, mem_after),
+                },
+                "top_functions": _top_functions(prof) if profiling else [],
+            })
+        except Exception as e:  # noqa: BLE001 — 측정 실패로 단계를 실패시키지 않음
+            print(f"[profiling] {stage} 요약 실패: {e}")
+
+
+def _save(out_dir: Path, stage: str, scene: Optional[int], prof: Optional[cProfile.Profile],
+          summary: dict) -> None:
+    tag = re.sub(r"[^\w-]+", "_", stage).strip("_") or "stage"
+    if scene is not None:
+        tag += f"_scene{scene + 1:02d}"
+    base = out_dir / f"{tag}_{time.strftime('%H%M%S')}_{os.getpid()}_{next(_seq)}"
+    try:
+        out_dir.mkdir(parents=True, exist_ok=True)
+        if prof is not None:
+            prof.dump_stats(str(base.with_suffix(".prof")))
+            summary["prof_file"] = base.with_suffix(".prof").name
+        with open(base.with_suffix(".json"), "w", encoding="utf-8") as f:
+            json.dump(summary, f, ensure_ascii=False, indent=2)
+    except OSError as e:
+        print(f"[profiling] 저장 실패 {base}: {e}")
+        return
+    log_event("profile_saved", {
+        "stage": stage, "scene": scene, "file": base.with_suffix(".json").name,
+        "wall_sec": summary["wall_sec"], "traced_peak_mb": summary["memory"]["traced_peak_mb"],
+    })
+
+
+def profiled(stage: Optional[str] = None):
+    """함수 호출 전체를 profile_stage로 감싸는 데코레이터."""
+    def deco(fn):
+        label = stage or fn.__name__
+
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            with profile_stage(label):
+                return fn(*args, **kwargs)
+        return wrapper
+    return deco
@@ -0,0 +1,123 @@
+# -*- coding: utf-8 -*-
+"""
+장면 단위 렌더 캐시 (증분 리빌드).
+장면 산출물(정지 화상 클립, 자막 합성본, 오디오 합성본)을 입력 내용 해시로
+키잉해서 저장해 두고, 새 버전 폴더를 만들 때 입력이 그대로인 장면은
+하드링크로 재사용한다. 대사 한 줄만 고치면 그 장면 하나만 다시 렌더링된다.
+
+키는 빌드 그래프 순서대로 앞 단계 키를 입력으로 포함한다.
+    base(이미지, 길이) → sub(base, 자막, 색상) → final(sub, TTS, BGM, 볼륨)
+"""
+import hashlib
+import json
+import os
+import shutil
+import threading
+from pathlib import Path
+from typing import Callable, Dict, Optional, Tuple
+
+# 캐시 키 포맷이 바뀌면 올려서 이전 산출물을 무효화
+CACHE_VERSION = 1
+
+_DIGEST_MEMO: Dict[Tuple[str, int, int], str] = {}
+_DIGEST_LOCK = threading.Lock()
+
+
+def file_digest(path) -> str:
+    """파일 내용 sha256. (경로, 크기, mtime)이 같으면 다시 읽지 않는다.
+    파일이 없으면 빈 문자열 — 키에 '없음'으로 반영됨."""
+    if not path:
+        return ""
+    p = Path(path)
+    try:
+        stat = p.stat()
+    except OSError:
+        return ""
+    memo_key = (str(p.resolve()), stat.st_size, stat.st_mtime_ns)
+    with _DIGEST_LOCK:
+        hit = _DIGEST_MEMO.get(memo_key)
+    if hit:
+        return hit
+    h = hashlib.sha256()
+    with open(p, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            h.update(chunk)
+    digest = h.hexdigest()
+    with _DIGEST_LOCK:
+        _DIGEST_MEMO[memo_key] = digest
+    return digest
+
+
+def scene_key(kind: str, **inputs) -> str:
+    """산출물 종류 + 입력 파라미터로 캐시 키 생성.
+    Path 값은 경로가 아니라 파일 내용 해시로 치환된다."""
+    norm = {}
+    for k, v in sorted(inputs.items()):
+        if isinstance(v, Path):
+            v = {"file": file_digest(v)}
+        elif isinstance(v, float):
+            v = round(v, 3)
+        norm[k] = v
+    payload = json.dumps({"v": CACHE_VERSION, "kind": kind, "in": norm},
+                         ensure_ascii=False, sort_keys=True, default=str)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+def link_or_copy(src, dst) -> None:
+    """하드링크 시도 후 실패(다른 파일시스템 등)하면 복사."""
+    src, dst = str(src), str(dst)
+    if os.path.exists(dst):
+        os.remove(dst)
+    try:
+        os.link(src, dst)
+    except OSError:
+        shutil.copy2(src, dst)
+
+
+class RenderCache:
+    """<root>/<kind>/<key[:2]>/<key>.mp4 형태로 장면 산출물을 보관."""
+
+    def __init__(self, root):
+        self.root = Path(root)
+
+    def path_for(self, kind: str, key: str) -> Path:
+        return self.root / kind / key[:2] / f"{key}.mp4"
+
+    def lookup(self, kind: str, key: str) -> Optional[Path]:
+        p = self.path_for(kind, key)
+        if p.exists() and p.stat().st_size > 0:
+            return p
+        return None
+
+    def store(self, kind: str, key: str, built_path) -> None:
+        """렌더링된 파일을 캐시에 등록. 실패해도 렌더 결과에는 영향 없음."""
+        if not built_path or not os.path.exists(built_path) or os.path.getsize(built_path) == 0:
+            return
+        p = self.path_for(kind, key)
+        try:
+            # 내용은 산출물 저장소(artifact_store)에 한 번만 두고 캐시 항목도 그 하드링크로
+            # → 같은 렌더 결과가 다른 세션 캐시에 있어도 디스크는 한 벌
+            from artifact_store import get_store
+            get_store().materialize(built_path, p)
+        except OSError as e:
+            print(f"[render_cache] store failed: {e}")
+
+    def materialize(self, kind: str, key: str, dest,
+                    build: Callable[[str], object]) -> Tuple[object, bool]:
+        """캐시에 있으면 dest로 링크, 없으면 build(dest) 실행 후 캐시에 등록.
+
+        Returns:
+            (build 반환값 또는 캐시 히트 시 True, 캐시 히트 여부)
+        """
+        hit = self.lookup(kind, key)
+        if hit:
+            link_or_copy(hit, dest)
+            return True, True
+        # dest가 이전 실행에서 캐시와 하드링크된 파일이면 덮어쓰기가 캐시까지 오염시키므로 먼저 끊음
+        if os.path.exists(dest):
+            os.remove(dest)
+        result = build(str(dest))
+        # 함수들이 True/None 또는 에러 문자열을 돌려주는 관례 — 문자열이면 실패로 보고 캐시하지 않음
+        if not isinstance(result, str):
+            self.store(kind, key, dest)
+        return result, False
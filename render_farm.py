@@ -0,0 +1,403 @@
+# -*- coding: utf-8 -*-
+"""
+공유 파일시스템 렌더 팜 (장면 단위 fit / subtitle / mux 작업).
+
+장면 작업을 입력 파일 해시가 들어간 자기완결 spec으로 표현하고, RENDER_FARM_DB가 가리키는
+SQLite 큐에 넣는다. 같은 마운트를 가진 다른 머신의 워커들이 작업을 lease → heartbeat → complete
+하고, lease가 만료된 작업(워커 사망)은 다른 워커가 다시 가져간다.
+Streamlit 앱과 배치 CLI는 execute()로 제출하고 결과를 기다리기만 하면 된다.
+
+- 작업 ID = (op, 입력 파일 내용 해시, 파라미터) 해시 → 같은 장면을 여러 세션이 요청해도 한 번만 렌더
+- 결과물은 <DB 폴더>/artifacts/<op>/<id[:2]>/<id>.mp4 에 저장되고 요청한 경로로 하드링크
+- RENDER_FARM_DB가 없거나 살아 있는 워커가 없으면 이 프로세스에서 바로 실행 (기존 동작)
+- 모든 노드에서 outputs/ 와 DB 폴더가 같은 절대 경로로 마운트되어 있어야 함
+- 워커도 렌더 전에 그 노드의 cpu 슬롯을 받는다 (render_scheduler 대기열은 노드 로컬 — RENDER_SLOT_DB를 공유 마운트에 두지 말 것)
+- 네트워크 파일시스템에서는 WAL이 안전하지 않아 기본 journal(DELETE) 모드 + 긴 busy timeout 사용
+
+워커 실행:
+    RENDER_FARM_DB=/mnt/render/farm.db python render_farm.py worker --concurrency 4
+"""
+import argparse
+import json
+import os
+import socket
+import sqlite3
+import sys
+import threading
+import time
+import traceback
+import uuid
+from contextlib import closing, contextmanager
+from pathlib import Path
+from typing import Callable, Dict, Optional
+
+import cancellation
+from render_cache import file_digest, link_or_copy, scene_key
+from render_scheduler import PRIORITIES, current_priority, render_slot
+
+LEASE_SEC = int(os.getenv("RENDER_FARM_LEASE_SEC", "60"))
+MAX_ATTEMPTS = int(os.getenv("RENDER_FARM_MAX_ATTEMPTS", "3"))
+WAIT_TIMEOUT_SEC = int(os.getenv("RENDER_FARM_WAIT_TIMEOUT", "1800"))
+POLL_SEC = 0.5
+# 마지막 heartbeat가 이보다 오래된 워커는 죽은 것으로 간주
+WORKER_STALE_SEC = LEASE_SEC
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS tasks (
+    id TEXT PRIMARY KEY,
+    op TEXT NOT NULL,
+    spec TEXT NOT NULL,
+    state TEXT NOT NULL,            -- queued | leased | done | failed
+    priority INTEGER NOT NULL DEFAULT 1,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    lease_owner TEXT,
+    lease_expires REAL,
+    error TEXT,
+    created_at REAL NOT NULL,
+    updated_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_tasks_queue ON tasks(state, priority, created_at);
+CREATE TABLE IF NOT EXISTS workers (
+    id TEXT PRIMARY KEY,
+    host TEXT,
+    pid INTEGER,
+    running INTEGER NOT NULL DEFAULT 0,
+    last_seen REAL NOT NULL
+);
+"""
+
+
+# =========================================================
+# 작업 종류 (op) — 입력 경로 dict + 파라미터 → output에 mp4 생성
+# 반환값 관례: True/None 성공, 문자열/False 실패
+# =========================================================
+def _op_fit(inputs: dict, params: dict, output: str):
+    method = params.get("method", "speed")
+    if method == "speed":
+        from video_utils import retime_video_to_duration
+        return retime_video_to_duration(inputs["video"], params["source_duration"], params["target_duration"], output)
+    from video_utils import fit_video_to_duration
+    return fit_video_to_duration(inputs["video"], params["target_duration"], output, extend_mode=method)
+
+
+def _op_subtitle(inputs: dict, params: dict, output: str):
+    from video_utils import add_subtitle_to_video
+    return add_subtitle_to_video(
+        inputs["video"], params["text"], output,
+        scene_index=params.get("scene_index", 0), font_color=params.get("font_color", "white"),
+    )
+
+
+def _op_mux(inputs: dict, params: dict, output: str):
+    from tts_core import add_audio_to_video
+    return add_audio_to_video(
+        inputs["video"], inputs["audio"], output,
+        bgm_path=inputs.get("bgm"), bgm_volume=params.get("bgm_volume", 0.15),
+    )
+
+
+OPS: Dict[str, Callable[[dict, dict, str], object]] = {
+    "fit": _op_fit,
+    "subtitle": _op_subtitle,
+    "mux": _op_mux,
+}
+
+
+def _run_op(op: str, inputs: dict, params: dict, output: str):
+    """op 실행 후 True 또는 에러 문자열."""
+    try:
+        result = OPS[op](inputs, params, output)
+    except Exception as e:
+        return f"{op} 실패: {e}"
+    if isinstance(result, str):
+        return result
+    if result is False or not os.path.exists(output) or os.path.getsize(output) == 0:
+        return f"{op} 실패: 출력 파일이 생성되지 않았습니다."
+    return True
+
+
+# =========================================================
+# 큐 (SQLite)
+# =========================================================
+class RenderFarm:
+    def __init__(self, db_path):
+        self.db_path = Path(db_path).resolve()
+        self.artifact_root = self.db_path.parent / "artifacts"
+        self.db_path.parent.mkdir(parents=True, exist_ok=True)
+        with self._connect() as conn:
+            conn.executescript(_SCHEMA)
+
+    @contextmanager
+    def _connect(self):
+        # autocommit 모드 — 여러 문장을 묶어야 하는 lease만 BEGIN IMMEDIATE로 직접 트랜잭션
+        with closing(sqlite3.connect(str(self.db_path), timeout=30, isolation_level=None)) as conn:
+            conn.row_factory = sqlite3.Row
+            yield conn
+
+    def artifact_path(self, task_id: str, op: str) -> Path:
+        return self.artifact_root / op / task_id[:2] / f"{task_id}.mp4"
+
+    # ---- 제출 쪽 ----
+    def make_spec(self, op: str, inputs: dict, params: dict) -> dict:
+        """입력 경로를 절대 경로 + 내용 해시로 고정한 자기완결 spec."""
+        files = {
+            name: {"path": str(Path(p).resolve()), "sha256": file_digest(p)}
+            for name, p in inputs.items() if p
+        }
+        task_id = scene_key(f"farm_{op}", **{k: v["sha256"] for k, v in files.items()}, **params)
+        return {"id": task_id, "op": op, "inputs": files, "params": params}
+
+    def submit(self, spec: dict) -> str:
+        """큐에 등록 (이미 있으면 그대로, 실패했던 작업이면 다시 대기열로)."""
+        now = time.time()
+        with self._connect() as conn:
+            conn.execute(
+                "INSERT OR IGNORE INTO tasks (id, op, spec, state, priority, created_at, updated_at) "
+                "VALUES (?, ?, ?, 'queued', ?, ?, ?)",
+                (spec["id"], spec["op"], json.dumps(spec, ensure_ascii=False),
+                 PRIORITIES[current_priority()], now, now),
+            )
+            conn.execute(
+                "UPDATE tasks SET state='queued', attempts=0, error=NULL, updated_at=? "
+                "WHERE id=? AND state='failed'",
+                (now, spec["id"]),
+            )
+        return spec["id"]
+
+    def wait(self, task_id: str, op: str, timeout: float = WAIT_TIMEOUT_SEC):
+        """작업이 끝날 때까지 폴링. True 또는 에러 문자열."""
+        deadline = time.time() + timeout
+        artifact = self.artifact_path(task_id, op)
+        while time.time() < deadline:
+            with self._connect() as conn:
+                row = conn.execute("SELECT state, error FROM tasks WHERE id=?", (task_id,)).fetchone()
+            if row is None:
+                return f"렌더 팜 작업이 사라졌습니다: {task_id}"
+            if row["state"] == "done" and artifact.exists():
+                return True
+            if row["state"] == "failed":
+                return row["error"] or "렌더 팜 작업 실패"
+            cancellation.sleep(POLL_SEC)  # 취소되면 기다리기만 그만둠 (같은 입력의 작업은 다른 세션이 쓸 수 있음)
+        return f"렌더 팜 대기 시간 초과 ({timeout:.0f}s): {task_id}"
+
+    def live_workers(self) -> int:
+        with self._connect() as conn:
+            row = conn.execute("SELECT COUNT(*) FROM workers WHERE last_seen > ?",
+                               (time.time() - WORKER_STALE_SEC,)).fetchone()
+        return row[0]
+
+    def run(self, op: str, inputs: dict, params: dict, output: str):
+        """제출 → 대기 → 결과를 output으로 링크. True 또는 에러 문자열."""
+        spec = self.make_spec(op, inputs, params)
+        artifact = self.artifact_path(spec["id"], op)
+        if not artifact.exists():
+            self.submit(spec)
+            result = self.wait(spec["id"], op)
+            if result is not True:
+                return result
+        link_or_copy(artifact, output)
+        return True
+
+    # ---- 워커 쪽 ----
+    def lease(self, worker_id: str, lease_sec: int = LEASE_SEC) -> Optional[dict]:
+        """대기 중이거나 lease가 만료된 작업 하나를 가져옴."""
+        now = time.time()
+        with self._connect() as conn:
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                # 재시도 한도를 넘긴 채 lease가 만료된 작업은 실패 처리
+                conn.execute(
+                    "UPDATE tasks SET state='failed', error=COALESCE(error, 'lease 만료 (워커 응답 없음)'), "
+                    "updated_at=? WHERE state='leased' AND lease_expires < ? AND attempts >= ?",
+                    (now, now, MAX_ATTEMPTS),
+                )
+                row = conn.execute(
+                    "SELECT id, spec FROM tasks "
+                    "WHERE state='queued' OR (state='leased' AND lease_expires < ?) "
+                    "ORDER BY priority, created_at LIMIT 1",
+                    (now,),
+                ).fetchone()
+                if row is None:
+                    conn.execute("COMMIT")
+                    return None
+                conn.execute(
+                    "UPDATE tasks SET state='leased', lease_owner=?, lease_expires=?, "
+                    "attempts=attempts+1, updated_at=? WHERE id=?",
+                    (worker_id, now + lease_sec, now, row["id"]),
+                )
+                conn.execute("COMMIT")
+            except BaseException:
+                conn.execute("ROLLBACK")
+                raise
+        return json.loads(row["spec"])
+
+    def heartbeat(self, task_id: str, worker_id: str, lease_sec: int = LEASE_SEC) -> bool:
+        """lease 연장. 다른 워커에게 넘어갔으면 False."""
+        with self._connect() as conn:
+            cur = conn.execute(
+                "UPDATE tasks SET lease_expires=?, updated_at=? "
+                "WHERE id=? AND lease_owner=? AND state='leased'",
+                (time.time() + lease_sec, time.time(), task_id, worker_id),
+            )
+        return cur.rowcount == 1
+
+    def complete(self, task_id: str, worker_id: str) -> None:
+        with self._connect() as conn:
+            conn.execute(
+                "UPDATE tasks SET state='done', error=NULL, updated_at=? WHERE id=? AND lease_owner=?",
+                (time.time(), task_id, worker_id),
+            )
+
+    def fail(self, task_id: str, worker_id: str, error: str) -> None:
+        """재시도 한도 전이면 다시 대기열로, 넘었으면 실패."""
+        with self._connect() as conn:
+            conn.execute(
+                "UPDATE tasks SET state=CASE WHEN attempts >= ? THEN 'failed' ELSE 'queued' END, "
+                "error=?, lease_owner=NULL, lease_expires=NULL, updated_at=? WHERE id=? AND lease_owner=?",
+                (MAX_ATTEMPTS, error[:2000], time.time(), task_id, worker_id),
+            )
+
+    def register_worker(self, worker_id: str, running: int = 0) -> None:
+        with self._connect() as conn:
+            conn.execute(
+                "INSERT INTO workers (id, host, pid, running, last_seen) VALUES (?, ?, ?, ?, ?) "
+                "ON CONFLICT(id) DO UPDATE SET running=excluded.running, last_seen=excluded.last_seen",
+                (worker_id, socket.gethostname(), os.getpid(), running, time.time()),
+            )
+
+    def stats(self) -> dict:
+        with self._connect() as conn:
+            states = dict(conn.execute("SELECT state, COUNT(*) FROM tasks GROUP BY state").fetchall())
+        return {"tasks": states, "live_workers": self.live_workers()}
+
+
+_FARMS: Dict[str, RenderFarm] = {}
+_FARMS_LOCK = threading.Lock()
+
+
+def get_farm() -> Optional[RenderFarm]:
+    """RENDER_FARM_DB가 설정되어 있으면 RenderFarm, 아니면 None."""
+    db = os.getenv("RENDER_FARM_DB")
+    if not db:
+        return None
+    with _FARMS_LOCK:
+        if db not in _FARMS:
+            _FARMS[db] = RenderFarm(db)
+        return _FARMS[db]
+
+
+def execute(op: str, inputs: dict, params: dict, output):
+    """
+    장면 작업 하나 실행. 렌더 팜에 살아 있는 워커가 있으면 제출 후 대기, 아니면 여기서 직접 렌더.
+    inputs: {"video": 경로, "audio": 경로, "bgm": 경로|None} 처럼 이름 → 파일 경로
+    Returns: True 또는 에러 문자열 (현재 취소 토큰이 취소되면 쓰다 만 출력을 지우고 Cancelled)
+    """
+    output = str(output)
+    cancellation.check_cancelled()
+    farm = get_farm()
+    if farm is not None:
+        try:
+            if farm.live_workers():
+                return farm.run(op, inputs, params, output)
+        except sqlite3.Error as e:
+            print(f"[render_farm] 큐 접근 실패, 로컬에서 실행: {e}")
+    with render_slot("cpu"):
+        result = _run_op(op, {k: str(v) for k, v in inputs.items() if v}, params, output)
+    if cancellation.is_cancelled():
+        # ffmpeg가 중간에 종료된 결과물 — 실패 문자열 대신 취소로 올림
+        cancellation.discard_partial(output)
+        cancellation.check_cancelled()
+    return result
+
+
+# =========================================================
+# 워커 프로세스
+# =========================================================
+def _work_one(farm: RenderFarm, worker_id: str, spec: dict) -> None:
+    task_id, op = spec["id"], spec["op"]
+    stop = threading.Event()
+
+    def _beat():
+        while not stop.wait(LEASE_SEC / 3):
+            if not farm.heartbeat(task_id, worker_id):
+                print(f"[{worker_id}] lease 상실: {task_id}", flush=True)
+                return
+
+    beat = threading.Thread(target=_beat, daemon=True)
+    beat.start()
+    try:
+        inputs = {}
+        for name, f in spec["inputs"].items():
+            # 마운트 동기화 지연 등으로 내용이 다르면 잘못된 결과를 만들지 않도록 실패 → 재시도
+            if file_digest(f["path"]) != f["sha256"]:
+                raise RuntimeError(f"입력 파일 해시 불일치: {f['path']}")
+            inputs[name] = f["path"]
+        artifact = farm.artifact_path(task_id, op)
+        artifact.parent.mkdir(parents=True, exist_ok=True)
+        tmp = artifact.with_name(f"{artifact.stem}.{worker_id}.tmp.mp4")
+        with render_slot("cpu"):
+            result = _run_op(op, inputs, spec["params"], str(tmp))
+        if result is not True:
+            raise RuntimeError(result)
+        os.replace(tmp, artifact)
+        farm.complete(task_id, worker_id)
+        print(f"[{worker_id}] ✅ {op} {task_id[:12]}", flush=True)
+    except Exception as e:
+        print(f"[{worker_id}] ❌ {op} {task_id[:12]}: {e}", flush=True)
+        traceback.print_exc()
+        farm.fail(task_id, worker_id, f"{type(e).__name__}: {e}")
+    finally:
+        stop.set()
+
+
+def run_worker(farm: RenderFarm, concurrency: int = 1, idle_sleep: float = 1.0) -> None:
+    """작업을 계속 가져와 실행 (Ctrl+C로 종료)."""
+    base_id = f"{socket.gethostname()}-{os.getpid()}-{uuid.uuid4().hex[:4]}"
+    running = [0]
+    lock = threading.Lock()
+
+    def _loop(n):
+        worker_id = f"{base_id}-{n}"
+        while True:
+            spec = farm.lease(worker_id)
+            if spec is None:
+                time.sleep(idle_sleep)
+                continue
+            with lock:
+                running[0] += 1
+            try:
+                _work_one(farm, worker_id, spec)
+            finally:
+                with lock:
+                    running[0] -= 1
+
+    for n in range(concurrency):
+        threading.Thread(target=_loop, args=(n,), name=f"farm-worker-{n}", daemon=True).start()
+    print(f"렌더 팜 워커 시작: {base_id} · 동시 {concurrency} · DB {farm.db_path}", flush=True)
+    try:
+        while True:
+            farm.register_worker(base_id, running[0])
+            time.sleep(min(10, WORKER_STALE_SEC / 3))
+    except KeyboardInterrupt:
+        print("워커 종료", flush=True)
+
+
+def main(argv=None) -> int:
+    ap = argparse.ArgumentParser(description="렌더 팜 워커 / 상태 확인")
+    ap.add_argument("command", choices=["worker", "stats"])
+    ap.add_argument("--db", default=os.getenv("RENDER_FARM_DB"), help="큐 DB 경로 (기본: RENDER_FARM_DB)")
+    ap.add_argument("--concurrency", type=int, default=1, help="이 노드에서 동시에 처리할 작업 수")
+    args = ap.parse_args(argv)
+    if not args.db:
+        ap.error("--db 또는 RENDER_FARM_DB를 지정하세요.")
+
+    farm = RenderFarm(args.db)
+    if args.command == "stats":
+        print(json.dumps(farm.stats(), ensure_ascii=False, indent=2))
+        return 0
+    run_worker(farm, max(1, args.concurrency))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
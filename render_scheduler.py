@@ -0,0 +1,372 @@
+# -*- coding: utf-8 -*-
+"""
+머신 전역 렌더 스케줄러 (세션·프로세스 간 공정 분배).
+moviepy/ffmpeg 인코딩, TTS 일괄 생성, Runway 제출이 모두 render_slot()을 거쳐 자원 슬롯을 받는다.
+
+- 자원 풀: cpu(인코딩), runway(영상 생성 제출), tts(음성 일괄 생성) — 풀마다 동시 실행 상한
+- 우선순위: interactive(프리뷰·TTS) > render(Step 7/8) > batch(CLI 배치)
+- 같은 우선순위 안에서는 슬롯을 덜 받은 세션이 먼저 (세션별 라운드 로빈) → 한 세션이 장면 20개를
+  넣어도 다른 세션의 요청은 그 뒤에 줄 서지 않고 번갈아 처리됨
+- 대기열은 이 머신 로컬 임시 폴더의 render_slots-<호스트>.db (SQLite, RENDER_SLOT_DB로 변경) 티켓 테이블 하나 —
+  Streamlit 프로세스와 백그라운드 잡 프로세스(job_runner), 배치 CLI, 렌더 팜 워커가 모두 같은 줄에 서므로
+  우선순위·공정 분배·상한이 머신 전체에 적용됨. 공유 마운트에 두면 여러 노드가 상한 하나를 나눠 쓰게 되므로 안 됨
+- 프로세스가 죽으면 그 티켓은 pid 확인(같은 호스트) 또는 heartbeat 만료(TICKET_STALE_SEC)로 정리
+
+사용:
+    with render_slot("cpu"):
+        clip.write_videofile(...)
+
+    with render_priority("interactive"):
+        ...  # 이 블록(및 여기서 띄운 파이프라인 스레드)의 슬롯 요청은 interactive 우선순위
+"""
+import contextvars
+import os
+import socket
+import sqlite3
+import tempfile
+import threading
+import time
+from contextlib import closing, contextmanager
+from pathlib import Path
+from typing import Callable, Dict, Optional
+
+import metrics
+from cancellation import Cancelled, current_token
+from session_logger import current_session_id
+
+PRIORITIES = {"interactive": 0, "render": 1, "batch": 2}
+DEFAULT_PRIORITY = "render"
+
+
+def _env_int(name: str, default: int) -> int:
+    try:
+        return max(1, int(os.getenv(name, "")))
+    except ValueError:
+        return default
+
+
+# 풀별 동시 실행 상한 (환경변수 RENDER_SLOTS_<POOL>로 덮어쓰기)
+POOL_CAPACITY = {
+    "cpu": _env_int("RENDER_SLOTS_CPU", max(1, (os.cpu_count() or 2) // 2)),
+    "runway": _env_int("RENDER_SLOTS_RUNWAY", 4),
+    "tts": _env_int("RENDER_SLOTS_TTS", 4),
+}
+# 머신 전체가 공유하는 대기열 DB (로컬 디스크에 둘 것 — 풀 상한은 머신 단위).
+# 작업 폴더 기준 경로면 공유 마운트에서 도는 렌더 팜 워커들이 한 DB를 같이 쓰게 되므로 기본값은 로컬 임시 폴더
+SLOT_DB = Path(os.getenv("RENDER_SLOT_DB", "")
+               or Path(tempfile.gettempdir()) / f"render_slots-{socket.gethostname()}.db")
+POLL_SEC = 0.2           # 다른 프로세스의 반납을 확인하는 간격
+HEARTBEAT_SEC = 5.0      # 이 프로세스 티켓의 heartbeat 갱신 간격
+TICKET_STALE_SEC = 60.0  # heartbeat가 이보다 오래된 티켓은 죽은 프로세스 것으로 보고 정리
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS tickets (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    pool TEXT NOT NULL,
+    priority INTEGER NOT NULL,
+    session TEXT NOT NULL,
+    host TEXT NOT NULL,
+    pid INTEGER NOT NULL,
+    state TEXT NOT NULL,            -- waiting | running
+    created_at REAL NOT NULL,
+    heartbeat REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_tickets_pool ON tickets(pool, state);
+CREATE TABLE IF NOT EXISTS served (
+    pool TEXT NOT NULL,
+    session TEXT NOT NULL,
+    n INTEGER NOT NULL,
+    PRIMARY KEY (pool, session)
+);
+"""
+
+_PRIORITY: contextvars.ContextVar = contextvars.ContextVar("render_priority", default=DEFAULT_PRIORITY)
+
+
+@contextmanager
+def render_priority(name: str):
+    """블록 안의 슬롯 요청 우선순위 지정. 파이프라인 워커 스레드에도 컨텍스트로 전파된다."""
+    if name not in PRIORITIES:
+        raise ValueError(f"알 수 없는 우선순위: {name}")
+    token = _PRIORITY.set(name)
+    try:
+        yield
+    finally:
+        _PRIORITY.reset(token)
+
+
+def current_priority() -> str:
+    return _PRIORITY.get()
+
+
+def _pid_alive(pid: int) -> bool:
+    if os.name != "posix":
+        return True  # Windows에서는 heartbeat 만료로만 판단
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except OSError:
+        return True  # 다른 사용자의 프로세스 (EPERM) — 살아 있음
+    return True
+
+
+class RenderScheduler:
+    """풀별 슬롯을 (우선순위, 세션이 받은 슬롯 수, 도착 순서) 순으로 나눠 준다.
+
+    받은 슬롯 수(served)는 세션이 활성(대기 또는 실행 중 티켓이 있음)인 동안만 유지하고, 새로 활성화되는
+    세션은 현재 활성 세션들의 최솟값에서 출발한다 — 한동안 쉬던 세션이 밀린 몫을 몰아 받지 않도록.
+    상태는 전부 SQLite에 있고, 티켓 순서 판단·상태 변경은 BEGIN IMMEDIATE 트랜잭션 안에서만 한다.
+    """
+
+    def __init__(self, capacity: Dict[str, int], db_path=SLOT_DB):
+        self.capacity = dict(capacity)
+        self.db_path = Path(db_path)
+        self._host = socket.gethostname()
+        self._cond = threading.Condition()
+        self._ready = False
+        self._live = 0  # 이 인스턴스가 가진 티켓 수 (heartbeat 스레드용)
+        self._beat_thread: Optional[threading.Thread] = None
+        self._held = threading.local()
+
+    @contextmanager
+    def _connect(self):
+        if not self._ready:
+            self.db_path.parent.mkdir(parents=True, exist_ok=True)
+        # autocommit 모드 — 여러 문장을 묶어야 하는 곳만 BEGIN IMMEDIATE로 직접 트랜잭션
+        with closing(sqlite3.connect(str(self.db_path), timeout=30, isolation_level=None)) as conn:
+            if not self._ready:
+                conn.executescript(_SCHEMA)
+                self._ready = True
+            yield conn
+
+    @contextmanager
+    def _transaction(self):
+        with self._connect() as conn:
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                yield conn
+                conn.execute("COMMIT")
+            except BaseException:
+                conn.execute("ROLLBACK")
+                raise
+
+    # ---- 순서 계산 (트랜잭션 안에서만 호출) ----
+    def _reap(self, conn) -> None:
+        """죽은 프로세스의 티켓과 비활성 세션의 served 기록 정리."""
+        conn.execute("DELETE FROM tickets WHERE heartbeat < ?", (time.time() - TICKET_STALE_SEC,))
+        rows = conn.execute("SELECT DISTINCT pid FROM tickets WHERE host=?", (self._host,)).fetchall()
+        for (pid,) in rows:
+            if not _pid_alive(pid):
+                conn.execute("DELETE FROM tickets WHERE host=? AND pid=?", (self._host, pid))
+        conn.execute(
+            "DELETE FROM served WHERE NOT EXISTS "
+            "(SELECT 1 FROM tickets t WHERE t.pool=served.pool AND t.session=served.session)"
+        )
+
+    def _order(self, conn, pool: str) -> list:
+        rows = conn.execute(
+            "SELECT t.id FROM tickets t LEFT JOIN served s ON s.pool=t.pool AND s.session=t.session "
+            "WHERE t.pool=? AND t.state='waiting' ORDER BY t.priority, COALESCE(s.n, 0), t.id",
+            (pool,),
+        ).fetchall()
+        return [r[0] for r in rows]
+
+    def _enqueue(self, pool: str, prio: int, session: str) -> int:
+        now = time.time()
+        with self._transaction() as conn:
+            self._reap(conn)
+            # served 행이 없으면 비활성 세션 → 활성 세션들의 최솟값에서 출발
+            conn.execute(
+                "INSERT OR IGNORE INTO served (pool, session, n) "
+                "VALUES (?, ?, COALESCE((SELECT MIN(n) FROM served WHERE pool=?), 0))",
+                (pool, session, pool),
+            )
+            cur = conn.execute(
+                "INSERT INTO tickets (pool, priority, session, host, pid, state, created_at, heartbeat) "
+                "VALUES (?, ?, ?, ?, ?, 'waiting', ?, ?)",
+                (pool, prio, session, self._host, os.getpid(), now, now),
+            )
+        return cur.lastrowid
+
+    def _try_acquire(self, pool: str, ticket_id: int) -> Optional[int]:
+        """슬롯을 받으면 0, 아니면 대기 순번. 티켓이 정리돼 사라졌으면 None (다시 줄 서기)."""
+        with self._transaction() as conn:
+            self._reap(conn)
+            order = self._order(conn, pool)
+            if ticket_id not in order:
+                return None
+            running = conn.execute("SELECT COUNT(*) FROM tickets WHERE pool=? AND state='running'",
+                                   (pool,)).fetchone()[0]
+            if running < self.capacity[pool] and order[0] == ticket_id:
+                conn.execute("UPDATE tickets SET state='running', heartbeat=? WHERE id=?",
+                             (time.time(), ticket_id))
+                conn.execute("UPDATE served SET n=n+1 WHERE pool=? AND session="
+                             "(SELECT session FROM tickets WHERE id=?)", (pool, ticket_id))
+                return 0
+            return order.index(ticket_id) + 1
+
+    def _release(self, ticket_id: int) -> None:
+        try:
+            with self._transaction() as conn:
+                conn.execute("DELETE FROM tickets WHERE id=?", (ticket_id,))
+                self._reap(conn)
+        except sqlite3.Error as e:
+            # 반납에 실패해도 heartbeat가 멈추면 TICKET_STALE_SEC 뒤 다른 프로세스가 정리
+            print(f"⚠️ 렌더 슬롯 반납 실패 (ticket {ticket_id}): {e}")
+        with self._cond:
+            self._live -= 1
+            self._cond.notify_all()
+
+    def _ensure_heartbeat(self) -> None:
+        with self._cond:
+            self._live += 1
+            if self._beat_thread is not None and self._beat_thread.is_alive():
+                return
+            self._beat_thread = threading.Thread(target=self._heartbeat_loop, daemon=True,
+                                                 name="render-slot-heartbeat")
+            self._beat_thread.start()
+
+    def _heartbeat_loop(self) -> None:
+        while True:
+            time.sleep(HEARTBEAT_SEC)
+            with self._cond:
+                if not self._live:
+                    continue
+            try:
+                with self._connect() as conn:
+                    conn.execute("UPDATE tickets SET heartbeat=? WHERE host=? AND pid=?",
+                                 (time.time(), self._host, os.getpid()))
+            except sqlite3.Error as e:
+                print(f"⚠️ 렌더 슬롯 heartbeat 실패: {e}")
+
+    def _wake(self) -> None:
+        with self._cond:
+            self._cond.notify_all()
+
+    # ---- 공개 API ----
+    @contextmanager
+    def slot(self, pool: str, priority: Optional[str] = None, session_id: Optional[str] = None,
+             on_wait: Optional[Callable[[int], None]] = None):
+        """
+        슬롯 하나를 잡고 블록 실행. on_wait(대기 순번)은 순번이 바뀔 때마다 호출.
+        대기 중 현재 취소 토큰이 취소되면 줄에서 빠지고 Cancelled.
+        """
+        held = getattr(self._held, "pools", None)
+        if held is None:
+            held = self._held.pools = set()
+        if pool in held or pool not in self.capacity:
+            # 이미 같은 풀 슬롯을 쥔 스레드의 중첩 호출(예: concat 안의 인코딩)은 그대로 통과
+            yield
+            return
+
+        session = session_id or current_session_id() or "_anon"
+        prio_name = priority or _PRIORITY.get()
+        prio = PRIORITIES[prio_name]
+        queued_at = time.perf_counter()
+        last_pos = None
+        token = current_token()
+        try:
+            ticket_id = self._enqueue(pool, prio, session)
+        except (OSError, sqlite3.Error) as e:
+            # 대기열 DB를 못 쓰면 렌더 자체는 막지 않고 상한 없이 진행
+            print(f"⚠️ 렌더 슬롯 대기열 사용 불가 ({self.db_path}): {e}")
+            ticket_id = None
+        if ticket_id is None:
+            yield
+            return
+        self._ensure_heartbeat()
+        unregister = token.on_cancel(self._wake) if token else None
+        try:
+            while True:
+                if token is not None and token.cancelled:
+                    raise Cancelled(token.reason or "취소됨")
+                pos = self._try_acquire(pool, ticket_id)
+                if pos is None:
+                    # heartbeat가 늦어(절전 등) 다른 프로세스가 티켓을 정리함 → 다시 줄 서기
+                    ticket_id = self._enqueue(pool, prio, session)
+                    continue
+                if pos == 0:
+                    break
+                if pos != last_pos:
+                    last_pos = pos
+                    if on_wait:
+                        on_wait(pos)
+                with self._cond:
+                    # 같은 프로세스의 반납·취소는 notify로 바로, 다른 프로세스의 반납은 폴링으로 확인
+                    self._cond.wait(timeout=POLL_SEC)
+        except BaseException:
+            # 취소, on_wait 안의 Streamlit 리런 등 — 대기 중이던 티켓이 줄에 남지 않게
+            self._release(ticket_id)
+            raise
+        finally:
+            if unregister:
+                unregister()
+
+        held.add(pool)
+        try:
+            SLOT_WAIT_SECONDS.observe(time.perf_counter() - queued_at, pool=pool, priority=prio_name)
+            yield
+        finally:
+            held.discard(pool)
+            self._release(ticket_id)
+
+    def queue_position(self, pool: str, session_id: Optional[str] = None) -> Optional[int]:
+        """세션의 가장 앞선 대기 요청 순번 (대기 중이 아니면 None)."""
+        session = session_id or current_session_id() or "_anon"
+        with self._connect() as conn:
+            for i, tid in enumerate(self._order(conn, pool), 1):
+                row = conn.execute("SELECT session FROM tickets WHERE id=?", (tid,)).fetchone()
+                if row and row[0] == session:
+                    return i
+        return None
+
+    def snapshot(self) -> dict:
+        """풀별 사용량/대기 현황 (모니터링용, 머신 전체)."""
+        out = {pool: {"capacity": cap, "in_use": 0, "waiting": 0, "sessions": {}}
+               for pool, cap in self.capacity.items()}
+        try:
+            with self._connect() as conn:
+                rows = conn.execute(
+                    "SELECT pool, session, state, COUNT(*) FROM tickets "
+                    "WHERE heartbeat >= ? GROUP BY pool, session, state",
+                    (time.time() - TICKET_STALE_SEC,),
+                ).fetchall()
+        except (OSError, sqlite3.Error):
+            return out
+        for pool, session, state, n in rows:
+            info = out.get(pool)
+            if info is None:
+                continue
+            if state == "running":
+                info["in_use"] += n
+                info["sessions"][session] = info["sessions"].get(session, 0) + n
+            else:
+                info["waiting"] += n
+        return out
+
+
+_SCHEDULER = RenderScheduler(POOL_CAPACITY)
+
+SLOT_WAIT_SECONDS = metrics.histogram("render_slot_wait_seconds", "렌더 슬롯을 받기까지 대기 시간",
+                                      ("pool", "priority"))
+
+
+def _collect_slots():
+    snap = _SCHEDULER.snapshot()
+    for name, key, help_text in (("render_slots_capacity", "capacity", "풀별 동시 실행 상한"),
+                                 ("render_slots_in_use", "in_use", "풀별 사용 중인 슬롯"),
+                                 ("render_slots_waiting", "waiting", "풀별 대기 중인 요청")):
+        yield name, "gauge", help_text, [({"pool": pool}, info[key]) for pool, info in snap.items()]
+
+
+metrics.register_collector(_collect_slots)
+
+
+def get_scheduler() -> RenderScheduler:
+    return _SCHEDULER
+
+
+def render_slot(pool: str, priority: Optional[str] = None, on_wait: Optional[Callable[[int], None]] = None):
+    """전역 스케줄러에서 pool 슬롯 하나를 잡는 컨텍스트 매니저."""
+    return _SCHEDULER.slot(pool, priority=priority, on_wait=on_wait)
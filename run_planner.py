@@ -0,0 +1,356 @@
+# -*- coding: utf-8 -*-
+"""
+실행 계획 미리 보기 (dry run).
+Step 7이나 Mode A 합성 버튼을 누르기 전에 2분짜리인지 20분짜리인지, 크레딧이 얼마나 드는지 보여 주기 위함.
+
+현재 대본·TTS 길이·매칭된 이미지·캐시 상태(체크포인트, render_cache)로 실행하면 할 호출을 모두 나열한다:
+Runway 생성(재사용/새로 생성), TTS 세그먼트, 인코딩(fit/subtitle/mux/병합), LLM 호출.
+- 호출 하나의 소요: eta.get_history() (scene_done 스테이지 기록, API 응답 시간, 없으면 사전값)
+- 동시성: scene_pipeline 스테이지 워커 수와 render_scheduler 풀 상한 중 작은 값
+- 비용: scripts/analyze_session.py의 PRICING (estimate_cost)
+아무 API도 호출하지 않고 파일도 쓰지 않는다.
+
+    plan = plan_video_step(matches, audio_data, candidates, prompt, 5, video_dir)
+    print(plan.format_text())          # 배치 CLI: scripts/batch_mode_b.py --plan
+    st.dataframe(plan.rows())          # UI
+"""
+import json
+from collections import defaultdict
+from pathlib import Path
+from typing import Dict, List, NamedTuple, Optional
+
+from checkpoint import CHECKPOINT_FILE, SceneCheckpoint
+from eta import TTS_PARALLEL, format_eta, get_history
+from perf_monitor import analyze_session_module
+from render_cache import RenderCache
+from render_scheduler import POOL_CAPACITY, get_scheduler
+from scene_pipeline import stage_workers
+
+# TTS 엔진 → 로그/단가표의 API 이름
+TTS_API = {"clova": "clova_tts", "gpt": "openai_tts", "gemini-pro": "gemini_tts"}
+# 인코딩 스테이지 (render_farm 로컬 실행 시 cpu 풀 슬롯을 잡음)
+CPU_STAGES = ("fit", "subtitle", "mux", "concat")
+# 병합(concat) 인코딩 사전값: 결과 영상 1초당 초
+CONCAT_SEC_PER_MEDIA_SEC = 0.4
+# 배치 계획용 LLM 호출 한 번 사전값 (분석 · 캐릭터 · 구간 추천 · 대본)
+LLM_CALL_SEC = 20.0
+LLM_PROMPT_TOKENS = 6000
+LLM_COMPLETION_TOKENS = 1500
+BATCH_LLM_CALLS = ("동화 분석", "등장인물 분석", "예고편 구간 추천", "대본 작성")
+# 배치 계획용: 대본 생성 전이라 길이 옵션별 대략적인 장면 수·글자 수·영상 길이(초)로 추정
+BATCH_SCRIPT_SIZE = {
+    "Short": {"scenes": 10, "chars": 250, "seconds": 40},
+    "Standard": {"scenes": 14, "chars": 465, "seconds": 70},
+    "Long": {"scenes": 21, "chars": 675, "seconds": 100},
+}
+
+
+class PlannedCall(NamedTuple):
+    phase: str             # 순서대로 실행되는 구간 (예: "Step 7 Runway")
+    kind: str              # runway / download / tts / encode / llm
+    stage: str             # 동시성 계산 단위 (scene_pipeline 스테이지 이름, tts, llm, concat)
+    scene: Optional[int]
+    label: str
+    cached: bool           # 재사용 (API 호출·인코딩 없음)
+    seconds: float         # 호출 하나 예상 소요 (병렬 미포함)
+    cost_usd: float
+
+
+def _concurrency(stage: str) -> int:
+    if stage == "generate":
+        return max(1, min(stage_workers("generate"), POOL_CAPACITY["runway"]))
+    if stage == "tts":
+        return TTS_PARALLEL
+    if stage in ("llm", "concat"):
+        return 1
+    if stage in CPU_STAGES:
+        return max(1, min(stage_workers(stage), POOL_CAPACITY["cpu"]))
+    return stage_workers(stage)
+
+
+def _phase_wall(calls: List[PlannedCall]) -> float:
+    """
+    한 구간(장면 파이프라인 하나)의 예상 벽시계 시간.
+    가장 느린 스테이지(또는 인코딩 스테이지 전체가 나눠 쓰는 cpu 풀)가 병목이고,
+    첫 장면이 나머지 스테이지를 지나는 시간만큼 더해짐 (파이프라인 채우기/비우기).
+    """
+    work = defaultdict(float)
+    longest = defaultdict(float)
+    count = defaultdict(int)
+    for c in calls:
+        if c.cached:
+            continue
+        work[c.stage] += c.seconds
+        longest[c.stage] = max(longest[c.stage], c.seconds)
+        count[c.stage] += 1
+    if not work:
+        return 0.0
+    stage_time = {s: max(w / _concurrency(s), longest[s]) for s, w in work.items()}
+    # concat은 장면이 다 끝난 뒤 따로 도는 꼬리
+    tail = stage_time.pop("concat", 0.0)
+    if not stage_time:
+        return tail
+    cpu_work = sum(w for s, w in work.items() if s in CPU_STAGES and s != "concat")
+    bottleneck = max(max(stage_time.values()), cpu_work / max(1, POOL_CAPACITY["cpu"]))
+    mean = {s: work[s] / count[s] for s in stage_time}
+    fill = sum(mean.values()) - max(mean.values())
+    return bottleneck + fill + tail
+
+
+def _cost(api: str, **stats) -> float:
+    mod = analyze_session_module()
+    if mod is None:
+        return 0.0
+    full = {k: stats.get(k, 0) for k in ("prompt_tokens", "completion_tokens", "prompt_token_count",
+                                         "char_count", "billed_seconds")}
+    return mod.estimate_cost(api, full)
+
+
+class RunPlan:
+    """실행 계획. 구간(phase)은 추가한 순서대로 하나씩 실행된다고 보고 시간을 더함."""
+
+    def __init__(self, title: str):
+        self.title = title
+        self.calls: List[PlannedCall] = []
+        self.notes: List[str] = []
+        self._history = get_history()
+
+    def add(self, phase: str, kind: str, stage: str, scene: Optional[int], label: str,
+            cached: bool = False, seconds: Optional[float] = None, cost_usd: float = 0.0) -> None:
+        if seconds is None:
+            seconds = self._history.stage_latency(stage)
+        self.calls.append(PlannedCall(phase, kind, stage, scene, label, cached,
+                                      0.0 if cached else round(seconds, 1), 0.0 if cached else cost_usd))
+
+    def extend(self, other: "RunPlan") -> None:
+        self.calls.extend(other.calls)
+        self.notes.extend(other.notes)
+
+    # ---------------------------------------------------------
+    # 장면 단위 항목
+    # ---------------------------------------------------------
+    def add_tts(self, phase: str, scene: int, text: str, engine: str) -> None:
+        chars = len(text or "")
+        self.add(phase, "tts", "tts", scene, f"{engine} {chars}자",
+                 seconds=self._history.tts_latency(chars),
+                 cost_usd=_cost(TTS_API.get(engine, engine), char_count=chars))
+
+    def add_runway(self, phase: str, scene: int, runway_dur: int, resumed: dict, cached_raw: bool = False) -> None:
+        """Runway 생성 + 다운로드. resumed는 체크포인트 기록 (SceneCheckpoint.peek)."""
+        if cached_raw or resumed.get("raw_path"):
+            self.add(phase, "runway", "generate", scene, f"{runway_dur}초 · 재사용", cached=True)
+            self.add(phase, "download", "download", scene, "재사용", cached=True)
+            return
+        if resumed.get("task_id"):
+            # 이미 제출된 작업 — 크레딧은 이미 차감됨, 결과만 다시 조회
+            self.add(phase, "runway", "generate", scene, f"{runway_dur}초 · 제출된 작업 재조회")
+        else:
+            self.add(phase, "runway", "generate", scene, f"{runway_dur}초 · 새로 생성",
+                     cost_usd=_cost("runway_gen4", billed_seconds=runway_dur))
+        self.add(phase, "download", "download", scene, "결과 다운로드")
+
+    def add_encode(self, phase: str, stage: str, scene: Optional[int], label: str, cached: bool = False,
+                   media_sec: Optional[float] = None) -> None:
+        seconds = media_sec * CONCAT_SEC_PER_MEDIA_SEC if stage == "concat" and media_sec else None
+        self.add(phase, "encode", stage, scene, label, cached=cached, seconds=seconds)
+
+    # ---------------------------------------------------------
+    # 요약
+    # ---------------------------------------------------------
+    def phases(self) -> Dict[str, List[PlannedCall]]:
+        out: Dict[str, List[PlannedCall]] = {}
+        for c in self.calls:
+            out.setdefault(c.phase, []).append(c)
+        return out
+
+    def wall_sec(self) -> float:
+        return sum(_phase_wall(calls) for calls in self.phases().values())
+
+    def cost_usd(self) -> float:
+        return sum(c.cost_usd for c in self.calls)
+
+    def counts(self) -> Dict[str, Dict[str, int]]:
+        """kind → {"run": 새로 실행, "cached": 재사용}."""
+        out: Dict[str, Dict[str, int]] = defaultdict(lambda: {"run": 0, "cached": 0})
+        for c in self.calls:
+            out[c.kind]["cached" if c.cached else "run"] += 1
+        return dict(out)
+
+    def summary(self) -> dict:
+        sched = get_scheduler().snapshot()
+        return {
+            "title": self.title,
+            "wall_sec": round(self.wall_sec(), 1),
+            "cost_usd": round(self.cost_usd(), 4),
+            "counts": self.counts(),
+            "phases": {p: round(_phase_wall(calls), 1) for p, calls in self.phases().items()},
+            # 지금 다른 세션 작업으로 밀려 있는 슬롯 (예측에는 포함 안 됨)
+            "slots_waiting": {pool: s["waiting"] for pool, s in sched.items() if s["waiting"]},
+            "notes": self.notes,
+        }
+
+    def summary_text(self) -> str:
+        counts = self.counts()
+        parts = [f"예상 {format_eta(self.wall_sec())}", f"비용 약 ${self.cost_usd():.2f}"]
+        if "runway" in counts:
+            parts.append(f"Runway 새로 {counts['runway']['run']} · 재사용 {counts['runway']['cached']}")
+        if "tts" in counts:
+            parts.append(f"TTS {counts['tts']['run']}개")
+        if "encode" in counts:
+            parts.append(f"인코딩 {counts['encode']['run']}회 (재사용 {counts['encode']['cached']})")
+        return " · ".join(parts)
+
+    def rows(self) -> List[dict]:
+        return [{
+            "단계": c.phase,
+            "장면": c.scene + 1 if c.scene is not None else "",
+            "작업": c.kind,
+            "내용": c.label,
+            "재사용": "♻️" if c.cached else "",
+            "예상 (초)": c.seconds,
+            "비용 ($)": round(c.cost_usd, 3),
+        } for c in self.calls]
+
+    def format_text(self) -> str:
+        s = self.summary()
+        out = [f"=== 실행 계획: {self.title} ===", f"  {self.summary_text()}"]
+        for phase, sec in s["phases"].items():
+            out.append(f"  - {phase}: {format_eta(sec) if sec else '재사용만'}")
+        for kind, c in sorted(s["counts"].items()):
+            out.append(f"    {kind:<9} 실행 {c['run']:>3}  재사용 {c['cached']:>3}")
+        if s["slots_waiting"]:
+            out.append(f"  ⚠️ 지금 슬롯 대기 중: {s['slots_waiting']} (예측에 미포함)")
+        out.extend(f"  ※ {n}" for n in self.notes)
+        return "\n".join(out)
+
+    def to_json(self) -> str:
+        return json.dumps({**self.summary(), "calls": [c._asdict() for c in self.calls]},
+                          ensure_ascii=False, indent=2)
+
+
+# =========================================================
+# 단계별 계획
+# =========================================================
+def plan_tts_step(scripts: list, engine: str, phase: str = "Step 4 TTS") -> RunPlan:
+    plan = RunPlan(phase)
+    for i, s in enumerate(scripts):
+        plan.add_tts(phase, i, s.get("text", ""), engine)
+    return plan
+
+
+def plan_video_step(matches: list, audio_data: list, candidates: list, prompt: str,
+                    default_duration: int = 5, video_dir=None, phase: str = "Step 7 Runway") -> RunPlan:
+    """Step 7: 장면별 Runway 생성 → 다운로드 → 길이 맞춤, 무음 전체 병합. video_dir의 체크포인트를 반영."""
+    # 순환 import 방지 (b_text_based가 이 모듈을 씀)
+    import b_text_based as mb
+    plan = RunPlan(phase)
+    specs = mb.build_runway_scene_specs(matches, audio_data, {c['page_num']: c for c in candidates},
+                                        default_duration)
+    ckpt_path = Path(video_dir) / CHECKPOINT_FILE if video_dir else None
+    checkpoint = SceneCheckpoint(ckpt_path) if ckpt_path and ckpt_path.exists() else None
+    if checkpoint:
+        plan.notes.append("이전 실행 체크포인트 반영 (완료된 장면·제출된 작업 재사용)")
+    for spec in specs:
+        i = spec["scene"]
+        resumed = checkpoint.peek(i, mb.runway_checkpoint_key(spec, prompt)) if checkpoint else {}
+        plan.add_runway(phase, i, spec["runway_dur"], resumed)
+        fit_cached = bool(resumed.get("trimmed_path")) and resumed.get("fit_target") == round(spec["target_trim_dur"], 3)
+        plan.add_encode(phase, "fit", i, f"길이 맞춤 {spec['runway_dur']}s → {spec['target_trim_dur']:.1f}s",
+                        cached=fit_cached)
+    if specs:
+        plan.add_encode(phase, "concat", None, "무음 전체 병합",
+                        media_sec=sum(s["target_trim_dur"] for s in specs))
+    skipped = len(matches) - len(specs)
+    if skipped:
+        plan.notes.append(f"이미지가 없는 장면 {skipped}개는 건너뜀")
+    return plan
+
+
+def plan_final_step(video_results: list, audio_data: list, scripts: list, subtitle_mode: str,
+                    use_bgm: bool, bgm_volume: float, bgm_dir, cover_page_num, cache_root,
+                    phase: str = "Step 8 합성") -> RunPlan:
+    """Step 8: 장면별 자막 → 음성/BGM 합성, 최종 병합. render_cache 적중은 재사용으로."""
+    # 순환 import 방지 (b_text_based가 이 모듈을 씀)
+    import b_text_based as mb
+    plan = RunPlan(phase)
+    cache = RenderCache(cache_root)
+    specs, missing = mb.build_final_scene_specs(
+        video_results, audio_data, scripts, Path(cache_root), "plan",
+        subtitle_mode, use_bgm, Path(bgm_dir) if bgm_dir else bgm_dir, cover_page_num,
+    )
+    media_sec = 0.0
+    for spec in specs:
+        i = spec["scene"]
+        sub_key, final_key = mb.final_scene_keys(spec, use_bgm, bgm_volume)
+        final_hit = cache.lookup("final_scene", final_key) is not None
+        sub_hit = final_hit or cache.lookup("final_sub", sub_key) is not None
+        plan.add_encode(phase, "subtitle", i, "자막", cached=sub_hit)
+        has_bgm = bool(use_bgm and spec["page_bgm"] and spec["page_bgm"].exists())
+        plan.add_encode(phase, "mux", i, "음성 + BGM 합성" if has_bgm else "음성 합성", cached=final_hit)
+        media_sec += ((audio_data[i] or {}).get("duration") or 5.0) if i < len(audio_data) else 5.0
+    if specs:
+        plan.add_encode(phase, "concat", None, "최종 병합", media_sec=media_sec)
+    if missing:
+        plan.notes.append(f"영상 파일이 없는 장면 {len(missing)}개는 건너뜀: {[i + 1 for i in missing]}")
+    return plan
+
+
+def mode_a_checkpoint_key(spec: dict) -> dict:
+    """Mode A Step 3 장면 체크포인트 키 (입력이 같을 때만 이전 기록 재사용)."""
+    return {
+        "img": str(spec["img_path"]), "prompt": spec["prompt"],
+        "runway_dur": spec["runway_dur"], "cached_raw": spec["cached_raw"],
+    }
+
+
+def plan_mode_a(scene_specs: list, checkpoint_path=None, phase: str = "Mode A 합성") -> RunPlan:
+    """Mode A Step 3: generate → download → fit → subtitle → mux, 최종 병합."""
+    plan = RunPlan(phase)
+    checkpoint = SceneCheckpoint(checkpoint_path) if checkpoint_path and Path(checkpoint_path).exists() else None
+    for i, spec in enumerate(scene_specs):
+        resumed = checkpoint.peek(i, mode_a_checkpoint_key(spec)) if checkpoint else {}
+        plan.add_runway(phase, i, spec["runway_dur"], resumed, cached_raw=bool(spec["cached_raw"]))
+        fit_cached = bool(resumed.get("clip_path")) and resumed.get("fit_target") == spec["tts_dur"]
+        plan.add_encode(phase, "fit", i, "길이 맞춤", cached=fit_cached or not spec["tts_dur"])
+        plan.add_encode(phase, "subtitle", i, "자막")
+        if spec["audio"]:
+            plan.add_encode(phase, "mux", i, "음성 + BGM 합성" if spec["bgm"] else "음성 합성")
+    if scene_specs:
+        plan.add_encode(phase, "concat", None, "최종 병합",
+                        media_sec=sum(s["tts_dur"] or s["runway_dur"] for s in scene_specs))
+    return plan
+
+
+def plan_batch_book(book: str, preset: dict, until: str = "final", duration_key: Optional[str] = None) -> RunPlan:
+    """
+    배치(scripts/batch_mode_b.py) 책 한 권. 배치는 모든 단계를 새 버전으로 만들어서 재사용이 없고,
+    대본이 아직 없으므로 길이 옵션별 평균 장면 수·글자 수로 추정한다.
+    """
+    # 순환 import 방지 (mode_b_pipeline → b_text_based가 이 모듈을 씀)
+    from mode_b_pipeline import STAGES
+    stop = STAGES.index(until)
+    size = BATCH_SCRIPT_SIZE.get(duration_key or preset.get("duration") or "Standard", BATCH_SCRIPT_SIZE["Standard"])
+    n, chars_per_scene = size["scenes"], size["chars"] / size["scenes"]
+    sec_per_scene = size["seconds"] / n
+    plan = RunPlan(book)
+    plan.notes.append(f"대본 전 추정: 장면 {n}개 · 장면당 {chars_per_scene:.0f}자 · {sec_per_scene:.1f}초")
+
+    for label in BATCH_LLM_CALLS[:3 if stop < STAGES.index("script") else 4]:
+        plan.add("LLM", "llm", "llm", None, label, seconds=LLM_CALL_SEC,
+                 cost_usd=_cost("openai_chat", prompt_tokens=LLM_PROMPT_TOKENS,
+                                completion_tokens=LLM_COMPLETION_TOKENS))
+    if stop >= STAGES.index("tts"):
+        for i in range(n):
+            plan.add_tts("Step 4 TTS", i, "가" * int(chars_per_scene), preset["engine"])
+    if stop >= STAGES.index("video"):
+        runway_dur = 5 if sec_per_scene <= 6.0 else 10
+        for i in range(n):
+            plan.add_runway("Step 7 Runway", i, runway_dur, {})
+            plan.add_encode("Step 7 Runway", "fit", i, "길이 맞춤")
+        plan.add_encode("Step 7 Runway", "concat", None, "무음 전체 병합", media_sec=size["seconds"])
+    if stop >= STAGES.index("final"):
+        for i in range(n):
+            plan.add_encode("Step 8 합성", "subtitle", i, "자막")
+            plan.add_encode("Step 8 합성", "mux", i, "음성 합성")
+        plan.add_encode("Step 8 합성", "concat", None, "최종 병합", media_sec=size["seconds"])
+    return plan
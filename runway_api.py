@@ -1,22 +1,23 @@
 # -*- coding: utf-8 -*-
 # runway_api.py
-from runwayml import RunwayML, TaskFailedError
 from dotenv import load_dotenv
 from pathlib import Path
-from PIL import Image
 import io, base64
 import os
+import time
 from session_logger import log_api_call, summarize_text
+import cancellation
+from cancellation import Cancelled, check_cancelled, current_token
+from sdk_clients import get_runway
 
 # .env 로드 (RUNWAYML_API_SECRET 필요)
 ENV_PATH = Path(__file__).resolve().parent / ".env"
 load_dotenv(dotenv_path=ENV_PATH)
 
-client = RunwayML() 
-
 
 def image_file_to_data_uri(image_path: str, max_size=1280, quality=85) -> str:
     """이미지를 Base64로 변환 (Runway 업로드용)"""
+    from PIL import Image
     img = Image.open(image_path).convert("RGB")
     img.thumbnail((max_size, max_size))
     buf = io.BytesIO()
@@ -27,6 +28,7 @@ def image_file_to_data_uri(image_path: str, max_size=1280, quality=85) -> str:
 
 def generate_video_from_image(image_path: str, prompt_text: str, duration=5, ratio="720:1280"):
     """Runway Gen4 Turbo 영상 생성"""
+    from runwayml import TaskFailedError
     prompt_image = image_file_to_data_uri(image_path)
 
     try:
@@ -37,7 +39,7 @@ def generate_video_from_image(image_path: str, prompt_text: str, duration=5, rat
             "ratio": ratio,
         }) as _ctx:
             task = (
-                client.image_to_video.create(
+                get_runway().image_to_video.create(
                     model="gen4_turbo",
                     prompt_image=prompt_image,
                     prompt_text=prompt_text,
@@ -56,6 +58,112 @@ def generate_video_from_image(image_path: str, prompt_text: str, duration=5, rat
         raise RuntimeError(f"Runway 작업 실패: {e.task_details}")
 
 
+# Runway 작업 상태 (tasks.retrieve 응답의 status)
+RUNWAY_DONE_STATUSES = ("SUCCEEDED",)
+RUNWAY_FAILED_STATUSES = ("FAILED", "CANCELLED")
+
+
+class RunwayTimeout(RuntimeError):
+    """대기 시간 안에 끝나지 않은 작업 — 이미 취소 요청을 보냈으므로 같은 장면을 바로 다시 제출하지 않는다."""
+
+
+def submit_video_task(image_path: str, prompt_text: str, duration=5, ratio="720:1280") -> str:
+    """
+    Runway Gen4 Turbo 작업 제출만 하고 task id 반환 (크레딧은 여기서 차감됨).
+    로그는 runway_gen4_submit — 과금(billed_duration_sec)은 run_video_task의 runway_gen4 쪽에 남김.
+    """
+    check_cancelled()
+    prompt_image = image_file_to_data_uri(image_path)
+    with log_api_call("runway_gen4_submit", "gen4_turbo", {
+        "image": Path(image_path).name,
+        "duration": duration,
+    }) as _ctx:
+        task = get_runway().image_to_video.create(
+            model="gen4_turbo",
+            prompt_image=prompt_image,
+            prompt_text=prompt_text,
+            duration=duration,
+            ratio=ratio,
+        )
+        _ctx["result_summary"] = {"task_id": task.id}
+    return task.id
+
+
+def cancel_video_task(task_id: str) -> None:
+    """진행 중인 작업 취소 (tasks.delete — 아직 안 끝난 작업은 취소되고 동시 실행 몫이 풀림)."""
+    try:
+        get_runway().tasks.delete(task_id)
+        print(f"[runway] 작업 취소: {task_id}")
+    except Exception as e:
+        print(f"[runway] 작업 취소 실패 {task_id}: {e}")
+
+
+def wait_for_video_task(task_id: str, timeout: float = 900, poll_sec: float = 5):
+    """
+    제출된 작업을 tasks.retrieve로 폴링. 이전 실행에서 제출한 작업도 id만 있으면 이어서 기다릴 수 있음.
+    기다리는 중 현재 취소 토큰이 취소되면 Runway 작업을 바로 취소하고 Cancelled.
+    timeout을 넘기면 작업을 취소(tasks.delete)한 뒤 RunwayTimeout — 뒤늦게 끝나 과금되는 작업이 남지 않게.
+    """
+    token = current_token()
+    unregister = token.on_cancel(lambda: cancel_video_task(task_id)) if token else None
+    try:
+        with log_api_call("runway_gen4_wait", "gen4_turbo", {"task_id": task_id}) as _ctx:
+            deadline = time.time() + timeout
+            while True:
+                check_cancelled()
+                task = get_runway().tasks.retrieve(task_id)
+                if task.status in RUNWAY_DONE_STATUSES:
+                    _ctx["result_summary"] = {"task_id": task_id, "status": task.status}
+                    return task
+                if task.status in RUNWAY_FAILED_STATUSES:
+                    raise RuntimeError(f"Runway 작업 실패 ({task.status}): {getattr(task, 'failure', '')}")
+                if time.time() > deadline:
+                    cancel_video_task(task_id)
+                    raise RunwayTimeout(f"Runway 작업 대기 시간 초과 ({timeout:.0f}s): {task_id}")
+                cancellation.sleep(poll_sec)
+    finally:
+        if unregister:
+            unregister()
+
+
+def run_video_task(image_path: str, prompt_text: str, duration=5, ratio="720:1280",
+                   task_id: str = None, on_submitted=None):
+    """
+    task_id가 있으면 재제출 없이 그 작업 결과를 다시 조회하고,
+    없거나 그 작업이 실패/만료됐으면 (이전 작업을 취소한 뒤) 새로 제출합니다.
+    이전 작업이 대기 시간을 넘긴 경우는 RunwayTimeout을 그대로 올림 — 이중 과금 방지.
+    on_submitted(task_id)는 제출 직후 호출
+    (체크포인트 기록용 — 기다리는 도중 죽어도 다음 실행이 같은 작업을 이어받음).
+
+    로그: runway_gen4 = 제출부터 결과까지 전체 (generate_video_from_image와 같은 기준의 생성 지연·과금),
+    그 안의 runway_gen4_submit / runway_gen4_wait는 구간별 내역.
+    """
+    with log_api_call("runway_gen4", "gen4_turbo", {
+        "image": Path(image_path).name,
+        "prompt": summarize_text(prompt_text),
+        "duration": duration,
+        "ratio": ratio,
+        "resumed_task_id": task_id,
+    }) as _ctx:
+        if task_id:
+            try:
+                task = wait_for_video_task(task_id)
+                _ctx["result_summary"] = {"task_id": task_id, "resumed": True, "ratio": ratio}
+                return task
+            except (Cancelled, RunwayTimeout):
+                raise
+            except Exception as e:
+                print(f"[runway] 이전 작업 {task_id} 재사용 불가, 새로 제출: {e}")
+                # 조회만 실패하고 작업은 돌고 있을 수도 있음 → 새로 제출하기 전에 정리
+                cancel_video_task(task_id)
+        task_id = submit_video_task(image_path, prompt_text, duration, ratio)
+        # 제출 즉시 과금 — 기다리다 실패·취소돼도 기록되게 먼저 채움
+        _ctx["result_summary"] = {"task_id": task_id, "billed_duration_sec": duration, "ratio": ratio}
+        if on_submitted:
+            on_submitted(task_id)
+        return wait_for_video_task(task_id)
+
+
 def extract_video_url(result):
     """Runway 응답 구조가 다양할 때 안전하게 URL 추출"""
     output = result.output
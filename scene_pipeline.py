@@ -0,0 +1,256 @@
+# -*- coding: utf-8 -*-
+"""
+장면 단위 스테이지 파이프라인.
+generate → download → fit → subtitle → mux 처럼 장면마다 거치는 단계를
+스테이지별 워커 스레드 + 스테이지 사이 bounded queue로 연결한다.
+장면 N을 합성하는 동안 장면 N+1의 Runway 생성이 진행되므로 CPU 인코딩이
+Runway 대기 시간 뒤로 숨는다. 결과는 입력 순서대로 돌려줘서
+concat_videos_with_audio에 그대로 넘길 수 있다.
+"""
+import contextvars
+import os
+import queue
+import threading
+import time
+from typing import Any, Callable, Dict, List, NamedTuple, Optional
+
+from cancellation import Cancelled, current_token
+from profiling import profile_stage
+from render_scheduler import render_slot
+from session_logger import log_event
+from tracing import current_step
+
+# 스테이지별 기본 워커 수. 환경변수 PIPELINE_WORKERS_<STAGE>로 덮어쓸 수 있음.
+# Runway/다운로드는 네트워크 대기라 넉넉히, 인코딩 스테이지는 CPU 코어를 고려해 작게.
+DEFAULT_WORKERS = {
+    "generate": 3,
+    "download": 2,
+    "fit": 2,
+    "subtitle": 2,
+    "mux": 2,
+}
+# 스테이지 → render_scheduler 자원 풀. 워커가 장면을 처리하는 동안 해당 풀 슬롯을 잡는다.
+# 워커 수는 파이프라인 하나의 동시성, 풀 상한은 모든 세션을 합친 동시성.
+# fit/subtitle/mux 인코딩은 render_farm.execute가 로컬 실행일 때만 cpu 슬롯을 잡는다
+# (렌더 팜에 넘긴 작업을 기다리는 동안 이 머신의 슬롯을 붙잡지 않도록).
+STAGE_POOLS = {
+    "generate": "runway",
+}
+# 스테이지 사이 큐 크기 — 앞 스테이지가 너무 앞서가며 디스크·메모리를 채우지 않게 제한
+DEFAULT_QUEUE_SIZE = 2
+
+_DONE = object()  # 스테이지 종료 sentinel
+IDLE_SEC = 0.5  # run()이 결과를 기다리며 on_idle을 부르는 간격
+
+
+def stage_workers(name: str) -> int:
+    """스테이지 워커 수 (환경변수 우선)."""
+    env = os.getenv(f"PIPELINE_WORKERS_{name.upper()}")
+    if env:
+        try:
+            return max(1, int(env))
+        except ValueError:
+            pass
+    return DEFAULT_WORKERS.get(name, 1)
+
+
+class Stage(NamedTuple):
+    """fn(index, value) → 다음 스테이지로 넘길 value."""
+    name: str
+    fn: Callable[[int, Any], Any]
+    workers: int = 0  # 0이면 stage_workers(name) 사용
+
+
+class SceneResult(NamedTuple):
+    index: int
+    value: Any
+    error: Optional[BaseException] = None
+    failed_stage: Optional[str] = None
+
+    @property
+    def ok(self) -> bool:
+        return self.error is None
+
+
+def _streamlit_ctx():
+    """현재 스레드의 Streamlit ScriptRunContext (없으면 None).
+    워커 스레드에 붙여야 session_state 기반 로깅(log_event)이 유실되지 않음."""
+    try:
+        from streamlit.runtime.scriptrunner import get_script_run_ctx
+        return get_script_run_ctx()
+    except Exception:
+        return None
+
+
+def _attach_streamlit_ctx(thread: threading.Thread, ctx) -> None:
+    if ctx is None:
+        return
+    try:
+        from streamlit.runtime.scriptrunner import add_script_run_ctx
+        add_script_run_ctx(thread, ctx)
+    except Exception:
+        pass
+
+
+def run_with_idle(fn: Callable[..., Any], *args, on_idle: Optional[Callable[[], None]] = None, **kwargs) -> Any:
+    """
+    fn(*args, **kwargs)를 워커 스레드에서 돌리고 끝날 때까지 IDLE_SEC마다 on_idle()을 부른다.
+    스크립트 스레드가 st.*를 불러야 취소 버튼 리런이 반영되므로, 한 번에 오래 걸리는 호출
+    (TTS 일괄 합성 등)을 cancel_scope 안에서 기다릴 때 사용. fn의 예외는 그대로 다시 올린다.
+    """
+    box: Dict[str, Any] = {}
+
+    def target():
+        try:
+            box["value"] = fn(*args, **kwargs)
+        except BaseException as e:  # noqa: BLE001 — 호출한 스레드에서 다시 올림
+            box["error"] = e
+
+    t = threading.Thread(target=contextvars.copy_context().run, args=(target,),
+                         name="run-with-idle", daemon=True)
+    _attach_streamlit_ctx(t, _streamlit_ctx())
+    t.start()
+    while True:
+        t.join(IDLE_SEC if on_idle else None)
+        if not t.is_alive():
+            break
+        on_idle()
+    if "error" in box:
+        raise box["error"]
+    return box.get("value")
+
+
+class ScenePipeline:
+    """스테이지별 워커 풀을 bounded queue로 연결한 파이프라인.
+
+    사용 예:
+        pipe = ScenePipeline([
+            Stage("generate", gen_fn),
+            Stage("fit", fit_fn),
+        ])
+        results = pipe.run(scenes, on_result=lambda r: progress.progress(...))
+
+    한 장면이 어떤 스테이지에서 예외를 내면 그 장면만 실패로 기록하고
+    나머지 장면은 계속 진행한다. 장면이 끝날 때마다 스테이지별 소요 시간을 scene_done 이벤트로
+    남긴다 (성능 대시보드의 느린 장면 목록). on_result는 호출한 스레드(Streamlit 스크립트
+    스레드)에서 완료 순서대로 불리므로 st.* 호출을 해도 안전하다.
+
+    현재 취소 토큰(cancellation)이 취소되면 남은 스테이지는 실행하지 않고
+    Cancelled 에러로 장면을 흘려보내서 run()이 바로 끝난다. on_idle은 결과를 기다리는 동안
+    IDLE_SEC마다 불린다 (Streamlit에서 st.* 호출을 해 줘야 취소 버튼 리런이 바로 반영됨).
+    """
+
+    def __init__(self, stages: List[Stage], queue_size: int = DEFAULT_QUEUE_SIZE):
+        if not stages:
+            raise ValueError("stages가 비어 있습니다.")
+        self.stages = [
+            s if s.workers else s._replace(workers=stage_workers(s.name))
+            for s in stages
+        ]
+        self.queue_size = max(1, queue_size)
+
+    def run(self, items: List[Any],
+            on_result: Optional[Callable[[SceneResult], None]] = None,
+            on_idle: Optional[Callable[[], None]] = None) -> List[SceneResult]:
+        n = len(items)
+        if n == 0:
+            return []
+
+        queues = [queue.Queue(maxsize=self.queue_size) for _ in self.stages]
+        out_q: "queue.Queue" = queue.Queue()
+        queues.append(out_q)
+
+        base_ctx = contextvars.copy_context()
+        token = current_token()
+        st_ctx = _streamlit_ctx()
+        threads: List[threading.Thread] = []
+        # 장면별 첫 스테이지 시작 시각, 스테이지별 소요 시간 (큐 대기 제외)
+        started_at: Dict[int, float] = {}
+        stage_sec: Dict[int, Dict[str, float]] = {i: {} for i in range(n)}
+
+        def feeder():
+            for i, item in enumerate(items):
+                queues[0].put((i, item, None, None))
+            for _ in range(self.stages[0].workers):
+                queues[0].put(_DONE)
+
+        def make_worker(stage_idx: int, remaining: List[int], lock: threading.Lock):
+            stage = self.stages[stage_idx]
+            pool = STAGE_POOLS.get(stage.name)
+            in_q, next_q = queues[stage_idx], queues[stage_idx + 1]
+            next_workers = (self.stages[stage_idx + 1].workers
+                            if stage_idx + 1 < len(self.stages) else 1)
+
+            def worker():
+                while True:
+                    msg = in_q.get()
+                    if msg is _DONE:
+                        with lock:
+                            remaining[0] -= 1
+                            last = remaining[0] == 0
+                        if last:
+                            # 이 스테이지의 마지막 워커가 다음 스테이지 종료 신호 전달
+                            for _ in range(next_workers):
+                                next_q.put(_DONE)
+                        return
+                    idx, value, err, failed_stage = msg
+                    if err is None and token is not None and token.cancelled:
+                        err, failed_stage = Cancelled(token.reason or "취소됨"), stage.name
+                    if err is None:
+                        t0 = time.perf_counter()
+                        started_at.setdefault(idx, t0)
+                        try:
+                            if pool:
+                                with render_slot(pool), profile_stage(stage.name, scene=idx):
+                                    value = stage.fn(idx, value)
+                            else:
+                                with profile_stage(stage.name, scene=idx):
+                                    value = stage.fn(idx, value)
+                        except BaseException as e:  # noqa: BLE001 — 장면 단위로 격리
+                            err, failed_stage = e, stage.name
+                        stage_sec[idx][stage.name] = round(time.perf_counter() - t0, 3)
+                    next_q.put((idx, value, err, failed_stage))
+            return worker
+
+        def spawn(target, name):
+            t = threading.Thread(
+                target=base_ctx.copy().run, args=(target,), name=name, daemon=True,
+            )
+            _attach_streamlit_ctx(t, st_ctx)
+            threads.append(t)
+            t.start()
+
+        spawn(feeder, "pipeline-feeder")
+        for si, stage in enumerate(self.stages):
+            remaining, lock = [stage.workers], threading.Lock()
+            for wi in range(stage.workers):
+                spawn(make_worker(si, remaining, lock), f"pipeline-{stage.name}-{wi}")
+
+        results: List[Optional[SceneResult]] = [None] * n
+        received = 0
+        while received < n:
+            try:
+                msg = out_q.get(timeout=IDLE_SEC if on_idle else None)
+            except queue.Empty:
+                on_idle()
+                continue
+            if msg is _DONE:
+                continue
+            idx, value, err, failed_stage = msg
+            res = SceneResult(idx, value, err, failed_stage)
+            results[idx] = res
+            received += 1
+            log_event("scene_done", {
+                "index": idx,
+                "step": current_step(),
+                "wall_sec": round(time.perf_counter() - started_at.get(idx, time.perf_counter()), 3),
+                "stages": stage_sec[idx],
+                "failed_stage": failed_stage,
+                "error": type(err).__name__ if err is not None else None,
+            })
+            if on_result:
+                on_result(res)
+
+        for t in threads:
+            t.join()
+        return results  # type: ignore[return-value]
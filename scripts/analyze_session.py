@@ -8,17 +8,31 @@
     python scripts/analyze_session.py outputs/sessions/허지웅_20260608_142315/
     python scripts/analyze_session.py 허지웅_20260608_142315.zip
     python scripts/analyze_session.py outputs/sessions/  # 모든 세션 일괄
+
+모든 세션은 먼저 이벤트 저장소(SQLite, 기본 outputs/events.db)에 적재한다.
+세션 파일은 프로세스 풀에서 병렬로 파싱하고, 이미 적재한 줄은 건너뛴다 (events.jsonl은 append-only).
+분석은 저장소에 SQL로 질의하므로 적재가 끝난 뒤에는 세션 수백 개도 1초 안에 나온다.
+Runway 지연·비용은 runway_gen4(제출부터 결과까지)로 보고, runway_gen4_submit/_wait는 그 아래 구간별 내역으로만 보인다.
+세션에 profiles/ (profiling.py, 사이드바 "성능 프로파일링")가 있으면 단계별 프로파일 요약도 붙인다.
 """
 from __future__ import annotations
 
 import argparse
 import json
+import math
+import os
+import sqlite3
 import sys
+import time
 import zipfile
+from concurrent.futures import ProcessPoolExecutor
 from collections import defaultdict
+from contextlib import closing, contextmanager
 from datetime import datetime
 from pathlib import Path
-from typing import Iterable
+from typing import Iterable, Optional
+
+EVENT_STORE_DB = os.getenv("EVENT_STORE_DB", "outputs/events.db")
 
 # =========================================================
 # 단가표 — 필요 시 직접 수정. 단가 변동 잦으면 환경변수로 빼도 됨.
@@ -40,46 +54,241 @@ PRICING = {
 }
 
 
+# =========================================================
+# 이벤트 저장소 (SQLite) — 세션 수백 개를 한 번 적재해 두고 SQL로 집계
+# 자주 쓰는 값(API, 소요 시간, 토큰, 글자 수 등)은 컬럼으로 풀어 두고, 원본 data는 JSON 그대로 보관.
+# =========================================================
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS sources (
+    source     TEXT PRIMARY KEY,   -- 파일 경로 또는 '<zip 경로>!<멤버>'
+    session_id TEXT NOT NULL,
+    version    TEXT NOT NULL,      -- 일반 파일은 inode, zip 멤버는 CRC:크기
+    offset     INTEGER NOT NULL,   -- 여기까지 읽음 (일반 파일은 이어서 적재)
+    next_seq   INTEGER NOT NULL,
+    pending    TEXT NOT NULL DEFAULT '{}'  -- 아직 응답이 안 온 request (증분 적재 사이에 유지)
+);
+CREATE TABLE IF NOT EXISTS events (
+    session_id             TEXT NOT NULL,
+    seq                    INTEGER NOT NULL,
+    ts                     TEXT NOT NULL,
+    t                      REAL NOT NULL,
+    action                 TEXT NOT NULL,
+    api                    TEXT,
+    phase                  TEXT,   -- request / response / NULL
+    call_id                TEXT,   -- log_api_call이 request/response에 같이 남기는 id
+    start_t                REAL,   -- 호출 시작 시각 (response 행, 동시 실행 분석용)
+    endpoint               TEXT,
+    voice                  TEXT,
+    duration_ms            INTEGER,
+    success                INTEGER,
+    error                  TEXT,
+    prompt_tokens          INTEGER NOT NULL DEFAULT 0,
+    completion_tokens      INTEGER NOT NULL DEFAULT 0,
+    total_tokens           INTEGER NOT NULL DEFAULT 0,
+    prompt_token_count     INTEGER NOT NULL DEFAULT 0,
+    candidates_token_count INTEGER NOT NULL DEFAULT 0,
+    char_count             INTEGER NOT NULL DEFAULT 0,
+    billed_seconds         REAL NOT NULL DEFAULT 0,
+    line                   TEXT,   -- 원본 JSON 한 줄
+    PRIMARY KEY (session_id, seq)
+);
+CREATE INDEX IF NOT EXISTS events_action ON events (session_id, action);
+CREATE INDEX IF NOT EXISTS events_api ON events (session_id, phase, api);
+"""
+# 컬럼이 바뀌면 올림 → 기존 저장소는 지우고 원본에서 다시 적재
+SCHEMA_VERSION = 2
+
+_EVENT_COLS = (
+    "session_id", "seq", "ts", "t", "action", "api", "phase", "call_id", "start_t", "endpoint", "voice",
+    "duration_ms", "success", "error", "prompt_tokens", "completion_tokens", "total_tokens",
+    "prompt_token_count", "candidates_token_count", "char_count", "billed_seconds", "line",
+)
+_USAGE_KEYS = ("prompt_tokens", "completion_tokens", "total_tokens",
+               "prompt_token_count", "candidates_token_count")
+
+
+@contextmanager
+def open_store(path):
+    path = str(path)
+    if path != ":memory:":
+        Path(path).parent.mkdir(parents=True, exist_ok=True)
+    with closing(sqlite3.connect(path, timeout=30, isolation_level=None)) as conn:
+        if conn.execute("PRAGMA user_version").fetchone()[0] != SCHEMA_VERSION:
+            conn.executescript("DROP TABLE IF EXISTS events; DROP TABLE IF EXISTS sources;")
+            conn.execute(f"PRAGMA user_version={SCHEMA_VERSION}")
+        conn.executescript(_SCHEMA)
+        # 원본 events.jsonl에서 언제든 다시 만들 수 있는 저장소 → fsync 생략
+        conn.execute("PRAGMA synchronous=OFF")
+        yield conn
+
+
 # =========================================================
 # 입력 처리 — 폴더, zip, 폴더 내 다중 세션 모두 수용
 # =========================================================
-def iter_event_files(target: Path) -> Iterable[tuple[str, Path]]:
-    """target에서 (session_id, events.jsonl 경로)들을 찾아 yield."""
+def iter_sources(target: Path) -> Iterable[dict]:
+    """target에서 적재할 events.jsonl들을 찾아 yield. zip 멤버는 풀지 않고 메모리에서 읽는다."""
     if target.is_file() and target.suffix == ".zip":
-        # zip은 임시 풀어내지 않고 그대로 처리 (yield 시 추출)
         with zipfile.ZipFile(target) as zf:
-            for name in zf.namelist():
-                if name.endswith("events.jsonl"):
-                    sid = Path(name).parent.name
-                    tmp = target.parent / f"_extracted_{sid}_events.jsonl"
-                    with zf.open(name) as src, open(tmp, "wb") as dst:
-                        dst.write(src.read())
-                    yield sid, tmp
+            for info in zf.infolist():
+                if info.filename.endswith("events.jsonl"):
+                    yield {
+                        "source": f"{target.resolve()}!{info.filename}",
+                        "session_id": Path(info.filename).parent.name,
+                        "path": str(target.resolve()),
+                        "member": info.filename,
+                        "version": f"{info.CRC}:{info.file_size}",
+                        "size": info.file_size,
+                    }
         return
 
     if target.is_dir():
-        # 단일 세션 폴더?
-        if (target / "events.jsonl").exists():
-            yield target.name, target / "events.jsonl"
-            return
-        # outputs/sessions/ 같은 상위 폴더: 하위 세션 전부
-        for sub in sorted(target.iterdir()):
-            if sub.is_dir() and (sub / "events.jsonl").exists():
-                yield sub.name, sub / "events.jsonl"
-
-
-def load_events(path: Path) -> list[dict]:
-    events = []
-    with open(path, encoding="utf-8") as f:
-        for line in f:
-            line = line.strip()
-            if not line:
-                continue
+        # 단일 세션 폴더면 그것만, outputs/sessions/ 같은 상위 폴더면 하위 세션 전부
+        files = [target / "events.jsonl"] if (target / "events.jsonl").exists() else [
+            sub / "events.jsonl" for sub in sorted(target.iterdir())
+            if sub.is_dir() and (sub / "events.jsonl").exists()
+        ]
+        for f in files:
+            st = f.stat()
+            yield {
+                "source": str(f.resolve()),
+                "session_id": f.parent.name,
+                "path": str(f.resolve()),
+                "member": None,
+                "version": str(st.st_ino),
+                "size": st.st_size,
+            }
+
+
+def _event_row(session_id: str, seq: int, line: str, e: dict, pending: dict) -> tuple:
+    action = e.get("action", "")
+    data = e.get("data") or {}
+    ts = e.get("ts", "")
+    try:
+        t = parse_ts(ts).timestamp()
+    except (TypeError, ValueError):
+        t = 0.0
+    row = dict.fromkeys(_EVENT_COLS)
+    row.update({
+        "session_id": session_id, "seq": seq, "ts": ts, "t": t, "action": action,
+        "endpoint": data.get("endpoint"), "line": line,
+    })
+    for k in _USAGE_KEYS + ("char_count", "billed_seconds"):
+        row[k] = 0
+
+    if action.endswith("_request"):
+        api = action[:-len("_request")]
+        req_payload = data.get("request") or {}
+        chars = 0
+        for txt_key in ("text", "user_text", "prompt"):
+            if isinstance(req_payload.get(txt_key), dict):
+                chars = req_payload[txt_key].get("length", 0)
+                break
+        # call_id가 있으면 그것으로, 없는 예전 로그는 같은 API의 가장 최근 request와 짝지음
+        call_id = data.get("call_id")
+        pending[call_id or api] = {"chars": chars, "voice": req_payload.get("voice"),
+                                   "start_t": data.get("start_ts") or t}
+        row.update({"api": api, "phase": "request", "call_id": call_id, "voice": req_payload.get("voice")})
+    elif action.endswith("_response"):
+        api = action[:-len("_response")]
+        call_id = data.get("call_id")
+        req = pending.pop(call_id or api, {})
+        usage = data.get("usage") or {}
+        result = data.get("result") or {}
+        duration_ms = data.get("duration_ms") or 0
+        row.update({
+            "api": api, "phase": "response", "call_id": call_id, "voice": req.get("voice"),
+            "start_t": data.get("start_ts") or req.get("start_t") or t - duration_ms / 1000,
+            "duration_ms": duration_ms,
+            "success": 1 if data.get("success", True) else 0,
+            "error": ((data.get("error") or {}).get("message") or "")[:200],
+            "char_count": req.get("chars", 0),
+            "billed_seconds": result.get("billed_duration_sec", 0) or 0,
+        })
+        for k in _USAGE_KEYS:
+            row[k] = usage.get(k, 0) or 0
+    return tuple(row[c] for c in _EVENT_COLS)
+
+
+def _parse_source(task: dict) -> dict:
+    """프로세스 풀 워커: 소스 하나를 task["offset"]부터 읽어 행으로 변환."""
+    if task["member"]:
+        with zipfile.ZipFile(task["path"]) as zf:
+            raw = zf.read(task["member"])[task["offset"]:]
+    else:
+        with open(task["path"], "rb") as f:
+            f.seek(task["offset"])
+            raw = f.read()
+    # 쓰는 중인 마지막 줄(개행 없음)은 다음 적재로 미룸
+    end = raw.rfind(b"\n") + 1
+    pending = json.loads(task["pending"])
+    seq = task["next_seq"]
+    rows = []
+    for line in raw[:end].decode("utf-8", errors="replace").splitlines():
+        line = line.strip()
+        if not line:
+            continue
+        try:
+            e = json.loads(line)
+        except json.JSONDecodeError:
+            continue
+        rows.append(_event_row(task["session_id"], seq, line, e, pending))
+        seq += 1
+    return {**task, "offset": task["offset"] + end, "next_seq": seq,
+            "pending": json.dumps(pending, ensure_ascii=False), "rows": rows}
+
+
+def ingest(conn, target: Path, workers: Optional[int] = None) -> tuple[list[str], int]:
+    """
+    target의 세션들을 저장소에 적재 (이미 적재한 부분은 건너뛰고 새로 붙은 줄만).
+    Returns: (target에 있는 session_id 목록, 새로 넣은 이벤트 수)
+    """
+    tasks, session_ids = [], []
+    for src in iter_sources(target):
+        session_ids.append(src["session_id"])
+        prev = conn.execute("SELECT version, offset, next_seq, pending FROM sources WHERE source=?",
+                            (src["source"],)).fetchone()
+        if prev and prev[0] == src["version"] and prev[1] == src["size"]:
+            continue
+        if prev and prev[0] == src["version"] and src["member"] is None and prev[1] < src["size"]:
+            tasks.append({**src, "offset": prev[1], "next_seq": prev[2], "pending": prev[3], "full": False})
+        else:
+            # 처음 보거나 파일이 바뀜(zip 갱신, 잘림) → 세션 전체 다시
+            tasks.append({**src, "offset": 0, "next_seq": 0, "pending": "{}", "full": True})
+
+    if workers is None:
+        workers = os.cpu_count() or 1
+    if len(tasks) > 1 and workers > 1:
+        pool = ProcessPoolExecutor(max_workers=min(workers, len(tasks)))
+        results = pool.map(_parse_source, tasks, chunksize=max(1, len(tasks) // (workers * 4)))
+    else:
+        pool, results = None, map(_parse_source, tasks)
+
+    added = 0
+    placeholders = ", ".join("?" * len(_EVENT_COLS))
+    try:
+        for res in results:
+            conn.execute("BEGIN IMMEDIATE")
             try:
-                events.append(json.loads(line))
-            except json.JSONDecodeError:
-                pass
-    return events
+                if res["full"]:
+                    conn.execute("DELETE FROM events WHERE session_id=?", (res["session_id"],))
+                    conn.execute("DELETE FROM sources WHERE session_id=?", (res["session_id"],))
+                conn.executemany(f"INSERT OR REPLACE INTO events ({', '.join(_EVENT_COLS)}) "
+                                 f"VALUES ({placeholders})", res["rows"])
+                conn.execute(
+                    "INSERT OR REPLACE INTO sources (source, session_id, version, offset, next_seq, pending) "
+                    "VALUES (?, ?, ?, ?, ?, ?)",
+                    (res["source"], res["session_id"], res["version"], res["offset"], res["next_seq"],
+                     res["pending"]),
+                )
+                conn.execute("COMMIT")
+            except BaseException:
+                conn.execute("ROLLBACK")
+                raise
+            added += len(res["rows"])
+    finally:
+        if pool is not None:
+            pool.shutdown()
+    return list(dict.fromkeys(session_ids)), added
 
 
 # =========================================================
@@ -89,19 +298,8 @@ def parse_ts(ts: str) -> datetime:
     return datetime.fromisoformat(ts)
 
 
-def analyze(events: list[dict]) -> dict:
-    if not events:
-        return {}
-
-    started = parse_ts(events[0]["ts"])
-    ended = parse_ts(events[-1]["ts"])
-
-    user_name = None
-    stages: list[tuple[str, datetime]] = []
-    button_clicks: list[tuple[str, datetime, dict]] = []
-
-    # API 집계: (api_name) → 누적 통계
-    api_stats: dict[str, dict] = defaultdict(lambda: {
+def _empty_api_stats() -> dict:
+    return {
         "calls": 0,
         "duration_ms_total": 0,
         "duration_ms_max": 0,
@@ -118,59 +316,51 @@ def analyze(events: list[dict]) -> dict:
         "char_count": 0,
         # Runway
         "billed_seconds": 0,
-    })
+    }
 
-    # request → response 매칭용 임시 저장 (가장 가까운 같은 API의 request 사용)
-    pending_requests: dict[str, dict] = {}
-
-    for e in events:
-        action = e.get("action", "")
-        data = e.get("data") or {}
-        ts = parse_ts(e["ts"])
-
-        if action == "session_start":
-            user_name = data.get("user_name")
-        elif action == "stage_entered":
-            stages.append((data.get("stage", "?"), ts))
-        elif action == "button_click":
-            button_clicks.append((data.get("button", "?"), ts, data))
-
-        # API request/response 처리
-        if action.endswith("_request"):
-            api_name = action[:-len("_request")]
-            pending_requests[api_name] = data
-        elif action.endswith("_response"):
-            api_name = action[:-len("_response")]
-            stats = api_stats[api_name]
-            stats["calls"] += 1
-            dms = data.get("duration_ms") or 0
-            stats["duration_ms_total"] += dms
-            stats["duration_ms_max"] = max(stats["duration_ms_max"], dms)
-
-            if not data.get("success", True):
-                stats["errors"] += 1
-                err = (data.get("error") or {}).get("message", "")
-                if err and len(stats["error_messages"]) < 5:
-                    stats["error_messages"].append(err[:200])
-
-            usage = data.get("usage") or {}
-            for k in ("prompt_tokens", "completion_tokens", "total_tokens",
-                     "prompt_token_count", "candidates_token_count"):
-                if k in usage:
-                    stats[k] += usage[k]
-
-            # 문자수: request에 저장된 text.length 사용
-            req = pending_requests.pop(api_name, {})
-            req_payload = req.get("request") or {}
-            for txt_key in ("text", "user_text", "prompt"):
-                if isinstance(req_payload.get(txt_key), dict):
-                    stats["char_count"] += req_payload[txt_key].get("length", 0)
-                    break
-
-            # Runway 청구 초
-            result = data.get("result") or {}
-            if "billed_duration_sec" in result:
-                stats["billed_seconds"] += result["billed_duration_sec"]
+
+def analyze(conn, session_id: str) -> dict:
+    """저장소에 적재된 세션 하나 요약."""
+    first = conn.execute("SELECT ts FROM events WHERE session_id=? ORDER BY seq LIMIT 1",
+                         (session_id,)).fetchone()
+    if first is None:
+        return {}
+    last = conn.execute("SELECT ts FROM events WHERE session_id=? ORDER BY seq DESC LIMIT 1",
+                        (session_id,)).fetchone()
+    started, ended = parse_ts(first[0]), parse_ts(last[0])
+
+    row = conn.execute(
+        "SELECT json_extract(line, '$.data.user_name') FROM events "
+        "WHERE session_id=? AND action='session_start' ORDER BY seq DESC LIMIT 1", (session_id,),
+    ).fetchone()
+    user_name = row[0] if row else None
+
+    stages = [(name or "?", parse_ts(ts)) for name, ts in conn.execute(
+        "SELECT json_extract(line, '$.data.stage'), ts FROM events "
+        "WHERE session_id=? AND action='stage_entered' ORDER BY seq", (session_id,))]
+    button_clicks = []
+    for ts, line in conn.execute(
+            "SELECT ts, line FROM events WHERE session_id=? AND action='button_click' ORDER BY seq",
+            (session_id,)):
+        data = json.loads(line).get("data") or {}
+        button_clicks.append((data.get("button", "?"), parse_ts(ts), data))
+
+    # API 집계: (api_name) → 누적 통계
+    api_stats: dict[str, dict] = {}
+    sums = ", ".join(f"SUM({k})" for k in _USAGE_KEYS)
+    for r in conn.execute(
+            f"SELECT api, COUNT(*), SUM(duration_ms), MAX(duration_ms), SUM(success=0), {sums}, "
+            f"SUM(char_count), SUM(billed_seconds) FROM events "
+            f"WHERE session_id=? AND phase='response' GROUP BY api ORDER BY MIN(seq)", (session_id,)):
+        stats = _empty_api_stats()
+        stats.update(zip(("calls", "duration_ms_total", "duration_ms_max", "errors") + _USAGE_KEYS
+                         + ("char_count", "billed_seconds"), r[1:]))
+        api_stats[r[0]] = stats
+    for api, err in conn.execute(
+            "SELECT api, error FROM events WHERE session_id=? AND phase='response' AND success=0 "
+            "AND error != '' ORDER BY seq", (session_id,)):
+        if len(api_stats[api]["error_messages"]) < 5:
+            api_stats[api]["error_messages"].append(err)
 
     # 단계별 머문 시간 계산
     stage_durations: list[tuple[str, float]] = []
@@ -178,6 +368,11 @@ def analyze(events: list[dict]) -> dict:
         end_t = stages[i + 1][1] if i + 1 < len(stages) else ended
         stage_durations.append((name, (end_t - t).total_seconds()))
 
+    calls = load_calls(conn, [session_id])
+    whole = [c for c in calls if c["api"] not in BREAKDOWN_APIS]
+    conc = concurrency(whole)
+    t_first = min((c["start_t"] for c in whole), default=0.0)
+    t_last = max((c["start_t"] + c["duration_ms"] / 1000 for c in whole), default=0.0)
     return {
         "user_name": user_name,
         "started": started,
@@ -185,10 +380,232 @@ def analyze(events: list[dict]) -> dict:
         "duration_sec": (ended - started).total_seconds(),
         "stages": stage_durations,
         "button_clicks": button_clicks,
-        "api_stats": dict(api_stats),
+        "api_stats": api_stats,
+        "latency": latency_table(calls),
+        "concurrency": {
+            "max_in_flight": conc["max"],
+            "busy_sec": round(conc["busy_sec"], 3),
+            "avg_in_flight_when_busy": round(conc["avg_busy"], 2),
+            "timeline": timeline(conc["steps"], t_first, t_last),
+            "timeline_start": datetime.fromtimestamp(t_first) if whole else None,
+            "timeline_end": datetime.fromtimestamp(t_last) if whole else None,
+        },
+        "serial_stretches": serial_stretches(whole),
+        "encodes": subprocess_table(conn, [session_id]),
     }
 
 
+# =========================================================
+# 지연 분포 · 동시 실행
+# =========================================================
+PERCENTILES = (50, 90, 99)
+TIMELINE_COLS = 60          # 타임라인 글자 수
+SERIAL_MIN_CALLS = 3        # 이만큼 연달아 안 겹치면 '직렬 구간'으로 표시
+SERIAL_MAX_GAP_SEC = 2.0    # 앞 호출이 끝나고 이 안에 다음 호출이 시작돼야 연달아 본 것
+
+
+# 종단 간 호출 안의 구간 → 그 호출. 지연표에는 내역으로 따로 보이되 동시 실행·직렬 구간에서는 빼서 두 번 세지 않음
+BREAKDOWN_APIS = {"runway_gen4_submit": "runway_gen4", "runway_gen4_wait": "runway_gen4"}
+
+
+def percentile(sorted_vals: list, pct: float) -> float:
+    """nearest-rank 백분위수 (값의 pct% 이상이 그 값 이하인 가장 작은 값). perf_monitor도 이걸 씀."""
+    if not sorted_vals:
+        return 0.0
+    k = math.ceil(pct * len(sorted_vals) / 100) - 1
+    return sorted_vals[max(0, min(len(sorted_vals) - 1, k))]
+
+
+def latency_table(calls: list[dict]) -> list[dict]:
+    """API별, (API, endpoint)별, (API, voice)별 p50/p90/p99/max (ms)."""
+    groups: dict[tuple, list] = defaultdict(list)
+    for c in calls:
+        groups[(c["api"], "", "")].append(c["duration_ms"])
+        groups[(c["api"], c["endpoint"] or "?", "")].append(c["duration_ms"])
+        if c["voice"]:
+            groups[(c["api"], "", c["voice"])].append(c["duration_ms"])
+    rows = []
+    # API 합계 → endpoint별 → voice별 순
+    for (api, endpoint, voice), vals in sorted(groups.items(), key=lambda kv: (kv[0][0], bool(kv[0][2]), kv[0])):
+        vals.sort()
+        row = {"api": api, "endpoint": endpoint, "voice": voice, "calls": len(vals), "max": vals[-1]}
+        row.update({f"p{p}": percentile(vals, p) for p in PERCENTILES})
+        rows.append(row)
+    return rows
+
+
+def concurrency(calls: list[dict]) -> dict:
+    """
+    호출 구간(start_t ~ start_t + duration)으로 동시에 떠 있던 호출 수를 복원.
+    Returns: {"max", "busy_sec", "avg_busy", "steps": [(t, 동시 수), ...]}  (전체 API 합산)
+    """
+    edges = []
+    for c in calls:
+        edges.append((c["start_t"], 1))
+        edges.append((c["start_t"] + c["duration_ms"] / 1000, -1))
+    edges.sort(key=lambda e: (e[0], e[1]))  # 같은 시각이면 끝나는 쪽 먼저
+    steps, level, peak, busy, area = [], 0, 0, 0.0, 0.0
+    for i, (t, d) in enumerate(edges):
+        if i and level > 0:
+            dt = t - edges[i - 1][0]
+            busy += dt
+            area += dt * level
+        level += d
+        peak = max(peak, level)
+        steps.append((t, level))
+    return {"max": peak, "busy_sec": busy, "avg_busy": area / busy if busy else 0.0, "steps": steps}
+
+
+def timeline(steps: list[tuple], start: float, end: float, cols: int = TIMELINE_COLS) -> str:
+    """구간을 cols칸으로 나눠 칸마다 최대 동시 호출 수 (0은 '.', 10 이상은 '+')."""
+    if not steps or end <= start:
+        return ""
+    width = (end - start) / cols
+    peaks = [0] * cols
+    level, idx = 0, 0
+    for col in range(cols):
+        col_end = start + (col + 1) * width
+        col_peak = level
+        while idx < len(steps) and steps[idx][0] < col_end:
+            level = steps[idx][1]
+            col_peak = max(col_peak, level)
+            idx += 1
+        peaks[col] = col_peak
+    return "".join("." if n == 0 else ("+" if n >= 10 else str(n)) for n in peaks)
+
+
+def serial_stretches(calls: list[dict]) -> list[dict]:
+    """
+    같은 API 호출이 SERIAL_MIN_CALLS개 이상 한 번도 겹치지 않고 연달아 실행된 구간.
+    병렬화할 수 있었는데 순차로 돈 곳을 찾기 위함.
+    """
+    by_api: dict[str, list] = defaultdict(list)
+    for c in calls:
+        by_api[c["api"]].append(c)
+    found = []
+
+    def _flush(api, run):
+        if len(run) >= SERIAL_MIN_CALLS:
+            found.append({
+                "api": api, "calls": len(run), "start": run[0]["start_t"],
+                "end": run[-1]["start_t"] + run[-1]["duration_ms"] / 1000,
+                "busy_sec": sum(x["duration_ms"] for x in run) / 1000,
+            })
+
+    for api, items in by_api.items():
+        items.sort(key=lambda c: c["start_t"])
+        run, max_end = [], None
+        for c in items:
+            if run and max_end <= c["start_t"] <= max_end + SERIAL_MAX_GAP_SEC:
+                run.append(c)
+            else:
+                # 앞 호출과 겹쳤거나(병렬 실행 중) 한참 쉬었다 시작 → 구간 끝
+                _flush(api, run)
+                run = [c]
+            end = c["start_t"] + c["duration_ms"] / 1000
+            max_end = end if max_end is None else max(max_end, end)
+        _flush(api, run)
+    found.sort(key=lambda r: r["start"])
+    return found
+
+
+def subprocess_table(conn, session_ids: list[str]) -> list[dict]:
+    """subprocess_done 이벤트(proc_accounting)를 (op, kind, codec, preset)별로 — CPU 시간 내림차순, 비율 포함."""
+    marks = ", ".join("?" * len(session_ids))
+    cols = ("op", "kind", "codec", "preset", "count", "cpu_sec", "wall_sec", "max_rss_mb", "output_bytes")
+    rows = [dict(zip(cols, r)) for r in conn.execute(
+        "SELECT COALESCE(NULLIF(json_extract(line, '$.data.op'), ''), '?'), json_extract(line, '$.data.kind'), "
+        "json_extract(line, '$.data.codec'), json_extract(line, '$.data.preset'), COUNT(*), "
+        "SUM(COALESCE(json_extract(line, '$.data.user_sec'), 0) + COALESCE(json_extract(line, '$.data.system_sec'), 0)), "
+        "SUM(json_extract(line, '$.data.wall_sec')), MAX(json_extract(line, '$.data.max_rss_mb')), "
+        "SUM(COALESCE(json_extract(line, '$.data.output_bytes'), 0)) "
+        f"FROM events WHERE action='subprocess_done' AND session_id IN ({marks}) "
+        "GROUP BY 1, 2, 3, 4 ORDER BY 6 DESC", session_ids)]
+    total = sum(r["cpu_sec"] for r in rows) or 1.0
+    for r in rows:
+        r["cpu_share"] = round(r["cpu_sec"] / total, 3)
+    return rows
+
+
+def load_calls(conn, session_ids: list[str]) -> list[dict]:
+    marks = ", ".join("?" * len(session_ids))
+    cols = ("session_id", "api", "endpoint", "voice", "start_t", "duration_ms")
+    return [dict(zip(cols, r)) for r in conn.execute(
+        f"SELECT {', '.join(cols)} FROM events WHERE phase='response' AND session_id IN ({marks}) "
+        f"ORDER BY start_t", session_ids)]
+
+
+# =========================================================
+# 프로파일 요약 — profiling.py가 남긴 <세션>/profiles/*.json
+# =========================================================
+PROFILE_TOP_FUNCS = 5
+PROFILE_TOP_ALLOCS = 3
+
+
+def iter_profiles(target: Path) -> Iterable[tuple[str, dict]]:
+    """(session_id, 프로파일 요약 dict)를 yield. 폴더와 zip 모두."""
+    if target.is_file() and target.suffix == ".zip":
+        with zipfile.ZipFile(target) as zf:
+            for name in zf.namelist():
+                parts = Path(name).parts
+                if len(parts) >= 3 and parts[-2] == "profiles" and name.endswith(".json"):
+                    try:
+                        yield parts[-3], json.loads(zf.read(name))
+                    except ValueError:
+                        continue
+        return
+
+    if target.is_dir():
+        dirs = [target] if (target / "events.jsonl").exists() or (target / "profiles").is_dir() else [
+            sub for sub in sorted(target.iterdir()) if sub.is_dir()
+        ]
+        for d in dirs:
+            for f in sorted((d / "profiles").glob("*.json")):
+                try:
+                    yield d.name, json.loads(f.read_text(encoding="utf-8"))
+                except (OSError, ValueError):
+                    continue
+
+
+def summarize_profiles(records: list[dict]) -> list[dict]:
+    """단계별로 묶어 실행 횟수·시간·메모리 최댓값·자체 시간(tottime) 상위 함수. 총 시간 내림차순."""
+    by_stage: dict[str, list[dict]] = defaultdict(list)
+    for r in records:
+        by_stage[r.get("stage", "?")].append(r)
+
+    rows = []
+    for stage, items in by_stage.items():
+        slowest = max(items, key=lambda r: r.get("wall_sec", 0))
+        funcs: dict[str, float] = defaultdict(float)
+        allocs: dict[str, float] = defaultdict(float)
+        for r in items:
+            for fn in r.get("top_functions", []):
+                funcs[fn["func"]] += fn["tottime"]
+            for a in r.get("memory", {}).get("top_allocations", []):
+                allocs[a["where"]] += a["size_diff_kb"]
+
+        def _max_mem(key):
+            vals = [r.get("memory", {}).get(key) for r in items]
+            return max((v for v in vals if v is not None), default=None)
+
+        rows.append({
+            "stage": stage,
+            "runs": len(items),
+            "errors": sum(1 for r in items if r.get("error")),
+            "wall_sec": sum(r.get("wall_sec", 0) for r in items),
+            "max_wall_sec": slowest.get("wall_sec", 0),
+            "slowest_scene": slowest.get("scene"),
+            "cpu_sec": sum(r.get("thread_cpu_sec", 0) for r in items),
+            "traced_peak_mb": _max_mem("traced_peak_mb"),
+            "max_rss_mb": _max_mem("max_rss_mb"),
+            "children_max_rss_mb": _max_mem("children_max_rss_mb"),
+            "top_functions": sorted(funcs.items(), key=lambda kv: kv[1], reverse=True)[:PROFILE_TOP_FUNCS],
+            "top_allocations": sorted(allocs.items(), key=lambda kv: kv[1], reverse=True)[:PROFILE_TOP_ALLOCS],
+        })
+    rows.sort(key=lambda r: r["wall_sec"], reverse=True)
+    return rows
+
+
 # =========================================================
 # 비용 추정
 # =========================================================
@@ -283,9 +700,81 @@ def render(session_id: str, summary: dict) -> str:
     out.append(f"Total estimated cost: ${total_cost:.4f}")
     out.append(f"Total API errors:     {total_errors}")
     out.append("")
+    out.extend(render_latency(summary.get("latency", [])))
+    out.extend(render_concurrency(summary.get("concurrency"), summary.get("serial_stretches", [])))
+    out.extend(render_encodes(summary.get("encodes", [])))
+    out.extend(render_profiles(summary.get("profiles", [])))
     return "\n".join(out)
 
 
+def render_latency(rows: list[dict]) -> list[str]:
+    if not rows:
+        return []
+    out = ["Latency (p50 / p90 / p99 / max):"]
+    for r in rows:
+        label = r["api"] + (f" @{r['endpoint']}" if r["endpoint"] else "") + (f" voice={r['voice']}" if r["voice"] else "")
+        if r["api"] in BREAKDOWN_APIS:
+            label = f"↳ {label}"  # 바로 위 종단 간 호출의 구간별 내역
+        indent = "  " if not (r["endpoint"] or r["voice"]) else "    "
+        out.append(f"{indent}{label:38s} {r['calls']:4d} calls  "
+                   + " / ".join(f"{r[k] / 1000:6.1f}s" for k in ("p50", "p90", "p99", "max")))
+    out.append("")
+    return out
+
+
+def render_concurrency(conc: Optional[dict], stretches: list[dict]) -> list[str]:
+    if not conc or not conc.get("timeline"):
+        return []
+    out = [
+        "Concurrency (API calls in flight):",
+        f"  max {conc['max_in_flight']}, avg {conc['avg_in_flight_when_busy']:.2f} while busy, "
+        f"busy {fmt_dur(conc['busy_sec'])}",
+        f"  {conc['timeline_start'].strftime('%H:%M:%S')} |{conc['timeline']}| "
+        f"{conc['timeline_end'].strftime('%H:%M:%S')}",
+    ]
+    for r in stretches:
+        start = datetime.fromtimestamp(r["start"]).strftime("%H:%M:%S")
+        end = datetime.fromtimestamp(r["end"]).strftime("%H:%M:%S")
+        out.append(f"  ⚠ 직렬 구간: {r['api']} {r['calls']}회 연달아 겹침 없이 {start}–{end} "
+                   f"({fmt_dur(r['busy_sec'])}) — 병렬화 여지")
+    out.append("")
+    return out
+
+
+def render_encodes(rows: list[dict]) -> list[str]:
+    if not rows:
+        return []
+    out = ["ffmpeg processes (CPU 시간 순):"]
+    for r in rows:
+        label = f"{r['op']} [{r['kind']}] {r['codec'] or '-'}" + (f" preset={r['preset']}" if r["preset"] else "")
+        out.append(f"  {label:52s} {r['count']:4d}회, CPU {r['cpu_sec']:7.1f}s ({r['cpu_share']:5.1%}), "
+                   f"wall {r['wall_sec']:7.1f}s, RSS 최대 {r['max_rss_mb'] or 0:,.0f}MB")
+    out.append("")
+    return out
+
+
+def render_profiles(rows: list[dict]) -> list[str]:
+    if not rows:
+        return []
+    out = ["Profiles (단계별 cProfile / 메모리):"]
+    for r in rows:
+        scene = f", 가장 느린 장면 {r['slowest_scene'] + 1}" if r["slowest_scene"] is not None else ""
+        mem = [f"{label} {r[k]:,.0f}MB" for k, label in (
+            ("traced_peak_mb", "py 피크"), ("max_rss_mb", "RSS 최대"), ("children_max_rss_mb", "자식 프로세스 RSS 최대"),
+        ) if r[k] is not None]
+        out.append(f"  {r['stage']:25s} {r['runs']:3d}회, 합계 {fmt_dur(r['wall_sec'])}, "
+                   f"최대 {r['max_wall_sec']:.1f}s{scene}, 스레드 CPU {r['cpu_sec']:.1f}s"
+                   + (f", 오류 {r['errors']}" if r["errors"] else ""))
+        if mem:
+            out.append(f"      {' | '.join(mem)}")
+        for func, tottime in r["top_functions"]:
+            out.append(f"      {tottime:8.2f}s  {func}")
+        for where, kb in r["top_allocations"]:
+            out.append(f"      +{kb / 1024:7.1f}MB  {where}")
+    out.append("")
+    return out
+
+
 # =========================================================
 # 엔트리
 # =========================================================
@@ -295,27 +784,43 @@ def main(argv: list[str]) -> int:
                    help="세션 폴더, zip 파일, 또는 outputs/sessions/")
     p.add_argument("--json", action="store_true",
                    help="JSON으로 출력 (집계 스크립트용)")
+    p.add_argument("--store", default=EVENT_STORE_DB,
+                   help=f"이벤트 저장소 SQLite 경로 (기본 {EVENT_STORE_DB}, ':memory:'면 임시)")
+    p.add_argument("--workers", type=int, default=None,
+                   help="적재 프로세스 수 (기본 CPU 수)")
     args = p.parse_args(argv)
 
     if not args.target.exists():
         print(f"경로 없음: {args.target}", file=sys.stderr)
         return 1
 
-    found_any = False
-    all_summaries = {}
-    for sid, path in iter_event_files(args.target):
-        found_any = True
-        events = load_events(path)
-        summary = analyze(events)
-        all_summaries[sid] = summary
-        if not args.json:
+    with open_store(args.store) as conn:
+        t0 = time.perf_counter()
+        session_ids, added = ingest(conn, args.target, args.workers)
+        t1 = time.perf_counter()
+        if not session_ids:
+            print(f"events.jsonl을 찾지 못함: {args.target}", file=sys.stderr)
+            return 1
+
+        all_summaries = {sid: analyze(conn, sid) for sid in session_ids}
+        profiles = defaultdict(list)
+        for sid, record in iter_profiles(args.target):
+            profiles[sid].append(record)
+        for sid, summary in all_summaries.items():
+            if summary and profiles.get(sid):
+                summary["profiles"] = summarize_profiles(profiles[sid])
+        overall_latency = latency_table(load_calls(conn, session_ids)) if len(session_ids) > 1 else []
+        t2 = time.perf_counter()
+    print(f"[적재] 세션 {len(session_ids)}개, 새 이벤트 {added:,}개 ({t1 - t0:.2f}s) / "
+          f"[분석] {t2 - t1:.3f}s", file=sys.stderr)
+
+    if not args.json:
+        for sid, summary in all_summaries.items():
             print(render(sid, summary))
-
-    if not found_any:
-        print(f"events.jsonl을 찾지 못함: {args.target}", file=sys.stderr)
-        return 1
-
-    if args.json:
+        if len(session_ids) > 1:
+            print(f"=== 전체 {len(session_ids)}개 세션 ===")
+            print("\n".join(render_latency(overall_latency)))
+    else:
         # datetime은 isoformat 직렬화
         def _default(o):
             if isinstance(o, datetime):
@@ -0,0 +1,173 @@
+# -*- coding: utf-8 -*-
+"""
+Mode B 배치 실행기 (UI 없이 여러 권을 한 번에).
+character/ 폴더의 책들을 분석 → 대본 → TTS → 이미지 매칭 → Runway → 최종 합성까지
+동시에 돌리고, UI와 같은 버전 폴더(outputs/sessions/<세션>/<동화이름>/...)에 저장한다.
+
+사용:
+    python scripts/batch_mode_b.py --all
+    python scripts/batch_mode_b.py "리딩토탈_72개월_내지_괴물 가족의 초대_220608_ISBN" --preset conversation
+    python scripts/batch_mode_b.py --all --preset my_preset.json --books 3 --workers 12 --until tts
+    python scripts/batch_mode_b.py --all --engine gpt --voice-speed 1.0 --bgm --bgm-volume 0.2
+    python scripts/batch_mode_b.py --all --farm /mnt/render/farm.db   # 장면 인코딩을 렌더 팜 워커에 분산
+    python scripts/batch_mode_b.py --all --plan                       # 실행 없이 호출 수·예상 시간·비용만
+"""
+from __future__ import annotations
+
+import argparse
+import contextvars
+import json
+import os
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from datetime import datetime
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from dotenv import load_dotenv  # noqa: E402
+
+load_dotenv()
+
+import mode_b_pipeline as pipeline  # noqa: E402
+from cancellation import cancel_scope  # noqa: E402
+from scene_pipeline import DEFAULT_WORKERS, stage_workers  # noqa: E402
+from render_scheduler import render_priority  # noqa: E402
+from eta import format_eta  # noqa: E402
+from run_planner import plan_batch_book  # noqa: E402
+from session_logger import bind_session  # noqa: E402
+
+_PRINT_LOCK = threading.Lock()
+
+
+def _log(msg: str) -> None:
+    with _PRINT_LOCK:
+        print(f"{datetime.now():%H:%M:%S} {msg}", flush=True)
+
+
+def split_worker_budget(total: int, books: int) -> dict:
+    """
+    전체 워커 예산을 동시에 도는 책 수로 나눠 책 하나의 스테이지별 워커 수를 정함.
+    책당 몫(total // books)을 스테이지 기본 워커 수 비율로 나누고 (최대 잉여 방식), 스테이지마다 최소 1.
+    → 책 수로 나눠떨어지면 모든 책의 합이 total과 같고, 예산이 스테이지 수 × 책 수보다 작을 때만 넘침.
+    """
+    names = list(DEFAULT_WORKERS)
+    per_book = max(len(names), total // max(books, 1))
+    weights = {name: stage_workers(name) for name in names}
+    share = {name: per_book * w / sum(weights.values()) for name, w in weights.items()}
+    alloc = {name: max(1, int(share[name])) for name in names}
+    while sum(alloc.values()) < per_book:
+        alloc[max(names, key=lambda n: share[n] - alloc[n])] += 1
+    while sum(alloc.values()) > per_book:
+        alloc[min((n for n in names if alloc[n] > 1), key=lambda n: share[n] - alloc[n])] -= 1
+    return alloc
+
+
+def resolve_books(args) -> list:
+    """인자(책 폴더명 또는 경로) → [(이미지 폴더, txt 파일)]."""
+    names = pipeline.list_book_folders() if args.all else args.books_list
+    books = []
+    for name in names:
+        p = Path(name)
+        folder = p if p.is_dir() else pipeline.CHARACTER_DIR / name
+        books.append((folder, pipeline.resolve_txt_path(folder.name)))
+    return books
+
+
+def print_plan(books: list, preset: dict, until: str, parallel: int) -> int:
+    """--plan: 책별 실행 계획과 전체 합계. 아무 API도 호출하지 않음."""
+    plans = [plan_batch_book(folder.name, preset, until) for folder, _ in books]
+    for plan in plans:
+        print(plan.format_text())
+        print()
+    walls = [p.wall_sec() for p in plans]
+    # 책은 parallel권씩 동시에 돎 — 같은 풀(Runway·cpu)을 나눠 쓰므로 합을 나눈 값과 가장 긴 책 중 큰 쪽
+    total = max(max(walls, default=0.0), sum(walls) / parallel)
+    cost = sum(p.cost_usd() for p in plans)
+    print(f"합계: 책 {len(plans)}권 · 동시 {parallel}권 · 예상 {format_eta(total)} · 비용 약 ${cost:.2f}")
+    return 0
+
+
+def main(argv=None) -> int:
+    ap = argparse.ArgumentParser(description="Mode B 헤드리스 배치 실행기")
+    ap.add_argument("books_list", nargs="*", metavar="BOOK", help="character/ 아래 책 폴더명 또는 폴더 경로")
+    ap.add_argument("--all", action="store_true", help="character/의 모든 책")
+    ap.add_argument("--preset", help=f"프리셋 이름({', '.join(pipeline.PRESETS)}) 또는 JSON 파일")
+    ap.add_argument("--mode", choices=["Standard", "Conversation", "Comprehensive"], help="대본 스타일")
+    ap.add_argument("--duration", choices=["Short", "Standard", "Long"], help="영상 길이 (기본: 월령 추천)")
+    ap.add_argument("--engine", choices=["clova", "gpt", "gemini-pro"], help="TTS 엔진")
+    ap.add_argument("--voice-speed", type=float, help="음성 속도 배수 (0.5~1.5)")
+    ap.add_argument("--bgm", action="store_true", default=None, help="BGM 포함")
+    ap.add_argument("--bgm-volume", type=float, help="BGM 볼륨 (0.0~1.0)")
+    ap.add_argument("--prompt", help="Runway 모션 프롬프트")
+    ap.add_argument("--until", choices=pipeline.STAGES, default="final", help="이 단계까지만 실행")
+    ap.add_argument("--books", type=int, default=2, help="동시에 처리할 책 수")
+    ap.add_argument("--workers", type=int, default=sum(DEFAULT_WORKERS.values()),
+                    help="모든 책이 나눠 쓰는 장면 스테이지 워커 총량")
+    ap.add_argument("--session", help="결과를 저장할 세션 ID (기본: batch_<시각>)")
+    ap.add_argument("--farm", help="렌더 팜 큐 DB 경로 (기본: RENDER_FARM_DB 환경변수)")
+    ap.add_argument("--plan", action="store_true", help="실행하지 않고 실행 계획(호출 수·예상 시간·비용)만 출력")
+    args = ap.parse_args(argv)
+    if args.farm:
+        os.environ["RENDER_FARM_DB"] = args.farm
+
+    if not args.all and not args.books_list:
+        ap.error("책 이름을 주거나 --all을 지정하세요.")
+
+    preset = pipeline.load_preset(args.preset, {
+        "script_mode": args.mode,
+        "duration": args.duration,
+        "engine": args.engine,
+        "voice_speed": args.voice_speed,
+        "use_bgm": args.bgm,
+        "bgm_volume": args.bgm_volume,
+        "runway_prompt": args.prompt,
+    })
+    books = resolve_books(args)
+    parallel = max(1, min(args.books, len(books)))
+    workers = split_worker_budget(args.workers, parallel)
+    if args.plan:
+        return print_plan(books, preset, args.until, parallel)
+    session_id = args.session or f"batch_{datetime.now():%Y%m%d_%H%M%S}"
+
+    _log(f"세션: {session_id} · 책 {len(books)}권 · 동시 {parallel}권 · 책당 워커 {workers}")
+    results = {}
+    started = time.perf_counter()
+    # 배치는 batch 우선순위 — 같은 머신에서 워크숍 UI가 돌고 있으면 그쪽 프리뷰/렌더가 먼저 슬롯을 받음
+    with bind_session(session_id) as session_dir, render_priority("batch"):
+        # Ctrl+C면 cancel_scope가 (풀이 스레드를 기다리기 전에) 토큰을 취소 → ffmpeg 종료, Runway 작업 취소
+        with ThreadPoolExecutor(max_workers=parallel, thread_name_prefix="book") as pool, cancel_scope():
+            futures = {}
+            for folder, txt_file in books:
+                # 책마다 컨텍스트를 복사해야 bind_session이 워커 스레드에서도 유지됨
+                ctx = contextvars.copy_context()
+                fut = pool.submit(ctx.run, pipeline.run_book, folder, txt_file, preset,
+                                  args.until, workers, _log)
+                futures[fut] = folder.name
+            for fut in as_completed(futures):
+                name = futures[fut]
+                try:
+                    results[name] = {"ok": True, **fut.result()}
+                except Exception as e:
+                    _log(f"[{name}] ❌ 실패: {e}")
+                    results[name] = {"ok": False, "error": f"{type(e).__name__}: {e}"}
+
+        report = {
+            "session_id": session_id,
+            "preset": preset,
+            "until": args.until,
+            "elapsed_sec": round(time.perf_counter() - started, 1),
+            "books": results,
+        }
+        with open(session_dir / "batch_report.json", "w", encoding="utf-8") as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+
+    ok = sum(1 for r in results.values() if r["ok"])
+    _log(f"완료: {ok}/{len(results)}권 성공 · {report['elapsed_sec']}s · 리포트 {session_dir / 'batch_report.json'}")
+    return 0 if ok == len(results) else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
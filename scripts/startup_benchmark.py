@@ -0,0 +1,210 @@
+# -*- coding: utf-8 -*-
+"""
+Streamlit 워커 콜드 스타트 벤치마크.
+moviepy·AI SDK를 처음 쓸 때 불러오도록 바꾼 뒤(video_utils.load_moviepy, sdk_clients)
+누가 다시 모듈 최상단에서 import해도 바로 드러나게 하려고 만든 검사.
+
+- 모듈별: 새 인터프리터에서 streamlit을 먼저 불러온 뒤 `import 모듈`에 걸린 시간 (streamlit 자체는 빼고)
+  → 가장 오래 걸린 하위 import도 같이 보여 줌 (-X importtime)
+- 첫 화면: AppTest로 app.py를 이름 입력 화면 → 책 선택 화면까지 실행한 시간
+- 예산(ms)을 넘거나 HEAVY_MODULES 중 하나라도 불러왔으면 종료 코드 1
+
+사용:
+    python scripts/startup_benchmark.py
+    python scripts/startup_benchmark.py --repeat 5 --json
+    STARTUP_BUDGET_SCALE=2 python scripts/startup_benchmark.py     # 느린 CI 머신
+"""
+from __future__ import annotations
+
+import argparse
+import json
+import os
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+
+# 모듈별 import 예산 (ms, streamlit import 이후 추가분)
+MODULE_BUDGET_MS = {
+    "session_logger": 150,
+    "video_utils": 150,
+    "tts_core": 150,
+    "tts_module": 250,
+    "runway_api": 150,
+    "duration_model": 150,
+    "b_text_based": 400,
+    "mode_b_pipeline": 400,
+}
+# 첫 화면 예산 (ms, AppTest 실행 — 앱 모듈 import 포함)
+LANDING_BUDGET_MS = 3000
+# 첫 화면에서 불러오면 안 되는 모듈 (미디어 / AI SDK)
+HEAVY_MODULES = (
+    "moviepy", "imageio_ffmpeg", "openai", "runwayml",
+    "google.genai", "google.cloud.texttospeech", "edge_tts",
+)
+BUDGET_SCALE = float(os.getenv("STARTUP_BUDGET_SCALE", "1.0"))
+_MARK = "startup_benchmark:start"
+
+# 자식 프로세스: streamlit을 먼저 불러온 뒤 대상 모듈 import 시간 측정
+_IMPORT_CHILD = """
+import json, sys, time
+import streamlit
+sys.stderr.write("{mark}\\n"); sys.stderr.flush()
+t0 = time.perf_counter()
+import {module}
+ms = (time.perf_counter() - t0) * 1000
+print(json.dumps({{"ms": ms, "heavy": [m for m in {heavy!r} if m in sys.modules]}}))
+"""
+
+# 자식 프로세스: 이름 입력 화면 → 이름 넣고 시작 → 책 선택 화면
+_LANDING_CHILD = """
+import json, sys, time
+from streamlit.testing.v1 import AppTest
+t0 = time.perf_counter()
+at = AppTest.from_file({app!r}, default_timeout=120)
+at.run()
+name_ms = (time.perf_counter() - t0) * 1000
+errors = [e.value for e in at.exception]
+at.text_input(key="user_name_input").input("startup_benchmark")
+at.button[0].click()
+t1 = time.perf_counter()
+at.run()
+book_ms = (time.perf_counter() - t1) * 1000
+errors += [e.value for e in at.exception]
+print(json.dumps({{"name_ms": name_ms, "book_ms": book_ms, "errors": errors,
+                   "heavy": [m for m in {heavy!r} if m in sys.modules]}}))
+"""
+
+
+def _child_env() -> dict:
+    env = dict(os.environ)
+    env["PYTHONPATH"] = os.pathsep.join(p for p in (str(ROOT), env.get("PYTHONPATH")) if p)
+    # 첫 화면이 띄우는 영상/메트릭 서버는 포트를 잡으므로 측정에서 뺌
+    env.setdefault("MEDIA_SERVER", "0")
+    env.setdefault("METRICS", "0")
+    return env
+
+
+def _slowest_imports(stderr: str, top: int = 5) -> list:
+    """-X importtime 출력에서 대상 모듈 import 구간의 self 시간 상위 패키지."""
+    if _MARK not in stderr:
+        return []
+    by_pkg: dict = {}
+    for line in stderr.split(_MARK, 1)[1].splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        try:
+            self_us, _, name = line[len("import time:"):].split("|", 2)
+            pkg = name.strip().split(".")[0]
+            by_pkg[pkg] = by_pkg.get(pkg, 0) + int(self_us)
+        except ValueError:
+            continue
+    rows = sorted(by_pkg.items(), key=lambda kv: -kv[1])[:top]
+    return [(pkg, round(us / 1000, 1)) for pkg, us in rows]
+
+
+def measure_import(module: str, repeat: int, cwd: str) -> dict:
+    runs, heavy, slowest = [], set(), []
+    code = _IMPORT_CHILD.format(mark=_MARK, module=module, heavy=HEAVY_MODULES)
+    for _ in range(repeat):
+        proc = subprocess.run([sys.executable, "-X", "importtime", "-c", code], cwd=cwd,
+                              env=_child_env(), capture_output=True, text=True)
+        if proc.returncode != 0:
+            tail = proc.stderr.strip().splitlines()[-1:] or ["?"]
+            return {"module": module, "error": tail[0]}
+        out = json.loads(proc.stdout.strip().splitlines()[-1])
+        runs.append(out["ms"])
+        heavy.update(out["heavy"])
+        slowest = _slowest_imports(proc.stderr)
+    return {"module": module, "ms": round(statistics.median(runs), 1),
+            "heavy": sorted(heavy), "slowest": slowest}
+
+
+def measure_landing(repeat: int, cwd: str) -> dict:
+    code = _LANDING_CHILD.format(app=str(ROOT / "app.py"), heavy=HEAVY_MODULES)
+    name_runs, book_runs, heavy, errors = [], [], set(), []
+    for _ in range(repeat):
+        proc = subprocess.run([sys.executable, "-c", code], cwd=cwd, env=_child_env(),
+                              capture_output=True, text=True)
+        if proc.returncode != 0:
+            tail = proc.stderr.strip().splitlines()[-1:] or ["?"]
+            return {"error": tail[0]}
+        out = json.loads(proc.stdout.strip().splitlines()[-1])
+        name_runs.append(out["name_ms"])
+        book_runs.append(out["book_ms"])
+        heavy.update(out["heavy"])
+        errors.extend(out["errors"])
+    return {"name_ms": round(statistics.median(name_runs), 1),
+            "book_ms": round(statistics.median(book_runs), 1),
+            "heavy": sorted(heavy), "errors": errors[:3]}
+
+
+def main(argv: list[str]) -> int:
+    p = argparse.ArgumentParser(description="앱 import / 첫 화면 시간 예산 검사")
+    p.add_argument("modules", nargs="*", help="측정할 모듈 (기본: MODULE_BUDGET_MS 전부)")
+    p.add_argument("--repeat", type=int, default=3, help="모듈마다 반복 횟수 (중앙값 사용)")
+    p.add_argument("--no-landing", action="store_true", help="AppTest 첫 화면 측정 생략")
+    p.add_argument("--json", action="store_true", help="결과를 JSON으로 출력")
+    args = p.parse_args(argv)
+
+    modules = args.modules or list(MODULE_BUDGET_MS)
+    failures = []
+    # 자식 프로세스가 만드는 outputs/ (세션 폴더 등)는 임시 폴더에
+    cwd = tempfile.mkdtemp(prefix="startup_bench_")
+    try:
+        results = [measure_import(m, max(1, args.repeat), cwd) for m in modules]
+        landing = None if args.no_landing else measure_landing(max(1, args.repeat), cwd)
+    finally:
+        shutil.rmtree(cwd, ignore_errors=True)
+
+    for r in results:
+        budget = MODULE_BUDGET_MS.get(r["module"], min(MODULE_BUDGET_MS.values())) * BUDGET_SCALE
+        r["budget_ms"] = round(budget, 1)
+        if "error" in r:
+            failures.append(f"{r['module']}: import 실패 — {r['error']}")
+            continue
+        if r["ms"] > budget:
+            failures.append(f"{r['module']}: {r['ms']:.0f}ms > 예산 {budget:.0f}ms")
+        if r["heavy"]:
+            failures.append(f"{r['module']}: 최상단에서 {', '.join(r['heavy'])} 를 불러옴")
+    if landing is not None:
+        budget = LANDING_BUDGET_MS * BUDGET_SCALE
+        landing["budget_ms"] = round(budget, 1)
+        if "error" in landing:
+            failures.append(f"첫 화면: 실행 실패 — {landing['error']}")
+        else:
+            total = landing["name_ms"] + landing["book_ms"]
+            if total > budget:
+                failures.append(f"첫 화면: {total:.0f}ms > 예산 {budget:.0f}ms")
+            if landing["heavy"]:
+                failures.append(f"첫 화면: {', '.join(landing['heavy'])} 를 불러옴")
+            if landing["errors"]:
+                failures.append(f"첫 화면: 예외 — {landing['errors'][0][:200]}")
+
+    if args.json:
+        print(json.dumps({"modules": results, "landing": landing, "failures": failures},
+                         ensure_ascii=False, indent=2))
+    else:
+        print(f"{'모듈':<18}{'ms':>8}{'예산':>8}  느린 하위 import")
+        for r in results:
+            if "error" in r:
+                print(f"{r['module']:<18}{'실패':>8}{r['budget_ms']:>8.0f}  {r['error']}")
+                continue
+            slow = ", ".join(f"{pkg} {ms}ms" for pkg, ms in r["slowest"])
+            print(f"{r['module']:<18}{r['ms']:>8.0f}{r['budget_ms']:>8.0f}  {slow}")
+        if landing and "error" not in landing:
+            print(f"\n첫 화면: 이름 입력 {landing['name_ms']:.0f}ms + 책 선택 {landing['book_ms']:.0f}ms"
+                  f" (예산 {landing['budget_ms']:.0f}ms)")
+        for f in failures:
+            print(f"❌ {f}")
+        if not failures:
+            print("✅ 예산 안")
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
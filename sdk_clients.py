@@ -0,0 +1,36 @@
+# -*- coding: utf-8 -*-
+"""
+AI SDK 클라이언트를 처음 쓸 때 만드는 팩토리 (프로세스 공용).
+openai, runwayml은 import만 해도 수백 ms가 걸려서 Streamlit 워커가 처음 뜰 때 느렸다 —
+이름 입력·책 선택 화면은 이 SDK들 없이 그려지고, 실제 호출 직전에 한 번만 불러온다.
+(Gemini TTS 클라이언트는 인증 정보에 따라 달라서 tts_module에 있음, moviepy는 video_utils.load_moviepy)
+
+    get_openai().chat.completions.create(...)
+    get_runway().image_to_video.create(...)
+"""
+import os
+import threading
+
+_OPENAI = None
+_RUNWAY = None
+_LOCK = threading.Lock()
+
+
+def get_openai():
+    """OpenAI 클라이언트 (OPENAI_API_KEY). 스레드 간 공유해도 안전."""
+    global _OPENAI
+    with _LOCK:
+        if _OPENAI is None:
+            from openai import OpenAI
+            _OPENAI = OpenAI(api_key=os.getenv("OPENAI_API_KEY"))
+        return _OPENAI
+
+
+def get_runway():
+    """RunwayML 클라이언트 (RUNWAYML_API_SECRET — runway_api가 .env를 읽은 뒤 부름)."""
+    global _RUNWAY
+    with _LOCK:
+        if _RUNWAY is None:
+            from runwayml import RunwayML
+            _RUNWAY = RunwayML()
+        return _RUNWAY
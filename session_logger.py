@@ -3,20 +3,33 @@
 워크숍 세션 로깅 유틸리티.
 사용자별로 격리된 폴더에 작업 데이터를 저장하고 ZIP으로 묶어 다운로드 가능하게 한다.
 """
+import atexit
+import contextvars
 import hashlib
-import io
 import json
+import os
+import shutil
+import threading
 import time
+import uuid
 import zipfile
 from contextlib import contextmanager
 from datetime import datetime
 from pathlib import Path
-from typing import Any, Optional
+from typing import Any, Dict, List, Optional, Set, Tuple
 
 import streamlit as st
 
+import metrics
+from tracing import current_step, export_chrome_trace, span
+
 SESSIONS_ROOT = Path("outputs/sessions")
 
+# Streamlit 밖(배치 CLI, 워커 스레드)에서 쓰는 세션 바인딩. 설정돼 있으면 session_state보다 우선.
+_BOUND_SESSION: "contextvars.ContextVar[Optional[str]]" = contextvars.ContextVar(
+    "bound_session_id", default=None
+)
+
 
 def init_session(user_name: str) -> str:
     """이름을 받아 세션 ID 생성 및 폴더 초기화."""
@@ -39,9 +52,33 @@ def init_session(user_name: str) -> str:
     return session_id
 
 
+@contextmanager
+def bind_session(session_id: str):
+    """with 블록 안의 log_event/get_session_dir을 session_id 폴더로 보낸다.
+    contextvars 기반이라 스레드별로 독립이고, copy_context()로 워커에 전파된다."""
+    token = _BOUND_SESSION.set(session_id)
+    try:
+        (SESSIONS_ROOT / session_id).mkdir(parents=True, exist_ok=True)
+        yield SESSIONS_ROOT / session_id
+    finally:
+        _BOUND_SESSION.reset(token)
+
+
+def current_session_id() -> Optional[str]:
+    """바인딩된 세션 → Streamlit session_state 순으로 조회."""
+    sid = _BOUND_SESSION.get()
+    if sid:
+        return sid
+    try:
+        return st.session_state.get("session_id")
+    except Exception:
+        # Streamlit 런타임 밖
+        return None
+
+
 def get_session_dir() -> Optional[Path]:
     """현재 세션 폴더. 이름 입력 전이면 None."""
-    sid = st.session_state.get("session_id")
+    sid = current_session_id()
     if not sid:
         return None
     d = SESSIONS_ROOT / sid
@@ -49,23 +86,96 @@ def get_session_dir() -> Optional[Path]:
     return d
 
 
-def log_event(action: str, data: Optional[dict] = None) -> None:
-    """세션 events.jsonl에 한 줄 추가. 사용자 식별 전엔 무시."""
-    sdir = get_session_dir()
-    if not sdir:
+# ---------------------------------------------------------
+# 이벤트 기록: 메모리 큐 + 백그라운드 writer 스레드
+# ---------------------------------------------------------
+# log_event는 큐에 한 줄 넣고 바로 반환 (TTS 워커 스레드에서 파일 I/O·mkdir 없음).
+# writer가 FLUSH_INTERVAL_SEC마다, 또는 FLUSH_BATCH줄이 쌓이면 세션별로 모아 한 번의 write로 붙인다.
+# 큐 교체와 파일 쓰기를 한 잠금 안에서 하므로 세션별 순서가 유지되고 줄이 섞이지 않는다.
+FLUSH_INTERVAL_SEC = float(os.getenv("LOG_FLUSH_INTERVAL_SEC", "0.5"))
+FLUSH_BATCH = int(os.getenv("LOG_FLUSH_BATCH", "256"))
+EVENTS_FILE = "events.jsonl"
+
+
+class _EventWriter:
+    def __init__(self):
+        self._cond = threading.Condition()
+        self._write_lock = threading.Lock()
+        self._queue: List[Tuple[str, str, str]] = []
+        self._thread: Optional[threading.Thread] = None
+        self._made_dirs = set()
+
+    def put(self, session_id: str, line: str, filename: str = EVENTS_FILE) -> None:
+        with self._cond:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, name="event-writer", daemon=True)
+                self._thread.start()
+            self._queue.append((session_id, filename, line))
+            if len(self._queue) >= FLUSH_BATCH:
+                self._cond.notify()
+
+    def _run(self) -> None:
+        while True:
+            with self._cond:
+                self._cond.wait_for(lambda: len(self._queue) >= FLUSH_BATCH, timeout=FLUSH_INTERVAL_SEC)
+            self.flush()
+
+    def flush(self) -> None:
+        """쌓인 줄을 지금 파일에 쓴다."""
+        with self._write_lock:
+            with self._cond:
+                batch, self._queue = self._queue, []
+            if not batch:
+                return
+            by_file: Dict[Tuple[str, str], List[str]] = {}
+            for sid, filename, line in batch:
+                by_file.setdefault((sid, filename), []).append(line)
+            for (sid, filename), lines in by_file.items():
+                sdir = SESSIONS_ROOT / sid
+                try:
+                    if sid not in self._made_dirs:
+                        sdir.mkdir(parents=True, exist_ok=True)
+                        self._made_dirs.add(sid)
+                    with open(sdir / filename, "a", encoding="utf-8") as f:
+                        f.write("".join(lines))
+                except Exception as e:
+                    # 로깅 실패가 앱 동작을 막아선 안 됨
+                    print(f"[session_logger] {filename} {len(lines)}줄 기록 실패 ({sid}): {e}")
+
+
+_WRITER = _EventWriter()
+atexit.register(_WRITER.flush)
+
+
+def append_session_line(filename: str, line: str, session_id: Optional[str] = None) -> None:
+    """세션 폴더의 다른 JSONL 파일에 한 줄 추가 (events.jsonl과 같은 writer 사용, line은 개행 포함)."""
+    sid = session_id or current_session_id()
+    if sid:
+        _WRITER.put(sid, line, filename)
+
+
+def flush_events() -> None:
+    """아직 큐에 있는 이벤트를 events.jsonl에 반영 (파일을 읽기 직전에 호출)."""
+    _WRITER.flush()
+
+
+def log_event(action: str, data: Optional[dict] = None, session_id: Optional[str] = None) -> None:
+    """세션 events.jsonl에 한 줄 추가 (비동기). 사용자 식별 전엔 무시.
+    session_id: 다른 스레드에서 대신 기록할 때 (예: 취소 스레드가 거둔 ffmpeg 프로세스)."""
+    sid = session_id or current_session_id()
+    if not sid:
         return
     entry = {
         "ts": datetime.now().isoformat(timespec="seconds"),
         "action": action,
         "data": data or {},
     }
-    log_file = sdir / "events.jsonl"
     try:
-        with open(log_file, "a", encoding="utf-8") as f:
-            f.write(json.dumps(entry, ensure_ascii=False) + "\n")
-    except Exception as e:
-        # 로깅 실패가 앱 동작을 막아선 안 됨
+        line = json.dumps(entry, ensure_ascii=False) + "\n"
+    except (TypeError, ValueError) as e:
         print(f"[session_logger] log_event failed: {e}")
+        return
+    _WRITER.put(sid, line)
 
 
 def summarize_text(text: str, max_chars: int = 200) -> dict:
@@ -154,17 +264,23 @@ def log_api_call(
 
     원본 예외는 로그 후 재발생되어 호출자가 평소처럼 처리할 수 있게 함.
     """
+    # call_id: 여러 스레드에서 같은 API가 겹쳐 불려도 request/response를 정확히 짝짓기 위함
+    # start_ts: 초 단위 ts로는 겹침을 못 보므로 ms 정밀도 시작 시각 (동시 실행 타임라인용)
+    call_id = uuid.uuid4().hex[:12]
     started_perf = time.perf_counter()
+    started_ts = round(time.time(), 3)
     started_iso = datetime.now().isoformat(timespec="seconds")
-    req_payload = {"endpoint": endpoint, "started_at": started_iso}
+    req_payload = {"endpoint": endpoint, "call_id": call_id, "started_at": started_iso, "start_ts": started_ts}
     if request_summary:
         req_payload["request"] = request_summary
     log_event(f"{api_name}_request", req_payload)
 
-    ctx: dict = {}
+    ctx: dict = {"call_id": call_id}
     error_info = None
+    metrics.API_IN_FLIGHT.inc(engine=api_name)
     try:
-        yield ctx
+        with span(api_name, cat="api", endpoint=endpoint, call_id=call_id):
+            yield ctx
     except Exception as e:
         error_info = {
             "type": type(e).__name__,
@@ -175,6 +291,8 @@ def log_api_call(
         duration_ms = int((time.perf_counter() - started_perf) * 1000)
         resp_payload = {
             "endpoint": endpoint,
+            "call_id": call_id,
+            "start_ts": started_ts,
             "duration_ms": duration_ms,
             "success": error_info is None,
         }
@@ -189,19 +307,164 @@ def log_api_call(
             resp_payload["result"] = ctx["result_summary"]
         log_event(f"{api_name}_response", resp_payload)
 
+        voice = (request_summary or {}).get("voice")
+        metrics.API_IN_FLIGHT.dec(engine=api_name)
+        metrics.API_SECONDS.observe(duration_ms / 1000, engine=api_name, model=endpoint, voice=voice)
+        metrics.API_CALLS.inc(engine=api_name, model=endpoint, voice=voice, step=current_step(),
+                              status=metrics.api_status(error_info, ctx.get("result_summary")))
+
+
+# 이미 압축된 미디어 — deflate해 봐야 크기는 거의 그대로고 CPU만 씀
+_STORED_SUFFIXES = {".mp4", ".mp3", ".wav", ".m4a", ".png", ".jpg", ".jpeg", ".webp"}
+
+# ZIP을 만드는 동안 세션 폴더에 두는 표시 파일 — outputs_gc가 이 세션의 파일을 지우지 않음
+ZIP_PIN_FILE = ".zip_pin"
+
+
+@contextmanager
+def _zip_pin(sdir: Path):
+    pin = sdir / ZIP_PIN_FILE
+    pin.touch()
+    try:
+        yield
+    finally:
+        pin.unlink(missing_ok=True)
+
+
+# ---------------------------------------------------------
+# 세션 ZIP: 디스크 캐시 + 증분 갱신
+# ---------------------------------------------------------
+# outputs/.session_zips/<세션>.zip 을 두고, 옆의 .json에 넣은 파일별 (크기, mtime)을 기록한다.
+# 갱신할 때는 임시 파일에 새로 쓰고 os.replace로 바꿔 끼운다 (미디어 서버가 내려보내는 중인 ZIP을
+# 제자리에서 고치지 않도록 — 이미 연 쪽은 예전 파일을 끝까지 읽음). 바뀌지 않은 항목은 원래 세션 파일을
+# 다시 읽지 않고 기존 ZIP에서 그대로 옮기고(미디어는 무압축이라 단순 복사), 새 파일·바뀐 파일만 뒤에 붙인다.
+# 계속 바뀌는 작은 파일(events.jsonl, manifest 등)은 항상 미디어 뒤에 쓴다.
+ZIP_CACHE_DIR = SESSIONS_ROOT.parent / ".session_zips"
+_ZIP_LOCKS: Dict[str, threading.Lock] = {}
+_ZIP_LOCKS_GUARD = threading.Lock()
+
+
+def _zip_lock(session_id: str) -> threading.Lock:
+    with _ZIP_LOCKS_GUARD:
+        return _ZIP_LOCKS.setdefault(session_id, threading.Lock())
+
+
+def _session_files(sdir: Path) -> Dict[str, tuple]:
+    """{arcname: (size, mtime_ns, 경로)}"""
+    files = {}
+    for path in sdir.rglob("*"):
+        if path.name == ZIP_PIN_FILE:
+            continue
+        try:
+            st_ = path.stat()
+        except OSError:
+            continue
+        if path.is_file():
+            files[path.relative_to(sdir.parent).as_posix()] = (st_.st_size, st_.st_mtime_ns, path)
+    return files
+
+
+def _load_zip_index(zip_path: Path, index_path: Path) -> Optional[dict]:
+    """캐시 인덱스. ZIP 크기가 기록과 다르면 (쓰다 죽었거나 지워짐) None → 새로 만듦."""
+    try:
+        with open(index_path, "r", encoding="utf-8") as f:
+            index = json.load(f)
+        if zip_path.stat().st_size != index.get("zip_size"):
+            return None
+        return index
+    except (OSError, json.JSONDecodeError):
+        return None
+
+
+def zipped_session_files(sessions_root: Path = SESSIONS_ROOT) -> Set[Path]:
+    """
+    캐시된 세션 ZIP들이 담고 있는 원본 파일 경로. 다음 update_session_zip이 다시 담아야 하므로
+    outputs_gc가 지우지 않는다 (지우면 ZIP에서도 빠짐).
+    """
+    cache_dir = sessions_root.parent / ZIP_CACHE_DIR.name
+    paths = set()
+    for index_path in cache_dir.glob("*.json"):
+        index = _load_zip_index(index_path.with_suffix(".zip"), index_path)
+        for arc in (index or {}).get("files", {}):
+            paths.add(sessions_root / arc)
+    return paths
+
+
+def _copy_zip_entry(src: zipfile.ZipFile, info: zipfile.ZipInfo, dst: zipfile.ZipFile) -> None:
+    """기존 ZIP 항목을 그대로 옮김 (메모리에 통째로 올리지 않고 조금씩)."""
+    out = zipfile.ZipInfo(info.filename, date_time=info.date_time)
+    out.compress_type = info.compress_type
+    out.external_attr = info.external_attr
+    out.file_size = info.file_size
+    with src.open(info) as fin, dst.open(out, "w", force_zip64=info.file_size > zipfile.ZIP64_LIMIT) as fout:
+        shutil.copyfileobj(fin, fout, 1024 * 1024)
+
+
+def update_session_zip(session_id: Optional[str] = None) -> Optional[Path]:
+    """
+    세션 ZIP 캐시를 최신 상태로 만들고 경로를 반환 (세션 폴더가 없으면 None).
+    미디어 파일은 무압축(STORED)으로 넣는다.
+    """
+    session_id = session_id or current_session_id()
+    if not session_id:
+        return None
+    sdir = SESSIONS_ROOT / session_id
+    if not sdir.exists():
+        return None
+    export_chrome_trace(sdir)  # trace.json도 ZIP에 같이 (추적이 켜져 있었을 때만 생김)
+    ZIP_CACHE_DIR.mkdir(parents=True, exist_ok=True)
+    zip_path = ZIP_CACHE_DIR / f"{session_id}.zip"
+    index_path = ZIP_CACHE_DIR / f"{session_id}.json"
+
+    with _zip_lock(session_id), _zip_pin(sdir):
+        files = _session_files(sdir)
+        index = _load_zip_index(zip_path, index_path) if zip_path.exists() else None
+        cached = index["files"] if index else {}
+        dirty = {arc for arc, (size, mtime) in cached.items()
+                 if arc not in files or files[arc][:2] != (size, mtime)}
+        if index and not dirty and set(files) <= set(cached):
+            return zip_path
+
+        # 쓰는 도중 죽으면 인덱스가 없으므로 다음에 처음부터 다시 만든다
+        index_path.unlink(missing_ok=True)
+        tmp_zip = zip_path.with_suffix(".zip.tmp")
+        written = {}
+        try:
+            with zipfile.ZipFile(tmp_zip, "w", zipfile.ZIP_DEFLATED, compresslevel=6) as zf:
+                if index:
+                    with zipfile.ZipFile(zip_path) as old:
+                        for info in old.infolist():
+                            if info.filename in dirty or info.filename not in files:
+                                continue
+                            _copy_zip_entry(old, info, zf)
+                            written[info.filename] = tuple(cached[info.filename])
+                pending = [arc for arc in files if arc not in written]
+                # 미디어(거의 안 바뀜) 먼저, 자주 바뀌는 작은 파일은 맨 뒤
+                pending.sort(key=lambda arc: (Path(arc).suffix.lower() not in _STORED_SUFFIXES, arc))
+                for arc in pending:
+                    size, mtime, path = files[arc]
+                    compress = zipfile.ZIP_STORED if path.suffix.lower() in _STORED_SUFFIXES else zipfile.ZIP_DEFLATED
+                    try:
+                        zf.write(path, arc, compress_type=compress)
+                    except FileNotFoundError:
+                        continue
+                    written[arc] = (size, mtime)
+            os.replace(tmp_zip, zip_path)
+        except BaseException:
+            tmp_zip.unlink(missing_ok=True)
+            raise
+
+        tmp = index_path.with_suffix(".tmp")
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump({"zip_size": zip_path.stat().st_size, "files": written}, f, ensure_ascii=False)
+        os.replace(tmp, index_path)
+    return zip_path
+
 
 def make_session_zip() -> bytes:
-    """세션 폴더 전체를 ZIP bytes로 직렬화."""
-    sdir = get_session_dir()
-    if not sdir or not sdir.exists():
-        return b""
-    buf = io.BytesIO()
-    with zipfile.ZipFile(buf, "w", zipfile.ZIP_DEFLATED, compresslevel=6) as zf:
-        for path in sdir.rglob("*"):
-            if path.is_file():
-                arcname = path.relative_to(sdir.parent)
-                zf.write(path, arcname)
-    return buf.getvalue()
+    """세션 폴더 전체를 ZIP bytes로. 가능하면 update_session_zip() 경로를 직접 쓸 것."""
+    zip_path = update_session_zip()
+    return zip_path.read_bytes() if zip_path else b""
 
 
 def render_sidebar_panel() -> None:
@@ -211,18 +474,43 @@ def render_sidebar_panel() -> None:
     st.sidebar.markdown(f"### 👤 {st.session_state.user_name}")
     st.sidebar.caption(f"세션 ID: `{st.session_state.session_id}`")
 
-    zip_bytes = make_session_zip()
-    if zip_bytes:
-        st.sidebar.download_button(
-            "📦 내 세션 다운로드",
-            data=zip_bytes,
-            file_name=f"{st.session_state.session_id}.zip",
-            mime="application/zip",
-            use_container_width=True,
-        )
+    session_id = st.session_state.session_id
+    sdir = SESSIONS_ROOT / session_id
+    if sdir.exists() and any(sdir.iterdir()):
+        # 순환 import 방지 (media_server가 이 모듈을 씀)
+        from media_server import session_zip_url
+        zip_url = session_zip_url(session_id)
+        if zip_url:
+            # 클릭하면 미디어 서버가 그때 증분 갱신하고 디스크에서 스트리밍
+            st.sidebar.link_button("📦 내 세션 다운로드", zip_url, use_container_width=True)
+        else:
+            def _open_zip():
+                # 클릭했을 때만 (별도 스레드에서) 증분 갱신 후 바이트를 넘김 — 리런마다 압축하지 않음
+                # (파일 객체를 넘기면 Streamlit이 읽기만 하고 닫지 않아 fd가 샘)
+                zip_path = update_session_zip(session_id)
+                if zip_path is None:
+                    # 그 사이 세션 폴더가 정리됨
+                    print(f"[session_logger] 세션 폴더 없음, 빈 ZIP 전달: {session_id}")
+                    return b""
+                return Path(zip_path).read_bytes()
+
+            st.sidebar.download_button(
+                "📦 내 세션 다운로드",
+                data=_open_zip,
+                file_name=f"{st.session_state.session_id}.zip",
+                mime="application/zip",
+                use_container_width=True,
+            )
         st.sidebar.caption(
             "지금까지의 모든 작업이 담겨 있어요.\n"
             "**워크숍 끝나면 꼭 받아 주세요.**"
         )
     else:
         st.sidebar.caption("아직 저장된 작업이 없습니다.")
+
+    # 순환 import 방지 (profiling이 이 모듈을 씀)
+    from profiling import is_enabled as profiling_enabled, set_session_enabled
+    on = st.sidebar.toggle("🔬 성능 프로파일링", value=profiling_enabled(session_id),
+                           help="다음 단계부터 cProfile·메모리 기록을 세션 profiles/ 폴더에 남깁니다. 켜 두면 느려집니다.")
+    if on != profiling_enabled(session_id):
+        set_session_enabled(on, session_id)
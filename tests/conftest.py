@@ -0,0 +1,25 @@
+# -*- coding: utf-8 -*-
+import sys
+from pathlib import Path
+
+import pytest
+
+ROOT = Path(__file__).resolve().parent.parent
+if str(ROOT) not in sys.path:
+    sys.path.insert(0, str(ROOT))
+
+
+@pytest.fixture(autouse=True)
+def _isolated_cwd(tmp_path, monkeypatch):
+    # 모듈들이 outputs/ 상대 경로를 쓰므로 테스트마다 빈 작업 폴더에서 실행
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setenv("METRICS", "0")
+    monkeypatch.setenv("MEDIA_SERVER", "0")
+
+
+@pytest.fixture(autouse=True)
+def _isolated_slots(tmp_path, monkeypatch):
+    # 전역 렌더 슬롯 대기열은 머신 로컬 임시 폴더에 있음 → 테스트 것과 섞이지 않게 테스트마다 새로
+    import render_scheduler
+    monkeypatch.setattr(render_scheduler, "_SCHEDULER",
+                        render_scheduler.RenderScheduler(render_scheduler.POOL_CAPACITY, tmp_path / "slots.db"))
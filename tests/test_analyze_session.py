@@ -0,0 +1,119 @@
+# -*- coding: utf-8 -*-
+import importlib.util
+import json
+import sys
+
+import pytest
+
+from conftest import ROOT
+
+
+@pytest.fixture(scope="module")
+def analyze():
+    # scripts/는 패키지가 아님 → 파일 경로로 로드 (프로세스 풀이 함수를 찾도록 sys.modules에 등록)
+    spec = importlib.util.spec_from_file_location("analyze_session", ROOT / "scripts" / "analyze_session.py")
+    mod = importlib.util.module_from_spec(spec)
+    sys.modules["analyze_session"] = mod
+    spec.loader.exec_module(mod)
+    yield mod
+    sys.modules.pop("analyze_session", None)
+
+
+@pytest.mark.parametrize("n, expected", [
+    (1, {50: 1, 90: 1, 99: 1}),
+    (2, {50: 1, 90: 2, 99: 2}),
+    (3, {50: 2, 90: 3, 99: 3}),
+    (10, {50: 5, 90: 9, 99: 10}),
+    (11, {50: 6, 90: 10, 99: 11}),
+])
+def test_percentile_is_nearest_rank(analyze, n, expected):
+    vals = list(range(1, n + 1))
+    assert {p: analyze.percentile(vals, p) for p in expected} == expected
+    assert analyze.percentile([], 50) == 0.0
+
+
+def _line(ts, action, **data):
+    return json.dumps({"ts": ts, "action": action, "data": data}) + "\n"
+
+
+def _runway_call(i, start):
+    # run_video_task: runway_gen4(전체) 안에 submit → wait
+    cid = f"r{i}"
+    return [
+        _line("2026-06-08T10:00:00", "runway_gen4_request", call_id=cid, start_ts=start, request={"duration": 5}),
+        _line("2026-06-08T10:00:00", "runway_gen4_submit_request", call_id=cid + "s", start_ts=start),
+        _line("2026-06-08T10:00:01", "runway_gen4_submit_response", call_id=cid + "s", start_ts=start,
+              duration_ms=1000),
+        _line("2026-06-08T10:00:01", "runway_gen4_wait_request", call_id=cid + "w", start_ts=start + 1),
+        _line("2026-06-08T10:01:00", "runway_gen4_wait_response", call_id=cid + "w", start_ts=start + 1,
+              duration_ms=59000),
+        _line("2026-06-08T10:01:00", "runway_gen4_response", call_id=cid, start_ts=start, duration_ms=60000,
+              result={"billed_duration_sec": 5}),
+    ]
+
+
+def _write_session(root, sid, lines):
+    d = root / sid
+    d.mkdir(parents=True, exist_ok=True)
+    with open(d / "events.jsonl", "a", encoding="utf-8") as f:
+        f.writelines(lines)
+
+
+def _totals(analyze, conn, sid):
+    s = analyze.analyze(conn, sid)
+    return ({api: (st["calls"], st["billed_seconds"]) for api, st in s["api_stats"].items()},
+            s["concurrency"]["max_in_flight"],
+            conn.execute("SELECT COUNT(*) FROM events WHERE session_id=?", (sid,)).fetchone()[0])
+
+
+def test_runway_latency_is_end_to_end_with_breakdown(analyze, tmp_path):
+    root = tmp_path / "sessions"
+    _write_session(root, "s1", [_line("2026-06-08T10:00:00", "session_start", user_name="u")]
+                   + _runway_call(1, 1000.0))
+
+    with analyze.open_store(":memory:") as conn:
+        analyze.ingest(conn, root, workers=1)
+        summary = analyze.analyze(conn, "s1")
+
+    rows = {r["api"]: r for r in summary["latency"] if not r["endpoint"] and not r["voice"]}
+    assert rows["runway_gen4"]["p50"] == 60000
+    assert rows["runway_gen4_wait"]["p50"] == 59000
+    assert summary["api_stats"]["runway_gen4"]["billed_seconds"] == 5
+    assert analyze.estimate_cost("runway_gen4_submit", summary["api_stats"]["runway_gen4_submit"]) == 0
+    # 내역 구간은 동시 실행에 다시 세지 않음
+    assert summary["concurrency"]["max_in_flight"] == 1
+
+
+def test_second_ingest_reads_only_appended_lines(analyze, tmp_path):
+    root = tmp_path / "sessions"
+    first = {"s1": _runway_call(1, 1000.0)[:4], "s2": _runway_call(2, 2000.0)}
+    rest = {"s1": _runway_call(1, 1000.0)[4:] + _runway_call(3, 1100.0), "s2": []}
+    for sid, lines in first.items():
+        _write_session(root, sid, lines)
+    # 쓰는 중인 마지막 줄은 개행이 없어 다음 적재로 미뤄짐
+    with open(root / "s1" / "events.jsonl", "a", encoding="utf-8") as f:
+        f.write(rest["s1"][0].rstrip("\n"))
+
+    store = tmp_path / "events.db"
+    with analyze.open_store(store) as conn:
+        _, added = analyze.ingest(conn, root, workers=2)  # 세션 2개 → 프로세스 풀
+        assert added == 4 + 6
+
+    with open(root / "s1" / "events.jsonl", "a", encoding="utf-8") as f:
+        f.write("\n")
+        f.writelines(rest["s1"][1:])
+    with analyze.open_store(store) as conn:
+        _, added = analyze.ingest(conn, root, workers=2)
+        assert added == len(rest["s1"])
+        incremental = {sid: _totals(analyze, conn, sid) for sid in first}
+        # 바뀐 게 없으면 아무것도 안 읽음
+        assert analyze.ingest(conn, root, workers=2)[1] == 0
+
+    with analyze.open_store(tmp_path / "fresh.db") as conn:
+        analyze.ingest(conn, root, workers=1)
+        fresh = {sid: _totals(analyze, conn, sid) for sid in first}
+
+    assert incremental == fresh
+    # request/response가 두 번의 적재에 걸쳐도 짝이 맞음
+    assert incremental["s1"][0]["runway_gen4"] == (2, 10)
+    assert incremental["s1"][0]["runway_gen4_wait"] == (2, 0)
@@ -0,0 +1,53 @@
+# -*- coding: utf-8 -*-
+import os
+
+from artifact_store import ArtifactStore, detach
+
+
+def _write(path, data: bytes):
+    with open(path, "wb") as f:
+        f.write(data)
+
+
+def test_put_does_not_link_source(tmp_path):
+    store = ArtifactStore(tmp_path / "cas")
+    src = tmp_path / "a.mp3"
+    _write(src, b"old")
+    digest = store.put(src)
+    assert os.stat(src).st_nlink == 1
+    assert not os.path.samefile(src, store.object_path(digest))
+
+
+def test_rewriting_source_keeps_materialized_copies(tmp_path):
+    store = ArtifactStore(tmp_path / "cas")
+    a, b = tmp_path / "a.mp4", tmp_path / "b.mp4"
+    _write(a, b"v1")
+    store.materialize(a, b)
+    digest = store.put(b)
+
+    _write(a, b"v2")  # 제자리 덮어쓰기 (download_video, Clova TTS와 같은 방식)
+
+    assert b.read_bytes() == b"v1"
+    assert store.object_path(digest).read_bytes() == b"v1"
+
+
+def test_detach_before_write_protects_object(tmp_path):
+    store = ArtifactStore(tmp_path / "cas")
+    a, b = tmp_path / "a.mp4", tmp_path / "b.mp4"
+    _write(a, b"v1")
+    store.materialize(a, b)
+    obj = store.object_path(store.put(a))
+    assert os.path.samefile(b, obj)
+
+    detach(b)
+    _write(b, b"v2")
+
+    assert obj.read_bytes() == b"v1"
+    assert not os.stat(obj).st_mode & 0o222
+
+
+def test_detach_keeps_unshared_file(tmp_path):
+    p = tmp_path / "solo.mp4"
+    _write(p, b"x")
+    detach(p)
+    assert p.exists()
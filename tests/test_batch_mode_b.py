@@ -0,0 +1,50 @@
+# -*- coding: utf-8 -*-
+import importlib.util
+
+import pytest
+
+from conftest import ROOT
+from scene_pipeline import DEFAULT_WORKERS
+
+
+@pytest.fixture(scope="module")
+def batch():
+    spec = importlib.util.spec_from_file_location("batch_mode_b", ROOT / "scripts" / "batch_mode_b.py")
+    mod = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(mod)
+    return mod
+
+
+@pytest.fixture(autouse=True)
+def _default_stage_workers(monkeypatch):
+    for name in DEFAULT_WORKERS:
+        monkeypatch.delenv(f"PIPELINE_WORKERS_{name.upper()}", raising=False)
+
+
+@pytest.mark.parametrize("total, books", [(11, 1), (12, 2), (30, 3), (40, 4), (100, 1), (22, 2)])
+def test_budget_sums_to_total(batch, total, books):
+    workers = batch.split_worker_budget(total, books)
+
+    assert set(workers) == set(DEFAULT_WORKERS)
+    assert sum(workers.values()) * books == total
+    assert min(workers.values()) >= 1
+
+
+def test_budget_keeps_default_ratio_and_floor(batch):
+    assert batch.split_worker_budget(sum(DEFAULT_WORKERS.values()), 1) == DEFAULT_WORKERS
+    # 나눠떨어지지 않으면 넘지 않는 선에서
+    assert sum(batch.split_worker_budget(11, 2).values()) * 2 <= 11
+    # 스테이지마다 워커 하나는 있어야 파이프라인이 돎 — 예산이 그보다 작으면 최소치
+    assert batch.split_worker_budget(3, 2) == {name: 1 for name in DEFAULT_WORKERS}
+
+
+def test_plan_prints_totals_without_running(batch, monkeypatch, capsys, tmp_path):
+    monkeypatch.setattr(batch.pipeline, "list_book_folders", lambda: ["책1_48개월", "책2_50개월"])
+    monkeypatch.setattr(batch.pipeline, "run_book", lambda *a, **kw: pytest.fail("--plan은 실행하지 않음"))
+
+    assert batch.main(["--all", "--plan", "--books", "2", "--until", "video"]) == 0
+
+    out = capsys.readouterr().out
+    assert "책1_48개월" in out and "책2_50개월" in out
+    assert "합계: 책 2권 · 동시 2권" in out
+    assert not (tmp_path / "outputs" / "sessions").exists()  # 세션 폴더도 만들지 않음
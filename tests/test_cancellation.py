@@ -0,0 +1,95 @@
+# -*- coding: utf-8 -*-
+import contextvars
+import subprocess
+import sys
+import threading
+import time
+
+import pytest
+
+import cancellation
+from cancellation import (Cancelled, CancelToken, cancel_scope, check_cancelled, partial_output,
+                          use_token, watch_cancel_file)
+
+
+def test_cancel_runs_callbacks_once_and_unregister_skips():
+    token = CancelToken()
+    calls = []
+    token.on_cancel(lambda: calls.append("a"))
+    unregister = token.on_cancel(lambda: calls.append("b"))
+    unregister()
+
+    token.cancel("테스트")
+    token.cancel("두 번째")
+
+    assert calls == ["a"]
+    assert token.reason == "테스트"
+    # 이미 취소된 토큰에 등록하면 바로 실행
+    token.on_cancel(lambda: calls.append("late"))
+    assert calls == ["a", "late"]
+
+
+def test_cancel_reaches_worker_thread_inside_scope():
+    started = threading.Event()
+    outcome = []
+
+    def worker():
+        started.set()
+        try:
+            while True:
+                cancellation.sleep(5)  # 취소되면 5초를 다 기다리지 않고 깨어남
+        except Cancelled:
+            outcome.append(time.monotonic())
+
+    with pytest.raises(KeyboardInterrupt):
+        with cancel_scope() as token:
+            # 파이프라인처럼 현재 컨텍스트를 복사해 워커 스레드를 띄움
+            t = threading.Thread(target=contextvars.copy_context().run, args=(worker,))
+            t.start()
+            started.wait(1)
+            raised_at = time.monotonic()
+            raise KeyboardInterrupt  # Streamlit 중지/리런과 같은 경로
+
+    t.join(2)
+    assert token.cancelled and token.reason == "작업 중단"
+    assert outcome and outcome[0] - raised_at < 1
+    check_cancelled()  # 블록 밖에서는 토큰 없음
+
+
+def test_cancel_terminates_tracked_process():
+    token = CancelToken()
+    proc = subprocess.Popen([sys.executable, "-c", "import time; time.sleep(30)"])
+    token.track_process(proc)
+
+    token.cancel()
+
+    assert proc.wait(timeout=5) is not None
+
+
+def test_partial_output_removed_only_on_cancel(tmp_path):
+    out = tmp_path / "scene.mp4"
+    token = CancelToken()
+    with use_token(token):
+        with pytest.raises(RuntimeError):
+            with partial_output(out):
+                out.write_bytes(b"half")
+                raise RuntimeError("ffmpeg 오류")
+        assert out.exists()  # 취소가 아닌 실패는 디버깅용으로 남김
+
+        with pytest.raises(Cancelled):
+            with partial_output(out):
+                token.cancel()
+                check_cancelled()
+    assert not out.exists()
+
+
+def test_watch_cancel_file_cancels_token(tmp_path):
+    token = CancelToken()
+    stop = watch_cancel_file(tmp_path / "cancel", token, interval=0.01)
+    try:
+        assert not token.wait(0.05)
+        (tmp_path / "cancel").write_text("", encoding="utf-8")
+        assert token.wait(2)
+        assert token.reason == "사용자 취소"
+    finally:
+        stop.set()
@@ -0,0 +1,95 @@
+# -*- coding: utf-8 -*-
+import pytest
+
+from checkpoint import MODE_A_CHECKPOINT_DIR, SceneCheckpoint, mode_a_checkpoint_path
+
+
+def _key(i):
+    return {"image": f"page{i}.png", "prompt": "바람", "duration": 5}
+
+
+def _run(path, scenes, done, fail_at=None):
+    """Step 7처럼: 장면마다 resume → 남은 단계만 실행 → 단계 끝날 때마다 record."""
+    ckpt = SceneCheckpoint(path)
+    for i in scenes:
+        rec = ckpt.resume(i, _key(i))
+        if "task_id" not in rec:
+            done.append(("submit", i))
+            ckpt.record(i, task_id=f"task{i}")
+        if "raw_path" not in rec:
+            if i == fail_at:
+                raise RuntimeError("세션 종료")
+            raw = path.parent / f"raw{i}.mp4"
+            raw.write_bytes(b"raw")
+            done.append(("render", i))
+            ckpt.record(i, raw_path=raw)
+
+
+def test_interrupted_run_resumes_from_last_finished_step(tmp_path):
+    path = tmp_path / "v1" / "checkpoint.json"
+    path.parent.mkdir()
+    done = []
+    with pytest.raises(RuntimeError):
+        _run(path, range(3), done, fail_at=1)
+    assert done == [("submit", 0), ("render", 0), ("submit", 1)]
+
+    done.clear()
+    _run(path, range(3), done)
+
+    # 끝난 장면은 건너뛰고, 제출까지 한 장면은 Runway 재제출 없이 렌더만
+    assert done == [("render", 1), ("submit", 2), ("render", 2)]
+
+
+def test_changed_key_or_missing_file_is_not_reused(tmp_path):
+    path = tmp_path / "checkpoint.json"
+    raw = tmp_path / "raw0.mp4"
+    raw.write_bytes(b"raw")
+    ckpt = SceneCheckpoint(path)
+    ckpt.resume(0, _key(0))
+    ckpt.record(0, task_id="t0", raw_path=raw)
+
+    assert SceneCheckpoint(path).resume(0, _key(0)) == {"task_id": "t0", "raw_path": str(raw)}
+    raw.unlink()
+    assert SceneCheckpoint(path).resume(0, _key(0)) == {"task_id": "t0"}  # 파일이 없으면 경로 필드만 빠짐
+
+    ckpt = SceneCheckpoint(path)
+    assert ckpt.resume(0, dict(_key(0), duration=6)) == {}
+    assert ckpt.get(0, "task_id") is None  # 입력이 바뀌면 기록을 비움
+
+
+def test_peek_does_not_touch_records(tmp_path):
+    path = tmp_path / "checkpoint.json"
+    ckpt = SceneCheckpoint(path)
+    ckpt.resume(0, _key(0))
+    ckpt.record(0, task_id="t0")
+
+    assert ckpt.peek(0, _key(0)) == {"task_id": "t0"}
+    assert ckpt.peek(0, dict(_key(0), prompt="비")) == {}
+    assert ckpt.get(0, "task_id") == "t0"  # resume과 달리 지우지 않음
+    assert ckpt.peek(1, _key(1)) == {}
+    assert SceneCheckpoint(path).get(1, "key") is None
+
+
+def test_forget_drops_only_named_fields(tmp_path):
+    path = tmp_path / "checkpoint.json"
+    ckpt = SceneCheckpoint(path)
+    ckpt.resume(0, _key(0))
+    ckpt.record(0, task_id="t0", video_url="https://expired")
+
+    ckpt.forget(0, "video_url")
+
+    assert SceneCheckpoint(path).resume(0, _key(0)) == {"task_id": "t0"}
+
+
+def test_corrupt_file_starts_fresh(tmp_path):
+    path = tmp_path / "checkpoint.json"
+    path.write_text("{", encoding="utf-8")
+    assert SceneCheckpoint(path).resume(0, _key(0)) == {}
+
+
+def test_mode_a_path_is_stable_across_sessions():
+    a = mode_a_checkpoint_path("민지", "흥부와 놀부", ["p1.png", "p2.png"])
+
+    assert a.parent == MODE_A_CHECKPOINT_DIR
+    assert a == mode_a_checkpoint_path("민지", "흥부와 놀부", ["p1.png", "p2.png"])
+    assert a != mode_a_checkpoint_path("민지", "흥부와 놀부", ["p2.png", "p1.png"])
@@ -0,0 +1,99 @@
+# -*- coding: utf-8 -*-
+import random
+
+import pytest
+
+import duration_model
+from duration_model import MIN_SAMPLES, DurationModel, predict_segments
+from tts_core import calculate_speed_for_duration
+
+# (엔진, 보이스) → (초/글자, 초/문장부호, 절편)
+TRUE_RATES = {
+    ("clova", "narrator"): (0.20, 0.30, 0.10),
+    ("clova", "child_girl"): (0.30, 0.40, 0.20),
+    ("gpt", "narrator"): (0.15, 0.20, 0.30),
+}
+
+
+def _samples(engine, voice, n, sigma=0.0, seed=0, speed=0):
+    rng = random.Random(seed)
+    a, b, c = TRUE_RATES[(engine, voice)]
+    out = []
+    for _ in range(n):
+        chars, punct = rng.randint(5, 60), rng.randint(0, 5)
+        base = a * chars + b * punct + c + rng.gauss(0, sigma)
+        out.append({"chars": chars, "punct": punct, "engine": engine, "voice": voice, "speed": speed,
+                    "duration": base * duration_model.speed_factor(engine, speed)})
+    return out
+
+
+def _text(chars, punct=0):
+    # text_features는 문장부호도 글자 수에 셈
+    return "가" * (chars - punct) + "." * punct
+
+
+def test_fit_learns_each_voice_rate():
+    model = DurationModel(_samples("clova", "narrator", 40) + _samples("clova", "child_girl", 40, seed=1)
+                          + _samples("clova", "narrator", 20, seed=2, speed=3))
+
+    narr = model.predict(_text(30, 2), voice="narrator", engine="clova")
+    girl = model.predict(_text(30, 2), voice="char_01 (흥부) child_girl", engine="clova")
+
+    assert narr.source == "clova/narrator"
+    assert narr.seconds == pytest.approx(0.2 * 30 + 0.3 * 2 + 0.1, abs=0.05)
+    assert girl.seconds == pytest.approx(0.3 * 30 + 0.4 * 2 + 0.2, abs=0.05)
+    # speed를 걷어내고 학습했으므로 speed를 주면 엔진 배율만큼 늘어남
+    slow = model.predict(_text(30, 2), voice="narrator", engine="clova", speed=3)
+    assert slow.seconds == pytest.approx(narr.seconds / 0.7, abs=0.05)
+
+
+def test_fallback_voice_then_engine_then_global_then_prior():
+    few = MIN_SAMPLES - 1
+    model = DurationModel(_samples("clova", "narrator", 20) + _samples("clova", "child_girl", few, seed=1)
+                          + _samples("gpt", "narrator", 20, seed=2))
+
+    assert model.predict("안녕.", voice="narrator", engine="clova").source == "clova/narrator"
+    # 샘플이 모자란 보이스 → 같은 엔진 전체
+    assert model.predict("안녕.", voice="child_girl", engine="clova").source == "clova/*"
+    # 기록 없는 엔진 → 전체
+    assert model.predict("안녕.", voice="narrator", engine="edge").source == "*/*"
+    prior = DurationModel().predict(_text(45), engine="clova")
+    assert prior.source == "prior"
+    assert prior.seconds == pytest.approx(45 / duration_model.PRIOR_CHARS_PER_SEC)
+
+
+def test_90_percent_interval_covers_about_90_percent():
+    model = DurationModel(_samples("clova", "narrator", 400, sigma=0.3))
+    held_out = _samples("clova", "narrator", 1000, sigma=0.3, seed=99)
+
+    inside = 0
+    for s in held_out:
+        est = model.predict(_text(s["chars"], s["punct"]), voice="narrator", engine="clova")
+        assert est.low <= est.seconds <= est.high
+        inside += est.low <= s["duration"] <= est.high
+    assert 0.85 <= inside / len(held_out) <= 0.95
+
+
+def test_segments_sum_and_widen_in_quadrature(monkeypatch):
+    model = DurationModel(_samples("clova", "narrator", 40, sigma=0.2) + _samples("clova", "child_girl", 40, sigma=0.2))
+    monkeypatch.setattr(duration_model, "get_model", lambda refresh=False: model)
+    a = model.predict(_text(20), voice="narrator")
+    b = model.predict(_text(20), voice="child_girl")
+
+    both = predict_segments([(_text(20), "narrator"), (_text(20), "child_girl")])
+
+    assert both.seconds == pytest.approx(a.seconds + b.seconds, abs=0.02)
+    assert both.high - both.seconds < (a.high - a.seconds) + (b.high - b.seconds)
+
+
+def test_speed_for_duration_uses_voice_rate(monkeypatch):
+    model = DurationModel(_samples("clova", "narrator", 40) + _samples("clova", "child_girl", 40, seed=1))
+    monkeypatch.setattr(duration_model, "get_model", lambda refresh=False: model)
+    text = _text(40)  # narrator ≈ 8.1초, child_girl ≈ 12.2초
+
+    assert calculate_speed_for_duration(text, 8.1, voice="narrator") == 0
+    # 같은 글이라도 느린 보이스는 빠르게 (clova: 음수 = 빠르게)
+    assert calculate_speed_for_duration(text, 8.1, voice="child_girl") < 0
+    assert calculate_speed_for_duration(text, 12.2, voice="narrator") > 0
+    # speed가 길이에 영향 없는 엔진은 그대로
+    assert calculate_speed_for_duration(text, 4.0, engine="gemini") == 0
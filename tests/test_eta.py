@@ -0,0 +1,126 @@
+# -*- coding: utf-8 -*-
+import json
+import threading
+
+import pytest
+
+import eta
+from eta import History, StageETA, harvest
+from event_history import DerivedCache, EventHistory
+
+
+class _Clock:
+    def __init__(self):
+        self.now = 100.0
+
+    def monotonic(self):
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    c = _Clock()
+    monkeypatch.setattr(eta, "time", c)
+    return c
+
+
+@pytest.fixture
+def logged(monkeypatch):
+    events = []
+    monkeypatch.setattr(eta, "log_event", lambda action, data: events.append((action, data)))
+    return events
+
+
+def _events(path, rows):
+    path.parent.mkdir(parents=True, exist_ok=True)
+    with open(path, "a", encoding="utf-8") as f:
+        for action, data in rows:
+            f.write(json.dumps({"ts": "2026-01-01T00:00:00", "action": action, "data": data}) + "\n")
+
+
+def test_remaining_blends_live_rate_with_prior(clock, logged):
+    e = StageETA("preview", [2, 2, 2, 2], history=History())  # 사전값 0.8초/단위
+    assert e.initial_estimate == pytest.approx(6.4)
+
+    clock.now += 4
+    e.unit_done(0)
+    # 실측 2.0초/단위를 1/3, 사전값을 2/3 → 1.2초/단위, 남은 6 → 7.2초에서 진행 중 장면에 쓴 1.6초 뺌
+    assert e.remaining() == pytest.approx(5.6)
+    assert e.fraction() == 0.25
+
+
+def test_cached_units_do_not_count_as_measured(clock, logged):
+    e = StageETA("preview", [2, 2, 2, 2], history=History())
+    clock.now += 4
+    e.unit_done(0, cached=True)
+    assert e.remaining() == pytest.approx(6 * 0.8 - 4)
+
+    for i in (1, 2, 3):
+        e.unit_done(i, cached=True)
+    assert e.remaining() == 0.0
+    assert logged == []  # 전부 캐시 재사용이면 처리 속도 기록을 남기지 않음
+
+
+def test_stage_timing_logged_once_when_all_units_done(clock, logged):
+    e = StageETA("tts", {"a": 10, "b": 30}, history=History())
+    clock.now += 8
+    e.unit_done("b")
+    e.unit_done("a")
+    e.unit_done("a")  # 중복 완료는 무시
+
+    assert [a for a, _ in logged] == [eta.STAGE_TIMING_EVENT]
+    assert logged[0][1]["size"] == 40 and logged[0][1]["wall_sec"] == 8
+    assert "남은 시간" not in e.text("TTS")
+
+
+def test_harvest_uses_stage_timing_then_api_latency(tmp_path):
+    root = tmp_path / "sessions"
+    _events(root / "s1" / "events.jsonl", [
+        ("stage_timing", {"stage": "preview", "size": 10, "wall_sec": 20}),
+        ("stage_timing", {"stage": "preview", "size": 10, "wall_sec": 40}),
+        ("clova_tts_request", {"call_id": "c1", "request": {"text": {"length": 50}}}),
+        ("clova_tts_response", {"call_id": "c1", "success": True, "duration_ms": 10000}),
+        ("scene_done", {"stages": {"fit": 4.0, "mux": 0.01}}),
+    ])
+
+    hist = harvest(root)
+
+    assert hist.rate("preview") == pytest.approx(3.0)
+    assert hist.source("preview") == "history"
+    assert hist.rate("tts") == pytest.approx(0.2 / eta.TTS_PARALLEL)
+    assert hist.source("tts") == "api"
+    assert hist.stage_latency("fit") == 4.0
+    assert hist.stage_latency("mux") == eta.PRIOR_STAGE_SEC["mux"]  # 캐시 재사용 기록은 뺌
+    assert hist.source("final") == "prior"
+
+
+def test_event_history_reads_only_new_complete_lines(tmp_path):
+    path = tmp_path / "sessions" / "s1" / "events.jsonl"
+    _events(path, [("stage_timing", {"stage": "tts", "size": 1, "wall_sec": 1}), ("api_call", {})])
+    with open(path, "a", encoding="utf-8") as f:
+        f.write('{"action": "stage_timing", "data": {')  # 쓰는 중인 줄
+    hist = EventHistory(tmp_path / "sessions")
+
+    assert hist.refresh() == 1
+    assert hist.refresh() == 0
+    with open(path, "a", encoding="utf-8") as f:
+        f.write('"stage": "tts", "size": 2, "wall_sec": 1}}\n')
+    assert hist.refresh() == 1
+    assert [e["data"]["size"] for _, e in hist.events("stage_timing")] == [1, 2]
+    assert hist.generation == 2
+
+
+def test_derived_cache_get_does_not_block(monkeypatch, tmp_path):
+    release = threading.Event()
+
+    def slow_build(hist):
+        release.wait(5)
+        return "fitted"
+
+    monkeypatch.setattr("event_history._HISTORY", EventHistory(tmp_path / "sessions"))
+    cache = DerivedCache(slow_build, "default")
+
+    assert cache.get() == "default"  # 학습은 백그라운드
+    release.set()
+    cache._thread.join(5)
+    assert cache.get() == "fitted"
@@ -0,0 +1,92 @@
+# -*- coding: utf-8 -*-
+import json
+import subprocess
+import sys
+import time
+
+import pytest
+
+import job_runner
+
+
+@pytest.fixture(autouse=True)
+def _fresh_runner(monkeypatch):
+    monkeypatch.setattr(job_runner, "_PENDING", [])
+    monkeypatch.setattr(job_runner, "_RUNNING", {})
+    monkeypatch.setattr(job_runner, "_RESUMED", False)
+    monkeypatch.setattr(job_runner, "MAX_CONCURRENT_JOBS", 0)  # 디스패처가 실제로 띄우지 않게
+    yield
+    job_runner.stop_dispatcher()
+
+
+def _job(root, session, job_id, state, submitted_at, cancel=False, pid=None):
+    d = root / session / "jobs" / job_id
+    d.mkdir(parents=True)
+    (d / job_runner.PARAMS_FILE).write_text(json.dumps({"session_id": session}), encoding="utf-8")
+    status = {"state": state, "submitted_at": submitted_at}
+    if pid is not None:
+        status["pid"] = pid
+    (d / job_runner.STATUS_FILE).write_text(json.dumps(status), encoding="utf-8")
+    if cancel:
+        (d / job_runner.CANCEL_FILE).write_text("", encoding="utf-8")
+    return d
+
+
+def test_resume_queued_jobs_rebuilds_queue_in_submit_order(tmp_path):
+    root = tmp_path / "sessions"
+    late = _job(root, "s1", "b", "queued", "2026-01-01T10:05:00")
+    early = _job(root, "s2", "a", "queued", "2026-01-01T10:00:00")
+    cancelled = _job(root, "s2", "d", "queued", "2026-01-01T09:30:00", cancel=True)
+
+    assert job_runner.resume_queued_jobs(root) == 2
+    assert job_runner.resume_queued_jobs(root) == 0  # 프로세스당 한 번
+
+    assert job_runner.queue_position(early) == 1
+    assert job_runner.queue_position(late) == 2
+    assert job_runner.read_status(cancelled)["state"] == "cancelled"
+
+
+def test_running_jobs_are_adopted_or_reaped_after_restart(tmp_path, monkeypatch):
+    monkeypatch.setattr(job_runner, "ADOPT_POLL_SEC", 0.05)
+    root = tmp_path / "sessions"
+    gone = subprocess.Popen([sys.executable, "-c", "pass"])
+    gone.wait()
+    dead = _job(root, "s1", "dead", "running", "2026-01-01T09:00:00", pid=gone.pid)
+    no_pid = _job(root, "s1", "nopid", "running", "2026-01-01T09:01:00")
+    # 다른 잡 이름으로 도는 프로세스 — pid가 재사용된 경우
+    other = subprocess.Popen([sys.executable, "-c", "import time; time.sleep(30)", "unrelated"])
+    reused = _job(root, "s2", "reused", "running", "2026-01-01T09:02:00", pid=other.pid)
+    child = subprocess.Popen([sys.executable, "-c", "import time; time.sleep(30)", "alive"])
+    alive = _job(root, "s2", "alive", "running", "2026-01-01T09:03:00", pid=child.pid)
+    try:
+        assert job_runner.resume_queued_jobs(root) == 0
+
+        assert job_runner.running_count() == 1
+        assert job_runner._RUNNING["alive"][1] == "s2"
+        for d in (dead, no_pid, reused):
+            assert job_runner.read_status(d)["state"] == "failed"
+        assert job_runner.read_status(alive)["state"] == "running"
+    finally:
+        other.kill()
+        other.wait()
+        child.kill()
+        child.wait()
+
+    # 다시 붙은 프로세스가 끝나면 슬롯을 돌려주고 상태를 마감
+    deadline = time.monotonic() + 5
+    while job_runner.running_count() and time.monotonic() < deadline:
+        time.sleep(0.05)
+    assert job_runner.running_count() == 0
+    assert job_runner.read_status(alive)["state"] == "failed"
+
+
+def test_stop_dispatcher_ends_thread(tmp_path):
+    _job(tmp_path / "sessions", "s1", "a", "queued", "2026-01-01T10:00:00")
+    job_runner.resume_queued_jobs(tmp_path / "sessions")
+    thread = job_runner._DISPATCHER
+    assert thread is not None and thread.is_alive()
+
+    job_runner.stop_dispatcher()
+
+    assert not thread.is_alive()
+    assert job_runner.queue_position(tmp_path / "sessions" / "s1" / "jobs" / "a") == 1  # 대기열은 유지
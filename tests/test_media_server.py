@@ -0,0 +1,105 @@
+# -*- coding: utf-8 -*-
+import threading
+from http.server import ThreadingHTTPServer
+from urllib.error import HTTPError
+from urllib.parse import parse_qs, urlsplit
+from urllib.request import urlopen
+
+import pytest
+
+import media_server
+from media_server import parse_range
+
+
+@pytest.mark.parametrize("header, expected", [
+    (None, None),
+    ("bytes=0-99", (0, 99)),
+    ("bytes=500-", (500, 999)),
+    ("bytes=900-5000", (900, 999)),   # 끝이 파일 밖이면 잘라서
+    ("bytes=-100", (900, 999)),       # 마지막 100바이트
+    ("bytes=-5000", (0, 999)),
+    ("bytes=0-1,5-9", None),          # 여러 구간은 전체 전송
+    ("items=0-10", None),
+    ("bytes=a-b", None),
+])
+def test_parse_range(header, expected):
+    assert parse_range(header, 1000) == expected
+
+
+@pytest.mark.parametrize("header", ["bytes=1000-", "bytes=10-5", "bytes=-0"])
+def test_parse_range_unsatisfiable(header):
+    with pytest.raises(ValueError):
+        parse_range(header, 1000)
+
+
+def test_suffix_range_of_empty_file_is_unsatisfiable():
+    with pytest.raises(ValueError):
+        parse_range("bytes=-100", 0)
+
+
+def test_no_links_without_public_url(monkeypatch):
+    monkeypatch.setattr(media_server, "_SERVER", object())
+    monkeypatch.setattr(media_server, "PUBLIC_URL", "")
+    assert not media_server.start_media_server()
+    assert media_server.media_url(media_server.OUTPUTS_ROOT / "sessions" / "s1" / "final.mp4") is None
+    assert media_server.session_zip_url("s1") is None
+
+
+def test_signed_url_uses_public_url(monkeypatch):
+    monkeypatch.setattr(media_server, "_SERVER", object())
+    monkeypatch.setattr(media_server, "PUBLIC_URL", "https://example.com/media/")
+    url = media_server.media_url(media_server.OUTPUTS_ROOT / "sessions" / "s1" / "final.mp4",
+                                 download_name="최종.mp4")
+
+    parts = urlsplit(url)
+    assert f"{parts.scheme}://{parts.netloc}" == "https://example.com"
+    path = parts.path[len("/media"):]
+    assert path == "/media/sessions/s1/final.mp4"
+    query = parse_qs(parts.query)
+    assert query["sig"][0] == media_server._sign(path, int(query["exp"][0]), "최종.mp4")
+    assert query["dl"][0] == "최종.mp4"
+
+
+@pytest.fixture
+def server(tmp_path, monkeypatch):
+    monkeypatch.setattr(media_server, "OUTPUTS_ROOT", (tmp_path / "outputs").resolve())
+    httpd = ThreadingHTTPServer(("127.0.0.1", 0), media_server._MediaHandler)
+    threading.Thread(target=httpd.serve_forever, daemon=True).start()
+    monkeypatch.setattr(media_server, "_SERVER", httpd)
+    monkeypatch.setattr(media_server, "PUBLIC_URL", f"http://127.0.0.1:{httpd.server_address[1]}")
+    yield httpd
+    httpd.shutdown()
+    httpd.server_close()
+
+
+def _status(url):
+    try:
+        with urlopen(url) as resp:
+            return resp.status, resp.headers.get("Content-Disposition"), resp.read()
+    except HTTPError as e:
+        return e.code, None, b""
+
+
+def test_download_name_is_part_of_signature(server):
+    video = media_server.OUTPUTS_ROOT / "sessions" / "s1" / "final.mp4"
+    video.parent.mkdir(parents=True)
+    video.write_bytes(b"mp4")
+    url = media_server.media_url(video, download_name="final.mp4")
+
+    status, disposition, body = _status(url)
+    assert (status, body) == (200, b"mp4")
+    assert disposition.endswith("final.mp4")
+    assert _status(url.replace("dl=final.mp4", "dl=final.exe"))[0] == 403
+    assert _status(url.replace("&dl=final.mp4", ""))[0] == 403
+
+
+def test_fallback_download_passes_bytes(tmp_path, monkeypatch):
+    monkeypatch.setattr(media_server, "_SERVER", None)
+    buttons = []
+    monkeypatch.setattr(media_server.st, "download_button", lambda label, data, **kw: buttons.append(data))
+    video = tmp_path / "final.mp4"
+    video.write_bytes(b"mp4")
+
+    media_server.download_link("받기", video, "final.mp4")
+
+    assert buttons[0]() == b"mp4"  # 파일 객체를 넘기면 fd가 닫히지 않음
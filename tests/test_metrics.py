@@ -0,0 +1,71 @@
+# -*- coding: utf-8 -*-
+import json
+
+import pytest
+
+import metrics
+from metrics import Registry
+
+
+@pytest.fixture
+def export_dir(tmp_path, monkeypatch):
+    d = tmp_path / "metrics"
+    d.mkdir()
+    monkeypatch.setattr(metrics, "METRICS_DIR", str(d))
+    return d
+
+
+def _job_snapshot(export_dir, pid, amount):
+    # 잡 프로세스 쪽 레지스트리를 흉내 내서 파일로 내보냄
+    job = Registry()
+    job.counter("api_calls_total", "호출 수", ("engine",)).inc(amount, engine="clova")
+    job.gauge("api_in_flight", "진행 중", ("engine",)).inc(engine="clova")
+    job.histogram("render_seconds", "소요", ("op",), buckets=(1, 10)).observe(5, op="mux")
+    path = export_dir / f"{pid}-1.json"
+    path.write_text(json.dumps(job.snapshot()), encoding="utf-8")
+    return path
+
+
+def _value(text, line_prefix):
+    return [line.split()[-1] for line in text.splitlines() if line.startswith(line_prefix)]
+
+
+def test_live_job_values_are_added_without_folding(export_dir, monkeypatch):
+    monkeypatch.setattr(metrics, "_pid_alive", lambda pid: True)
+    reg = Registry()
+    reg.counter("api_calls_total", "호출 수", ("engine",)).inc(1, engine="clova")
+    path = _job_snapshot(export_dir, 999999, 2)
+
+    text = reg.render()
+    assert _value(text, 'api_calls_total{engine="clova"}') == ["3"]
+    assert _value(text, 'api_in_flight{engine="clova"}') == ["1"]
+    assert _value(text, 'render_seconds_bucket{op="mux",le="10"}') == ["1"]
+    assert text.count("# TYPE api_calls_total") == 1
+    # 살아 있는 잡은 다음 내보내기 때 누계를 다시 쓰므로 접지 않음
+    assert path.exists()
+    assert _value(reg.render(), 'api_calls_total{engine="clova"}') == ["3"]
+
+
+def test_finished_job_counters_are_folded_once(export_dir, monkeypatch):
+    monkeypatch.setattr(metrics, "_pid_alive", lambda pid: False)
+    reg = Registry()
+    path = _job_snapshot(export_dir, 999999, 2)
+
+    first, second = reg.render(), reg.render()
+
+    assert not path.exists()
+    for text in (first, second):
+        assert _value(text, 'api_calls_total{engine="clova"}') == ["2"]
+        assert _value(text, 'render_seconds_count{op="mux"}') == ["1"]
+        assert _value(text, 'api_in_flight{engine="clova"}') == []  # 끝난 프로세스의 게이지는 버림
+
+
+def test_flush_writes_process_snapshot(export_dir, monkeypatch):
+    monkeypatch.setattr(metrics, "_EXPORT_PATH", export_dir / "123-1.json")
+    metrics.API_CALLS.inc(engine="gpt", status="ok")
+
+    metrics.flush_metrics()
+
+    snap = json.loads((export_dir / "123-1.json").read_text(encoding="utf-8"))
+    assert snap["api_calls_total"]["kind"] == "counter"
+    assert any(key[0] == "gpt" for key, _ in snap["api_calls_total"]["items"])
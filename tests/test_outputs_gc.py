@@ -0,0 +1,75 @@
+# -*- coding: utf-8 -*-
+import json
+import os
+import time
+
+import pytest
+
+import outputs_gc
+import version_catalog
+from version_catalog import VersionCatalog
+
+OLD = time.time() - 7 * 24 * 3600
+
+
+def _media(path, size=1024):
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_bytes(b"\0" * size)
+    os.utime(path, (OLD, OLD))
+    return path
+
+
+@pytest.fixture
+def root(tmp_path, monkeypatch):
+    monkeypatch.setattr(version_catalog, "_CATALOG", VersionCatalog(tmp_path / "catalog.db"))
+    return tmp_path / "outputs"
+
+
+def _evicted(report):
+    return {os.path.basename(p) for c in report["evict"] for p in c["paths"]}
+
+
+def test_latest_version_of_unopened_session_is_pinned(root):
+    # 카탈로그가 생기기 전에 만들어져 한 번도 안 연 세션
+    mode_dir = root / "sessions" / "s1" / "book" / "video" / "modeB"
+    for v in (1, 2):
+        d = mode_dir / f"v1_1_{v}"
+        d.mkdir(parents=True)
+        (d / "manifest.json").write_text("{}", encoding="utf-8")
+        _media(d / f"scene_v{v}.mp4")
+
+    report = outputs_gc.plan(root, quota_bytes=0)
+
+    assert "scene_v1.mp4" in _evicted(report)
+    assert "scene_v2.mp4" not in _evicted(report)
+
+
+def test_mode_a_checkpoint_files_are_pinned(root):
+    session = root / "sessions" / "s1"
+    raw = _media(session / "clip_00_abc_raw.mp4")
+    _media(session / "clip_01_old_raw.mp4")
+    # Mode A 체크포인트는 세션 밖 공용 폴더 (checkpoint.mode_a_checkpoint_path)
+    cp = root / "checkpoints" / "modeA" / "step3_checkpoint_abc.json"
+    cp.parent.mkdir(parents=True)
+    cp.write_text(json.dumps({"scenes": {"0": {"raw_path": str(raw)}}}), encoding="utf-8")
+
+    report = outputs_gc.plan(root, quota_bytes=0)
+
+    assert _evicted(report) == {"clip_01_old_raw.mp4"}
+    assert report["pinned_bytes"] == 1024
+
+
+def test_files_in_session_zip_survive_between_builds(root):
+    from session_logger import ZIP_PIN_FILE, update_session_zip
+
+    session = root / "sessions" / "s1"
+    _media(session / "book" / "final_movie_1.mp4")
+    _media(session / "book" / "scene_00_audio.mp4")
+    update_session_zip("s1")
+    # ZIP을 만든 뒤 생긴 파일은 아직 ZIP에 없음
+    _media(session / "book" / "scene_01_audio.mp4")
+    assert not (session / ZIP_PIN_FILE).exists()
+
+    report = outputs_gc.plan(root, quota_bytes=0)
+
+    assert _evicted(report) == {"scene_01_audio.mp4"}
@@ -0,0 +1,104 @@
+# -*- coding: utf-8 -*-
+import json
+import os
+import time
+from datetime import datetime
+
+import pytest
+
+from perf_monitor import PerfMonitor, _percentile
+
+
+def _line(action, at=None, **data):
+    ts = datetime.fromtimestamp(at or time.time()).isoformat(timespec="seconds")
+    return json.dumps({"ts": ts, "action": action, "data": data}) + "\n"
+
+
+def _call(cid, api="gemini_tts", ms=1000, at=None):
+    return (_line(f"{api}_request", at, call_id=cid, start_ts=at or time.time())
+            + _line(f"{api}_response", at, call_id=cid, duration_ms=ms))
+
+
+@pytest.fixture
+def root(tmp_path):
+    (tmp_path / "sessions" / "s1").mkdir(parents=True)
+    return tmp_path / "sessions"
+
+
+def _append(root, text, sid="s1"):
+    with open(root / sid / "events.jsonl", "a", encoding="utf-8") as f:
+        f.write(text)
+
+
+def test_poll_reads_only_new_complete_lines(root):
+    mon = PerfMonitor(root)
+    _append(root, _call("a"))
+    assert mon.poll() == 1
+    assert mon.lines_read == 2
+
+    assert mon.poll() == 0  # 바뀐 게 없으면 읽지 않음
+    half = _call("b")
+    _append(root, half[:-10])  # 쓰는 중인 줄
+    mon.poll()
+    assert mon.lines_read == 3
+    _append(root, half[-10:])
+    mon.poll()
+
+    assert mon.lines_read == 4
+    assert [c["api"] for c in mon._calls] == ["gemini_tts", "gemini_tts"]
+
+
+def test_replaced_or_truncated_file_is_read_from_start(root):
+    mon = PerfMonitor(root)
+    _append(root, _call("a") + _call("b"))
+    mon.poll()
+    assert mon.lines_read == 4
+
+    # 같은 이름의 새 파일 (inode가 바뀜) — 크기가 더 커도 처음부터
+    new = root / "s1" / "events.new"
+    new.write_text(_call("c") + _call("d") + _call("e"), encoding="utf-8")
+    os.replace(new, root / "s1" / "events.jsonl")
+    mon.poll()
+    assert mon.lines_read == 10
+
+    # 같은 inode인데 잘림 — 읽은 위치가 크기보다 크면 처음부터
+    with open(root / "s1" / "events.jsonl", "w", encoding="utf-8") as f:
+        f.write(_call("f"))
+    mon.poll()
+    assert mon.lines_read == 12
+
+
+def test_file_idle_before_window_is_skipped_on_first_sight(root):
+    _append(root, _call("old"))
+    old = time.time() - 3600
+    os.utime(root / "s1" / "events.jsonl", (old, old))
+    mon = PerfMonitor(root, window_sec=900)
+
+    mon.poll()
+    assert mon.lines_read == 0
+    _append(root, _call("new"))  # 다시 활동하면 그 뒤부터
+    mon.poll()
+    assert mon.lines_read == 2
+
+
+def test_prune_drops_calls_outside_window_and_stale_requests(root):
+    now = time.time()
+    mon = PerfMonitor(root, window_sec=100)
+    _append(root, _call("old", at=now - 150) + _call("new", at=now - 10)
+            + _line("runway_gen4_request", now - 300, call_id="slow", start_ts=now - 300)
+            + _line("runway_gen4_request", now - 500, call_id="dead", start_ts=now - 500))
+
+    mon.poll()
+
+    assert len(mon._calls) == 1
+    # 창보다 오래 걸리는 Runway 대기는 남기고, 4배 넘게 응답이 없으면 버림
+    assert [k[1] for k in mon._pending] == ["slow"]
+    mon._prune(now + 200)
+    assert not mon._calls and not mon._pending
+
+
+def test_dashboard_percentile_matches_report():
+    vals = [5, 1, 4, 2, 3]
+    assert _percentile(vals, 50) == 3
+    assert _percentile(vals, 95) == 5
+    assert _percentile([], 50) == 0.0
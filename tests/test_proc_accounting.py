@@ -0,0 +1,44 @@
+# -*- coding: utf-8 -*-
+from pathlib import Path
+
+import pytest
+
+from proc_accounting import describe_command
+
+
+def test_moviepy_write_is_encode_with_output_codec():
+    # moviepy write_videofile: rawvideo 파이프 입력 → libx264 출력
+    info = describe_command([
+        "/venv/imageio_ffmpeg/binaries/ffmpeg-linux-x86_64-v7.0", "-y", "-loglevel", "error",
+        "-f", "rawvideo", "-vcodec", "rawvideo", "-s", "720x1280", "-pix_fmt", "rgb24", "-r", "24",
+        "-i", "-", "-i", "/tmp/audio.mp3", "-vcodec", "libx264", "-acodec", "aac",
+        "-preset", "ultrafast", "-pix_fmt", "yuv420p", "/out/scene.mp4",
+    ])
+    assert info["tool"] == "ffmpeg"
+    assert info["kind"] == "encode"
+    assert info["inputs"] == ["-", "/tmp/audio.mp3"]
+    assert info["output"] == "/out/scene.mp4"
+    assert info["codec"] == "libx264,aac"  # 입력 파이프 쪽 rawvideo는 빼고
+    assert info["preset"] == "ultrafast"
+
+
+def test_moviepy_read_is_decode():
+    info = describe_command(["ffmpeg", "-ss", "0", "-i", "in.mp4", "-f", "image2pipe",
+                             "-pix_fmt", "rgb24", "-vcodec", "rawvideo", "-"])
+    assert (info["kind"], info["output"], info["codec"]) == ("decode", None, "rawvideo")
+
+
+@pytest.mark.parametrize("args", [
+    ["ffmpeg", "-i", "in.mp4"],                                   # moviepy 정보 조회
+    ["ffprobe", "-v", "error", "-show_format", Path("in.mp4")],   # 입력이 -i 없이 마지막 인자
+    "ffprobe",
+])
+def test_probe(args):
+    info = describe_command(args)
+    assert info["kind"] == "probe"
+    assert info["output"] is None
+
+
+def test_other_tools_only_report_tool():
+    info = describe_command(["/usr/bin/convert", "a.png", "b.png"])
+    assert info == {"tool": "convert", "kind": "other", "inputs": [], "output": None, "codec": "", "preset": ""}
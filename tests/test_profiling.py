@@ -0,0 +1,56 @@
+# -*- coding: utf-8 -*-
+import json
+import threading
+
+import pytest
+
+import profiling
+from session_logger import bind_session
+
+
+@pytest.fixture
+def session(monkeypatch):
+    monkeypatch.setattr(profiling, "_env_enabled", True)
+    with bind_session("prof_test") as sdir:
+        yield sdir
+
+
+def _summaries(sdir):
+    return [json.loads(p.read_text(encoding="utf-8")) for p in (sdir / "profiles").glob("*.json")]
+
+
+def test_overlapping_stages_in_threads_never_fail(session):
+    inside, release = threading.Event(), threading.Event()
+
+    def other():
+        with bind_session("prof_test"), profiling.profile_stage("other"):
+            inside.set()
+            release.wait(5)
+
+    t = threading.Thread(target=other)
+    t.start()
+    inside.wait(5)
+    try:
+        with profiling.profile_stage("main"):
+            sum(range(1000))
+    finally:
+        release.set()
+        t.join(5)
+
+    rows = {r["stage"]: r for r in _summaries(session)}
+    assert set(rows) == {"main", "other"}
+    assert rows["main"]["error"] is None and rows["main"]["wall_sec"] >= 0
+    # 둘 다 정리돼야 다음 구간이 tracemalloc을 다시 켜고 끔
+    assert profiling._tm_users == 0
+    assert not getattr(profiling._tls, "stack", [])
+
+
+def test_failed_enable_does_not_leak(session, monkeypatch):
+    monkeypatch.setattr(profiling.cProfile.Profile, "enable",
+                        lambda self: (_ for _ in ()).throw(ValueError("Another profiling tool is already active")))
+    with profiling.profile_stage("busy"):
+        pass
+    (row,) = _summaries(session)
+    assert row["cpu_profile"] is False and "prof_file" not in row
+    assert profiling._tm_users == 0
+    assert profiling._tls.stack == []
@@ -0,0 +1,74 @@
+# -*- coding: utf-8 -*-
+import os
+
+from render_cache import RenderCache, scene_key
+
+
+def _write(path, data: bytes):
+    with open(path, "wb") as f:
+        f.write(data)
+
+
+def _builder(calls, data=b"rendered"):
+    def build(out):
+        calls.append(out)
+        _write(out, data)
+    return build
+
+
+def test_miss_builds_then_hit_links(tmp_path):
+    cache = RenderCache(tmp_path / "cache")
+    img = tmp_path / "page.png"
+    _write(img, b"image-v1")
+    key = scene_key("preview_base", image=img, duration=5.0)
+    calls = []
+
+    first, hit = cache.materialize("preview_base", key, tmp_path / "a.mp4", _builder(calls))
+    assert (first, hit) == (None, False)
+    second, hit = cache.materialize("preview_base", key, tmp_path / "b.mp4", _builder(calls))
+
+    assert (second, hit) == (True, True)
+    assert len(calls) == 1
+    assert (tmp_path / "b.mp4").read_bytes() == b"rendered"
+    assert os.path.samefile(tmp_path / "b.mp4", cache.lookup("preview_base", key))
+
+
+def test_input_content_change_invalidates_key_chain(tmp_path):
+    img = tmp_path / "page.png"
+    _write(img, b"image-v1")
+    base = scene_key("preview_base", image=img, duration=5.0)
+    sub = scene_key("preview_sub", base=base, text="안녕", color="white", scene_index=0)
+    # 경로가 아니라 내용 — 같은 내용을 다른 이름으로 옮겨도 같은 키
+    copy = tmp_path / "copy.png"
+    _write(copy, b"image-v1")
+    assert scene_key("preview_base", image=copy, duration=5.0) == base
+
+    _write(img, b"image-v2")
+    os.utime(img, ns=(os.stat(img).st_atime_ns, os.stat(img).st_mtime_ns + 1_000_000))
+    new_base = scene_key("preview_base", image=img, duration=5.0)
+
+    assert new_base != base
+    assert scene_key("preview_sub", base=new_base, text="안녕", color="white", scene_index=0) != sub
+    assert scene_key("preview_base", image=img, duration=5.0004) == new_base  # 소수 셋째 자리까지
+    assert scene_key("preview_base", image=tmp_path / "none.png", duration=5.0) != new_base
+
+
+def test_failed_build_is_not_cached_and_rebuild_does_not_touch_cache(tmp_path):
+    cache = RenderCache(tmp_path / "cache")
+    calls = []
+
+    def failing(out):
+        calls.append(out)
+        return "자막 실패"
+
+    assert cache.materialize("preview_sub", "k" * 64, tmp_path / "a.mp4", failing) == ("자막 실패", False)
+    assert cache.lookup("preview_sub", "k" * 64) is None
+
+    cache.materialize("preview_sub", "k" * 64, tmp_path / "a.mp4", _builder(calls, b"v1"))
+    cached = cache.lookup("preview_sub", "k" * 64)
+    # 캐시와 하드링크된 dest를 새 키로 다시 빌드해도 캐시된 내용은 그대로
+    cache.materialize("preview_sub", "j" * 64, tmp_path / "a.mp4", _builder(calls, b"v2"))
+
+    assert cached.read_bytes() == b"v1"
+    assert (tmp_path / "a.mp4").read_bytes() == b"v2"
+    assert len(calls) == 3
@@ -0,0 +1,104 @@
+# -*- coding: utf-8 -*-
+from contextlib import nullcontext
+
+import pytest
+
+import render_farm
+from render_farm import RenderFarm
+
+
+@pytest.fixture
+def farm(tmp_path):
+    return RenderFarm(tmp_path / "farm" / "farm.db")
+
+
+def _state(farm, task_id):
+    with farm._connect() as conn:
+        return dict(conn.execute("SELECT state, attempts, lease_owner, error FROM tasks WHERE id=?",
+                                 (task_id,)).fetchone())
+
+
+def _submit(farm, task_id="t1"):
+    return farm.submit({"id": task_id, "op": "fit", "inputs": {}, "params": {}})
+
+
+def test_lease_is_exclusive_until_completed(farm):
+    _submit(farm)
+
+    assert farm.lease("w1")["id"] == "t1"
+    assert farm.lease("w2") is None
+    assert farm.heartbeat("t1", "w1")
+    farm.complete("t1", "w1")
+
+    assert _state(farm, "t1")["state"] == "done"
+    assert farm.lease("w2") is None
+
+
+def test_expired_lease_moves_to_another_worker(farm):
+    _submit(farm)
+    farm.lease("w1", lease_sec=-1)  # w1이 heartbeat 없이 죽음
+
+    assert farm.lease("w2")["id"] == "t1"
+    # 늦게 살아난 w1은 lease를 되찾지 못하고 결과도 덮어쓰지 못함
+    assert not farm.heartbeat("t1", "w1")
+    farm.complete("t1", "w1")
+    assert _state(farm, "t1") == {"state": "leased", "attempts": 2, "lease_owner": "w2", "error": None}
+
+    farm.complete("t1", "w2")
+    assert _state(farm, "t1")["state"] == "done"
+
+
+def test_task_fails_after_max_attempts(farm, monkeypatch):
+    monkeypatch.setattr(render_farm, "MAX_ATTEMPTS", 2)
+    _submit(farm)
+
+    farm.lease("w1")
+    farm.fail("t1", "w1", "ffmpeg 오류")
+    assert _state(farm, "t1")["state"] == "queued"  # 한도 전이면 다시 대기열
+    farm.lease("w2", lease_sec=-1)
+
+    assert farm.lease("w1") is None
+    assert _state(farm, "t1") == {"state": "failed", "attempts": 2, "lease_owner": "w2", "error": "ffmpeg 오류"}
+    # 같은 작업을 다시 제출하면 처음부터
+    _submit(farm)
+    assert _state(farm, "t1")["state"] == "queued"
+
+
+def test_worker_renders_and_submitter_links_result(farm, tmp_path, monkeypatch):
+    monkeypatch.setattr(render_farm, "render_slot", lambda pool: nullcontext())
+    calls = []
+
+    def fake_fit(inputs, params, output):
+        calls.append(inputs["video"])
+        with open(output, "wb") as f:
+            f.write(b"fitted")
+
+    monkeypatch.setitem(render_farm.OPS, "fit", fake_fit)
+    video = tmp_path / "raw.mp4"
+    video.write_bytes(b"raw")
+    spec = farm.make_spec("fit", {"video": video}, {"method": "loop", "target_duration": 4.2})
+    farm.submit(spec)
+
+    leased = farm.lease("w1")
+    render_farm._work_one(farm, "w1", leased)
+
+    assert _state(farm, spec["id"])["state"] == "done"
+    out = tmp_path / "scene.mp4"
+    assert farm.run("fit", {"video": video}, {"method": "loop", "target_duration": 4.2}, str(out)) is True
+    assert out.read_bytes() == b"fitted"
+    assert len(calls) == 1  # 같은 입력은 다시 렌더하지 않음
+
+
+def test_input_changed_after_submit_is_retried_not_rendered(farm, tmp_path, monkeypatch):
+    monkeypatch.setattr(render_farm, "render_slot", lambda pool: nullcontext())
+    monkeypatch.setitem(render_farm.OPS, "fit", lambda *a: pytest.fail("렌더하면 안 됨"))
+    video = tmp_path / "raw.mp4"
+    video.write_bytes(b"raw")
+    spec = farm.make_spec("fit", {"video": video}, {})
+    farm.submit(spec)
+    video.write_bytes(b"changed")
+
+    render_farm._work_one(farm, "w1", farm.lease("w1"))
+
+    row = _state(farm, spec["id"])
+    assert row["state"] == "queued" and "해시 불일치" in row["error"]
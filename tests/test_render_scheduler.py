@@ -0,0 +1,80 @@
+# -*- coding: utf-8 -*-
+import threading
+import time
+
+from render_scheduler import RenderScheduler
+
+
+def _wait_until(cond, timeout=5.0):
+    deadline = time.time() + timeout
+    while not cond():
+        assert time.time() < deadline, "시간 초과"
+        time.sleep(0.01)
+
+
+def _queue_in_order(sched, requests, order):
+    """requests를 순서대로 줄 세움 (앞 요청이 대기열에 들어간 걸 확인하고 다음 요청)."""
+    threads = []
+    for session, prio in requests:
+        def run(session=session, prio=prio):
+            with sched.slot("cpu", prio, session_id=session):
+                order.append((session, prio))
+        before = sched.snapshot()["cpu"]["waiting"]
+        t = threading.Thread(target=run)
+        t.start()
+        threads.append(t)
+        _wait_until(lambda: sched.snapshot()["cpu"]["waiting"] == before + 1)
+    return threads
+
+
+def test_priority_then_fair_share_then_arrival(tmp_path):
+    sched = RenderScheduler({"cpu": 1}, tmp_path / "slots.db")
+    order = []
+    release = threading.Event()
+
+    def holder():
+        with sched.slot("cpu", "render", session_id="x"):
+            release.wait()
+
+    h = threading.Thread(target=holder)
+    h.start()
+    _wait_until(lambda: sched.snapshot()["cpu"]["in_use"] == 1)
+
+    threads = _queue_in_order(sched, [
+        ("a", "render"), ("a", "render"), ("b", "render"), ("c", "batch"), ("d", "interactive"),
+    ], order)
+    assert sched.queue_position("cpu", "d") == 1
+    assert sched.queue_position("cpu", "c") == 5
+
+    release.set()
+    for t in threads + [h]:
+        t.join(timeout=10)
+    # interactive 먼저 → render는 a, b 번갈아 (b가 a의 두 번째 요청을 앞지름) → batch
+    assert order == [("d", "interactive"), ("a", "render"), ("b", "render"),
+                     ("a", "render"), ("c", "batch")]
+    assert sched.snapshot()["cpu"] == {"capacity": 1, "in_use": 0, "waiting": 0, "sessions": {}}
+
+
+def test_capacity_is_shared_between_schedulers(tmp_path):
+    # 같은 DB를 쓰는 두 인스턴스 = Streamlit 프로세스와 잡 프로세스
+    db = tmp_path / "slots.db"
+    app, job = RenderScheduler({"cpu": 1}, db), RenderScheduler({"cpu": 1}, db)
+    got = threading.Event()
+
+    with app.slot("cpu", "render", session_id="s1"):
+        def run():
+            with job.slot("cpu", "batch", session_id="s2"):
+                got.set()
+        t = threading.Thread(target=run)
+        t.start()
+        _wait_until(lambda: app.snapshot()["cpu"]["waiting"] == 1)
+        assert not got.wait(0.5)
+    assert got.wait(5)
+    t.join(timeout=5)
+
+
+def test_nested_slot_passes_through(tmp_path):
+    sched = RenderScheduler({"cpu": 1}, tmp_path / "slots.db")
+    with sched.slot("cpu", session_id="s"):
+        with sched.slot("cpu", session_id="s"):
+            assert sched.snapshot()["cpu"]["in_use"] == 1
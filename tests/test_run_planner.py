@@ -0,0 +1,40 @@
+# -*- coding: utf-8 -*-
+import pytest
+
+import run_planner
+from run_planner import PlannedCall, _phase_wall
+
+
+@pytest.fixture(autouse=True)
+def capacity(monkeypatch):
+    monkeypatch.setitem(run_planner.POOL_CAPACITY, "runway", 4)
+    monkeypatch.setitem(run_planner.POOL_CAPACITY, "cpu", 2)
+    for stage, n in (("GENERATE", 3), ("FIT", 2), ("SUBTITLE", 2), ("MUX", 2)):
+        monkeypatch.setenv(f"PIPELINE_WORKERS_{stage}", str(n))
+
+
+def _calls(stage, seconds, n, cached=False):
+    return [PlannedCall("Step 7", "x", stage, i, f"{stage}{i}", cached, seconds, 0.0) for i in range(n)]
+
+
+def test_slowest_stage_plus_pipeline_fill():
+    # Runway 6장면 / 동시 3개 = 120초가 병목, 첫 장면이 fit을 지나는 6초가 더해짐
+    calls = _calls("generate", 60, 6) + _calls("fit", 6, 6)
+    assert _phase_wall(calls) == pytest.approx(126)
+
+
+def test_single_call_cannot_be_split():
+    assert _phase_wall(_calls("generate", 100, 1)) == pytest.approx(100)
+
+
+def test_encode_stages_share_cpu_pool(monkeypatch):
+    monkeypatch.setitem(run_planner.POOL_CAPACITY, "cpu", 1)
+    calls = _calls("fit", 10, 4) + _calls("subtitle", 10, 4) + _calls("mux", 10, 4) + _calls("concat", 15, 1)
+    # cpu 슬롯 하나를 세 스테이지가 나눠 씀 → 120초 + 채우기 20초 + 병합 꼬리 15초
+    assert _phase_wall(calls) == pytest.approx(155)
+
+
+def test_cached_calls_take_no_time():
+    assert _phase_wall(_calls("generate", 60, 4, cached=True)) == 0.0
+    calls = _calls("generate", 60, 3, cached=True) + _calls("concat", 12, 1)
+    assert _phase_wall(calls) == pytest.approx(12)
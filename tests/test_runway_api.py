@@ -0,0 +1,67 @@
+# -*- coding: utf-8 -*-
+from types import SimpleNamespace
+
+import pytest
+
+import runway_api
+from runway_api import RunwayTimeout, run_video_task
+
+
+class FakeRunway:
+    def __init__(self, statuses):
+        self.statuses = statuses
+        self.created, self.deleted = [], []
+        self.image_to_video = SimpleNamespace(create=self._create)
+        self.tasks = SimpleNamespace(retrieve=self._retrieve, delete=self.deleted.append)
+
+    def _create(self, **kwargs):
+        task_id = f"new{len(self.created)}"
+        self.created.append(task_id)
+        return SimpleNamespace(id=task_id)
+
+    def _retrieve(self, task_id):
+        status = self.statuses.get(task_id, "SUCCEEDED")
+        if isinstance(status, Exception):
+            raise status
+        return SimpleNamespace(id=task_id, status=status, output=["url"])
+
+
+@pytest.fixture
+def fake(monkeypatch):
+    def install(statuses):
+        client = FakeRunway(statuses)
+        monkeypatch.setattr(runway_api, "get_runway", lambda: client)
+        monkeypatch.setattr(runway_api, "image_file_to_data_uri", lambda path: "data:")
+        return client
+    return install
+
+
+def _wait_once(monkeypatch):
+    # 대기 시간 초과를 바로 재현
+    real = runway_api.wait_for_video_task
+    monkeypatch.setattr(runway_api, "wait_for_video_task",
+                        lambda task_id, **kw: real(task_id, timeout=-1, poll_sec=0))
+
+
+def test_timeout_cancels_task_and_does_not_resubmit(fake, monkeypatch):
+    client = fake({"old": "RUNNING", "new0": "RUNNING"})
+    _wait_once(monkeypatch)
+
+    with pytest.raises(RunwayTimeout):
+        run_video_task("page.png", "prompt", task_id="old")
+    assert client.deleted == ["old"]
+    assert client.created == []
+
+    with pytest.raises(RunwayTimeout):
+        run_video_task("page.png", "prompt")
+    assert client.created == ["new0"] and client.deleted == ["old", "new0"]
+
+
+def test_unusable_previous_task_is_cancelled_before_resubmit(fake):
+    client = fake({"old": ConnectionError("조회 실패")})
+
+    task = run_video_task("page.png", "prompt", task_id="old", on_submitted=lambda t: client.created.append("cb"))
+
+    assert task.id == "new0"
+    assert client.deleted == ["old"]
+    assert client.created == ["new0", "cb"]
@@ -0,0 +1,84 @@
+# -*- coding: utf-8 -*-
+import threading
+import time
+
+from cancellation import Cancelled, CancelToken, use_token
+from scene_pipeline import ScenePipeline, Stage
+
+
+def test_results_come_back_in_input_order():
+    # 앞 장면일수록 늦게 끝나도 결과 리스트는 입력 순서
+    def slow_first(i, v):
+        time.sleep(0.02 * (5 - i))
+        return v * 10
+
+    seen = []
+    pipe = ScenePipeline([Stage("a", slow_first, workers=5), Stage("b", lambda i, v: v + 1, workers=2)])
+    results = pipe.run(list(range(5)), on_result=lambda r: seen.append(r.index))
+
+    assert [r.value for r in results] == [1, 11, 21, 31, 41]
+    assert all(r.ok for r in results)
+    assert sorted(seen) == list(range(5)) and seen != list(range(5))  # on_result는 완료 순서
+
+
+def test_bounded_queue_holds_back_fast_stage():
+    release = threading.Event()
+    first_done, blocked = [], threading.Event()
+
+    def fast(i, v):
+        first_done.append(i)
+        return v
+
+    def stuck(i, v):
+        blocked.set()
+        release.wait(5)
+        return v
+
+    pipe = ScenePipeline([Stage("a", fast, workers=1), Stage("b", stuck, workers=1)], queue_size=1)
+    box = []
+    runner = threading.Thread(target=lambda: box.append(pipe.run(list(range(20)))))
+    runner.start()
+    assert blocked.wait(5)
+    time.sleep(0.2)
+    # 뒤 스테이지가 막히면 앞 스테이지는 (뒤 워커 1 + 큐 1 + 내보내려는 1)개까지만 앞서감
+    assert len(first_done) <= 3
+    release.set()
+    runner.join(5)
+
+    assert [r.value for r in box[0]] == list(range(20))
+
+
+def test_failure_is_isolated_to_its_scene():
+    later = []
+
+    def fit(i, v):
+        if i == 1:
+            raise ValueError("ffmpeg 오류")
+        return v
+
+    def mux(i, v):
+        later.append(i)
+        return v
+
+    results = ScenePipeline([Stage("fit", fit, workers=2), Stage("mux", mux, workers=2)]).run(["a", "b", "c"])
+
+    assert [r.ok for r in results] == [True, False, True]
+    assert results[1].failed_stage == "fit" and isinstance(results[1].error, ValueError)
+    assert sorted(later) == [0, 2]  # 실패한 장면은 다음 스테이지를 건너뜀
+
+
+def test_cancel_skips_remaining_stages():
+    token = CancelToken()
+
+    def first(i, v):
+        if i == 0:
+            token.cancel()
+        return v
+
+    ran = []
+    with use_token(token):
+        results = ScenePipeline([Stage("a", first, workers=1),
+                                 Stage("b", lambda i, v: ran.append(i), workers=1)]).run([0, 1, 2])
+
+    assert ran == []
+    assert all(isinstance(r.error, Cancelled) for r in results)
@@ -0,0 +1,87 @@
+# -*- coding: utf-8 -*-
+import os
+import subprocess
+import sys
+import threading
+import time
+
+import pytest
+
+import session_logger
+from conftest import ROOT
+from session_logger import EVENTS_FILE, SESSIONS_ROOT, _EventWriter
+
+
+def _lines(sid="s1"):
+    try:
+        return (SESSIONS_ROOT / sid / EVENTS_FILE).read_text(encoding="utf-8").splitlines()
+    except FileNotFoundError:
+        return []
+
+
+def _wait_for(pred, timeout=3.0):
+    deadline = time.monotonic() + timeout
+    while not pred() and time.monotonic() < deadline:
+        time.sleep(0.01)
+    return pred()
+
+
+@pytest.fixture
+def writer(monkeypatch):
+    def make(batch, interval):
+        monkeypatch.setattr(session_logger, "FLUSH_BATCH", batch)
+        monkeypatch.setattr(session_logger, "FLUSH_INTERVAL_SEC", interval)
+        return _EventWriter()
+    return make
+
+
+def test_flushes_when_batch_fills(writer):
+    w = writer(batch=3, interval=60)
+    w.put("s1", "a\n")
+    w.put("s1", "b\n")
+    time.sleep(0.2)
+    assert _lines() == []  # 배치가 차기 전엔 쓰지 않음
+
+    w.put("s1", "c\n")
+
+    assert _wait_for(lambda: _lines() == ["a", "b", "c"])
+
+
+def test_flushes_after_interval(writer):
+    w = writer(batch=1000, interval=0.05)
+    w.put("s1", "a\n")
+    w.put("s2", "b\n", "other.jsonl")
+
+    assert _wait_for(lambda: _lines() == ["a"])
+    assert (SESSIONS_ROOT / "s2" / "other.jsonl").read_text(encoding="utf-8") == "b\n"
+
+
+def test_keeps_each_threads_order(writer):
+    w = writer(batch=7, interval=0.01)
+
+    def emit(t):
+        for n in range(200):
+            w.put("s1", f"{t}:{n}\n")
+
+    threads = [threading.Thread(target=emit, args=(t,)) for t in range(4)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    w.flush()
+
+    lines = _lines()
+    assert len(lines) == 800
+    for t in range(4):
+        assert [int(x.split(":")[1]) for x in lines if x.startswith(f"{t}:")] == list(range(200))
+
+
+def test_pending_lines_are_written_at_exit(tmp_path):
+    # 주기가 길어도 프로세스가 끝날 때 atexit이 남은 줄을 씀
+    env = dict(os.environ, PYTHONPATH=str(ROOT), LOG_FLUSH_INTERVAL_SEC="600", LOG_FLUSH_BATCH="1000")
+    subprocess.run([sys.executable, "-c",
+                    "import session_logger as s; s.log_event('bye', {'n': 1}, session_id='s1')"],
+                   cwd=tmp_path, env=env, check=True, timeout=60)
+
+    lines = _lines()
+    assert len(lines) == 1 and '"action": "bye"' in lines[0]
@@ -0,0 +1,76 @@
+# -*- coding: utf-8 -*-
+import os
+import time
+import zipfile
+
+import session_logger
+from session_logger import SESSIONS_ROOT, update_session_zip
+
+
+def _write(path, data):
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_bytes(data)
+    # 같은 나노초 mtime으로 변경이 가려지지 않게
+    t = time.time() + len(data) / 1000
+    os.utime(path, (t, t))
+
+
+def _contents(zip_path):
+    with zipfile.ZipFile(zip_path) as zf:
+        assert zf.testzip() is None
+        names = zf.namelist()
+        assert len(names) == len(set(names))
+        return {n: zf.read(n) for n in names}
+
+
+def test_first_build_stores_media_and_deflates_text():
+    sdir = SESSIONS_ROOT / "s1"
+    _write(sdir / "book" / "final.mp4", b"\0" * 4096)
+    _write(sdir / "events.jsonl", b'{"action": "x"}\n' * 50)
+
+    zip_path = update_session_zip("s1")
+
+    with zipfile.ZipFile(zip_path) as zf:
+        assert zf.getinfo("s1/book/final.mp4").compress_type == zipfile.ZIP_STORED
+        assert zf.getinfo("s1/events.jsonl").compress_type == zipfile.ZIP_DEFLATED
+        # 미디어가 앞, 자주 바뀌는 작은 파일이 뒤
+        assert zf.namelist() == ["s1/book/final.mp4", "s1/events.jsonl"]
+
+
+def test_unchanged_session_is_not_rewritten():
+    sdir = SESSIONS_ROOT / "s1"
+    _write(sdir / "a.mp4", b"a" * 100)
+    first = update_session_zip("s1")
+    ino = os.stat(first).st_ino
+
+    assert update_session_zip("s1") == first
+    assert os.stat(first).st_ino == ino
+
+
+def test_update_replaces_archive_and_keeps_open_readers_intact():
+    sdir = SESSIONS_ROOT / "s1"
+    _write(sdir / "a.mp4", b"a" * 1000)
+    _write(sdir / "b.mp4", b"b" * 1000)
+    _write(sdir / "events.jsonl", b"one\n")
+    zip_path = update_session_zip("s1")
+    reader = open(zip_path, "rb")  # 미디어 서버가 내려보내는 중
+
+    _write(sdir / "events.jsonl", b"one\ntwo\n")
+    _write(sdir / "c.mp4", b"c" * 1000)
+    (sdir / "b.mp4").unlink()
+    assert update_session_zip("s1") == zip_path
+
+    assert _contents(zip_path) == {
+        "s1/a.mp4": b"a" * 1000,
+        "s1/c.mp4": b"c" * 1000,
+        "s1/events.jsonl": b"one\ntwo\n",
+    }
+    with reader, zipfile.ZipFile(reader) as old:
+        assert old.read("s1/b.mp4") == b"b" * 1000
+        assert old.read("s1/events.jsonl") == b"one\n"
+    assert not zip_path.with_suffix(".zip.tmp").exists()
+
+
+def test_missing_session_returns_none():
+    assert update_session_zip("nope") is None
+    assert session_logger.make_session_zip() == b""
@@ -0,0 +1,93 @@
+# -*- coding: utf-8 -*-
+import contextvars
+import json
+import threading
+
+import pytest
+
+import tracing
+from session_logger import SESSIONS_ROOT, bind_session
+from tracing import current_step, export_chrome_trace, span, trace_step, traced
+
+
+@pytest.fixture(autouse=True)
+def enabled(monkeypatch):
+    monkeypatch.setattr(tracing, "_enabled", True)
+    tracing._tls.step = None
+    reset = tracing._STEP.set("")
+    yield
+    tracing._STEP.reset(reset)  # trace_step이 다른 테스트의 단계 라벨로 새지 않게
+
+
+def _events(sid="s1"):
+    path = export_chrome_trace(SESSIONS_ROOT / sid)
+    with open(path, "r", encoding="utf-8") as f:
+        events = json.load(f)["traceEvents"]
+    return {e["name"]: e for e in events if e["ph"] == "X"}, [e for e in events if e["ph"] == "M"]
+
+
+def _inside(inner, outer):
+    return outer["ts"] <= inner["ts"] and inner["ts"] + inner["dur"] <= outer["ts"] + outer["dur"]
+
+
+def test_spans_nest_and_steps_close_with_their_span():
+    @traced(cat="tts")
+    def synthesize():
+        return "ok"
+
+    with bind_session("s1"):
+        with span("step7", "step", scenes=3):
+            trace_step("runway")
+            with span("scene0", "scene"):
+                assert synthesize() == "ok"
+        with pytest.raises(ValueError):
+            with span("broken"):
+                raise ValueError
+
+    spans, _ = _events()
+    assert _inside(spans["scene0"], spans["step7"])
+    assert _inside(spans["synthesize"], spans["scene0"])
+    assert _inside(spans["runway"], spans["step7"])  # 바깥 span이 닫힐 때 같이 닫힘
+    assert spans["step7"]["args"] == {"scenes": 3}
+    assert spans["synthesize"]["cat"] == "tts"
+    assert spans["broken"]["args"] == {"error": "ValueError"}
+
+
+def test_worker_thread_inherits_session_and_step():
+    seen = {}
+
+    def worker():
+        seen["step"] = current_step()
+        with span("encode", "ffmpeg"):
+            pass
+
+    with bind_session("s1"):
+        trace_step("Step 8")
+        with span("main"):
+            # 파이프라인처럼 컨텍스트를 복사해 띄운 스레드
+            t = threading.Thread(target=contextvars.copy_context().run, args=(worker,), name="pipeline-mux-0")
+            t.start()
+            t.join()
+        # 컨텍스트 없이 띄운 스레드는 세션을 모르므로 기록되지 않음
+        orphan = threading.Thread(target=lambda: span("orphan").__enter__().__exit__(None, None, None))
+        orphan.start()
+        orphan.join()
+
+    spans, meta = _events()
+    assert seen["step"] == "Step 8"
+    assert spans["encode"]["tid"] != spans["main"]["tid"]
+    assert _inside(spans["encode"], spans["main"])
+    assert "orphan" not in spans
+    names = {m["tid"]: m["args"]["name"] for m in meta if m["name"] == "thread_name"}
+    assert names[spans["encode"]["tid"]] == "pipeline-mux-0"
+
+
+def test_disabled_span_is_shared_noop(monkeypatch):
+    monkeypatch.setattr(tracing, "_enabled", False)
+    assert span("a") is span("b")
+    trace_step("Step 3")
+    assert current_step() == "Step 3"  # metrics 라벨용 단계 이름은 꺼져 있어도 유지
+    with bind_session("s2"):
+        with span("a"):
+            pass
+    assert export_chrome_trace(SESSIONS_ROOT / "s2") is None
@@ -0,0 +1,77 @@
+# -*- coding: utf-8 -*-
+import os
+import shutil
+import time
+
+import pytest
+
+import version_catalog
+from version_catalog import MANIFEST_FILE, VersionCatalog
+
+
+def _version_dir(mode_dir, name):
+    d = mode_dir / name
+    d.mkdir(parents=True)
+    (d / MANIFEST_FILE).write_text("{}", encoding="utf-8")
+    return d
+
+
+def _touch_later(path):
+    # 같은 초 안에 생긴 변경도 '스캔 이후'로 보이게 mtime을 미래로
+    later = time.time() + 5
+    os.utime(path, (later, later))
+
+
+def test_write_manifest_then_lookup(tmp_path):
+    catalog = VersionCatalog(tmp_path / "catalog.db")
+    base = tmp_path / "book" / "video" / "modeB"
+    for v in (1, 2):
+        catalog.write_manifest("video", base, (1, 1, v), base / f"v1_1_{v}", {"v": v})
+
+    assert [e["key"] for e in catalog.entries("video", base)] == [(1, 1, 2), (1, 1, 1)]
+    assert catalog.next_version("video", base, prefix=(1, 1)) == 3
+    assert catalog.read_manifest("video", base / "v1_1_1") == {"v": 1}
+    assert catalog.update_manifest("video", base / "v1_1_1", extra=True) == {"v": 1, "extra": True}
+
+
+def test_deleted_version_is_forgotten(tmp_path):
+    catalog = VersionCatalog(tmp_path / "catalog.db")
+    base = tmp_path / "book" / "preview" / "Standard"
+    for p in (1, 2):
+        catalog.write_manifest("preview", base, (1, 1, p), base / f"v1_1_{p}", {})
+
+    shutil.rmtree(base / "v1_1_2")
+    _touch_later(base)
+
+    assert catalog.latest("preview", base)["key"] == (1, 1, 1)
+    assert [e["key"] for e in catalog.entries("preview", base)] == [(1, 1, 1)]
+    assert [e["path"].name for e in catalog.latest_all("preview")] == ["v1_1_1"]
+
+
+def test_folder_added_outside_catalog_is_rescanned(tmp_path):
+    catalog = VersionCatalog(tmp_path / "catalog.db")
+    base = tmp_path / "book" / "tts" / "Standard"
+    _version_dir(base, "v1_1_clova")
+    assert [e["key"] for e in catalog.entries("tts", base)] == [(1, 1)]
+
+    _version_dir(base, "v1_2_gpt")  # 다른 프로세스·수동 복사로 생긴 버전
+    _touch_later(base)
+
+    entries = catalog.entries("tts", base)
+    assert [(e["key"], e["label"]) for e in entries] == [((1, 2), "gpt"), ((1, 1), "clova")]
+
+
+def test_own_writes_do_not_force_rescan_and_entries_do_not_stat(tmp_path, monkeypatch):
+    catalog = VersionCatalog(tmp_path / "catalog.db")
+    base = tmp_path / "book" / "video" / "modeB"
+    catalog.write_manifest("video", base, (1, 1, 1), base / "v1_1_1", {})
+    scans = []
+    real_parse = version_catalog._parse_entry
+    monkeypatch.setattr(version_catalog, "_parse_entry", lambda *a: scans.append(a) or real_parse(*a))
+
+    catalog.write_manifest("video", base, (1, 1, 2), base / "v1_1_2", {})  # 새 버전 폴더 생성
+    monkeypatch.setattr(VersionCatalog, "_exists", lambda *a: pytest.fail("행마다 stat하면 안 됨"))
+    keys = [e["key"] for e in catalog.entries("video", base)]
+
+    assert keys == [(1, 1, 2), (1, 1, 1)]
+    assert scans == []
@@ -0,0 +1,207 @@
+# -*- coding: utf-8 -*-
+"""
+파이프라인 구간 추적 (Chrome trace-event / Perfetto).
+예고편 한 편에 9분이 걸렸을 때 Runway 대기, TTS, moviepy 인코딩, Streamlit 리런이 각각 얼마였는지 보기 위함.
+
+- span(name, cat, **args): with 블록 하나를 구간으로 기록 (중첩 가능)
+- traced(cat=...): 함수 전체를 구간으로 기록하는 데코레이터
+- trace_step(name): 긴 함수 안의 단계 표시. 다음 trace_step/바깥 span 종료/다음 리런 때 닫힘
+- begin_rerun(name): 스크립트 맨 위에서 호출. 이전 리런 구간을 닫고 새 리런 구간 시작
+
+구간은 시작 시점 세션의 <세션>/trace_events.jsonl에 (session_logger의 버퍼 writer로) 쌓이고,
+export_chrome_trace()가 <세션>/trace.json (Perfetto / chrome://tracing에서 열림)으로 묶는다.
+세션 ZIP을 만들 때 자동으로 export된다.
+
+켜기: 환경변수 TRACE=1 또는 set_enabled(True). 꺼져 있으면 span()은 공용 no-op 객체를 돌려주고
+데코레이터는 플래그 한 번 확인 후 원래 함수를 바로 호출한다.
+
+    python tracing.py outputs/sessions/<세션 ID>   # trace.json 다시 만들기
+"""
+import contextvars
+import functools
+import json
+import os
+import sys
+import threading
+import time
+from pathlib import Path
+from typing import Optional
+
+TRACE_EVENTS_FILE = "trace_events.jsonl"
+TRACE_FILE = "trace.json"
+
+_enabled = os.getenv("TRACE", "0") == "1"
+_tls = threading.local()
+# 현재 단계 이름 — 추적이 꺼져 있어도 유지 (metrics 라벨용, 파이프라인 워커 스레드로 전파됨)
+_STEP: "contextvars.ContextVar[str]" = contextvars.ContextVar("trace_step", default="")
+_seen_threads = set()
+_seen_lock = threading.Lock()
+
+
+def set_enabled(on: bool) -> None:
+    global _enabled
+    _enabled = bool(on)
+
+
+def is_enabled() -> bool:
+    return _enabled
+
+
+def _now_us() -> int:
+    return time.time_ns() // 1000
+
+
+def _emit(name: str, cat: str, start_us: int, end_us: int, args: Optional[dict] = None) -> None:
+    # 순환 import 방지 (session_logger가 이 모듈을 씀) — 켜져 있을 때만 여기까지 옴
+    from session_logger import append_session_line, current_session_id
+    sid = current_session_id()
+    if not sid:
+        return
+    pid, tid = os.getpid(), threading.get_native_id()
+    key = (sid, pid, tid)
+    if key not in _seen_threads:
+        with _seen_lock:
+            first_in_process = not any(k[0] == sid and k[1] == pid for k in _seen_threads)
+            _seen_threads.add(key)
+        if first_in_process:
+            proc_name = Path(sys.argv[0]).stem if sys.argv and sys.argv[0] else "python"
+            append_session_line(TRACE_EVENTS_FILE, json.dumps(
+                {"ph": "M", "name": "process_name", "pid": pid, "tid": tid,
+                 "args": {"name": f"{proc_name} ({pid})"}}, ensure_ascii=False) + "\n", sid)
+        append_session_line(TRACE_EVENTS_FILE, json.dumps(
+            {"ph": "M", "name": "thread_name", "pid": pid, "tid": tid,
+             "args": {"name": threading.current_thread().name}}, ensure_ascii=False) + "\n", sid)
+    event = {"name": name, "cat": cat or "app", "ph": "X", "ts": start_us,
+             "dur": max(0, end_us - start_us), "pid": pid, "tid": tid}
+    if args:
+        event["args"] = args
+    append_session_line(TRACE_EVENTS_FILE, json.dumps(event, ensure_ascii=False, default=str) + "\n", sid)
+    _tls.last_us = end_us
+
+
+def _close_step(end_us: int, opened_after: int = 0) -> None:
+    step = getattr(_tls, "step", None)
+    if step and step[1] >= opened_after:
+        _tls.step = None
+        _emit(step[0], "step", step[1], end_us)
+
+
+class _Span:
+    __slots__ = ("name", "cat", "args", "start")
+
+    def __init__(self, name: str, cat: str, args: dict):
+        self.name, self.cat, self.args = name, cat, args
+
+    def __enter__(self):
+        self.start = _now_us()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        end = _now_us()
+        # 이 구간 안에서 연 단계 표시는 구간과 같이 닫아야 중첩이 맞음
+        _close_step(end, self.start)
+        if exc_type is not None:
+            self.args = {**self.args, "error": exc_type.__name__}
+        _emit(self.name, self.cat, self.start, end, self.args)
+        return False
+
+
+class _NoopSpan:
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        return False
+
+
+_NOOP = _NoopSpan()
+
+
+def span(name: str, cat: str = "", **args):
+    """구간 기록용 context manager. 꺼져 있으면 no-op."""
+    if not _enabled:
+        return _NOOP
+    return _Span(name, cat, args)
+
+
+def traced(name: Optional[str] = None, cat: str = ""):
+    """함수 호출 전체를 구간으로 기록하는 데코레이터."""
+    def deco(fn):
+        label = name or fn.__name__
+
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            if not _enabled:
+                return fn(*args, **kwargs)
+            with _Span(label, cat, {}):
+                return fn(*args, **kwargs)
+        return wrapper
+    return deco
+
+
+def trace_step(name: str) -> None:
+    """지금부터 name 단계. 같은 스레드의 이전 단계 표시는 여기서 닫힘."""
+    _STEP.set(name)
+    if not _enabled:
+        return
+    now = _now_us()
+    _close_step(now)
+    _tls.step = (name, now)
+
+
+def current_step() -> str:
+    return _STEP.get()
+
+
+def begin_rerun(name: str = "rerun") -> None:
+    """
+    Streamlit 스크립트 맨 위에서 호출. st.rerun()/st.stop()은 예외로 스크립트를 끊으므로
+    이전 리런의 열린 구간은 다음 리런 시작 때, 마지막으로 기록된 시각을 끝으로 닫는다.
+    """
+    if not _enabled:
+        return
+    last = getattr(_tls, "last_us", None) or _now_us()
+    _close_step(last)
+    rerun = getattr(_tls, "rerun", None)
+    if rerun:
+        _emit(rerun[0], "rerun", rerun[1], max(last, rerun[1]))
+    _tls.rerun = (name, _now_us())
+    _tls.last_us = _tls.rerun[1]
+
+
+# ---------------------------------------------------------
+# 내보내기
+# ---------------------------------------------------------
+def export_chrome_trace(session_dir) -> Optional[Path]:
+    """<세션>/trace_events.jsonl → <세션>/trace.json. 기록이 없으면 None, 이미 최신이면 그대로."""
+    from session_logger import flush_events
+    session_dir = Path(session_dir)
+    src, dst = session_dir / TRACE_EVENTS_FILE, session_dir / TRACE_FILE
+    flush_events()
+    if not src.exists():
+        return None
+    if dst.exists() and dst.stat().st_mtime_ns >= src.stat().st_mtime_ns:
+        return dst
+    events = []
+    with open(src, "r", encoding="utf-8") as f:
+        for line in f:
+            try:
+                events.append(json.loads(line))
+            except json.JSONDecodeError:
+                continue
+    tmp = dst.with_suffix(".tmp")
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump({"traceEvents": events, "displayTimeUnit": "ms"}, f, ensure_ascii=False)
+    os.replace(tmp, dst)
+    return dst
+
+
+if __name__ == "__main__":
+    if len(sys.argv) != 2:
+        print("사용: python tracing.py <세션 폴더>")
+        sys.exit(2)
+    out = export_chrome_trace(sys.argv[1])
+    print(out or "trace_events.jsonl 없음 (TRACE=1로 실행했는지 확인)")
+    sys.exit(0 if out else 1)
@@ -10,6 +10,10 @@ from pathlib import Path
 from typing import List, Dict, Optional
 from collections import OrderedDict
 
+from metrics import timed_render
+from tracing import traced
+from video_utils import load_moviepy
+
 
 # ==========================================
 # 1. 상수 및 정규식 데이터
@@ -836,6 +840,8 @@ def parse_dialogue_with_speaker(
 # 캐릭터별 다중 화자 TTS 생성
 # ============================================================
 
+@traced(cat="render")
+@timed_render()
 def concat_audio_files(audio_paths: List[str], output_path: str) -> bool:
     """
     여러 오디오 파일을 하나로 합침
@@ -848,6 +854,7 @@ def concat_audio_files(audio_paths: List[str], output_path: str) -> bool:
         성공 여부
     """
     try:
+        load_moviepy()
         from moviepy.editor import AudioFileClip, concatenate_audioclips
 
         clips = [AudioFileClip(p) for p in audio_paths if Path(p).exists()]
@@ -867,6 +874,8 @@ def concat_audio_files(audio_paths: List[str], output_path: str) -> bool:
 
 
 
+@traced(cat="render")
+@timed_render()
 def add_audio_to_video(video_path: str, audio_path: str, output_path: str, bgm_path: str = None, bgm_volume: float = 0.15) -> bool:
     """
     영상에 음성 파일 합성 (BGM 지원)
@@ -881,6 +890,7 @@ def add_audio_to_video(video_path: str, audio_path: str, output_path: str, bgm_p
     Returns:
         성공 여부
     """
+    load_moviepy()
     from moviepy.editor import VideoFileClip, AudioFileClip, CompositeAudioClip, concatenate_audioclips
 
     video = None
@@ -957,6 +967,7 @@ def get_audio_duration(audio_path: str) -> float:
         오디오 길이 (초), 실패 시 0.0
     """
     try:
+        load_moviepy()
         from moviepy.editor import AudioFileClip
         clip = AudioFileClip(audio_path)
         duration = clip.duration
@@ -966,6 +977,8 @@ def get_audio_duration(audio_path: str) -> float:
         print(f"  ⚠️ 오디오 길이 측정 실패: {e}")
         return 0.0
     
+@traced(cat="render")
+@timed_render()
 def concat_videos_with_audio(video_paths: list, output_path: str):
     """
     여러 영상(음성 포함)을 하나로 합치기
@@ -978,6 +991,7 @@ def concat_videos_with_audio(video_paths: list, output_path: str):
         성공 시 True, 실패 시 에러 메시지 문자열
     """
     try:
+        load_moviepy()
         from moviepy.editor import VideoFileClip, concatenate_videoclips
 
         # 합치기 전 개별 파일 존재 여부 확인
@@ -1025,9 +1039,6 @@ SPEAKERS = {
     "default": "njiyun"
 }
 
-# 한국어 TTS 읽기 속도 (글자/초, speed=0 기준)
-CHARS_PER_SEC = 4.5
-
 def extract_characters_from_texts(texts: List[str]) -> List[str]:
     """
     전체 텍스트에서 등장인물 자동 추출 (빈도순 정렬)
@@ -1185,46 +1196,30 @@ def assign_voices_for_characters(
 
     return voice_assignments
 
-def calculate_speed_for_duration(text: str, target_duration: float) -> int:
+def calculate_speed_for_duration(text: str, target_duration: float,
+                                 voice: str = "narrator", engine: str = "clova") -> int:
     """
     텍스트를 목표 시간에 맞추기 위한 speed 값 계산
 
     Args:
         text: 읽을 텍스트
         target_duration: 목표 시간 (초)
+        voice: 보이스 키 (보이스별로 보정된 읽기 속도 사용)
+        engine: TTS 엔진
 
     Returns:
-        speed 값 (-5 ~ 5)
+        speed 값 (-5 ~ 2, 엔진 규약대로 음수=빠르게 / 양수=느리게)
     """
     if not text or target_duration <= 0:
         return 0
 
-    # 예상 읽기 시간 (speed=0 기준)
-    char_count = len(text.replace(" ", ""))
-    estimated_duration = char_count / CHARS_PER_SEC
-
-    # 속도 비율 계산
-    if estimated_duration <= target_duration:
-        # 음성이 충분히 짧음 - 약간 느리게
-        ratio = estimated_duration / target_duration
-        if ratio > 0.8:
-            return 0  # 거의 맞음
-        elif ratio > 0.6:
-            return -1  # 조금 느리게
-        else:
-            return -2  # 더 느리게
-    else:
-        # 음성이 김 - 빠르게
-        ratio = target_duration / estimated_duration
-        if ratio > 0.8:
-            return 1  # 조금 빠르게
-        elif ratio > 0.6:
-            return 2  # 빠르게
-        elif ratio > 0.5:
-            return 3  # 많이 빠르게
-        elif ratio > 0.4:
-            return 4  # 매우 빠르게
-        else:
-            return 5  # 최대 속도
-
+    # 예상 읽기 시간 (speed=0 기준) — 세션 기록으로 보정된 (엔진, 보이스)별 모델, 기록이 없으면 글자 수 사전값
+    from duration_model import predict_duration, speed_factor
+    estimated_duration = predict_duration(text, voice=voice, engine=engine, speed=0).seconds
+    if estimated_duration <= 0:
+        return 0
 
+    # 예측 길이가 목표에 가장 가까운 speed (같으면 0에 가까운 쪽 — speed를 안 쓰는 엔진은 항상 0).
+    # 느리게는 +2까지만 (그 이상은 늘어져 들림)
+    return min(range(-5, 3), key=lambda s: (
+        abs(estimated_duration * speed_factor(engine, s) - target_duration), abs(s)))
@@ -2,6 +2,7 @@
 # tts_module.py
 # TTS 메인 인터페이스 (API 호출 및 워크플로우 관리)
 
+import contextvars
 import re
 import os
 import time
@@ -9,7 +10,9 @@ import shutil
 import requests
 import hashlib
 import asyncio
-from typing import List, Dict, Optional
+import threading
+import wave  # WAV 파일 저장용
+from typing import Callable, List, Dict, Optional
 from pathlib import Path
 from dotenv import load_dotenv
 
@@ -17,10 +20,12 @@ from dotenv import load_dotenv
 import tts_core
 from tts_core import add_audio_to_video, concat_videos_with_audio, get_audio_duration
 from session_logger import log_api_call, summarize_text
+import cancellation
+from artifact_store import detach, get_store, materialize
+from cancellation import Cancelled, check_cancelled
+from sdk_clients import get_openai
 
 # 클로바 API 설정 (환경변수 우선, 폴백으로 기본값)
-import os
-from dotenv import load_dotenv
 load_dotenv()
 
 # ==========================================
@@ -30,31 +35,15 @@ CLOVA_CLIENT_ID = os.getenv("CLOVA_CLIENT_ID", "ozpoytlz95")
 CLOVA_CLIENT_SECRET = os.getenv("CLOVA_CLIENT_SECRET", "34c2g67KpznehFvEOzamxoqrrfSsQP5tzey1dwi2")
 CLOVA_ENDPOINT = "https://naveropenapi.apigw.ntruss.com/tts-premium/v1/tts"
 
-# [OpenAI 설정]
-try:
-    from openai import OpenAI
-    HAS_OPENAI = True
-except ImportError:
-    HAS_OPENAI = False
-    print("OpenAI 라이브러리가 없습니다. (pip install openai)")
-
+# [OpenAI 설정] — 클라이언트는 sdk_clients.get_openai() (처음 호출할 때 import)
 OPENAI_TTS_MODEL = "gpt-4o-mini-tts"
 
-from google.cloud import texttospeech
-from google.oauth2 import service_account
-
 # 서비스 계정 키 파일 이름 (tts_module.py와 같은 폴더)
 SERVICE_ACCOUNT_FILE = "tts-gemini-env.json"
 
-import wave  # WAV 파일 저장용
-# Google GenAI SDK 설정 preview 버전 사용
-try:
-    from google import genai
-    from google.genai import types
-    HAS_GOOGLE_GENAI = True
-except Exception as _e:
-    HAS_GOOGLE_GENAI = False
-    print(f"⚠️ google-genai import 실패: {type(_e).__name__}: {_e}")
+# Google GenAI SDK(preview)와 edge-tts도 처음 쓸 때 불러옴 (_load_genai, _load_edge_tts)
+_GENAI_CLIENT = None
+_SDK_LOCK = threading.Lock()
 
 # [핵심] Gemini 모델 매핑 (엔진 키 -> 실제 모델 ID)
 GEMINI_MODELS = {
@@ -145,12 +134,13 @@ GEMINI_VOICE_MAP = {
 }
 
 # Edge TTS 폴백 지원 (무료, 다중 목소리)
-try:
-    import edge_tts
-    import asyncio
-    HAS_EDGE_TTS = True
-except ImportError:
-    HAS_EDGE_TTS = False
+def _load_edge_tts():
+    """edge_tts 모듈, 없으면 None."""
+    try:
+        import edge_tts
+        return edge_tts
+    except ImportError:
+        return None
 
 
 # Edge TTS 한국어 목소리 매핑 (Clova 실패 시 폴백용)
@@ -252,7 +242,8 @@ def edge_tts_fallback(text: str, output_path: str, voice_type: str = 'default')
     Returns:
         성공 여부
     """
-    if not HAS_EDGE_TTS:
+    edge_tts = _load_edge_tts()
+    if edge_tts is None:
         print("    [WARN] Edge TTS not installed (pip install edge-tts)")
         return False
 
@@ -280,7 +271,8 @@ def edge_tts_fallback(text: str, output_path: str, voice_type: str = 'default')
 # 응답은 PCM(L16, 24kHz mono)로 오므로 WAV 헤더 씌운 뒤 ffmpeg로 MP3 변환.
 def _pcm_to_mp3(pcm_bytes: bytes, sample_rate: int, output_path: str):
     """PCM 16-bit mono → WAV → MP3."""
-    import tempfile, subprocess
+    import tempfile
+    import proc_accounting
     Path(output_path).parent.mkdir(parents=True, exist_ok=True)
     with tempfile.NamedTemporaryFile(suffix=".wav", delete=False) as tmp:
         wav_path = tmp.name
@@ -290,7 +282,7 @@ def _pcm_to_mp3(pcm_bytes: bytes, sample_rate: int, output_path: str):
             wf.setsampwidth(2)
             wf.setframerate(sample_rate)
             wf.writeframes(pcm_bytes)
-        subprocess.run(
+        proc_accounting.run(
             ["ffmpeg", "-y", "-i", wav_path, "-codec:a", "libmp3lame",
              "-b:a", "128k", output_path],
             check=True, capture_output=True,
@@ -299,6 +291,68 @@ def _pcm_to_mp3(pcm_bytes: bytes, sample_rate: int, output_path: str):
         Path(wav_path).unlink(missing_ok=True)
 
 
+def _load_genai():
+    """google-genai (genai, types), 없으면 None."""
+    try:
+        from google import genai
+        from google.genai import types
+        return genai, types
+    except Exception:
+        return None
+
+
+def _genai_client():
+    """Vertex AI genai 클라이언트 (프로세스 공용). 인증에 실패하면 None — 다음 호출에서 다시 시도."""
+    global _GENAI_CLIENT
+    sdk = _load_genai()
+    if sdk is None:
+        return None
+    with _SDK_LOCK:
+        if _GENAI_CLIENT is not None:
+            return _GENAI_CLIENT
+        from google.oauth2 import service_account
+        # 1. 인증 — 로컬 JSON 우선, 없으면 Streamlit Secrets 폴백.
+        try:
+            current_dir = Path(__file__).parent
+            key_path = current_dir / SERVICE_ACCOUNT_FILE
+            cred = None
+            scopes = ["https://www.googleapis.com/auth/cloud-platform"]
+
+            if key_path.exists():
+                cred = service_account.Credentials.from_service_account_file(
+                    key_path, scopes=scopes
+                )
+            else:
+                try:
+                    import streamlit as st
+                    if "gcp_service_account" in st.secrets:
+                        info = dict(st.secrets["gcp_service_account"])
+                        cred = service_account.Credentials.from_service_account_info(
+                            info, scopes=scopes
+                        )
+                except Exception:
+                    pass
+
+            if cred is None:
+                print(
+                    f"    [ERR] Google 서비스 계정 인증 정보를 찾지 못함. "
+                    f"로컬은 {key_path}, 배포는 st.secrets['gcp_service_account'] 필요."
+                )
+                return None
+
+            project_id = cred.project_id
+            _GENAI_CLIENT = sdk[0].Client(
+                vertexai=True,
+                project=project_id,
+                location="us-central1",
+                credentials=cred,
+            )
+        except Exception as e:
+            print(f"    [ERR] genai Client 초기화 실패: {e}")
+            return None
+        return _GENAI_CLIENT
+
+
 def _generate_with_gemini(
     text: str,
     output_path: str,
@@ -307,48 +361,13 @@ def _generate_with_gemini(
     style_prompt: str,
     model_name: str,
 ) -> bool:
-    if not HAS_GOOGLE_GENAI:
+    sdk = _load_genai()
+    if sdk is None:
         print("    [ERR] google-genai 라이브러리 미설치 (pip install google-genai)")
         return False
-
-    # 1. 인증 — 로컬 JSON 우선, 없으면 Streamlit Secrets 폴백.
-    try:
-        current_dir = Path(__file__).parent
-        key_path = current_dir / SERVICE_ACCOUNT_FILE
-        cred = None
-        scopes = ["https://www.googleapis.com/auth/cloud-platform"]
-
-        if key_path.exists():
-            cred = service_account.Credentials.from_service_account_file(
-                key_path, scopes=scopes
-            )
-        else:
-            try:
-                import streamlit as st
-                if "gcp_service_account" in st.secrets:
-                    info = dict(st.secrets["gcp_service_account"])
-                    cred = service_account.Credentials.from_service_account_info(
-                        info, scopes=scopes
-                    )
-            except Exception:
-                pass
-
-        if cred is None:
-            print(
-                f"    [ERR] Google 서비스 계정 인증 정보를 찾지 못함. "
-                f"로컬은 {key_path}, 배포는 st.secrets['gcp_service_account'] 필요."
-            )
-            return False
-
-        project_id = cred.project_id
-        client = genai.Client(
-            vertexai=True,
-            project=project_id,
-            location="us-central1",
-            credentials=cred,
-        )
-    except Exception as e:
-        print(f"    [ERR] genai Client 초기화 실패: {e}")
+    types = sdk[1]
+    client = _genai_client()
+    if client is None:
         return False
 
     # 2. 보이스 매핑. genai 경로는 별자리 이름(Puck, Aoede, Kore...)을 그대로 사용.
@@ -423,10 +442,6 @@ def _generate_with_gemini(
 
 # GPT 생성 함수
 def _generate_with_gpt(text: str, output_path: str, speaker: str, speed: float, instructions: str) -> bool:
-    if not HAS_OPENAI:
-        print("    [ERR] OpenAI 라이브러리 미설치")
-        return False
-        
     # 화자 매핑
     voice_id = GPT_VOICE_MAP.get(speaker, GPT_VOICE_MAP["default"])
     
@@ -435,7 +450,7 @@ def _generate_with_gpt(text: str, output_path: str, speaker: str, speed: float,
     gpt_speed = max(0.5, min(2.0, gpt_speed))
 
     try:
-        client = OpenAI()
+        client = get_openai()
         with log_api_call("openai_tts", OPENAI_TTS_MODEL, {
             "voice": voice_id,
             "text": summarize_text(text),
@@ -526,13 +541,15 @@ def _text_to_speech_single(
     ).hexdigest()
 
     if use_cache:
+        # 캐시 값은 저장소 객체 경로 — 처음 만든 output_path가 나중에 다른 텍스트로 다시 쓰여도 안전
         cached_path = tts_core._TTS_CACHE.get(cache_key)
         if cached_path and Path(cached_path).exists():
-            shutil.copy(cached_path, output_path)
+            materialize(cached_path, output_path)  # 복사 대신 저장소 하드링크
             print(f"    [CACHE HIT] {output_path}")
             return True
 
-    # 3. 엔진별 호출 분기
+    # 3. 엔진별 호출 분기 (output_path가 캐시 히트로 다른 위치와 하드링크돼 있으면 먼저 끊음)
+    detach(output_path)
     success = False
     engine_lower = engine.lower()
     if "gpt" in engine_lower:
@@ -560,7 +577,9 @@ def _text_to_speech_single(
 
     # 4. 결과 캐싱
     if success and use_cache:
-        tts_core._TTS_CACHE.set(cache_key, output_path)
+        digest = get_store().put(output_path)
+        if digest:
+            tts_core._TTS_CACHE.set(cache_key, str(get_store().object_path(digest)))
 
     return success
 
@@ -843,7 +862,8 @@ def generate_audio_for_subtitles(
     split_narration: bool = True,
     engine: str = "clova",
     global_speed: int = 0,
-    style_prompts: List[str] = None
+    style_prompts: List[str] = None,
+    on_progress: Optional[Callable[[int, Optional[Path]], None]] = None
 ) -> list:
     """
     자막 리스트를 음성 파일들로 변환 (병렬 처리 지원)
@@ -859,9 +879,14 @@ def generate_audio_for_subtitles(
         split_narration: 나래이션/대사 분리 여부 (기본 True)
             - True: 나래이션은 narrator, 대사만 GPT 화자 적용
             - False: 기존 동작 (전체에 GPT 화자 적용)
+        on_progress: 자막 하나가 끝날 때마다 on_progress(인덱스, 경로 또는 None) — 진행률/ETA용.
+            병렬 처리에서도 이 함수를 부른 스레드에서 호출됨
 
     Returns:
         생성된 음성 파일 경로 리스트
+
+    현재 취소 토큰(cancellation)이 취소되면 남은 자막은 건너뛰고, 이번 호출에서 만든 파일을 지운 뒤
+    Cancelled를 올립니다.
     """
     from concurrent.futures import ThreadPoolExecutor, as_completed
 
@@ -915,9 +940,10 @@ def generate_audio_for_subtitles(
         나래이션/대사 분리 + 개선된 화자 매핑 적용
         (GPT/Gemini 사용 시 Edge TTS로 빠지는 것 방지)
         """
+        check_cancelled()
         # Gemini일 경우 요청 시작 전 잠시 대기 (Rate Limiting)
         if is_gemini:
-            time.sleep(0.2)  
+            cancellation.sleep(0.2)
         if not text or not text.strip():
             return i, None, "skip", raw_spk_str
 
@@ -1048,7 +1074,8 @@ def generate_audio_for_subtitles(
         for seg_idx, seg in enumerate(segments):
             #  세그먼트 사이에도 딜레이 필요 (한 문장이 3개로 쪼개질 때 폭주 방지)
             if is_gemini and seg_idx > 0:
-                time.sleep(0.1)
+                cancellation.sleep(0.1)
+            check_cancelled()
             voice_key, char_name = resolve_voice(seg)
             temp_path = output_dir / f"tts_{i:02d}_{uid}_seg{seg_idx:02d}.mp3"
 
@@ -1060,6 +1087,9 @@ def generate_audio_for_subtitles(
                 segment_info.append(f"{seg['type']}")
             else:
                 print(f"    ⚠️ [Segment Fail] Scene {i}-{seg_idx}: {seg['text'][:10]}...")
+            if cancellation.is_cancelled():
+                cancellation.discard_partial(*temp_paths)
+                check_cancelled()
 
         if not temp_paths:
             return i, None, "fail", raw_spk_str
@@ -1081,28 +1111,45 @@ def generate_audio_for_subtitles(
     # 분리 모드 선택
     process_func = process_subtitle_with_split
 
+    token = cancellation.current_token()
     if parallel and len(subtitles) > 1:
         # 병렬 처리 (5-10배 속도 향상)
         with ThreadPoolExecutor(max_workers=run_max_workers) as executor:
+            # 취소되면 아직 시작 안 한 자막은 바로 버림 (진행 중인 요청은 끝나는 대로 결과 폐기)
+            unregister = token.on_cancel(lambda: executor.shutdown(wait=False, cancel_futures=True)) if token else None
+            # 작업마다 호출한 스레드의 컨텍스트 복사본에서 실행 — 현재 단계(tracing, 메트릭 step 라벨),
+            # 세션, 취소 토큰이 워커 스레드에서도 보이도록 (Context 하나는 한 스레드에서만 run 가능)
             futures = {
-                executor.submit(process_subtitle_with_split, i, subtitles[i], speakers[i], style_prompts[i]): i
+                executor.submit(contextvars.copy_context().run, process_subtitle_with_split,
+                                i, subtitles[i], speakers[i], style_prompts[i]): i
                 for i in range(len(subtitles))
             }
 
             for future in as_completed(futures):
+                if future.cancelled() or isinstance(future.exception(), Cancelled):
+                    continue
                 idx, result, status, spk_info = future.result()
                 audio_paths[idx] = result
+                if on_progress:
+                    on_progress(idx, result)
                 if status == "skip":
                     print(f"  [SKIP] Scene {idx+1} - no subtitle")
                 elif status == "ok":
                     print(f"  [OK] Scene {idx+1} [{spk_info}] audio generated")
                 else:
                     print(f"  [FAIL] Scene {idx+1} [{spk_info}] audio failed")
+            if unregister:
+                unregister()
     else:
         # 순차 처리 (단일 자막 또는 parallel=False)
         for i, text in enumerate(subtitles):
-            idx, result, status, spk_info = process_subtitle_with_split(i, subtitles[i], speakers[i], style_prompts[i])
+            try:
+                idx, result, status, spk_info = process_subtitle_with_split(i, subtitles[i], speakers[i], style_prompts[i])
+            except Cancelled:
+                break
             audio_paths[idx] = result
+            if on_progress:
+                on_progress(idx, result)
             if status == "skip":
                 print(f"  [SKIP] Scene {idx+1} - no subtitle")
             elif status == "ok":
@@ -1110,5 +1157,8 @@ def generate_audio_for_subtitles(
             else:
                 print(f"  [FAIL] Scene {idx+1} [{spk_info}] audio failed")
 
+    if token is not None and token.cancelled:
+        cancellation.discard_partial(*audio_paths)
+        token.raise_if_cancelled()
     return audio_paths
 
@@ -0,0 +1,377 @@
+# -*- coding: utf-8 -*-
+"""
+버전 카탈로그 (SQLite).
+대본 / TTS / 프리뷰 / 영상 / 최종본 버전 목록을 리런마다 폴더를 훑어 정규식으로 파싱하고
+manifest.json을 stat하는 대신, 산출물 종류별 테이블에서 (책, 모드, S, A, V, F) 인덱스로 조회한다.
+
+- manifest 쓰기는 tmp 파일 → 카탈로그 행 upsert → os.replace를 한 트랜잭션으로 묶고,
+  읽기도 카탈로그에 저장된 manifest를 돌려준다 (파일과 목록이 어긋나지 않음)
+- 카탈로그가 처음 보는 폴더(scope)는 기존 폴더를 한 번 스캔해서 가져온다 (마이그레이션)
+  → 이후 리런 비용은 버전이 몇 개 쌓였는지와 무관하게 인덱스 조회 한 번 + scope 폴더 stat 한 번
+- 카탈로그 밖에서 폴더가 바뀌면 (복사해 넣은 버전 폴더, 수동 삭제, outputs_gc 정리)
+  scope 폴더 mtime이 마지막 스캔보다 새로우면 다시 스캔하고, 그때 없어진 경로의 행도 지운다
+  (entries는 행마다 stat하지 않고 이 검사를 믿음. write_manifest가 만든 버전 폴더는 스캔 시각을 같이 올려
+  자기 쓰기 때문에 다시 스캔하지 않는다)
+- DB 위치: 환경변수 VERSION_CATALOG_DB (기본 outputs/catalog.db). 백그라운드 잡·배치 CLI도 같은 DB를 씀
+
+scope는 버전 폴더들이 들어 있는 폴더 (예: <세션>/<책>/video/<모드>).
+책/모드는 scope 경로에서 뽑고, 대본처럼 한 폴더에 여러 책 파일이 섞이는 경우만 book을 직접 넘긴다.
+"""
+import json
+import os
+import re
+import sqlite3
+import time
+from contextlib import closing, contextmanager
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+CATALOG_DB = os.getenv("VERSION_CATALOG_DB", "outputs/catalog.db")
+MANIFEST_FILE = "manifest.json"
+
+# 산출물 종류 → 버전 컬럼 (정렬 순서 그대로)
+KINDS = {
+    "script": ("s",),
+    "tts": ("s", "a"),
+    "preview": ("s", "a", "p"),
+    "video": ("s", "a", "v"),
+    "final": ("s", "a", "v", "f"),
+}
+# 버전 폴더 구조(<책>/<단계>/<모드>/<버전>)를 쓰는 종류 — 대본은 파일 하나씩이라 제외
+STAGE_KINDS = ("tts", "preview", "video", "final")
+
+
+def _schema() -> str:
+    stmts = ["""
+CREATE TABLE IF NOT EXISTS scopes (
+    kind        TEXT NOT NULL,
+    scope       TEXT NOT NULL,
+    book        TEXT NOT NULL,
+    migrated_at REAL NOT NULL,
+    PRIMARY KEY (kind, scope, book)
+);"""]
+    for kind, cols in KINDS.items():
+        col_defs = ", ".join(f"{c} INTEGER NOT NULL" for c in cols)
+        stmts.append(f"""
+CREATE TABLE IF NOT EXISTS {kind} (
+    scope      TEXT NOT NULL,
+    book       TEXT NOT NULL,
+    mode       TEXT NOT NULL,
+    {col_defs},
+    path       TEXT NOT NULL,
+    label      TEXT NOT NULL DEFAULT '',
+    manifest   TEXT,
+    updated_at REAL NOT NULL,
+    PRIMARY KEY (scope, book, {", ".join(cols)})
+);""")
+    return "\n".join(stmts)
+
+
+# =========================================================
+# 기존 폴더 파싱 (마이그레이션 전용 — 예전 get_*_versions 규칙 그대로)
+# =========================================================
+_DIR_PATTERNS = {
+    "preview": re.compile(r"^v(\d+)_(\d+)_(\d+)$"),
+    "video": re.compile(r"^v(\d+)_(\d+)_(\d+)$"),
+    "final": re.compile(r"^v(\d+)_(\d+)_(\d+)_(\d+)$"),
+}
+
+
+def _parse_entry(kind: str, item: Path, book: str, mode: str) -> Optional[Tuple[tuple, str]]:
+    """폴더/파일 하나 → (버전 키, 라벨). 해당 없으면 None."""
+    if kind == "script":
+        m = re.match(rf"script_{re.escape(book)}_{re.escape(mode)}_v(\d+)\.json$", item.name)
+        return ((int(m.group(1)),), "") if m and item.is_file() else None
+    if not item.is_dir() or not (item / MANIFEST_FILE).exists():
+        return None
+    if kind == "tts":
+        # v1_1_clova → (1, 1), 라벨 "clova" (모델명이 없는 v1_2도 허용)
+        parts = item.name.split("_")
+        if not item.name.startswith("v") or len(parts) < 2:
+            return None
+        try:
+            return (int(parts[0][1:]), int(parts[1])), "_".join(parts[2:])
+        except ValueError:
+            return None
+    m = _DIR_PATTERNS[kind].match(item.name)
+    return (tuple(int(x) for x in m.groups()), "") if m else None
+
+
+def _modified_since(base: Path, since: float) -> bool:
+    """scope 폴더에 since 이후 버전 폴더가 생기거나 지워졌는지 (폴더 mtime 기준)."""
+    try:
+        return base.stat().st_mtime >= since
+    except OSError:
+        return False
+
+
+def _stamp_after_write(base: Path) -> float:
+    """우리가 방금 바꾼 scope 폴더를 '스캔 이후 변경'으로 보지 않게 할 migrated_at 값."""
+    try:
+        return max(time.time(), base.stat().st_mtime + 1e-3)
+    except OSError:
+        return time.time()
+
+
+def _read_text(path: Path) -> Optional[str]:
+    try:
+        return path.read_text(encoding="utf-8")
+    except OSError:
+        return None
+
+
+class VersionCatalog:
+    def __init__(self, db_path):
+        self.db_path = Path(db_path).resolve()
+        self.db_path.parent.mkdir(parents=True, exist_ok=True)
+        with self._connect() as conn:
+            conn.executescript(_schema())
+
+    @contextmanager
+    def _connect(self):
+        # autocommit 모드 — 쓰기는 BEGIN IMMEDIATE로 직접 트랜잭션
+        with closing(sqlite3.connect(str(self.db_path), timeout=30, isolation_level=None)) as conn:
+            conn.row_factory = sqlite3.Row
+            yield conn
+
+    @staticmethod
+    def _scope(kind: str, base_dir, book: Optional[str]) -> Tuple[str, str, str]:
+        """(scope, book, mode). 기본 폴더 구조: <책>/<단계>/<모드>."""
+        if kind not in KINDS:
+            raise ValueError(f"알 수 없는 버전 종류: {kind}")
+        base = Path(base_dir).resolve()
+        return str(base), book or base.parent.parent.name, base.name
+
+    # ---- 마이그레이션 ----
+    def migrate(self, kind: str, base_dir, book: Optional[str] = None, force: bool = False) -> int:
+        """
+        기존 폴더를 스캔해서 카탈로그에 등록. 이미 가져온 scope는 건너뜀 (force=True면 다시 스캔).
+        Returns: 새로 등록한 버전 수
+        """
+        scope, book, mode = self._scope(kind, base_dir, book)
+        cols = KINDS[kind]
+        base = Path(scope)
+        with self._connect() as conn:
+            row = conn.execute(
+                "SELECT migrated_at FROM scopes WHERE kind=? AND scope=? AND book=?", (kind, scope, book)
+            ).fetchone()
+            if not force and row and not _modified_since(base, row["migrated_at"]):
+                return 0
+            # 스캔 시작 시각 기준 — 스캔 도중 생긴 폴더는 다음 조회 때 다시 잡힘
+            now = time.time()
+            found = []
+            if base.exists():
+                for item in base.iterdir():
+                    parsed = _parse_entry(kind, item, book, mode)
+                    if parsed:
+                        manifest_path = item if kind == "script" else item / MANIFEST_FILE
+                        found.append((parsed[0], str(item), parsed[1], _read_text(manifest_path)))
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                added = 0
+                for key, path, label, manifest in found:
+                    cur = conn.execute(
+                        f"INSERT OR IGNORE INTO {kind} (scope, book, mode, {', '.join(cols)}, path, label, manifest, "
+                        f"updated_at) VALUES (?, ?, ?, {', '.join('?' * len(cols))}, ?, ?, ?, ?)",
+                        (scope, book, mode, *key, path, label, manifest, now),
+                    )
+                    added += cur.rowcount
+                if row:
+                    # 다시 스캔한 경우: 스캔에 안 잡혔고 실제로도 없는 경로 = 카탈로그 밖에서 지워진 버전
+                    seen = {path for _, path, _, _ in found}
+                    for old in conn.execute(f"SELECT path FROM {kind} WHERE scope=? AND book=?",
+                                            (scope, book)).fetchall():
+                        if old["path"] not in seen and not Path(old["path"]).exists():
+                            conn.execute(f"DELETE FROM {kind} WHERE path=?", (old["path"],))
+                conn.execute("INSERT OR REPLACE INTO scopes (kind, scope, book, migrated_at) VALUES (?, ?, ?, ?)",
+                             (kind, scope, book, now))
+                conn.execute("COMMIT")
+            except BaseException:
+                conn.execute("ROLLBACK")
+                raise
+        return added
+
+    # ---- 조회 ----
+    def entries(self, kind: str, base_dir, book: Optional[str] = None, prefix: tuple = ()) -> List[dict]:
+        """
+        버전 목록 (최신순). 각 항목: {"key": 튜플, "path": Path, "label": 문자열}. prefix로 앞자리 고정.
+        행마다 경로를 확인하지 않음 — 지워진 버전은 scope mtime 검사로 다시 스캔할 때 빠진다.
+        """
+        self.migrate(kind, base_dir, book)
+        scope, book, _ = self._scope(kind, base_dir, book)
+        cols = KINDS[kind]
+        where = " AND ".join(f"{c}=?" for c in cols[:len(prefix)])
+        sql = (f"SELECT {', '.join(cols)}, path, label FROM {kind} WHERE scope=? AND book=?"
+               + (f" AND {where}" if where else "")
+               + f" ORDER BY {', '.join(c + ' DESC' for c in cols)}")
+        with self._connect() as conn:
+            rows = conn.execute(sql, (scope, book, *prefix)).fetchall()
+        return [
+            {"key": tuple(r[c] for c in cols), "path": Path(r["path"]), "label": r["label"]}
+            for r in rows
+        ]
+
+    def versions(self, kind: str, base_dir, book: Optional[str] = None) -> Tuple[List[tuple], Dict[tuple, Path]]:
+        """예전 get_*_versions와 같은 모양: (내림차순 키 리스트, {키: 경로})."""
+        rows = self.entries(kind, base_dir, book)
+        return [r["key"] for r in rows], {r["key"]: r["path"] for r in rows}
+
+    def latest(self, kind: str, base_dir, book: Optional[str] = None, prefix: tuple = ()) -> Optional[dict]:
+        """prefix(예: (S, A))에 해당하는 가장 최신 버전 항목, 없으면 None."""
+        self.migrate(kind, base_dir, book)
+        scope, book, _ = self._scope(kind, base_dir, book)
+        cols = KINDS[kind]
+        where = "".join(f" AND {c}=?" for c in cols[:len(prefix)])
+        while True:
+            with self._connect() as conn:
+                row = conn.execute(
+                    f"SELECT {', '.join(cols)}, path, label FROM {kind} WHERE scope=? AND book=?{where} "
+                    f"ORDER BY {', '.join(c + ' DESC' for c in cols)} LIMIT 1",
+                    (scope, book, *prefix),
+                ).fetchone()
+            if row is None:
+                return None
+            if self._exists(kind, row["path"]):
+                return {"key": tuple(row[c] for c in cols), "path": Path(row["path"]), "label": row["label"]}
+
+    def _exists(self, kind: str, path: str) -> bool:
+        """버전 폴더(대본은 파일)가 아직 있는지. 없으면 카탈로그에서 지움."""
+        if Path(path).exists():
+            return True
+        self.forget(kind, path)
+        return False
+
+    def latest_all(self, kind: str) -> List[dict]:
+        """모든 scope·책의 최신 버전 항목 (정리 작업용). 각 항목: {"path": Path, "manifest": dict}."""
+        cols = KINDS[kind]
+        while True:
+            with self._connect() as conn:
+                rows = conn.execute(
+                    f"SELECT path, manifest FROM (SELECT path, manifest, ROW_NUMBER() OVER "
+                    f"(PARTITION BY scope, book ORDER BY {', '.join(c + ' DESC' for c in cols)}) AS rn "
+                    f"FROM {kind}) WHERE rn=1"
+                ).fetchall()
+            # 지워진 최신 버전은 빼고 다시 조회 → 그 아래 버전이 최신으로 올라옴
+            if all([self._exists(kind, r["path"]) for r in rows]):
+                break
+        out = []
+        for r in rows:
+            try:
+                manifest = json.loads(r["manifest"]) if r["manifest"] else {}
+            except json.JSONDecodeError:
+                manifest = {}
+            out.append({"path": Path(r["path"]), "manifest": manifest})
+        return out
+
+    def next_version(self, kind: str, base_dir, prefix: tuple = (), book: Optional[str] = None) -> int:
+        """prefix가 같은 버전들의 마지막 자리 최댓값 + 1."""
+        top = self.latest(kind, base_dir, book, prefix)
+        return top["key"][len(prefix)] + 1 if top else 1
+
+    def read_manifest(self, kind: str, path) -> dict:
+        """버전 폴더(대본은 파일) 경로로 manifest 읽기. 카탈로그에 없으면 파일에서."""
+        path = Path(path).resolve()
+        with self._connect() as conn:
+            row = conn.execute(f"SELECT manifest FROM {kind} WHERE path=?", (str(path),)).fetchone()
+        if row and row["manifest"]:
+            return json.loads(row["manifest"])
+        manifest_path = path if kind == "script" else path / MANIFEST_FILE
+        with open(manifest_path, "r", encoding="utf-8") as f:
+            return json.load(f)
+
+    # ---- 쓰기 ----
+    def write_manifest(self, kind: str, base_dir, key: tuple, path, manifest: dict,
+                       book: Optional[str] = None, label: str = "") -> Path:
+        """
+        manifest를 파일로 쓰고 카탈로그에 등록 (한 트랜잭션).
+        path: 버전 폴더 (대본은 대본 JSON 파일 경로). Returns: 쓴 manifest 파일 경로
+        """
+        scope, book, mode = self._scope(kind, base_dir, book)
+        cols = KINDS[kind]
+        if len(key) != len(cols):
+            raise ValueError(f"{kind} 버전 키는 {len(cols)}자리여야 합니다: {key}")
+        path = Path(path).resolve()
+        manifest_path = path if kind == "script" else path / MANIFEST_FILE
+        self.migrate(kind, base_dir, book)  # 새 scope면 기존 폴더부터 가져와야 목록이 빠지지 않음
+        with self._connect() as conn:
+            row = conn.execute(
+                "SELECT migrated_at FROM scopes WHERE kind=? AND scope=? AND book=?", (kind, scope, book)
+            ).fetchone()
+        # 방금 스캔과 맞는 상태일 때만, 아래 폴더 생성·교체로 바뀐 scope mtime을 스캔 시각에 반영
+        fresh = row is not None and not _modified_since(Path(scope), row["migrated_at"])
+        manifest_path.parent.mkdir(parents=True, exist_ok=True)
+        text = json.dumps(manifest, ensure_ascii=False, indent=4, default=str)
+        tmp = manifest_path.with_suffix(manifest_path.suffix + f".{os.getpid()}.tmp")
+        tmp.write_text(text, encoding="utf-8")
+        with self._connect() as conn:
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                conn.execute(
+                    f"INSERT OR REPLACE INTO {kind} (scope, book, mode, {', '.join(cols)}, path, label, manifest, "
+                    f"updated_at) VALUES (?, ?, ?, {', '.join('?' * len(cols))}, ?, ?, ?, ?)",
+                    (scope, book, mode, *key, str(path), label, text, time.time()),
+                )
+                os.replace(tmp, manifest_path)
+                if fresh:
+                    conn.execute("UPDATE scopes SET migrated_at=? WHERE kind=? AND scope=? AND book=?",
+                                 (_stamp_after_write(Path(scope)), kind, scope, book))
+                conn.execute("COMMIT")
+            except BaseException:
+                conn.execute("ROLLBACK")
+                tmp.unlink(missing_ok=True)
+                raise
+        return manifest_path
+
+    def update_manifest(self, kind: str, path, **fields) -> dict:
+        """기존 manifest 일부 필드 갱신 (예: 개별 장면 재생성 후 full_visual_path)."""
+        path = Path(path).resolve()
+        with self._connect() as conn:
+            row = conn.execute(f"SELECT * FROM {kind} WHERE path=?", (str(path),)).fetchone()
+        if row is None:
+            raise KeyError(f"카탈로그에 없는 버전: {path}")
+        manifest = self.read_manifest(kind, path)
+        manifest.update(fields)
+        key = tuple(row[c] for c in KINDS[kind])
+        self.write_manifest(kind, row["scope"], key, path, manifest, book=row["book"], label=row["label"])
+        return manifest
+
+    def migrate_tree(self, root, force: bool = False) -> int:
+        """
+        root 아래 모든 단계 폴더(<책>/<단계>/<모드>)를 migrate. 한 번도 열지 않은 세션도 카탈로그에 들어옴.
+        Returns: 새로 등록한 버전 수
+        """
+        total = 0
+        for kind in STAGE_KINDS:
+            for stage in Path(root).rglob(kind):
+                if not stage.is_dir():
+                    continue
+                for mode_dir in stage.iterdir():
+                    if mode_dir.is_dir():
+                        total += self.migrate(kind, mode_dir, force=force)
+        return total
+
+    def forget(self, kind: str, path) -> None:
+        """버전 폴더를 지운 뒤 카탈로그에서도 제거."""
+        with self._connect() as conn:
+            conn.execute(f"DELETE FROM {kind} WHERE path=?", (str(Path(path).resolve()),))
+
+
+_CATALOG: Optional[VersionCatalog] = None
+
+
+def get_catalog() -> VersionCatalog:
+    global _CATALOG
+    if _CATALOG is None:
+        _CATALOG = VersionCatalog(CATALOG_DB)
+    return _CATALOG
+
+
+if __name__ == "__main__":
+    # python version_catalog.py migrate <세션 폴더> — 기존 세션의 버전 폴더를 미리 전부 가져오기
+    import sys
+    if len(sys.argv) == 3 and sys.argv[1] == "migrate":
+        total = get_catalog().migrate_tree(sys.argv[2], force=True)
+        print(f"등록: {total}개 버전")
+        sys.exit(0)
+    print("사용: python version_catalog.py migrate <세션 폴더>")
+    sys.exit(2)
@@ -3,30 +3,78 @@ import os
 import re
 import gc
 import unicodedata
-import requests
 from pathlib import Path
-import numpy as np
-from PIL import Image, ImageDraw, ImageFont
-from moviepy.editor import VideoFileClip, concatenate_videoclips, ImageClip, CompositeVideoClip
-
-# ─── decorator 라이브러리 호환성 패치 ───
-# moviepy 1.0.3 + decorator 라이브러리 조합에서 write_videofile의 fps 파라미터가
-# 유실되는 버그 수정. ffmpeg_write_video 레벨에서 fps=None일 때 clip.fps로 폴백.
-import moviepy.video.VideoClip as _vc_module
-_orig_ffmpeg_write_video = _vc_module.ffmpeg_write_video
-
-def _patched_ffmpeg_write_video(clip, filename, fps, codec='libx264', bitrate=None,
-                                 preset="medium", withmask=False, write_logfile=False,
-                                 audiofile=None, verbose=True, threads=None,
-                                 ffmpeg_params=None, logger='bar'):
-    if fps is None:
-        fps = getattr(clip, 'fps', None) or 24
-    return _orig_ffmpeg_write_video(clip, filename, fps, codec, bitrate, preset,
-                                     withmask, write_logfile, audiofile, verbose,
-                                     threads, ffmpeg_params, logger)
-
-_vc_module.ffmpeg_write_video = _patched_ffmpeg_write_video
-# ─── 패치 끝 ───
+import subprocess as _subprocess
+import threading
+
+from metrics import timed_render
+from tracing import traced
+from cancellation import current_token
+from proc_accounting import AccountedPopen
+
+# moviepy(+numpy, imageio-ffmpeg 탐색)와 PIL은 처음 렌더할 때 불러옴 — Streamlit 워커 콜드 스타트 단축.
+# moviepy를 쓰는 곳은 import 전에 load_moviepy()를 불러서 아래 패치가 먼저 적용되게 할 것.
+_MOVIEPY = None
+_MOVIEPY_LOCK = threading.Lock()
+
+
+class _TrackedSubprocess:
+    """moviepy 모듈의 `sp`(subprocess) 자리에 끼우는 대리 객체. Popen만 가로챔."""
+
+    def __getattr__(self, name):
+        return getattr(_subprocess, name)
+
+    @staticmethod
+    def Popen(*args, **kwargs):
+        proc = AccountedPopen(*args, **kwargs)
+        token = current_token()
+        if token is not None:
+            token.track_process(proc)
+        return proc
+
+
+def _patch_moviepy():
+    # ─── decorator 라이브러리 호환성 패치 ───
+    # moviepy 1.0.3 + decorator 라이브러리 조합에서 write_videofile의 fps 파라미터가
+    # 유실되는 버그 수정. ffmpeg_write_video 레벨에서 fps=None일 때 clip.fps로 폴백.
+    import moviepy.video.VideoClip as _vc_module
+    _orig_ffmpeg_write_video = _vc_module.ffmpeg_write_video
+
+    def _patched_ffmpeg_write_video(clip, filename, fps, codec='libx264', bitrate=None,
+                                     preset="medium", withmask=False, write_logfile=False,
+                                     audiofile=None, verbose=True, threads=None,
+                                     ffmpeg_params=None, logger='bar'):
+        if fps is None:
+            fps = getattr(clip, 'fps', None) or 24
+        return _orig_ffmpeg_write_video(clip, filename, fps, codec, bitrate, preset,
+                                         withmask, write_logfile, audiofile, verbose,
+                                         threads, ffmpeg_params, logger)
+
+    _vc_module.ffmpeg_write_video = _patched_ffmpeg_write_video
+
+    # ─── ffmpeg 프로세스 취소 연동 + 자원 계측 패치 ───
+    # moviepy가 띄우는 ffmpeg(읽기/쓰기/오디오)를 현재 취소 토큰에 등록 → 취소 버튼을 누르면
+    # 인코딩 중인 ffmpeg가 바로 종료되고 moviepy 쪽은 BrokenPipe 등으로 빠져나옴.
+    # 프로세스는 AccountedPopen으로 띄워서 종료 시 CPU 시간·최대 RSS·코덱·프리셋이 기록됨 (proc_accounting).
+    import moviepy.tools as _mp_tools
+    import moviepy.video.io.ffmpeg_reader as _mp_reader
+    import moviepy.video.io.ffmpeg_writer as _mp_writer
+    import moviepy.audio.io.readers as _mp_audio_reader
+    import moviepy.audio.io.ffmpeg_audiowriter as _mp_audio_writer
+    for _mod in (_mp_tools, _mp_reader, _mp_writer, _mp_audio_reader, _mp_audio_writer):
+        _mod.sp = _TrackedSubprocess()
+
+
+def load_moviepy():
+    """moviepy.editor를 불러오고 (처음 한 번) 위 패치를 적용. 프로세스 공용."""
+    global _MOVIEPY
+    with _MOVIEPY_LOCK:
+        if _MOVIEPY is None:
+            import moviepy.editor
+            _patch_moviepy()
+            _MOVIEPY = moviepy.editor
+        return _MOVIEPY
+
 
 #  같은 폴더에 있는 폰트 자동 연결
 FONT_PATH = str(Path(__file__).resolve().parent / "malgun.ttf")
@@ -43,9 +91,14 @@ TEXT_COLORS = [
 # -------------------------
 # 영상 다운로드
 # -------------------------
+@traced(cat="render")
+@timed_render()
 def download_video(url: str, out_path: Path):
+    import requests
+    from artifact_store import detach
     r = requests.get(url)
     r.raise_for_status()
+    detach(out_path)
     with open(out_path, "wb") as f:
         f.write(r.content)
 
@@ -53,7 +106,12 @@ def download_video(url: str, out_path: Path):
 # -------------------------
 # 영상 이어붙이기
 # -------------------------
+@traced(cat="render")
+@timed_render()
 def concat_videos(video_paths, out_path):
+    load_moviepy()
+    from moviepy.editor import VideoFileClip, concatenate_videoclips
+
     clips = [VideoFileClip(str(p)) for p in video_paths]
     try:
         final = concatenate_videoclips(clips, method="compose")
@@ -185,6 +243,7 @@ def draw_colored_text_multiline(draw, text, font, max_width, start_xy,
 
 
 def _load_font(font_size):
+    from PIL import ImageFont
     if os.path.exists(FONT_PATH):
         return ImageFont.truetype(FONT_PATH, font_size)
     try:
@@ -210,6 +269,7 @@ def _measure_subtitle(text, width, font_size):
 # -------------------------
 # 자막 이미지 생성 (자동 폰트 축소 + 줄별 반투명 배경)
 # -------------------------
+@traced(cat="render")
 def create_subtitle_image(text, width, max_height=None, font_size=36,
                           scene_index=0, font_color="white"):
     """
@@ -217,6 +277,9 @@ def create_subtitle_image(text, width, max_height=None, font_size=36,
     max_height: 자막이 차지할 수 있는 최대 세로(px). 넘으면 폰트 자동 축소.
     font_size: 시작 폰트 크기.
     """
+    import numpy as np
+    from PIL import Image, ImageDraw
+
     if max_height is None:
         max_height = 10_000  # 사실상 무제한
 
@@ -246,7 +309,12 @@ def create_subtitle_image(text, width, max_height=None, font_size=36,
 # -------------------------
 # 자막 오버레이 (하단 고정 anchor + 화면 하단 35% 안에 가둠)
 # -------------------------
+@traced(cat="render")
+@timed_render()
 def add_subtitle_to_video(input_video, text, output_path, scene_index=0, font_color="white"):
+    load_moviepy()
+    from moviepy.editor import CompositeVideoClip, ImageClip, VideoFileClip
+
     clip = VideoFileClip(input_video)
     subtitle_clip = None
     final = None
@@ -291,6 +359,8 @@ def add_subtitle_to_video(input_video, text, output_path, scene_index=0, font_co
 # -------------------------
 # 영상 길이 조절 (TTS 길이에 맞춤)
 # -------------------------
+@traced(cat="render")
+@timed_render()
 def trim_video_to_duration(video_path: str, target_duration: float, output_path: str):
     """
     영상을 목표 길이로 자르기
@@ -300,6 +370,9 @@ def trim_video_to_duration(video_path: str, target_duration: float, output_path:
         target_duration: 목표 길이 (초)
         output_path: 출력 영상 경로
     """
+    load_moviepy()
+    from moviepy.editor import VideoFileClip
+
     clip = VideoFileClip(video_path)
     trimmed = None
 
@@ -316,9 +389,40 @@ def trim_video_to_duration(video_path: str, target_duration: float, output_path:
         gc.collect()  # Force garbage collection
 
 
+# -------------------------
+# 영상 길이를 목표에 맞춤 (짧으면 trim, 길면 슬로우 모션) — Mode B Runway 장면용
+# -------------------------
+@traced(cat="render")
+@timed_render()
+def retime_video_to_duration(video_path: str, source_duration: float, target_duration: float, output_path: str):
+    """
+    source_duration(Runway 요청 길이)보다 목표가 짧으면 뒤를 잘라내고,
+    길면 재생 속도를 늦춰 목표 길이만큼 늘린다. 오디오 없이 24fps로 저장.
+    """
+    load_moviepy()
+    from moviepy.editor import VideoFileClip
+    from moviepy.video.fx.all import speedx
+
+    clip = VideoFileClip(video_path)
+    final = None
+    try:
+        if target_duration <= source_duration:
+            final = clip.subclip(0, target_duration)
+        else:
+            final = clip.fx(speedx, final_duration=target_duration)
+        final.write_videofile(output_path, fps=24, codec="libx264", audio=False, logger=None)
+    finally:
+        if final:
+            final.close()
+        clip.close()
+        gc.collect()
+
+
 # -------------------------
 # 영상 길이를 목표에 정확히 맞춤 (짧으면 trim, 길면 extend)
 # -------------------------
+@traced(cat="render")
+@timed_render()
 def fit_video_to_duration(video_path: str, target_duration: float, output_path: str,
                           extend_mode: str = "loop"):
     """
@@ -332,7 +436,8 @@ def fit_video_to_duration(video_path: str, target_duration: float, output_path:
       - "pingpong" : 앞→역재생→앞 반복으로 이음새 매끄럽게
     """
     import math
-    from moviepy.editor import ImageClip, concatenate_videoclips
+    load_moviepy()
+    from moviepy.editor import ImageClip, VideoFileClip, concatenate_videoclips
     from moviepy.video.fx.all import time_mirror
 
     clip = VideoFileClip(video_path)